@@ -3,16 +3,22 @@ Aplicación web Flask para conectar y consultar Elasticsearch
 Proporciona interfaz web para:
 - Login con credenciales de Elasticsearch o API Key
 - Listar índices disponibles
-- Ejecutar queries personalizadas
+- Ejecutar queries personalizadas (también como búsquedas asíncronas)
 - Exportar resultados a JSON
 """
 
+import hashlib
+import hmac
 import json
+import secrets
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
 from elasticsearch import Elasticsearch
 import warnings
 
+import busqueda_asincrona
+from metadata_cache import CacheMetadatos
+
 warnings.filterwarnings('ignore')
 
 # Crear aplicación Flask
@@ -20,6 +26,50 @@ app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-in-production'
 CORS(app)
 
+# Metadatos compartidos entre peticiones del dashboard (listas de índices)
+cache_metadatos = CacheMetadatos(ttl=300.0)
+
+# Clave de proceso para la huella de las credenciales en la caché (no se persiste)
+_CLAVE_HUELLA = secrets.token_bytes(32)
+
+# Espera máxima de cada petición de búsqueda asíncrona (el worker queda libre después)
+ESPERA_ASINCRONA_SEGUNDOS = 2.0
+
+
+def crear_cliente(data, request_timeout):
+    """Cliente Elasticsearch con las credenciales de la petición (básicas o API Key)"""
+    if data.get('authType', 'basic') == 'apikey':
+        return Elasticsearch(
+            hosts=[data['host']],
+            api_key=(data['apiKeyId'], data['apiKeySecret']),
+            verify_certs=False,
+            request_timeout=request_timeout
+        )
+    return Elasticsearch(
+        hosts=[data['host']],
+        basic_auth=(data['username'], data['password']),
+        verify_certs=False,
+        request_timeout=request_timeout
+    )
+
+
+def clave_cache_indices(data):
+    """
+    Clave de la lista de índices en la caché: cluster + huella de la credencial completa
+
+    La huella incluye la contraseña o el secreto de la API Key, de modo que
+    una entrada cacheada solo la reutiliza quien presenta la misma credencial
+    que ya validó el cluster (conocer host y usuario no basta).
+    """
+    if data.get('authType', 'basic') == 'apikey':
+        credencial = ['apikey', data.get('apiKeyId') or '', data.get('apiKeySecret') or '']
+    else:
+        credencial = ['basic', data.get('username') or '', data.get('password') or '']
+    huella = hmac.new(
+        _CLAVE_HUELLA, '\0'.join(credencial).encode('utf-8'), hashlib.sha256
+    ).hexdigest()
+    return f"indices:{data['host']}|{huella}"
+
 
 @app.route('/')
 def index():
@@ -143,31 +193,24 @@ def api_indices():
     """
     try:
         data = request.get_json()
-        auth_type = data.get('authType', 'basic')
+        es_client = crear_cliente(data, request_timeout=10)
         
-        # Crear cliente
-        if auth_type == 'apikey':
-            es_client = Elasticsearch(
-                hosts=[data['host']],
-                api_key=(data['apiKeyId'], data['apiKeySecret']),
-                verify_certs=False,
-                request_timeout=10
-            )
-        else:
-            es_client = Elasticsearch(
-                hosts=[data['host']],
-                basic_auth=(data['username'], data['password']),
-                verify_certs=False,
-                request_timeout=10
-            )
+        # Obtener índices (cacheados por cluster y credencial completa)
+        clave = clave_cache_indices(data)
+        if data.get('refresh'):
+            cache_metadatos.invalidar_clave(clave)
+        
+        def cargar():
+            return sorted([idx['index'] for idx in es_client.cat.indices(format='json')])
+        
+        def version():
+            estado = es_client.cluster.state(metric='version')
+            return f"{estado['state_uuid']}:{estado['version']}"
         
-        # Obtener índices
         try:
-            indices_response = es_client.cat.indices(format='json')
+            indices = cache_metadatos.obtener(clave, cargar, validador=version)
         except:
-            indices_response = []
-        
-        indices = sorted([idx['index'] for idx in indices_response])
+            indices = []
         
         return jsonify({
             'indices': indices,
@@ -182,32 +225,27 @@ def api_indices():
 def api_search():
     """
     Ejecutar una query de Elasticsearch
+    
+    Con "async": true se envía a _async_search: la respuesta llega en unos
+    segundos con el id y los resultados parciales, y se sigue con
+    /api/search/status hasta que 'en_curso' sea false.
     """
     try:
         data = request.get_json()
-        auth_type = data.get('authType', 'basic')
         
         if not data.get('query'):
             return jsonify({'error': 'Query requerida'}), 400
         
-        # Crear cliente
-        if auth_type == 'apikey':
-            es_client = Elasticsearch(
-                hosts=[data['host']],
-                api_key=(data['apiKeyId'], data['apiKeySecret']),
-                verify_certs=False,
-                request_timeout=30
-            )
-        else:
-            es_client = Elasticsearch(
-                hosts=[data['host']],
-                basic_auth=(data['username'], data['password']),
-                verify_certs=False,
-                request_timeout=30
+        es_client = crear_cliente(data, request_timeout=30)
+        index = data.get('index', '*')
+        
+        if data.get('async'):
+            estado = busqueda_asincrona.enviar(
+                es_client, index, data['query'], espera_segundos=ESPERA_ASINCRONA_SEGUNDOS
             )
+            return jsonify(estado), 202 if estado['en_curso'] else 200
         
         # Ejecutar query
-        index = data.get('index', '*')
         response = es_client.search(
             index=index,
             body=data['query']
@@ -219,6 +257,46 @@ def api_search():
         return jsonify({'error': f'Error en la query: {str(e)[:100]}'}), 500
 
 
+@app.route('/api/search/status', methods=['POST'])
+def api_search_status():
+    """
+    Resultados parciales o finales de una búsqueda asíncrona
+    
+    {"host": "...", "username": "...", "password": "...", "id": "FmRld..."}
+    """
+    try:
+        data = request.get_json()
+        if not data.get('id'):
+            return jsonify({'error': 'Id de búsqueda requerido'}), 400
+        
+        es_client = crear_cliente(data, request_timeout=30)
+        estado = busqueda_asincrona.consultar(
+            es_client, data['id'], espera_segundos=ESPERA_ASINCRONA_SEGUNDOS
+        )
+        return jsonify(estado), 202 if estado['en_curso'] else 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': f'Error al consultar la búsqueda: {str(e)[:100]}'}), 500
+
+
+@app.route('/api/search/cancel', methods=['POST'])
+def api_search_cancel():
+    """Cancelar una búsqueda asíncrona y borrar su resultado"""
+    try:
+        data = request.get_json()
+        if not data.get('id'):
+            return jsonify({'error': 'Id de búsqueda requerido'}), 400
+        
+        es_client = crear_cliente(data, request_timeout=10)
+        borrada = busqueda_asincrona.cancelar(es_client, data['id'])
+        return jsonify({'id': data['id'], 'cancelada': borrada}), 200 if borrada else 404
+        
+    except Exception as e:
+        return jsonify({'error': f'Error al cancelar la búsqueda: {str(e)[:100]}'}), 500
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check"""
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark: escritura del CSV de download_to_csv
+Compara el camino anterior (DictWriter con writerow por documento y filtro
+de campos por diccionario) con la escritura por lotes (writerows con el orden
+de columnas fijado) sin comprimir y con gzip en un hilo aparte. Cada página
+simula una espera de red para medir el solape de la compresión con la descarga.
+
+Uso:
+    python benchmarks/bench_csv_write.py --docs 1000000 --message-kb 0.5 --fetch-ms 20
+"""
+
+import argparse
+import csv
+import gzip
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from salida_csv import EscritorCsv  # noqa: E402
+
+CAMPOS = ['@timestamp', 'message', 'host', 'level']
+
+
+def generar_pagina(docs: int, message_kb: float) -> list:
+    """Página de _source sintéticos con un Body de tamaño medio dado"""
+    relleno = 'x' * max(0, int(message_kb * 1024) - 80)
+    return [{
+        '@timestamp': f'2024-01-01T00:00:{i % 60:02d}Z',
+        'message': f'Body: {{"where":[{{"field":"idEstudio","value":{i}}}]}} {relleno}',
+        'host': f'srv-{i % 8}',
+        'level': 'ERROR',
+        'extra': i
+    } for i in range(docs)]
+
+
+def escribir_anterior(pagina: list, paginas: int, destino: str, espera: float) -> int:
+    """Camino anterior: DictWriter, filtro por diccionario y writerow por documento"""
+    count = 0
+    writer = None
+    abrir = gzip.open if destino.endswith('.gz') else open
+    with abrir(destino, 'wt', newline='', encoding='utf-8') as csv_file:
+        for _ in range(paginas):
+            time.sleep(espera)
+            for source in pagina:
+                source = {k: v for k, v in source.items() if k in CAMPOS}
+                if writer is None:
+                    writer = csv.DictWriter(csv_file, fieldnames=list(source.keys()))
+                    writer.writeheader()
+                writer.writerow(source)
+                count += 1
+    return count
+
+
+def escribir_lotes(pagina: list, paginas: int, destino: str, espera: float) -> int:
+    """Camino nuevo: writerows por página, compresión en segundo plano"""
+    count = 0
+    with EscritorCsv(destino) as escritor:
+        escritor.escribir_cabecera(CAMPOS)
+        for _ in range(paginas):
+            time.sleep(espera)
+            escritor.escribir_filas([[source.get(c, '') for c in CAMPOS] for source in pagina])
+            count += len(pagina)
+    return count
+
+
+def main():
+    """Ejecuta el benchmark e imprime la tabla de resultados"""
+    parser = argparse.ArgumentParser(description='Benchmark de escritura del CSV')
+    parser.add_argument('--docs', type=int, default=1_000_000, help='Filas a escribir')
+    parser.add_argument('--page-size', type=int, default=1000, help='Documentos por página')
+    parser.add_argument('--message-kb', type=float, default=0.5, help='Tamaño medio de mensaje (KB)')
+    parser.add_argument('--fetch-ms', type=float, default=20, help='Espera de red simulada por página (ms)')
+    args = parser.parse_args()
+
+    paginas = max(1, args.docs // args.page_size)
+    pagina = generar_pagina(args.page_size, args.message_kb)
+    espera = args.fetch_ms / 1000
+
+    print("=" * 70)
+    print("  BENCHMARK: ESCRITURA DEL CSV (writerow frente a lotes comprimidos)")
+    print("=" * 70)
+    print(f"  📄 {paginas * args.page_size:,} filas en páginas de {args.page_size:,}, "
+          f"mensajes de {args.message_kb} KB, {args.fetch_ms:.0f} ms de red por página")
+    print(f"  ⏳ Solo la red simulada: {paginas * espera:.1f} s")
+    print()
+    print(f"  {'camino':<22} | {'segundos':>8} | {'filas/s':>10} | {'MB en disco':>11}")
+    print(f"  {'-' * 22}-+-{'-' * 8}-+-{'-' * 10}-+-{'-' * 11}")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        for nombre, funcion, archivo in (
+            ('writerow', escribir_anterior, 'salida.csv'),
+            ('writerows', escribir_lotes, 'salida.csv'),
+            ('writerow + gzip', escribir_anterior, 'salida.csv.gz'),
+            ('writerows + gzip hilo', escribir_lotes, 'salida.csv.gz'),
+        ):
+            destino = os.path.join(directorio, archivo)
+            inicio = time.perf_counter()
+            filas = funcion(pagina, paginas, destino, espera)
+            segundos = time.perf_counter() - inicio
+            megas = os.path.getsize(destino) / 1024 / 1024
+            print(f"  {nombre:<22} | {segundos:>8.1f} | {filas / segundos:>10,.0f} | {megas:>11,.0f}")
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
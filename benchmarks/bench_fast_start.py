@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark: tiempo hasta el primer documento con y sin inicio rápido
+Simula un cluster con una latencia fija por petición (como una VPN) y cuenta
+las peticiones hechas antes del primer documento en cada camino.
+
+Uso:
+    python benchmarks/bench_fast_start.py --latency-ms 80
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from elasticsearch_client import ElasticsearchClient  # noqa: E402
+
+QUERY = {'query': {'range': {'@timestamp': {'gte': '2024-01-01T00:00:00Z'}}}}
+INDICES = ['logs-2024.01.01', 'logs-2024.01.02']
+
+
+class ClusterSimulado:
+    """Cliente con latencia fija por petición y respuestas mínimas"""
+
+    def __init__(self, latencia: float):
+        self.latencia = latencia
+        self.peticiones = []
+        self.cat = SimpleNamespace(indices=self._peticion('cat.indices', self._cat_indices))
+        self.indices = SimpleNamespace(exists=self._peticion('indices.exists', lambda **kw: True))
+        self.cluster = SimpleNamespace(state=self._peticion(
+            'cluster.state', lambda **kw: {'state_uuid': 'x', 'version': 1}
+        ))
+        self.ping = self._peticion('ping', lambda **kw: True)
+        self.info = self._peticion('info', lambda **kw: {
+            'cluster_name': 'simulado', 'version': {'number': '8.11.0'}
+        })
+        self.count = self._peticion('count', lambda **kw: {'count': 1})
+        self.search = self._peticion('search', self._search)
+        self.msearch = self._peticion('msearch', self._msearch)
+        self.scroll = self._peticion('scroll', lambda **kw: {
+            '_scroll_id': 's', '_shards': {'total': 1, 'successful': 1}, 'hits': {'hits': []}
+        })
+        self.clear_scroll = self._peticion('clear_scroll', lambda **kw: {})
+
+    def options(self, **kwargs):
+        """helpers.scan pide un cliente con opciones de transporte"""
+        return self
+
+    def _peticion(self, nombre, respuesta):
+        def llamar(*args, **kwargs):
+            time.sleep(self.latencia)
+            self.peticiones.append(nombre)
+            return respuesta(**kwargs)
+        return llamar
+
+    @staticmethod
+    def _cat_indices(**kwargs):
+        return [{'index': nombre, 'docs.count': '10', 'pri': '1'} for nombre in INDICES]
+
+    @staticmethod
+    def _msearch(**kwargs):
+        return {'responses': [
+            {'aggregations': {'min_ts': {'value': 1704067200000 + i},
+                              'max_ts': {'value': 1704067200000 + i}}}
+            for i, _ in enumerate(kwargs['searches'][::2])
+        ]}
+
+    @staticmethod
+    def _search(**kwargs):
+        return {
+            '_scroll_id': 's',
+            '_shards': {'total': 1, 'successful': 1},
+            'hits': {'hits': [{'_id': '1', '_source': {'message': 'm'}}]}
+        }
+
+
+def crear_config(fast_start: bool) -> SimpleNamespace:
+    """Config mínima equivalente a la de .env"""
+    return SimpleNamespace(
+        es_host='https://simulado:9200', es_user='u', es_password='p', es_index='logs-*',
+        verify_ssl=True, timeout=300, scroll_size=1000, scroll_timeout='5m',
+        http_compress=True, connections_per_node=16, node_class='urllib3',
+        serializer='json', max_retries=3, prune_indices=True,
+        metadata_cache_ttl=300, metadata_cache_persist=False, fast_start=fast_start,
+        adaptive_page_size=True, scroll_size_min=100, scroll_size_max=10000,
+        page_target_seconds=2.0, page_max_mb=20.0, window_workers=4,
+        adaptive_concurrency=True, breaker_threshold=5, breaker_pause=30.0,
+        load_monitor=False, es_hosts=['https://simulado:9200'], sniff=False,
+        dead_node_backoff=1.0, max_dead_node_backoff=30.0, hedge_requests=False, hedge_budget=0.05,
+        async_search=False, async_wait=2.0, async_keep_alive='1h',
+        page_cache=False, page_cache_dir='', page_cache_max_mb=2048.0,
+        page_cache_max_age_days=30.0, replay=False, pipeline_name='extractor-body-where',
+        pipeline_field='body_where', backfill_rate=1000.0, memory_limit_mb=0.0
+    )
+
+
+def medir(fast_start: bool, latencia: float) -> dict:
+    """Reproduce el arranque de main.py elasticsearch hasta el primer documento"""
+    cluster = ClusterSimulado(latencia)
+    with patch('elasticsearch_client.Elasticsearch', return_value=cluster):
+        client = ElasticsearchClient(crear_config(fast_start))
+        if not fast_start:
+            client.test_connection()
+        documentos = client.get_documents_generator(QUERY, 'logs-*')
+        next(documentos)
+        antes = list(cluster.peticiones)
+        documentos.close()
+    return {
+        'segundos': client.estadisticas['primer_documento'],
+        'peticiones': [p for p in antes if p != 'count']
+    }
+
+
+def main():
+    """Ejecuta el benchmark e imprime la tabla de resultados"""
+    parser = argparse.ArgumentParser(description='Benchmark del inicio rápido')
+    parser.add_argument('--latency-ms', type=float, default=80, help='Latencia por petición (ms)')
+    args = parser.parse_args()
+    latencia = args.latency_ms / 1000
+
+    print("=" * 70)
+    print("  BENCHMARK: TIEMPO HASTA EL PRIMER DOCUMENTO")
+    print("=" * 70)
+    print(f"  🌐 Latencia simulada: {args.latency_ms:.0f} ms por petición")
+    print("  (el _count va en segundo plano y no se cuenta)")
+    print()
+    print(f"  {'camino':<14} | {'1er doc (ms)':>12} | peticiones previas")
+    print(f"  {'-' * 14}-+-{'-' * 12}-+-{'-' * 38}")
+
+    for nombre, fast_start in (('normal', False), ('--fast-start', True)):
+        r = medir(fast_start, latencia)
+        print(f"  {nombre:<14} | {r['segundos'] * 1000:>12.0f} | {', '.join(r['peticiones'])}")
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark: parser incremental de hits frente a decodificación completa
+Mide, para una página grande (scroll_size alto y mensajes grandes), el tiempo
+hasta el primer documento, el tiempo total y la memoria pico de Python.
+
+Uso:
+    python benchmarks/bench_hit_parser.py --docs 5000 --message-kb 10
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from hit_parser import iterar_hits_crudos  # noqa: E402
+from bench_http_compress import generar_pagina  # noqa: E402
+
+
+def decodificacion_completa(raw: bytes):
+    """Camino actual: decodificar la página entera y recorrer hits.hits"""
+    respuesta = json.loads(raw)
+    for hit in respuesta['hits']['hits']:
+        yield {'message': hit['_source'].get('message', ''), '_id': hit['_id']}
+
+
+def parser_incremental(raw: bytes):
+    """Camino nuevo: recorrer los hits sobre los bytes de uno en uno"""
+    for hit in iterar_hits_crudos(raw):
+        yield {'message': hit['_source'].get('message', ''), '_id': hit['_id']}
+
+
+def medir(nombre: str, funcion, raw: bytes) -> dict:
+    """Mide tiempo al primer documento, tiempo total y memoria pico"""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    documentos = funcion(raw)
+    next(documentos)
+    primer_doc = time.perf_counter() - inicio
+    total = 1 + sum(1 for _ in documentos)
+    duracion = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'nombre': nombre,
+        'docs': total,
+        'primer_doc_ms': primer_doc * 1000,
+        'total_ms': duracion * 1000,
+        'pico_mb': pico / 1024 / 1024
+    }
+
+
+def main():
+    """Ejecuta el benchmark e imprime la tabla de resultados"""
+    parser = argparse.ArgumentParser(description='Benchmark del parser incremental de hits')
+    parser.add_argument('--docs', type=int, default=5000, help='Hits por página (scroll_size)')
+    parser.add_argument('--message-kb', type=float, default=10, help='Tamaño medio del mensaje (KB)')
+    args = parser.parse_args()
+
+    raw = generar_pagina(args.docs, args.message_kb)
+
+    print("=" * 70)
+    print("  BENCHMARK: PARSER INCREMENTAL DE HITS")
+    print("=" * 70)
+    print(f"  📄 Página: {args.docs:,} hits, {len(raw) / 1024 / 1024:.1f} MB en bytes")
+    print("  (la memoria pico no incluye los bytes de la página, comunes a ambos caminos)")
+    print()
+    print(f"  {'camino':<24} | {'1er doc (ms)':>12} | {'total (ms)':>10} | {'pico (MB)':>9}")
+    print(f"  {'-' * 24}-+-{'-' * 12}-+-{'-' * 10}-+-{'-' * 9}")
+
+    for nombre, funcion in (('json.loads completo', decodificacion_completa),
+                            ('iterar_hits_crudos', parser_incremental)):
+        r = medir(nombre, funcion, raw)
+        print(f"  {r['nombre']:<24} | {r['primer_doc_ms']:>12.1f} | {r['total_ms']:>10.1f} | "
+              f"{r['pico_mb']:>9.1f}")
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark: efecto de la compresión HTTP (gzip) en descargas de logs
+Genera páginas de búsqueda sintéticas con mensajes de varios KB, mide el
+tamaño comprimido y el coste de descompresión, y estima el throughput por
+VPN para distintos anchos de banda con ELASTICSEARCH_HTTP_COMPRESS on/off.
+
+Uso:
+    python benchmarks/bench_http_compress.py --docs 1000 --message-kb 4
+"""
+
+import argparse
+import gzip
+import json
+import random
+import time
+from typing import Dict, List
+
+# Nivel de compresión por defecto de Elasticsearch (http.compression_level)
+NIVEL_GZIP_ES = 3
+
+
+def generar_mensaje(tamano_kb: float, rng: random.Random) -> str:
+    """Genera un mensaje de log realista con Body JSON y traza de error"""
+    where = [
+        {"field": "idAsignaturaOfertada", "value": rng.randint(100000, 999999)},
+        {"field": "idAsignaturaPlan", "value": None},
+        {"field": "idEstudio", "value": rng.choice([None, rng.randint(1, 5000)])},
+        {"field": "idPlanEstudio", "value": rng.randint(1000, 9999)},
+    ]
+    cabecera = (
+        f"[{rng.randint(100, 999)}] Error con el Servicio de Evaluaciones, Method: POST, "
+        f"Body: {json.dumps({'where': where}, separators=(',', ':'))} , Mensaje del error: "
+    )
+    lineas = []
+    while len(cabecera) + sum(len(l) for l in lineas) < tamano_kb * 1024:
+        lineas.append(
+            f"   at Unir.Evaluaciones.Servicios.Niveles{rng.randint(1, 40)}"
+            f".Procesar(Int32 id{rng.randint(1, 9)}) in /src/Servicios/Niveles.cs:line {rng.randint(1, 900)}\n"
+        )
+    return cabecera + ''.join(lineas)
+
+
+def generar_pagina(num_docs: int, tamano_kb: float, semilla: int = 42) -> bytes:
+    """Genera el cuerpo JSON de una página de búsqueda con num_docs hits"""
+    rng = random.Random(semilla)
+    hits: List[Dict] = []
+    for i in range(num_docs):
+        hits.append({
+            '_index': '.ds-logs-aplicacion-2026.02.16-000123',
+            '_id': f"{rng.getrandbits(64):016x}",
+            '_score': None,
+            '_source': {
+                'message': generar_mensaje(tamano_kb, rng),
+                '@timestamp': f"2026-02-16T10:{i // 60 % 60:02d}:{i % 60:02d}.000Z"
+            },
+            'sort': [1771236000000 + i, i]
+        })
+    respuesta = {'took': 120, 'timed_out': False, 'hits': {'hits': hits}}
+    return json.dumps(respuesta, separators=(',', ':')).encode('utf-8')
+
+
+def medir(funcion, repeticiones: int = 5) -> float:
+    """Devuelve el mejor tiempo (segundos) de varias ejecuciones"""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    """Ejecuta el benchmark e imprime la tabla de resultados"""
+    parser = argparse.ArgumentParser(description='Benchmark de compresión HTTP para logs')
+    parser.add_argument('--docs', type=int, default=1000, help='Documentos por página')
+    parser.add_argument('--message-kb', type=float, default=4, help='Tamaño medio del mensaje (KB)')
+    parser.add_argument('--rtt-ms', type=float, default=60, help='Latencia ida y vuelta de la VPN (ms)')
+    parser.add_argument('--bandwidth-mbps', type=float, nargs='+', default=[10, 50, 100, 1000],
+                        help='Anchos de banda a simular (Mbit/s)')
+    args = parser.parse_args()
+
+    pagina = generar_pagina(args.docs, args.message_kb)
+    comprimida = gzip.compress(pagina, compresslevel=NIVEL_GZIP_ES)
+
+    t_compresion = medir(lambda: gzip.compress(pagina, compresslevel=NIVEL_GZIP_ES))
+    t_descompresion = medir(lambda: gzip.decompress(comprimida))
+    rtt = args.rtt_ms / 1000
+
+    print("=" * 70)
+    print("  BENCHMARK: COMPRESIÓN HTTP (gzip) EN DESCARGA DE LOGS")
+    print("=" * 70)
+    print(f"  📄 Página: {args.docs:,} docs × ~{args.message_kb} KB")
+    print(f"  📦 Sin comprimir: {len(pagina) / 1024 / 1024:.2f} MB")
+    print(f"  📦 Gzip nivel {NIVEL_GZIP_ES}: {len(comprimida) / 1024 / 1024:.2f} MB "
+          f"(ratio {len(pagina) / len(comprimida):.1f}x)")
+    print(f"  ⏱  Compresión (servidor): {t_compresion * 1000:.1f} ms/página")
+    print(f"  ⏱  Descompresión (cliente): {t_descompresion * 1000:.1f} ms/página")
+    print()
+    print(f"  Throughput estimado con RTT {args.rtt_ms:.0f} ms (docs/s):")
+    print(f"  {'Mbit/s':>8} | {'sin gzip':>10} | {'con gzip':>10} | {'mejora':>7}")
+    print(f"  {'-' * 8}-+-{'-' * 10}-+-{'-' * 10}-+-{'-' * 7}")
+
+    for mbps in args.bandwidth_mbps:
+        bytes_por_seg = mbps * 1_000_000 / 8
+        t_plano = rtt + len(pagina) / bytes_por_seg
+        t_gzip = rtt + t_compresion + len(comprimida) / bytes_por_seg + t_descompresion
+        docs_plano = args.docs / t_plano
+        docs_gzip = args.docs / t_gzip
+        print(f"  {mbps:>8,.0f} | {docs_plano:>10,.0f} | {docs_gzip:>10,.0f} | "
+              f"{docs_gzip / docs_plano:>6.1f}x")
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark: tiempo de decodificación de páginas de respuesta
+Compara el serializador json estándar de elastic-transport con
+FastJsonSerializer (orjson) sobre páginas sintéticas de 1000 hits.
+
+Uso:
+    python benchmarks/bench_serializer.py --docs 1000 --message-kb 0.5 2 8
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from elasticsearch.serializer import JsonSerializer  # noqa: E402
+from serializers import FastJsonSerializer  # noqa: E402
+from bench_http_compress import generar_pagina  # noqa: E402
+
+
+def medir_decodificacion(serializer, pagina: bytes, repeticiones: int) -> float:
+    """Devuelve el mejor tiempo de decodificación (ms) de una página"""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        serializer.loads(pagina)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000
+
+
+def main():
+    """Ejecuta el benchmark e imprime la tabla de resultados"""
+    parser = argparse.ArgumentParser(description='Benchmark de decodificación JSON por página')
+    parser.add_argument('--docs', type=int, default=1000, help='Hits por página')
+    parser.add_argument('--message-kb', type=float, nargs='+', default=[0.5, 2, 8],
+                        help='Tamaños medios de mensaje a probar (KB)')
+    parser.add_argument('--repeticiones', type=int, default=10, help='Repeticiones por medida')
+    args = parser.parse_args()
+
+    estandar = JsonSerializer()
+    rapido = FastJsonSerializer()
+
+    print("=" * 70)
+    print("  BENCHMARK: DECODIFICACIÓN DE PÁGINAS DE RESPUESTA")
+    print("=" * 70)
+    if not rapido.usa_orjson:
+        print("  ⚠  orjson no está instalado: FastJsonSerializer usa json estándar")
+    print(f"  📄 {args.docs:,} hits por página")
+    print()
+    print(f"  {'KB/msg':>7} | {'MB/página':>9} | {'json (ms)':>9} | {'orjson (ms)':>11} | {'mejora':>6}")
+    print(f"  {'-' * 7}-+-{'-' * 9}-+-{'-' * 9}-+-{'-' * 11}-+-{'-' * 6}")
+
+    for kb in args.message_kb:
+        pagina = generar_pagina(args.docs, kb)
+        t_json = medir_decodificacion(estandar, pagina, args.repeticiones)
+        t_orjson = medir_decodificacion(rapido, pagina, args.repeticiones)
+        print(f"  {kb:>7.1f} | {len(pagina) / 1024 / 1024:>9.2f} | {t_json:>9.1f} | "
+              f"{t_orjson:>11.1f} | {t_json / t_orjson:>5.1f}x")
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark: coste en el cliente de exportar a CSV
+Compara el camino actual (scan: decodificar el JSON de cada página y
+escribir cada _source con csv.DictWriter) con la exportación _sql
+(páginas CSV generadas en el servidor y escritas tal cual). La red y el
+trabajo del cluster no se miden: las páginas sintéticas se reutilizan.
+
+Uso:
+    python benchmarks/bench_sql_export.py --docs 5000000 --message-kb 0.5
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from elasticsearch.serializer import JsonSerializer  # noqa: E402
+from exportador_sql import contar_filas_csv, primera_linea, separar_cabecera  # noqa: E402
+from bench_http_compress import generar_pagina  # noqa: E402
+
+
+def pagina_csv(pagina_json: bytes) -> bytes:
+    """Página CSV equivalente, con el formato que genera _sql (columnas en orden alfabético)"""
+    hits = json.loads(pagina_json)['hits']['hits']
+    salida = io.StringIO()
+    writer = csv.writer(salida, lineterminator='\n')
+    writer.writerow(['@timestamp', 'message'])
+    for hit in hits:
+        writer.writerow([hit['_source']['@timestamp'], hit['_source']['message']])
+    return salida.getvalue().encode('utf-8')
+
+
+def exportar_scan(pagina: bytes, paginas: int, destino: str) -> int:
+    """Camino de download_to_csv: decodificar cada página y DictWriter por documento"""
+    serializer = JsonSerializer()
+    count = 0
+    writer = None
+    with open(destino, 'w', newline='', encoding='utf-8') as csv_file:
+        for _ in range(paginas):
+            for hit in serializer.loads(pagina)['hits']['hits']:
+                source = hit['_source']
+                if writer is None:
+                    writer = csv.DictWriter(csv_file, fieldnames=list(source.keys()))
+                    writer.writeheader()
+                writer.writerow(source)
+                count += 1
+    return count
+
+
+def exportar_sql(pagina: bytes, paginas: int, destino: str) -> int:
+    """Camino de download_to_csv_sql: escribir los bytes de cada página"""
+    count = 0
+    cabecera = None
+    with open(destino, 'wb') as csv_file:
+        for _ in range(paginas):
+            if cabecera is None:
+                cabecera = primera_linea(pagina)
+                csv_file.write(cabecera)
+            lineas = separar_cabecera(pagina, cabecera)
+            csv_file.write(lineas)
+            count += contar_filas_csv(lineas)
+    return count
+
+
+def medir(funcion, *args) -> tuple:
+    """Devuelve (segundos, resultado) de una ejecución"""
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    """Ejecuta el benchmark e imprime la tabla de resultados"""
+    parser = argparse.ArgumentParser(description='Benchmark de exportación a CSV')
+    parser.add_argument('--docs', type=int, default=5_000_000, help='Filas a exportar')
+    parser.add_argument('--page-size', type=int, default=1000, help='Documentos por página')
+    parser.add_argument('--message-kb', type=float, default=0.5, help='Tamaño medio de mensaje (KB)')
+    args = parser.parse_args()
+
+    paginas = max(1, args.docs // args.page_size)
+    pagina_json = generar_pagina(args.page_size, args.message_kb)
+    pagina_sql = pagina_csv(pagina_json)
+
+    print("=" * 70)
+    print("  BENCHMARK: EXPORTACIÓN A CSV (scan + DictWriter frente a _sql)")
+    print("=" * 70)
+    print(f"  📄 {paginas * args.page_size:,} filas en páginas de {args.page_size:,}, "
+          f"mensajes de {args.message_kb} KB")
+    print()
+    print(f"  {'camino':<16} | {'segundos':>8} | {'filas/s':>10} | {'MB escritos':>11}")
+    print(f"  {'-' * 16}-+-{'-' * 8}-+-{'-' * 10}-+-{'-' * 11}")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        tiempos = {}
+        for nombre, funcion, pagina in (
+            ('scan+DictWriter', exportar_scan, pagina_json),
+            ('_sql format=csv', exportar_sql, pagina_sql),
+        ):
+            destino = os.path.join(directorio, 'salida.csv')
+            segundos, filas = medir(funcion, pagina, paginas, destino)
+            tiempos[nombre] = segundos
+            megas = os.path.getsize(destino) / 1024 / 1024
+            print(f"  {nombre:<16} | {segundos:>8.1f} | {filas / segundos:>10,.0f} | {megas:>11,.0f}")
+
+    print()
+    print(f"  Mejora en CPU del cliente: "
+          f"{tiempos['scan+DictWriter'] / tiempos['_sql format=csv']:.1f}x")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Búsquedas asíncronas (_async_search) para queries pesadas
+El servidor ejecuta la query en segundo plano y guarda el resultado con un
+id: se consultan resultados parciales por ese id y al final el completo,
+sin mantener una petición HTTP abierta hasta el timeout
+"""
+
+from typing import Any, Callable, Dict, Optional
+
+from elasticsearch.exceptions import NotFoundError
+
+
+def resumir(respuesta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Estado de una búsqueda asíncrona en un formato común para CLI y web
+
+    Args:
+        respuesta: Respuesta de async_search.submit o async_search.get
+
+    Returns:
+        dict: id, en_curso, parcial, shards (completados/total), total_hits,
+        error (si falló) y respuesta (cuerpo de _search, parcial o final)
+    """
+    cuerpo = respuesta.get('response') or {}
+    shards = cuerpo.get('_shards') or {}
+    total = (cuerpo.get('hits') or {}).get('total')
+    if isinstance(total, dict):
+        total = total.get('value')
+    return {
+        'id': respuesta.get('id'),
+        'en_curso': bool(respuesta.get('is_running')),
+        'parcial': bool(respuesta.get('is_partial')),
+        'shards': {
+            'completados': shards.get('successful', 0) + shards.get('skipped', 0) + shards.get('failed', 0),
+            'total': shards.get('total')
+        },
+        'total_hits': total,
+        'error': respuesta.get('error'),
+        'respuesta': cuerpo
+    }
+
+
+def enviar(
+    es,
+    index: str,
+    body: Dict[str, Any],
+    espera_segundos: float = 1.0,
+    keep_alive: str = '1h'
+) -> Dict[str, Any]:
+    """
+    Envía una búsqueda asíncrona y espera un poco por si termina enseguida
+
+    Args:
+        es: Cliente Elasticsearch
+        index: Patrón de índices
+        body: Cuerpo de _search (query, aggs, size...)
+        espera_segundos: Espera máxima antes de devolver el estado
+        keep_alive: Tiempo que el servidor conserva el resultado
+
+    Returns:
+        dict: Estado (ver resumir); con id aunque termine dentro de la espera
+    """
+    respuesta = es.async_search.submit(
+        index=index,
+        body=body,
+        wait_for_completion_timeout=f"{int(espera_segundos * 1000)}ms",
+        keep_alive=keep_alive,
+        keep_on_completion=True
+    )
+    return resumir(respuesta)
+
+
+def consultar(es, id_busqueda: str, espera_segundos: float = 0.0) -> Dict[str, Any]:
+    """
+    Resultados (parciales o finales) de una búsqueda asíncrona
+
+    Args:
+        es: Cliente Elasticsearch
+        id_busqueda: Id devuelto por enviar
+        espera_segundos: Espera máxima a que termine antes de responder
+
+    Returns:
+        dict: Estado (ver resumir)
+
+    Raises:
+        ValueError: Si el id no existe o el resultado ya caducó
+    """
+    try:
+        respuesta = es.async_search.get(
+            id=id_busqueda,
+            wait_for_completion_timeout=f"{int(espera_segundos * 1000)}ms"
+        )
+    except NotFoundError:
+        raise ValueError(f"❌ Búsqueda asíncrona no encontrada o caducada: {id_busqueda}")
+    return resumir(respuesta)
+
+
+def cancelar(es, id_busqueda: str) -> bool:
+    """
+    Cancela la búsqueda si sigue en curso y borra su resultado
+
+    Returns:
+        bool: False si el id ya no existía
+    """
+    try:
+        es.async_search.delete(id=id_busqueda)
+    except NotFoundError:
+        return False
+    return True
+
+
+def esperar(
+    es,
+    estado: Dict[str, Any],
+    espera_segundos: float = 2.0,
+    al_progreso: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Consulta la búsqueda hasta que termine
+
+    Cada consulta espera en el servidor hasta espera_segundos (long polling),
+    así que no hace falta dormir entre una y otra.
+
+    Args:
+        es: Cliente Elasticsearch
+        estado: Estado devuelto por enviar o consultar
+        espera_segundos: Espera máxima de cada consulta
+        al_progreso: Función llamada con cada estado intermedio (parcial)
+
+    Returns:
+        dict: Estado final
+    """
+    while estado['en_curso']:
+        if al_progreso is not None:
+            al_progreso(estado)
+        estado = consultar(es, estado['id'], espera_segundos)
+    return estado
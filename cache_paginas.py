@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Caché en disco de páginas de respuesta (PIT + search_after)
+Cada página se guarda comprimida con gzip en un archivo cuyo nombre es el
+hash de la consulta normalizada (query con el rango de tiempo ya absoluto,
+índice, ventana y posición de search_after). Permite repetir una extracción
+desde disco (--replay) mientras se ajustan las reglas de extracción.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from checkpoint import escribir_json_atomico
+from metadata_cache import directorio_cache_usuario
+
+# Claves del body que no cambian el contenido de la página
+CLAVES_IGNORADAS = ('pit', 'size', 'track_total_hits')
+EXTENSION_PAGINA = '.json.gz'
+NIVEL_COMPRESION = 6
+
+
+def directorio_cache_paginas() -> Path:
+    """Directorio por defecto de la caché de páginas"""
+    return directorio_cache_usuario() / 'paginas'
+
+
+def _hash(datos: Any) -> str:
+    """SHA-256 de una estructura JSON normalizada (claves ordenadas)"""
+    normalizado = json.dumps(
+        datos, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(normalizado.encode('utf-8')).hexdigest()
+
+
+class CachePaginas:
+    """Páginas comprimidas direccionadas por contenido, con poda por tamaño y antigüedad"""
+
+    def __init__(
+        self,
+        directorio: Optional[Path] = None,
+        max_bytes: Optional[int] = None,
+        max_edad_segundos: Optional[float] = None
+    ):
+        """
+        Inicializa la caché
+
+        Args:
+            directorio: Raíz de la caché (por defecto, la del usuario)
+            max_bytes: Tamaño máximo en disco al podar (None = sin límite)
+            max_edad_segundos: Antigüedad máxima de una página al podar
+                (None = sin límite)
+        """
+        self.directorio = Path(directorio) if directorio else directorio_cache_paginas()
+        self.max_bytes = max_bytes
+        self.max_edad_segundos = max_edad_segundos
+        self.estadisticas = {'aciertos': 0, 'fallos': 0, 'bytes_leidos': 0, 'bytes_escritos': 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave_consulta(host: str, query_dict: Dict[str, Any], index: str) -> str:
+        """
+        Clave de una extracción: cluster + query original + índice
+
+        La query original (con "now-7d") identifica la extracción para
+        --replay; las páginas se guardan con la query ya congelada.
+        """
+        return _hash({'host': host, 'query': query_dict, 'index': index})[:32]
+
+    @staticmethod
+    def clave_pagina(consulta: str, body: Dict[str, Any], params: Dict[str, Any]) -> str:
+        """
+        Clave de una página: extracción + body normalizado + parámetros
+
+        El body ya lleva el rango absoluto, el filtro de la ventana y el
+        search_after. Se ignoran el PIT y el tamaño: la página siguiente
+        continúa desde el último hit guardado, sea cual sea su tamaño.
+        """
+        cuerpo = {k: v for k, v in body.items() if k not in CLAVES_IGNORADAS}
+        return _hash({'consulta': consulta, 'body': cuerpo, 'params': params})
+
+    def leer(self, clave: str) -> Optional[bytes]:
+        """Cuerpo JSON de la página (descomprimido), o None si no está"""
+        ruta = self._ruta_pagina(clave)
+        try:
+            with open(ruta, 'rb') as f:
+                datos = gzip.decompress(f.read())
+            # La fecha de modificación hace de último uso para la poda
+            os.utime(ruta)
+        except (OSError, EOFError):
+            with self._lock:
+                self.estadisticas['fallos'] += 1
+            return None
+        with self._lock:
+            self.estadisticas['aciertos'] += 1
+            self.estadisticas['bytes_leidos'] += len(datos)
+        return datos
+
+    def escribir(self, clave: str, datos: bytes) -> None:
+        """Guarda la página comprimida de forma atómica"""
+        ruta = self._ruta_pagina(clave)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        comprimido = gzip.compress(datos, compresslevel=NIVEL_COMPRESION)
+        descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(comprimido)
+            os.replace(temporal, ruta)
+        except BaseException:
+            Path(temporal).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self.estadisticas['bytes_escritos'] += len(comprimido)
+
+    def registrar_consulta(self, clave: str, datos: Dict[str, Any]) -> None:
+        """Guarda la query congelada (y las ventanas) de una extracción grabada"""
+        escribir_json_atomico(self._ruta_consulta(clave), dict(datos, grabada=time.time()))
+
+    def consulta(self, clave: str) -> Optional[Dict[str, Any]]:
+        """Datos de una extracción grabada, o None si no existe"""
+        try:
+            with open(self._ruta_consulta(clave), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def resumen(self) -> Dict[str, Any]:
+        """Aciertos y fallos de la ejecución, para las estadísticas"""
+        with self._lock:
+            return dict(self.estadisticas)
+
+    def estado(self) -> Dict[str, Any]:
+        """
+        Contenido de la caché en disco
+
+        Returns:
+            dict: paginas, bytes, extracciones grabadas y fechas (epoch) de
+            la página más antigua y la más reciente
+        """
+        paginas = self._paginas()
+        fechas = [p['mtime'] for p in paginas]
+        consultas = self.directorio / 'consultas'
+        return {
+            'directorio': str(self.directorio),
+            'paginas': len(paginas),
+            'bytes': sum(p['bytes'] for p in paginas),
+            'extracciones': len(list(consultas.glob('*.json'))) if consultas.exists() else 0,
+            'mas_antigua': min(fechas) if fechas else None,
+            'mas_reciente': max(fechas) if fechas else None
+        }
+
+    def podar(
+        self,
+        max_bytes: Optional[int] = None,
+        max_edad_segundos: Optional[float] = None
+    ) -> Dict[str, int]:
+        """
+        Borra las páginas caducadas y, si se supera el tamaño, las menos usadas
+
+        Args:
+            max_bytes: Tamaño máximo (por defecto, el de la caché)
+            max_edad_segundos: Antigüedad máxima (por defecto, la de la caché)
+
+        Returns:
+            dict: paginas y bytes borrados
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_edad = self.max_edad_segundos if max_edad_segundos is None else max_edad_segundos
+        borradas = {'paginas': 0, 'bytes': 0}
+
+        def borrar(pagina: Dict[str, Any]) -> None:
+            try:
+                pagina['ruta'].unlink()
+            except OSError:
+                return
+            borradas['paginas'] += 1
+            borradas['bytes'] += pagina['bytes']
+
+        paginas = sorted(self._paginas(), key=lambda p: p['mtime'])
+        if max_edad is not None:
+            limite = time.time() - max_edad
+            for pagina in [p for p in paginas if p['mtime'] < limite]:
+                borrar(pagina)
+            paginas = [p for p in paginas if p['mtime'] >= limite]
+        if max_bytes is not None:
+            total = sum(p['bytes'] for p in paginas)
+            for pagina in paginas:
+                if total <= max_bytes:
+                    break
+                borrar(pagina)
+                total -= pagina['bytes']
+
+        if max_edad is not None:
+            # Las extracciones sin páginas recientes ya no se pueden repetir
+            limite = time.time() - max_edad
+            for ruta in (self.directorio / 'consultas').glob('*.json'):
+                if ruta.stat().st_mtime < limite:
+                    ruta.unlink(missing_ok=True)
+        return borradas
+
+    def _paginas(self):
+        """Archivos de página con tamaño y fecha de último uso"""
+        raiz = self.directorio / 'objetos'
+        if not raiz.exists():
+            return []
+        paginas = []
+        for ruta in raiz.glob(f'*/*{EXTENSION_PAGINA}'):
+            try:
+                info = ruta.stat()
+            except OSError:
+                continue
+            paginas.append({'ruta': ruta, 'bytes': info.st_size, 'mtime': info.st_mtime})
+        return paginas
+
+    def _ruta_pagina(self, clave: str) -> Path:
+        """Ruta de una página (subdirectorio por los dos primeros caracteres)"""
+        return self.directorio / 'objetos' / clave[:2] / f"{clave}{EXTENSION_PAGINA}"
+
+    def _ruta_consulta(self, clave: str) -> Path:
+        """Ruta de los datos de una extracción grabada"""
+        return self.directorio / 'consultas' / f"{clave}.json"
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Checkpoints para extracciones largas desde Elasticsearch
+Guarda de forma atómica la posición de lectura, contadores y valores únicos
+para poder reanudar una ejecución interrumpida (--resume)
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+VERSION_CHECKPOINT = 1
+
+
+def escribir_json_atomico(path: Path, datos: Any) -> None:
+    """
+    Escribe un JSON de forma atómica (archivo temporal + os.replace)
+
+    Un corte a mitad de escritura nunca deja el archivo destino corrupto.
+
+    Args:
+        path: Ruta del archivo destino
+        datos: Objeto serializable a JSON
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+
+
+class Checkpoint:
+    """Estado persistente de una extracción reanudable"""
+
+    def __init__(self, path: str, clave: str, intervalo: float = 30.0):
+        """
+        Inicializa el checkpoint
+
+        Args:
+            path: Ruta del archivo de estado
+            clave: Hash de query + índice (ver query_utils.clave_query)
+            intervalo: Segundos mínimos entre escrituras periódicas
+        """
+        self.path = Path(path)
+        self.clave = clave
+        self.intervalo = intervalo
+        self.query: Optional[Dict[str, Any]] = None
+        self.cursores: Dict[str, Dict[str, Any]] = {}
+        self.extra: Dict[str, Any] = {}
+        self.estado: Dict[str, Any] = {
+            'valores_unicos': set(),
+            'registros_procesados': 0,
+            'registros_con_valores': 0
+        }
+        self.guardados = 0
+        self._ultimo_guardado = time.monotonic()
+
+    def cargar(self) -> bool:
+        """
+        Carga el estado desde disco si existe
+
+        Returns:
+            bool: True si se cargó un checkpoint válido
+
+        Raises:
+            ValueError: Si el checkpoint pertenece a otra query o índice
+        """
+        if not self.path.exists():
+            return False
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+
+        if datos.get('clave') != self.clave:
+            raise ValueError(
+                f"❌ El checkpoint {self.path} corresponde a otra query o índice\n"
+                f"Elimínalo o ejecuta sin --resume para empezar de cero"
+            )
+
+        estado = datos.get('estado', {})
+        self.query = datos.get('query')
+        self.cursores = datos.get('cursores', {})
+        self.extra = datos.get('extra', {})
+        self.estado['valores_unicos'] = {
+            (field, value) for field, value in estado.get('valores_unicos', [])
+        }
+        self.estado['registros_procesados'] = estado.get('registros_procesados', 0)
+        self.estado['registros_con_valores'] = estado.get('registros_con_valores', 0)
+        return True
+
+    def actualizar_cursor(self, particion: str, cursor: Dict[str, Any]) -> None:
+        """Registra la posición ya procesada de una partición"""
+        self.cursores[particion] = cursor
+
+    def particion_terminada(self, particion: str) -> bool:
+        """Indica si una partición se completó en una ejecución anterior"""
+        return self.cursores.get(particion, {}).get('terminado', False)
+
+    def guardar_si_toca(self) -> bool:
+        """
+        Guarda el checkpoint si ha pasado el intervalo configurado
+
+        Returns:
+            bool: True si se escribió a disco
+        """
+        if time.monotonic() - self._ultimo_guardado < self.intervalo:
+            return False
+        self.guardar()
+        return True
+
+    def guardar(self) -> None:
+        """Escribe el estado completo de forma atómica"""
+        datos = {
+            'version': VERSION_CHECKPOINT,
+            'clave': self.clave,
+            'query': self.query,
+            'cursores': self.cursores,
+            'extra': self.extra,
+            'estado': {
+                'valores_unicos': list(self.estado['valores_unicos']),
+                'registros_procesados': self.estado['registros_procesados'],
+                'registros_con_valores': self.estado['registros_con_valores']
+            }
+        }
+        escribir_json_atomico(self.path, datos)
+        self.guardados += 1
+        self._ultimo_guardado = time.monotonic()
+
+    def eliminar(self) -> None:
+        """Elimina el archivo de estado (extracción completada)"""
+        if self.path.exists():
+            self.path.unlink()
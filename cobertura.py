@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Peticiones de cobertura (hedged requests) contra la latencia de cola
+Si una página tarda más que el percentil 95 observado, se lanza un duplicado
+y se usa la primera respuesta; un presupuesto limita la carga extra
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+# Latencias recientes con las que se calcula el percentil
+VENTANA_LATENCIAS = 200
+MIN_MUESTRAS = 10
+
+
+class CoberturaPeticiones:
+    """Política de duplicados para páginas lentas, con presupuesto de carga"""
+
+    def __init__(
+        self,
+        presupuesto: float = 0.05,
+        percentil: float = 0.95,
+        max_workers: int = 8,
+        activo: bool = True
+    ):
+        """
+        Inicializa la política
+
+        Args:
+            presupuesto: Fracción máxima de peticiones que se pueden duplicar
+            percentil: Percentil de latencia a partir del cual se duplica
+            max_workers: Hilos para las peticiones en curso (originales y duplicados)
+            activo: False ejecuta cada petición una sola vez, sin medirla
+        """
+        self.presupuesto = presupuesto
+        self.percentil = percentil
+        self.max_workers = max_workers
+        self.activo = activo
+        self.latencias = deque(maxlen=VENTANA_LATENCIAS)
+        self.estadisticas = {'peticiones': 0, 'duplicadas': 0, 'ganadas_por_duplicado': 0}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def umbral(self) -> Optional[float]:
+        """Segundos a partir de los cuales se duplica (None sin muestras suficientes)"""
+        with self._lock:
+            if len(self.latencias) < MIN_MUESTRAS:
+                return None
+            ordenadas = sorted(self.latencias)
+        return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * self.percentil))]
+
+    def ejecutar(
+        self,
+        peticion: Callable[[int], Any],
+        cancelar: Optional[Callable[[int], None]] = None
+    ) -> Any:
+        """
+        Ejecuta una petición y la duplica si supera el umbral de latencia
+
+        Args:
+            peticion: Función que lanza la petición; recibe 0 para la original
+                y 1 para el duplicado (para marcarlas de forma distinta)
+            cancelar: Función que cancela en el servidor la petición perdedora
+                (recibe su número); se llama en segundo plano
+
+        Returns:
+            Respuesta de la primera petición que termine sin error
+
+        Raises:
+            Exception: El error de la original si ninguna termina bien
+        """
+        if not self.activo:
+            return peticion(0)
+
+        with self._lock:
+            self.estadisticas['peticiones'] += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='cobertura'
+                )
+            executor = self._executor
+
+        inicio = time.monotonic()
+        futuros = {executor.submit(peticion, 0): 0}
+        umbral = self.umbral()
+        hechos, _ = wait(futuros, timeout=umbral)
+        if not hechos and self._reservar_duplicado():
+            futuros[executor.submit(peticion, 1)] = 1
+
+        error: Optional[BaseException] = None
+        pendientes = set(futuros)
+        while pendientes:
+            hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                if futuro.exception() is not None:
+                    if futuros[futuro] == 0:
+                        error = futuro.exception()
+                    continue
+                self._registrar(time.monotonic() - inicio, futuros[futuro])
+                for perdedor in pendientes:
+                    perdedor.cancel()
+                    if cancelar is not None:
+                        executor.submit(cancelar, futuros[perdedor])
+                return futuro.result()
+        raise error
+
+    def resumen(self) -> Dict[str, Any]:
+        """Contadores y tasa de duplicados, para las estadísticas"""
+        with self._lock:
+            peticiones = self.estadisticas['peticiones']
+            return dict(
+                self.estadisticas,
+                tasa=self.estadisticas['duplicadas'] / peticiones if peticiones else 0.0
+            )
+
+    def cerrar(self) -> None:
+        """Libera los hilos (las peticiones perdedoras en curso terminan solas)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _reservar_duplicado(self) -> bool:
+        """Consume presupuesto para un duplicado si queda (sin mínimo garantizado)"""
+        with self._lock:
+            permitido = self.presupuesto * self.estadisticas['peticiones']
+            if self.estadisticas['duplicadas'] + 1 > permitido:
+                return False
+            self.estadisticas['duplicadas'] += 1
+            return True
+
+    def _registrar(self, segundos: float, ganadora: int) -> None:
+        """Guarda la latencia observada por el consumidor"""
+        with self._lock:
+            self.latencias.append(segundos)
+            if ganadora == 1:
+                self.estadisticas['ganadas_por_duplicado'] += 1
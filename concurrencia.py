@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Control adaptativo de peticiones simultáneas contra el cluster
+Limita las búsquedas en vuelo de las descargas paralelas: el límite crece
+mientras la latencia es estable y se reduce ante rechazos (429/503) o
+latencia creciente. Si los rechazos se encadenan, un circuit breaker pausa
+las descargas para no saturar las colas de búsqueda del cluster.
+"""
+
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from tamano_pagina import ERROR_CIRCUIT_BREAKER, es_error_de_sobrecarga
+
+ESTADOS_RECHAZO = (429, 503)
+
+# Latencia por encima de la media móvil (en veces) que se considera congestión
+TOLERANCIA_LATENCIA = 2.0
+PAUSA_MAXIMA_SEGUNDOS = 300.0
+
+
+def estado_http(error: Exception) -> Optional[int]:
+    """Código HTTP de un error del cliente de Elasticsearch, si lo tiene"""
+    estado = getattr(error, 'status_code', None)
+    if estado is None:
+        estado = getattr(getattr(error, 'meta', None), 'status', None)
+    return estado if isinstance(estado, int) else None
+
+
+def es_rechazo(error: Exception) -> bool:
+    """
+    Indica si el cluster rechazó la petición por carga (cola llena o no disponible)
+
+    Un circuit_breaking_exception también llega como 429, pero se debe al
+    tamaño de la página y lo gestiona tamano_pagina.
+
+    Args:
+        error: Excepción de una búsqueda
+
+    Returns:
+        bool: True para 429 y 503 que se pueden reintentar más tarde
+    """
+    if estado_http(error) not in ESTADOS_RECHAZO:
+        return False
+    return ERROR_CIRCUIT_BREAKER not in str(getattr(error, 'error', '')) and \
+        ERROR_CIRCUIT_BREAKER not in str(error)
+
+
+class LimitadorConcurrencia:
+    """Límite AIMD de peticiones en vuelo con circuit breaker"""
+
+    def __init__(
+        self,
+        maximo: int,
+        inicial: int = 2,
+        minimo: int = 1,
+        umbral_breaker: int = 5,
+        pausa_breaker: float = 30.0,
+        reintentos: int = 8,
+        activo: bool = True
+    ):
+        """
+        Inicializa el limitador
+
+        Args:
+            maximo: Peticiones simultáneas como máximo (hilos de descarga)
+            inicial: Límite de partida
+            minimo: Límite mínimo
+            umbral_breaker: Rechazos seguidos que abren el circuit breaker
+            pausa_breaker: Segundos de la primera pausa (se duplica si se repite)
+            reintentos: Reintentos de una petición rechazada con 429/503
+            activo: False desactiva el límite adaptativo (se respetan pausar y aplicar_techo)
+        """
+        self.maximo = max(1, maximo)
+        self.minimo = max(1, min(minimo, self.maximo))
+        self.limite = float(min(max(inicial, self.minimo), self.maximo))
+        self.umbral_breaker = umbral_breaker
+        self.pausa_breaker = pausa_breaker
+        self.reintentos = reintentos
+        self.activo = activo
+        self.en_vuelo = 0
+        self.latencia_media: Optional[float] = None
+        self.rechazos_seguidos = 0
+        self.pausa_actual = pausa_breaker
+        self.abierto_hasta = 0.0
+        # Tope externo del límite (monitor de carga del cluster); None = sin tope
+        self.techo: Optional[int] = None
+        self.estadisticas = {
+            'limite_maximo': int(self.limite),
+            'rechazos': 0,
+            'reintentos': 0,
+            'reducciones': 0,
+            'pausas': 0,
+            'segundos_en_pausa': 0.0
+        }
+        self._condicion = threading.Condition()
+
+    def ejecutar(self, funcion: Callable[[], Any]) -> Any:
+        """
+        Ejecuta una petición respetando el límite, con reintentos ante rechazos
+
+        Args:
+            funcion: Petición a ejecutar (sin argumentos)
+
+        Returns:
+            Resultado de la petición
+
+        Raises:
+            Exception: El error de la petición si no es un rechazo o se
+            agotaron los reintentos
+        """
+        if not self.activo:
+            # Sin control adaptativo solo se respetan las pausas y el tope externos
+            self._adquirir()
+            try:
+                return funcion()
+            finally:
+                with self._condicion:
+                    self.en_vuelo -= 1
+                    self._condicion.notify_all()
+
+        intentos = 0
+        while True:
+            self._adquirir()
+            inicio = time.monotonic()
+            try:
+                resultado = funcion()
+            except Exception as e:
+                rechazo = es_rechazo(e)
+                self._liberar(time.monotonic() - inicio, rechazo or es_error_de_sobrecarga(e))
+                if not rechazo or intentos >= self.reintentos:
+                    raise
+                intentos += 1
+                self.estadisticas['reintentos'] += 1
+                # Backoff exponencial con jitter para no sincronizar los hilos
+                time.sleep(min(2 ** intentos, 30) * random.uniform(0.5, 1.0))
+                continue
+            self._liberar(time.monotonic() - inicio, False)
+            return resultado
+
+    def aplicar_techo(self, techo: Optional[int]) -> None:
+        """Limita las peticiones simultáneas desde fuera (None retira el tope)"""
+        with self._condicion:
+            self.techo = techo
+            self._condicion.notify_all()
+
+    def pausar(self, segundos: float) -> None:
+        """Detiene las peticiones nuevas durante unos segundos"""
+        with self._condicion:
+            self.abierto_hasta = max(self.abierto_hasta, time.monotonic() + segundos)
+            self._condicion.notify_all()
+
+    def esperar_pausa(self) -> None:
+        """Espera a que termine la pausa en curso (circuit breaker o monitor de carga)"""
+        with self._condicion:
+            while True:
+                espera = self.abierto_hasta - time.monotonic()
+                if espera <= 0:
+                    return
+                self._condicion.wait(espera)
+
+    def resumen(self) -> Dict[str, Any]:
+        """Estado y contadores del limitador, para las estadísticas"""
+        with self._condicion:
+            return dict(self.estadisticas, limite=int(self.limite))
+
+    def _adquirir(self) -> None:
+        """Espera a que haya hueco y el circuit breaker esté cerrado"""
+        with self._condicion:
+            while True:
+                espera = self.abierto_hasta - time.monotonic()
+                if espera > 0:
+                    self._condicion.wait(espera)
+                    continue
+                limite = int(self.limite) if self.activo else self.maximo
+                if self.techo is not None:
+                    limite = min(limite, self.techo)
+                if self.en_vuelo < max(1, limite):
+                    self.en_vuelo += 1
+                    return
+                self._condicion.wait()
+
+    def _liberar(self, segundos: float, sobrecarga: bool) -> None:
+        """Ajusta el límite con el resultado de la petición y libera su hueco"""
+        with self._condicion:
+            self.en_vuelo -= 1
+            if sobrecarga:
+                self.estadisticas['rechazos'] += 1
+                self.rechazos_seguidos += 1
+                self._reducir(0.5)
+                if self.rechazos_seguidos >= self.umbral_breaker:
+                    self._abrir_breaker()
+            else:
+                self.rechazos_seguidos = 0
+                self.pausa_actual = self.pausa_breaker
+                if self.latencia_media is not None and \
+                        segundos > self.latencia_media * TOLERANCIA_LATENCIA:
+                    self._reducir(0.9)
+                elif self.limite < self.maximo:
+                    # Aumento aditivo: +1 por cada "ronda" de peticiones completas
+                    self.limite = min(self.maximo, self.limite + 1 / self.limite)
+                    self.estadisticas['limite_maximo'] = max(
+                        self.estadisticas['limite_maximo'], int(self.limite)
+                    )
+                self.latencia_media = segundos if self.latencia_media is None else (
+                    0.9 * self.latencia_media + 0.1 * segundos
+                )
+            self._condicion.notify_all()
+
+    def _reducir(self, factor: float) -> None:
+        """Reducción multiplicativa acotada al mínimo (con la condición tomada)"""
+        nuevo = max(float(self.minimo), self.limite * factor)
+        if int(nuevo) < int(self.limite):
+            self.estadisticas['reducciones'] += 1
+        self.limite = nuevo
+
+    def _abrir_breaker(self) -> None:
+        """Pausa todas las peticiones; al reanudar se empieza con el mínimo"""
+        pausa = self.pausa_actual
+        self.abierto_hasta = time.monotonic() + pausa
+        self.pausa_actual = min(PAUSA_MAXIMA_SEGUNDOS, pausa * 2)
+        self.rechazos_seguidos = 0
+        self.limite = float(self.minimo)
+        self.estadisticas['pausas'] += 1
+        self.estadisticas['segundos_en_pausa'] += pausa
+        print(
+            f"⛔ Cluster sobrecargado ({self.umbral_breaker} rechazos seguidos): "
+            f"descargas en pausa {pausa:.0f} s"
+        )
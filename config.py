@@ -11,6 +11,11 @@ from typing import Optional
 from dotenv import load_dotenv
 
 
+# Valores admitidos para el transporte HTTP
+NODE_CLASSES = ('urllib3', 'requests')
+SERIALIZERS = ('json', 'orjson')
+
+
 class Config:
     """Configuración de la aplicación"""
     
@@ -22,7 +27,9 @@ class Config:
             load_dotenv(env_path)
         
         # Elasticsearch/Kibana
+        # ELASTICSEARCH_HOST admite varios nodos coordinadores separados por comas
         self.es_host = os.getenv('ELASTICSEARCH_HOST')
+        self.es_hosts = [h.strip() for h in (self.es_host or '').split(',') if h.strip()]
         self.es_user = os.getenv('ELASTICSEARCH_USER')
         self.es_password = os.getenv('ELASTICSEARCH_PASSWORD')
         self.es_index = os.getenv('ELASTICSEARCH_INDEX', 'logs-*')
@@ -32,6 +39,103 @@ class Config:
         self.timeout = int(os.getenv('ELASTICSEARCH_TIMEOUT', '300'))
         self.scroll_size = int(os.getenv('ELASTICSEARCH_SCROLL_SIZE', '1000'))
         self.scroll_timeout = os.getenv('ELASTICSEARCH_SCROLL_TIMEOUT', '5m')
+        
+        # Transporte HTTP (ajustado para descargas masivas por VPN de alta latencia)
+        self.http_compress = os.getenv('ELASTICSEARCH_HTTP_COMPRESS', 'true').lower() == 'true'
+        self.connections_per_node = int(os.getenv('ELASTICSEARCH_CONNECTIONS_PER_NODE', '16'))
+        self.node_class = os.getenv('ELASTICSEARCH_NODE_CLASS', 'urllib3').lower()
+        self.serializer = os.getenv('ELASTICSEARCH_SERIALIZER', 'orjson').lower()
+        self.max_retries = int(os.getenv('ELASTICSEARCH_MAX_RETRIES', '3'))
+        
+        # Checkpoints de extracciones reanudables (segundos entre escrituras)
+        self.checkpoint_interval = float(os.getenv('ELASTICSEARCH_CHECKPOINT_INTERVAL', '30'))
+        
+        # Transporte reducido: filter_path, _source mínimo y docvalue_fields (--lean)
+        self.lean_fetch = os.getenv('ELASTICSEARCH_LEAN_FETCH', 'false').lower() == 'true'
+        
+        # Descarga paralela por ventanas de tiempo (--windows)
+        self.window_workers = int(os.getenv('ELASTICSEARCH_WINDOW_WORKERS', '4'))
+        self.window_retries = int(os.getenv('ELASTICSEARCH_WINDOW_RETRIES', '3'))
+        
+        # Descartar índices cuyo rango de @timestamp no corta el de la query
+        self.prune_indices = os.getenv('ELASTICSEARCH_PRUNE_INDICES', 'true').lower() == 'true'
+        
+        # Caché de metadatos (índices, existencia, mappings): TTL en segundos (0 = sin caché)
+        # y persistencia entre ejecuciones en el directorio de caché del usuario
+        self.metadata_cache_ttl = float(os.getenv('ELASTICSEARCH_METADATA_CACHE_TTL', '300'))
+        self.metadata_cache_persist = os.getenv(
+            'ELASTICSEARCH_METADATA_CACHE_PERSIST', 'true'
+        ).lower() == 'true'
+        
+        # Tamaño de página adaptativo (AIMD) entre un mínimo y un máximo: crece con
+        # páginas llenas y rápidas, se reduce con páginas lentas, enormes, timeouts
+        # o circuit_breaking_exception. ELASTICSEARCH_SCROLL_SIZE es el tamaño inicial
+        self.adaptive_page_size = os.getenv(
+            'ELASTICSEARCH_ADAPTIVE_PAGE_SIZE', 'true'
+        ).lower() == 'true'
+        self.scroll_size_min = int(os.getenv('ELASTICSEARCH_SCROLL_SIZE_MIN', '100'))
+        self.scroll_size_max = int(os.getenv('ELASTICSEARCH_SCROLL_SIZE_MAX', '10000'))
+        self.page_target_seconds = float(os.getenv('ELASTICSEARCH_PAGE_TARGET_SECONDS', '2'))
+        self.page_max_mb = float(os.getenv('ELASTICSEARCH_PAGE_MAX_MB', '20'))
+        
+        # Control adaptativo de búsquedas simultáneas (hasta ELASTICSEARCH_WINDOW_WORKERS):
+        # reintentos con backoff ante 429/503 y pausa tras N rechazos seguidos
+        self.adaptive_concurrency = os.getenv(
+            'ELASTICSEARCH_ADAPTIVE_CONCURRENCY', 'true'
+        ).lower() == 'true'
+        self.breaker_threshold = int(os.getenv('ELASTICSEARCH_BREAKER_THRESHOLD', '5'))
+        self.breaker_pause = float(os.getenv('ELASTICSEARCH_BREAKER_PAUSE', '30'))
+        
+        # Monitor de carga del cluster (_nodes/stats/thread_pool y _cluster/health):
+        # con la cola search por encima de THROTTLE o rechazos nuevos se baja a una
+        # búsqueda simultánea; por encima de PAUSE (o en rojo) se pausa hasta la
+        # siguiente muestra
+        self.load_monitor = os.getenv('ELASTICSEARCH_LOAD_MONITOR', 'false').lower() == 'true'
+        self.load_monitor_interval = float(os.getenv('ELASTICSEARCH_LOAD_MONITOR_INTERVAL', '15'))
+        self.load_queue_throttle = int(os.getenv('ELASTICSEARCH_LOAD_QUEUE_THROTTLE', '20'))
+        self.load_queue_pause = int(os.getenv('ELASTICSEARCH_LOAD_QUEUE_PAUSE', '100'))
+        self.load_pause_on_red = os.getenv(
+            'ELASTICSEARCH_LOAD_PAUSE_ON_RED', 'true'
+        ).lower() == 'true'
+        
+        # Varios nodos: reparto round-robin, backoff de nodos caídos (segundos,
+        # exponencial hasta el máximo) y sniffing opcional al arrancar y tras un fallo
+        self.sniff = os.getenv('ELASTICSEARCH_SNIFF', 'false').lower() == 'true'
+        self.dead_node_backoff = float(os.getenv('ELASTICSEARCH_DEAD_NODE_BACKOFF', '1'))
+        self.max_dead_node_backoff = float(os.getenv('ELASTICSEARCH_MAX_DEAD_NODE_BACKOFF', '30'))
+        
+        # Peticiones de cobertura en search_after: duplicar las páginas más lentas que
+        # el p95, como mucho una fracción ELASTICSEARCH_HEDGE_BUDGET de las peticiones
+        self.hedge_requests = os.getenv('ELASTICSEARCH_HEDGE_REQUESTS', 'false').lower() == 'true'
+        self.hedge_budget = float(os.getenv('ELASTICSEARCH_HEDGE_BUDGET', '0.05'))
+        
+        # Búsquedas asíncronas (_async_search) para conteos y agregaciones pesadas:
+        # cada consulta espera como mucho ELASTICSEARCH_ASYNC_WAIT segundos en el
+        # servidor y el resultado se conserva ELASTICSEARCH_ASYNC_KEEP_ALIVE
+        self.async_search = os.getenv('ELASTICSEARCH_ASYNC_SEARCH', 'false').lower() == 'true'
+        self.async_wait = float(os.getenv('ELASTICSEARCH_ASYNC_WAIT', '2'))
+        self.async_keep_alive = os.getenv('ELASTICSEARCH_ASYNC_KEEP_ALIVE', '1h')
+        
+        # Caché en disco de páginas de PIT + search_after (--page-cache) y repetición
+        # sin cluster (--replay); se poda por tamaño y antigüedad al terminar
+        self.page_cache = os.getenv('ELASTICSEARCH_PAGE_CACHE', 'false').lower() == 'true'
+        self.page_cache_dir = os.getenv('ELASTICSEARCH_PAGE_CACHE_DIR', '')
+        self.page_cache_max_mb = float(os.getenv('ELASTICSEARCH_PAGE_CACHE_MAX_MB', '2048'))
+        self.page_cache_max_age_days = float(os.getenv('ELASTICSEARCH_PAGE_CACHE_MAX_AGE_DAYS', '30'))
+        self.replay = False
+        
+        # Memoria disponible para --estimate (MB; 0 = límite del contenedor o memoria física)
+        self.memory_limit_mb = float(os.getenv('ELASTICSEARCH_MEMORY_LIMIT_MB', '0'))
+        
+        # Pipeline de ingesta que extrae los pares de Body al indexar
+        # (main.py install-pipeline) y ritmo máximo del relleno (docs/s, -1 = sin límite)
+        self.pipeline_name = os.getenv('ELASTICSEARCH_PIPELINE_NAME', 'extractor-body-where')
+        self.pipeline_field = os.getenv('ELASTICSEARCH_PIPELINE_FIELD', 'body_where')
+        self.backfill_rate = float(os.getenv('ELASTICSEARCH_BACKFILL_RATE', '1000'))
+        
+        # Inicio rápido: sin ping/info/exists ni poda previa; la primera búsqueda
+        # valida conexión y credenciales (--fast-start)
+        self.fast_start = os.getenv('ELASTICSEARCH_FAST_START', 'false').lower() == 'true'
     
     def validate(self) -> tuple[bool, Optional[str]]:
         """
@@ -48,6 +152,24 @@ class Config:
         
         missing = [var for var, value in required_vars.items() if not value]
         
+        if self.node_class not in NODE_CLASSES:
+            return False, (
+                f"❌ ELASTICSEARCH_NODE_CLASS no válido: {self.node_class}\n"
+                f"Valores permitidos: {', '.join(NODE_CLASSES)}"
+            )
+        
+        if self.serializer not in SERIALIZERS:
+            return False, (
+                f"❌ ELASTICSEARCH_SERIALIZER no válido: {self.serializer}\n"
+                f"Valores permitidos: {', '.join(SERIALIZERS)}"
+            )
+        
+        if self.scroll_size_min > self.scroll_size_max:
+            return False, (
+                f"❌ ELASTICSEARCH_SCROLL_SIZE_MIN ({self.scroll_size_min}) no puede ser mayor "
+                f"que ELASTICSEARCH_SCROLL_SIZE_MAX ({self.scroll_size_max})"
+            )
+        
         if missing:
             error_msg = (
                 f"❌ Faltan variables de entorno requeridas: {', '.join(missing)}\n\n"
@@ -67,7 +189,9 @@ class Config:
             f"user={self.es_user}, "
             f"index={self.es_index}, "
             f"verify_ssl={self.verify_ssl}, "
-            f"timeout={self.timeout}s)"
+            f"timeout={self.timeout}s, "
+            f"http_compress={self.http_compress}, "
+            f"node_class={self.node_class})"
         )
 
 
@@ -7,7 +7,10 @@ Funciones comunes para procesar mensajes y extraer valores no nulos
 
 import json
 import re
-from typing import Iterator, Dict, List, Set, Tuple, Optional, Any
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Dict, List, Set, Tuple, Optional, Any
+
+from progreso import Progreso
 
 
 def normalizar_json(text: str) -> Optional[str]:
@@ -57,6 +60,24 @@ def extraer_valores_no_nulos(json_data: Dict) -> List[Dict[str, Any]]:
     return valores
 
 
+def clave_valor(value: Any) -> Any:
+    """
+    Devuelve el valor en una forma hashable para deduplicarlo
+    
+    Las listas y objetos se guardan como su JSON compacto (claves ordenadas);
+    es la misma regla para el procesador en Python y para el pipeline.
+    
+    Args:
+        value: Valor extraído del JSON de Body
+        
+    Returns:
+        El propio valor si es escalar, o su JSON como string
+    """
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return value
+
+
 def procesar_mensaje(message: str) -> List[Dict[str, Any]]:
     """
     Procesa un mensaje completo: extrae JSON y filtra valores no nulos
@@ -91,29 +112,49 @@ def procesar_mensaje(message: str) -> List[Dict[str, Any]]:
 def procesar_registros_iterable(
     registros: Iterator[Dict],
     output_json: str,
-    show_progress: bool = True
+    show_progress: bool = True,
+    estado: Optional[Dict[str, Any]] = None,
+    obtener_total: Optional[Callable[[], Optional[int]]] = None
 ) -> Dict[str, int]:
     """
     Procesa un iterador de registros y extrae valores únicos a JSON
     
     Args:
         registros: Iterador que produce diccionarios con campo 'message'
+            (y 'count' opcional si el registro representa varios documentos)
         output_json: Ruta del archivo JSON de salida
         show_progress: Mostrar progreso durante el procesamiento
+        estado: Estado compartido (valores_unicos, contadores) que se actualiza
+            en sitio; permite continuar desde un checkpoint (opcional)
+        obtener_total: Función que devuelve el total de documentos esperado
+            en esta ejecución, o None mientras no se conozca; el progreso
+            muestra porcentaje y ETA desde que está disponible (opcional)
         
     Returns:
         dict: Estadísticas del procesamiento
     """
+    if estado is None:
+        estado = {}
+    estado.setdefault('valores_unicos', set())
+    estado.setdefault('registros_procesados', 0)
+    estado.setdefault('registros_con_valores', 0)
+    
     # Usar set con tuplas para eliminar duplicados
-    valores_unicos: Set[Tuple[str, Any]] = set()
-    registros_procesados = 0
-    registros_con_valores = 0
+    valores_unicos: Set[Tuple[str, Any]] = estado['valores_unicos']
     
     if show_progress:
         print("⏳ Procesando registros...")
     
+    progreso = Progreso(obtener_total)
+    inicio_sesion = estado['registros_procesados']
+    
     for registro in registros:
-        registros_procesados += 1
+        # Un registro colapsado en el servidor representa 'count' documentos
+        peso = registro.get('count', 1)
+        
+        # Los contadores viven en el estado para que un checkpoint los vea al día
+        estado['registros_procesados'] += peso
+        registros_procesados = estado['registros_procesados']
         
         try:
             message = registro.get('message', '')
@@ -125,24 +166,71 @@ def procesar_registros_iterable(
             valores = procesar_mensaje(message)
             
             if valores:
-                registros_con_valores += 1
+                estado['registros_con_valores'] += peso
                 
                 # Agregar al set (como tuplas para que sean hashables)
                 for valor in valores:
-                    valores_unicos.add((valor["field"], valor["value"]))
+                    valores_unicos.add((valor["field"], clave_valor(valor["value"])))
             
         except Exception:
             # Continuar con el siguiente registro si hay error
             continue
         
         # Mostrar progreso cada 1000 registros
-        if show_progress and registros_procesados % 1000 == 0:
-            print(f"  ✓ Procesados {registros_procesados:,} registros...")
+        if show_progress and registros_procesados // 1000 != (registros_procesados - peso) // 1000:
+            sufijo = progreso.describir(registros_procesados - inicio_sesion)
+            print(f"  ✓ Procesados {registros_procesados:,} registros{sufijo}...")
+    
+    registros_procesados = estado['registros_procesados']
+    registros_con_valores = estado['registros_con_valores']
     
     if show_progress:
         print(f"✓ Total de registros procesados: {registros_procesados:,}")
         print(f"📊 Registros con valores: {registros_con_valores:,}")
     
+    total_valores = escribir_valores_unicos(valores_unicos, output_json, show_progress)
+    
+    return {
+        "registros_procesados": registros_procesados,
+        "registros_con_valores": registros_con_valores,
+        "valores_unicos": total_valores
+    }
+
+
+def cargar_valores_unicos(output_json: str) -> Set[Tuple[str, Any]]:
+    """
+    Lee un archivo de salida previo como set de tuplas (campo, valor)
+    
+    Args:
+        output_json: Ruta del archivo JSON generado en una ejecución anterior
+        
+    Returns:
+        set: Valores del archivo (vacío si no existe)
+    """
+    path = Path(output_json)
+    if not path.exists():
+        return set()
+    
+    with open(path, 'r', encoding='utf-8') as jsonfile:
+        return {(item["field"], clave_valor(item["value"])) for item in json.load(jsonfile)}
+
+
+def escribir_valores_unicos(
+    valores_unicos: Set[Tuple[str, Any]],
+    output_json: str,
+    show_progress: bool = True
+) -> int:
+    """
+    Escribe los pares (campo, valor) como lista ordenada de {"field", "value"}
+    
+    Args:
+        valores_unicos: Set de tuplas (campo, valor)
+        output_json: Ruta del archivo JSON de salida
+        show_progress: Mostrar resumen por pantalla
+        
+    Returns:
+        int: Número de valores escritos
+    """
     # Convertir set de tuplas a lista de diccionarios ordenada
     resultado = [
         {"field": field, "value": value}
@@ -159,10 +247,41 @@ def procesar_registros_iterable(
     if show_progress:
         print(f"💾 Archivo generado: {output_json}")
     
+    return len(resultado)
+
+
+def procesar_valores_agregados(
+    valores: Iterable[Tuple[str, Any]],
+    output_json: str,
+    show_progress: bool = True
+) -> Dict[str, int]:
+    """
+    Escribe valores distintos ya calculados en el servidor (agregación composite)
+    
+    Produce el mismo formato de salida que procesar_registros_iterable.
+    
+    Args:
+        valores: Iterable de tuplas (campo, valor)
+        output_json: Ruta del archivo JSON de salida
+        show_progress: Mostrar progreso durante el procesamiento
+        
+    Returns:
+        dict: Estadísticas del procesamiento
+    """
+    if show_progress:
+        print("⏳ Enumerando valores distintos en el servidor...")
+    
+    valores_unicos: Set[Tuple[str, Any]] = set()
+    for field, value in valores:
+        if value is not None:
+            valores_unicos.add((field, clave_valor(value)))
+    
+    total_valores = escribir_valores_unicos(valores_unicos, output_json, show_progress)
+    
     return {
-        "registros_procesados": registros_procesados,
-        "registros_con_valores": registros_con_valores,
-        "valores_unicos": len(resultado)
+        "registros_procesados": 0,
+        "registros_con_valores": 0,
+        "valores_unicos": total_valores
     }
 
 
@@ -5,9 +5,13 @@ Cliente de Elasticsearch para descarga de logs
 Maneja conexión, queries y descarga de datos desde Elasticsearch/Kibana
 """
 
-import csv
 import json
-from typing import Iterator, Dict, List, Optional, Any
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Dict, List, Optional, Any, Tuple
 from elasticsearch import Elasticsearch
 from elasticsearch.helpers import scan
 from elasticsearch.exceptions import (
@@ -17,6 +21,115 @@ from elasticsearch.exceptions import (
     RequestError
 )
 
+from metadata_cache import CacheMetadatos, ruta_cache_cluster
+from progreso import Progreso
+import busqueda_asincrona
+import estimador
+import pipeline_ingesta
+from cache_paginas import CachePaginas
+from cobertura import CoberturaPeticiones
+from concurrencia import LimitadorConcurrencia
+from monitor_carga import MonitorCarga
+from elasticsearch.serializer import JsonSerializer
+from serializers import FastJsonSerializer, RawJsonSerializer, RawTextSerializer
+from exportador_sql import (
+    construir_sql, contar_filas_csv, filtro_sql, primera_linea, separar_cabecera
+)
+from salida_csv import EscritorCsv, SalidaBinaria
+from tamano_pagina import TamanoPaginaAdaptativo
+from hit_parser import iterar_hits_crudos
+from query_utils import (
+    CAMPO_TIMESTAMP,
+    agregar_filtro,
+    campos_con_wildcard,
+    extraer_rango_timestamp,
+    optimizar_query,
+    resolver_fechas_relativas
+)
+
+# Segundos mínimos entre dos mensajes de progreso de download_to_csv
+INTERVALO_PROGRESO_CSV = 2.0
+
+# Buckets del date_histogram por ventana al repartir el rango de tiempo
+BUCKETS_POR_VENTANA = 20
+
+# Modo lean: el procesador solo usa _id, message y @timestamp
+LEAN_SOURCE = ['message']
+LEAN_DOCVALUE_FIELDS = [{'field': CAMPO_TIMESTAMP, 'format': 'strict_date_optional_time'}]
+LEAN_FILTER_PATH = [
+    '-took',
+    '-timed_out',
+    '-_clusters',
+    '-hits.total',
+    '-hits.max_score',
+    '-hits.hits._index',
+    '-hits.hits._score',
+    '-hits.hits._ignored',
+]
+
+# Mínimo entre dos descubrimientos de nodos (sniffing) tras fallos
+SEGUNDOS_ENTRE_SNIFFING = 60
+
+# Estados que el transporte reintenta en las páginas que pasan por el limitador
+# (429/503 los reintenta el limitador con backoff)
+ESTADOS_REINTENTO_PAGINAS = (502, 504)
+
+# Poda de índices: índices por petición de min/max y longitud máxima de la lista en la URL
+LOTE_RANGOS_INDICES = 50
+MAX_LONGITUD_LISTA_INDICES = 3000
+
+# Colapso de mensajes idénticos: grupos por página y hash calculado en el servidor
+TAMANO_PAGINA_COLAPSO = 500
+CAMPO_HASH_MENSAJE = 'message_sha1'
+SCRIPT_HASH_MENSAJE = (
+    "def m = params._source['message']; "
+    "if (m != null) { emit(m.toString().sha1()); }"
+)
+
+
+def _hits_con_cursor(
+    hits: Iterator[Dict],
+    cursor: Dict[str, Any],
+    seguimiento: Dict[str, Any],
+    ts_limite: Optional[int],
+    omitir: set
+) -> Iterator[Dict]:
+    """
+    Entrega los hits de una página perezosa actualizando su cursor al agotarse
+    
+    Descarta los documentos del límite ya procesados (mismo @timestamp que
+    ts_limite y _id en omitir) y deja en seguimiento['search_after'] el sort
+    del último hit recibido; en seguimiento['recibidos'] quedan los hits de la página.
+    """
+    ts_cursor = cursor.get('ultimo_ts')
+    ids = list(cursor.get('ids', []))
+    recibidos = 0
+    for hit in hits:
+        recibidos += 1
+        sort = seguimiento['search_after'] = hit['sort']
+        ts = sort[0]
+        if omitir and ts == ts_limite and hit['_id'] in omitir:
+            continue
+        if ts != ts_cursor:
+            ts_cursor = ts
+            ids = []
+        ids.append(hit['_id'])
+        yield hit
+    cursor['ultimo_ts'] = ts_cursor
+    cursor['ids'] = ids
+    seguimiento['recibidos'] = recibidos
+
+
+def _poner_en_cola(cola: queue.Queue, item: Any, cancelado: threading.Event) -> bool:
+    """Encola sin bloquear indefinidamente si el consumidor ya se detuvo"""
+    while not cancelado.is_set():
+        try:
+            cola.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
 
 class ElasticsearchClient:
     """Cliente para interactuar con Elasticsearch"""
@@ -30,23 +143,150 @@ class ElasticsearchClient:
         """
         self.config = config
         self.es = None
+        self._es_raw = None
+        self._es_paginas = None
+        self._decodificador = None
+        # Estadísticas de la ejecución (total de documentos, etc.)
+        self.estadisticas: Dict[str, Any] = {'total': None, 'primer_documento': None}
+        self._conteo_pendiente = None
+        self._inicio = time.monotonic()
+        # Documentos por página según latencia y bytes observados (compartido entre ventanas)
+        self.tamano_pagina = TamanoPaginaAdaptativo(
+            inicial=config.scroll_size,
+            minimo=config.scroll_size_min,
+            maximo=config.scroll_size_max,
+            objetivo_segundos=config.page_target_seconds,
+            max_bytes=int(config.page_max_mb * 1024 * 1024),
+            activo=config.adaptive_page_size
+        )
+        # Búsquedas simultáneas de las descargas paralelas (AIMD + circuit breaker)
+        self.limitador = LimitadorConcurrencia(
+            maximo=config.window_workers,
+            umbral_breaker=config.breaker_threshold,
+            pausa_breaker=config.breaker_pause,
+            activo=config.adaptive_concurrency
+        )
+        self.monitor: Optional[MonitorCarga] = None
+        # Duplicado de las páginas más lentas que el p95 (opt-in)
+        cobertura_activa = config.hedge_requests
+        if cobertura_activa and len(config.es_hosts) == 1:
+            # Sin 'preference' con PIT, el duplicado iría al mismo coordinador
+            print("⚠ Advertencia: --hedge necesita varios hosts en ELASTICSEARCH_HOST; se desactiva")
+            cobertura_activa = False
+        self.cobertura = CoberturaPeticiones(
+            presupuesto=config.hedge_budget,
+            max_workers=2 * max(1, config.window_workers) + 2,
+            activo=cobertura_activa
+        )
+        # Páginas de PIT + search_after en disco (--page-cache) para repetirlas (--replay)
+        self.cache_paginas: Optional[CachePaginas] = None
+        if config.page_cache or config.replay:
+            self.cache_paginas = CachePaginas(
+                directorio=config.page_cache_dir or None,
+                max_bytes=int(config.page_cache_max_mb * 1024 * 1024),
+                max_edad_segundos=config.page_cache_max_age_days * 86400
+            )
         self._connect()
+        self.metadatos = CacheMetadatos(
+            ttl=config.metadata_cache_ttl,
+            ruta=(
+                ruta_cache_cluster(config.es_host, config.es_user)
+                if config.metadata_cache_persist else None
+            ),
+            validador=self._version_metadatos
+        )
     
     def _connect(self):
         """Establece conexión con Elasticsearch"""
         try:
-            self.es = Elasticsearch(
-                [self.config.es_host],
-                basic_auth=(self.config.es_user, self.config.es_password),
-                verify_certs=self.config.verify_ssl,
-                ssl_show_warn=self.config.verify_ssl,
-                timeout=self.config.timeout,
-                max_retries=3,
-                retry_on_timeout=True
-            )
+            self.es = self._build_client(self._build_serializers())
         except Exception as e:
             raise ConnectionError(f"Error al conectar con Elasticsearch: {e}")
     
+    def _build_client(self, serializers: Optional[Dict[str, Any]] = None) -> Elasticsearch:
+        """
+        Crea un cliente Elasticsearch con los ajustes de transporte del config
+        
+        Args:
+            serializers: Serializadores por mimetype (None = los de la librería)
+            
+        Returns:
+            Elasticsearch: Cliente configurado
+        """
+        transport_kwargs = {
+            'http_compress': self.config.http_compress,
+            'connections_per_node': self.config.connections_per_node,
+            'node_class': self.config.node_class,
+            # Con varios nodos: reparto round-robin y backoff de los nodos caídos
+            'node_selector_class': 'round_robin',
+            'dead_node_backoff_factor': self.config.dead_node_backoff,
+            'max_dead_node_backoff': self.config.max_dead_node_backoff,
+        }
+        if self.config.sniff:
+            # Descubrir el resto de nodos al arrancar y tras el fallo de uno
+            transport_kwargs['sniff_on_start'] = True
+            transport_kwargs['sniff_on_node_failure'] = True
+            transport_kwargs['min_delay_between_sniffing'] = SEGUNDOS_ENTRE_SNIFFING
+        if serializers:
+            transport_kwargs['serializers'] = serializers
+        
+        return Elasticsearch(
+            self.config.es_hosts,
+            basic_auth=(self.config.es_user, self.config.es_password),
+            verify_certs=self.config.verify_ssl,
+            ssl_show_warn=self.config.verify_ssl,
+            timeout=self.config.timeout,
+            max_retries=self.config.max_retries,
+            retry_on_timeout=True,
+            **transport_kwargs
+        )
+    
+    def _get_raw_client(self) -> Elasticsearch:
+        """Cliente cuyas respuestas JSON y de texto llegan como bytes sin decodificar"""
+        if self._es_raw is None:
+            self._es_raw = self._build_client({
+                'application/json': RawJsonSerializer(),
+                'text/*': RawTextSerializer()
+            })
+        return self._es_raw
+    
+    def _get_page_client(self) -> Elasticsearch:
+        """
+        Cliente en bytes para las páginas de search_after
+        
+        Con el limitador activo, el transporte de estas peticiones no reintenta
+        429/503 al instante: los reintenta el limitador con backoff. El resto
+        de llamadas (scroll, PIT, _count, agregaciones, metadatos) conserva los
+        reintentos por defecto del transporte.
+        """
+        if self._es_paginas is None:
+            cliente = self._get_raw_client()
+            if self.limitador.activo:
+                cliente = cliente.options(retry_on_status=ESTADOS_REINTENTO_PAGINAS)
+            self._es_paginas = cliente
+        return self._es_paginas
+    
+    def _decodificar(self, datos: bytes) -> Any:
+        """Decodifica una respuesta en bytes con el serializador configurado"""
+        if self._decodificador is None:
+            self._decodificador = (self._build_serializers() or {}).get(
+                'application/json', JsonSerializer()
+            )
+        return self._decodificador.loads(datos)
+    
+    def _build_serializers(self) -> Optional[Dict[str, Any]]:
+        """
+        Serializadores a registrar según config.serializer
+        
+        Returns:
+            dict: mimetype -> serializador, o None para usar el de la librería
+        """
+        if self.config.serializer != 'orjson':
+            return None
+        
+        # También cubre application/vnd.elasticsearch+json (modo compatibilidad)
+        return {'application/json': FastJsonSerializer()}
+    
     def test_connection(self) -> Dict[str, Any]:
         """
         Verifica la conexión con Elasticsearch
@@ -58,7 +298,13 @@ class ElasticsearchClient:
             Exception: Si no se puede conectar o hay error de autenticación
         """
         try:
-            if not self.es.ping():
+            # ping e info son independientes: se piden a la vez
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                ping = executor.submit(self.es.ping)
+                info = executor.submit(self.es.info)
+                conectado = ping.result()
+            
+            if not conectado:
                 raise Exception(
                     f"❌ Error de conexión: No se pudo establecer conexión con Elasticsearch\n"
                     f"Verifica:\n"
@@ -67,7 +313,7 @@ class ElasticsearchClient:
                     f"  - Si hay problemas SSL, configura ELASTICSEARCH_VERIFY_SSL=false en .env"
                 )
             
-            info = self.es.info()
+            info = info.result()
             return {
                 'connected': True,
                 'cluster_name': info['cluster_name'],
@@ -78,26 +324,83 @@ class ElasticsearchClient:
             # Si ya es nuestra Exception personalizada, re-lanzarla
             if "❌" in str(e):
                 raise
+            raise self._error_conexion(e)
+    
+    def _error_conexion(self, e: Exception) -> Exception:
+        """
+        Traduce un fallo de conexión o autenticación a un error con sugerencias
+        
+        Args:
+            e: Excepción original
             
-            # Procesar otros errores
-            error_msg = str(e).lower()
-            if 'auth' in error_msg or 'unauthorized' in error_msg:
-                raise Exception(
-                    f"❌ Error de autenticación: {e}\n"
-                    f"Verifica usuario y contraseña en .env"
-                )
-            else:
-                raise Exception(
-                    f"❌ Error de conexión: {e}\n"
-                    f"Verifica:\n"
-                    f"  - URL correcta: {self.config.es_host}\n"
-                    f"  - Red/Firewall\n"
-                    f"  - Si hay problemas SSL, configura ELASTICSEARCH_VERIFY_SSL=false en .env"
-                )
+        Returns:
+            Exception: Error con el mensaje para el usuario
+        """
+        error_msg = str(e).lower()
+        if (
+            isinstance(e, AuthenticationException)
+            or 'auth' in error_msg or 'unauthorized' in error_msg
+        ):
+            return Exception(
+                f"❌ Error de autenticación: {e}\n"
+                f"Verifica usuario y contraseña en .env"
+            )
+        return Exception(
+            f"❌ Error de conexión: {e}\n"
+            f"Verifica:\n"
+            f"  - URL correcta: {self.config.es_host}\n"
+            f"  - Red/Firewall\n"
+            f"  - Si hay problemas SSL, configura ELASTICSEARCH_VERIFY_SSL=false en .env"
+        )
+    
+    def _error_indice_no_encontrado(self, index: str) -> ValueError:
+        """Error de índice inexistente con los índices disponibles como pista"""
+        available = self.get_available_indices()
+        return ValueError(
+            f"❌ Índice no encontrado: {index}\n"
+            f"Índices disponibles: {', '.join(available[:10])}"
+        )
+    
+    def _medir_primer_documento(self, documentos: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Registra en estadisticas['primer_documento'] los segundos desde la
+        creación del cliente hasta el primer documento
+        """
+        documentos = iter(documentos)
+        for doc in documentos:
+            if self.estadisticas['primer_documento'] is None:
+                self.estadisticas['primer_documento'] = time.monotonic() - self._inicio
+            yield doc
+            break
+        yield from documentos
+    
+    def _version_metadatos(self) -> str:
+        """Versión del estado del cluster: cambia al crear índices o modificar mappings"""
+        estado = self.es.cluster.state(metric='version')
+        return f"{estado['state_uuid']}:{estado['version']}"
+    
+    def invalidate_metadata(self, prefijo: Optional[str] = None) -> int:
+        """
+        Descarta metadatos cacheados (todos o los de un tipo)
+        
+        Args:
+            prefijo: 'indices:', 'existe:', 'field_caps:', 'field_mapping:' o 'rango_ts:' (None = todos)
+            
+        Returns:
+            int: Entradas eliminadas
+        """
+        return self.metadatos.invalidar(prefijo)
+    
+    def index_exists(self, index: str) -> bool:
+        """Comprueba si existe el índice o patrón (cacheado)"""
+        return self.metadatos.obtener(
+            f"existe:{index}",
+            lambda: bool(self.es.indices.exists(index=index))
+        )
     
     def get_available_indices(self, pattern: Optional[str] = None) -> List[str]:
         """
-        Obtiene lista de índices disponibles
+        Obtiene lista de índices disponibles (cacheada)
         
         Args:
             pattern: Patrón para filtrar índices (opcional)
@@ -105,13 +408,15 @@ class ElasticsearchClient:
         Returns:
             list: Lista de nombres de índices
         """
-        try:
+        def cargar():
             if pattern:
                 indices = self.es.cat.indices(index=pattern, format='json')
             else:
                 indices = self.es.cat.indices(format='json')
-            
             return sorted([idx['index'] for idx in indices])
+        
+        try:
+            return self.metadatos.obtener(f"indices:{pattern or '*'}", cargar)
         except NotFoundError:
             return []
         except Exception as e:
@@ -130,136 +435,1816 @@ class ElasticsearchClient:
             int: Número estimado de documentos
         """
         try:
-            result = self.es.count(index=index_pattern, body=query_dict)
+            if self.config.async_search:
+                response = self._buscar_sin_hits(index_pattern, {
+                    'query': query_dict.get('query', {'match_all': {}}),
+                    'size': 0,
+                    'track_total_hits': True
+                })
+                return response['hits']['total']['value']
+            # _count solo admite 'query' en el cuerpo (no _source, sort, etc.)
+            result = self.es.count(
+                index=index_pattern,
+                body={'query': query_dict.get('query', {'match_all': {}})}
+            )
             return result['count']
         except Exception:
             return 0
     
-    def search_logs(
-        self, 
-        query_dict: Dict, 
-        index_pattern: Optional[str] = None
-    ) -> Iterator[Dict]:
+    def submit_async_search(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str] = None,
+        wait_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
-        Busca logs en Elasticsearch usando Scroll API
+        Envía una búsqueda asíncrona (_async_search) y devuelve su estado
         
         Args:
-            query_dict: Query de Elasticsearch en formato dict
+            query_dict: Cuerpo de la búsqueda (query, aggs, size...)
             index_pattern: Patrón de índices (override del config)
+            wait_seconds: Espera máxima a que termine (por defecto, config.async_wait)
             
-        Yields:
-            dict: Documentos encontrados uno por uno
+        Returns:
+            dict: Estado con id, en_curso, parcial, shards, total_hits,
+            error y respuesta (ver busqueda_asincrona.resumir)
             
         Raises:
             ValueError: Si no se encuentra el índice
-            Exception: Para errores de query o conexión
         """
         index = index_pattern or self.config.es_index
+        try:
+            return busqueda_asincrona.enviar(
+                self.es, index, query_dict,
+                espera_segundos=self.config.async_wait if wait_seconds is None else wait_seconds,
+                keep_alive=self.config.async_keep_alive
+            )
+        except NotFoundError:
+            raise self._error_indice_no_encontrado(index)
+        except (AuthenticationException, ConnectionError) as e:
+            raise self._error_conexion(e)
+    
+    def get_async_search(self, search_id: str, wait_seconds: float = 0.0) -> Dict[str, Any]:
+        """
+        Resultados parciales o finales de una búsqueda asíncrona por su id
+        
+        Raises:
+            ValueError: Si el id no existe o el resultado caducó
+        """
+        return busqueda_asincrona.consultar(self.es, search_id, wait_seconds)
+    
+    def delete_async_search(self, search_id: str) -> bool:
+        """Cancela la búsqueda asíncrona si sigue en curso y borra su resultado"""
+        return busqueda_asincrona.cancelar(self.es, search_id)
+    
+    def async_search(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str] = None,
+        al_progreso: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """
+        Ejecuta una búsqueda asíncrona hasta el final y borra el resultado guardado
         
+        Args:
+            query_dict: Cuerpo de la búsqueda
+            index_pattern: Patrón de índices (override del config)
+            al_progreso: Función llamada con cada estado parcial (opcional)
+            
+        Returns:
+            dict: Estado final (ver submit_async_search)
+            
+        Raises:
+            Exception: Si la búsqueda termina con error
+        """
+        estado = self.submit_async_search(query_dict, index_pattern)
         try:
-            # Verificar que el índice existe
-            if not self.es.indices.exists(index=index):
-                available = self.get_available_indices()
-                error_msg = (
-                    f"❌ Índice no encontrado: {index}\n"
-                    f"Índices disponibles: {', '.join(available[:10])}"
+            estado = busqueda_asincrona.esperar(
+                self.es, estado, self.config.async_wait, al_progreso
+            )
+        finally:
+            if estado['id'] is not None:
+                busqueda_asincrona.cancelar(self.es, estado['id'])
+        if estado['error']:
+            raise Exception(f"Error en la búsqueda asíncrona: {estado['error']}")
+        return estado
+    
+    def _buscar_sin_hits(self, index: str, body: Dict) -> Dict[str, Any]:
+        """
+        Búsqueda de agregaciones o conteos, asíncrona si config.async_search
+        
+        Con _async_search ninguna petición HTTP dura más de config.async_wait
+        segundos, así que las agregaciones largas no llegan al timeout.
+        """
+        if not self.config.async_search:
+            return self.es.search(index=index, body=body)
+        return self.async_search(body, index)['respuesta']
+    
+    def start_total_count(self, query_dict: Dict, index_pattern: str) -> None:
+        """
+        Lanza el _count en segundo plano, en paralelo con la primera página
+        
+        Args:
+            query_dict: Query de Elasticsearch
+            index_pattern: Patrón de índices a consultar
+        """
+        executor = ThreadPoolExecutor(max_workers=1)
+        self._conteo_pendiente = executor.submit(self.get_total_estimate, query_dict, index_pattern)
+        executor.shutdown(wait=False)
+    
+    def get_known_total(self) -> Optional[int]:
+        """
+        Total de documentos de la descarga en curso, si ya se conoce
+        
+        Proviene de track_total_hits en la primera página, de los buckets
+        de las ventanas de tiempo o del _count lanzado en segundo plano.
+        
+        Returns:
+            int: Documentos esperados en esta ejecución, o None si aún no se sabe
+        """
+        if self.estadisticas['total'] is None and self._conteo_pendiente is not None:
+            if self._conteo_pendiente.done():
+                total = self._conteo_pendiente.result()
+                self._conteo_pendiente = None
+                if total > 0:
+                    self.estadisticas['total'] = total
+        return self.estadisticas['total']
+    
+    def _registrar_total(self, total: Any) -> None:
+        """Guarda hits.total de la primera página ({'value', 'relation'} o entero)"""
+        if isinstance(total, dict):
+            if total.get('relation', 'eq') != 'eq':
+                return
+            total = total.get('value')
+        if isinstance(total, int):
+            self.estadisticas['total'] = total
+    
+    def resolve_concrete_indices(self, pattern: str) -> Dict[str, Dict[str, int]]:
+        """
+        Resuelve un patrón a índices concretos
+        
+        Los alias y data streams se expanden a sus índices (backing indices),
+        sin duplicados.
+        
+        Args:
+            pattern: Patrón de índices, alias o data stream
+            
+        Returns:
+            dict: Índice -> {'docs': docs.count, 'shards': shards primarios}
+        """
+        filas = self.es.cat.indices(index=pattern, format='json', h='index,docs.count,pri')
+        return {
+            fila['index']: {
+                'docs': int(fila.get('docs.count') or 0),
+                'shards': int(fila.get('pri') or 0)
+            }
+            for fila in filas
+        }
+    
+    def _rangos_timestamp_indices(
+        self,
+        indices: Dict[str, Dict[str, int]]
+    ) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+        """
+        Obtiene el @timestamp mínimo y máximo de cada índice
+        
+        Los rangos se guardan en la caché de metadatos (persistente entre
+        ejecuciones) junto con el docs.count: solo se consultan los índices
+        nuevos o cuyo docs.count cambió. Cada índice va en su propia búsqueda
+        de un _msearch, con min/max en la raíz y sin query, para que el
+        cluster los resuelva con los extremos del índice de puntos (BKD) sin
+        recorrer los documentos.
+        
+        Args:
+            indices: Resultado de resolve_concrete_indices
+            
+        Returns:
+            dict: Índice -> (min_ms, max_ms); None si no tiene @timestamp
+        """
+        rangos: Dict[str, Tuple[Optional[int], Optional[int]]] = {}
+        pendientes = []
+        for nombre, info in indices.items():
+            guardado = self.metadatos.leer(f"rango_ts:{nombre}")
+            if guardado and guardado.get('docs') == info['docs']:
+                rangos[nombre] = (guardado['min'], guardado['max'])
+            else:
+                pendientes.append(nombre)
+        
+        for i in range(0, len(pendientes), LOTE_RANGOS_INDICES):
+            lote = pendientes[i:i + LOTE_RANGOS_INDICES]
+            busquedas: List[Dict[str, Any]] = []
+            for nombre in lote:
+                busquedas.append({'index': nombre})
+                busquedas.append({
+                    'size': 0,
+                    'track_total_hits': False,
+                    'aggs': {
+                        'min_ts': {'min': {'field': CAMPO_TIMESTAMP}},
+                        'max_ts': {'max': {'field': CAMPO_TIMESTAMP}}
+                    }
+                })
+            response = self.es.msearch(searches=busquedas)
+            nuevos = {}
+            for nombre, respuesta in zip(lote, response['responses']):
+                if 'error' in respuesta:
+                    raise RuntimeError(f"{nombre}: {respuesta['error']}")
+                aggs = respuesta.get('aggregations') or {}
+                minimo = (aggs.get('min_ts') or {}).get('value')
+                maximo = (aggs.get('max_ts') or {}).get('value')
+                rango = (
+                    int(minimo) if minimo is not None else None,
+                    int(maximo) if maximo is not None else None
                 )
-                raise ValueError(error_msg)
+                rangos[nombre] = rango
+                nuevos[f"rango_ts:{nombre}"] = {
+                    'docs': indices[nombre]['docs'], 'min': rango[0], 'max': rango[1]
+                }
+            self.metadatos.guardar(nuevos)
+        
+        return rangos
+    
+    def prune_indices(self, query_dict: Dict, index_pattern: Optional[str] = None) -> Optional[str]:
+        """
+        Reduce el patrón de índices a los que pueden contener el rango de la query
+        
+        Args:
+            query_dict: Query de Elasticsearch (con filtro de @timestamp)
+            index_pattern: Patrón de índices (override del config)
             
-            # Usar scan helper para manejar paginación automáticamente
-            for doc in scan(
-                self.es,
-                index=index,
-                query=query_dict,
-                scroll=self.config.scroll_timeout,
-                size=self.config.scroll_size,
-                raise_on_error=True
-            ):
-                yield doc
-        except ValueError:
-            # Re-raise ValueError como está (índice no encontrado)
-            raise
+        Returns:
+            str: Lista de índices separada por comas (o el patrón original si no
+            hay nada que podar); None si ningún índice puede coincidir
+        """
+        index = index_pattern or self.config.es_index
+        if not self.config.prune_indices:
+            return index
+        
+        inicio, fin = extraer_rango_timestamp(query_dict)
+        if inicio is None and fin is None:
+            return index
+        
+        try:
+            indices = self.resolve_concrete_indices(index)
+            rangos = self._rangos_timestamp_indices(indices)
         except Exception as e:
-            # Cualquier otro error se envuelve en Exception genérica
-            raise Exception(f"Error durante la búsqueda: {str(e)}")
+            print(f"⚠ Advertencia: No se pudieron podar índices por rango de tiempo: {e}")
+            return index
+        
+        conservados = [
+            nombre for nombre in sorted(indices)
+            if rangos[nombre][0] is not None
+            and (fin is None or rangos[nombre][0] < fin)
+            and (inicio is None or rangos[nombre][1] >= inicio)
+        ]
+        omitidos = set(indices) - set(conservados)
+        if not omitidos:
+            return index
+        
+        shards_omitidos = sum(indices[nombre]['shards'] for nombre in omitidos)
+        print(
+            f"🗂️  Poda por rango de tiempo: {len(conservados)} de {len(indices)} índices "
+            f"({shards_omitidos} shards omitidos)"
+        )
+        
+        if not conservados:
+            return None
+        lista = ','.join(conservados)
+        if len(lista) > MAX_LONGITUD_LISTA_INDICES:
+            # Demasiados índices para la URL: se delega en el pre-filtro de shards del cluster
+            return index
+        return lista
     
-    def download_to_csv(
+    def get_field_types(
         self,
-        query_dict: Dict,
-        output_csv: str,
-        fields: Optional[List[str]] = None,
+        campos: List[str],
         index_pattern: Optional[str] = None
-    ) -> int:
+    ) -> Dict[str, str]:
         """
-        Descarga resultados de búsqueda a archivo CSV
+        Obtiene el tipo de mapping de los campos con la API field_caps
         
         Args:
-            query_dict: Query de Elasticsearch
-            output_csv: Ruta del archivo CSV de salida
-            fields: Lista de campos a incluir (None = todos los de _source)
+            campos: Campos o patrones (p. ej. 'message.*')
             index_pattern: Patrón de índices (override del config)
             
         Returns:
-            int: Número de documentos descargados
+            dict: Campo -> tipo; se omiten los campos con tipos distintos entre índices
         """
-        print(f"📥 Descargando logs a CSV: {output_csv}")
+        index = index_pattern or self.config.es_index
         
-        count = 0
-        writer = None
-        csv_file = None
+        def cargar():
+            response = self.es.field_caps(index=index, fields=campos)
+            return {
+                campo: next(iter(por_tipo))
+                for campo, por_tipo in response.get('fields', {}).items()
+                if len(por_tipo) == 1
+            }
+        
+        try:
+            return self.metadatos.obtener(f"field_caps:{index}:{','.join(sorted(campos))}", cargar)
+        except NotFoundError:
+            raise ValueError(f"❌ Índice no encontrado: {index}")
+    
+    def get_field_mapping_params(
+        self,
+        campos: List[str],
+        index_pattern: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtiene ignore_above y normalizer de los campos con get_field_mapping
+        
+        field_caps solo informa del tipo; estos parámetros deciden qué valores
+        se indexan y hacen falta para saber si dos campos son intercambiables.
+        
+        Args:
+            campos: Campos o patrones (p. ej. 'message.*')
+            index_pattern: Patrón de índices (override del config)
+            
+        Returns:
+            dict: Campo -> parámetros; se omiten los campos con parámetros
+            distintos entre índices
+        """
+        index = index_pattern or self.config.es_index
+        
+        def cargar():
+            response = self.es.indices.get_field_mapping(index=index, fields=campos)
+            parametros: Dict[str, Dict[str, Any]] = {}
+            conflictos = set()
+            for datos in response.values():
+                for nombre, campo in datos.get('mappings', {}).items():
+                    definicion = next(iter(campo.get('mapping', {}).values()), {})
+                    propios = {
+                        clave: definicion[clave]
+                        for clave in ('ignore_above', 'normalizer') if clave in definicion
+                    }
+                    if parametros.setdefault(nombre, propios) != propios:
+                        conflictos.add(nombre)
+            return {nombre: p for nombre, p in parametros.items() if nombre not in conflictos}
         
         try:
-            csv_file = open(output_csv, 'w', newline='', encoding='utf-8')
+            return self.metadatos.obtener(f"field_mapping:{index}:{','.join(sorted(campos))}", cargar)
+        except NotFoundError:
+            raise ValueError(f"❌ Índice no encontrado: {index}")
+    
+    def optimize_query(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str] = None
+    ) -> Tuple[Dict, List[str]]:
+        """
+        Reescribe la query según el mapping real de los índices
+        
+        Args:
+            query_dict: Query de Elasticsearch
+            index_pattern: Patrón de índices (override del config)
             
-            for doc in self.search_logs(query_dict, index_pattern):
-                source = doc['_source']
-                
-                # Filtrar campos si se especificaron
-                if fields:
-                    source = {k: v for k, v in source.items() if k in fields}
-                
-                # Inicializar writer con los campos del primer documento
-                if writer is None:
-                    fieldnames = list(source.keys())
-                    writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-                    writer.writeheader()
-                
-                writer.writerow(source)
-                count += 1
-                
-                # Mostrar progreso cada 1000 documentos
-                if count % 1000 == 0:
-                    print(f"  ✓ Descargados {count:,} documentos...")
+        Returns:
+            tuple: (query optimizada, lista de cambios aplicados)
+        """
+        campos = campos_con_wildcard(query_dict)
+        tipos = {}
+        parametros = None
+        if campos:
+            patrones = [p for campo in campos for p in (campo, f"{campo}.*")]
+            tipos = self.get_field_types(patrones, index_pattern)
+            # Los parámetros solo importan si hay un keyword con subcampo wildcard
+            if any(
+                tipos.get(campo) == 'keyword' and any(
+                    tipo == 'wildcard' and nombre.startswith(f"{campo}.")
+                    for nombre, tipo in tipos.items()
+                )
+                for campo in campos
+            ):
+                parametros = self.get_field_mapping_params(patrones, index_pattern)
+        return optimizar_query(query_dict, tipos, parametros)
+    
+    def profile_query(self, query_dict: Dict, index_pattern: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ejecuta la query con la Profile API y resume el tiempo por shard
+        
+        Args:
+            query_dict: Query de Elasticsearch
+            index_pattern: Patrón de índices (override del config)
             
-            print(f"✅ Descarga completa: {count:,} documentos guardados en {output_csv}")
-            return count
+        Returns:
+            dict: took (ms), total de hits y, por shard, tiempos de query,
+            rewrite y collector en ms
+        """
+        index = index_pattern or self.config.es_index
+        try:
+            response = self.es.search(index=index, request_cache=False, body={
+                'query': query_dict.get('query', {'match_all': {}}),
+                'size': 0,
+                'track_total_hits': True,
+                'profile': True
+            })
+        except NotFoundError:
+            raise ValueError(f"❌ Índice no encontrado: {index}")
+        
+        shards = []
+        for shard in response['profile']['shards']:
+            query_ns = rewrite_ns = collector_ns = 0
+            for busqueda in shard.get('searches', []):
+                query_ns += sum(q['time_in_nanos'] for q in busqueda.get('query', []))
+                rewrite_ns += busqueda.get('rewrite_time', 0)
+                collector_ns += sum(c['time_in_nanos'] for c in busqueda.get('collector', []))
+            shards.append({
+                'shard': shard['id'],
+                'query_ms': query_ns / 1e6,
+                'rewrite_ms': rewrite_ns / 1e6,
+                'collector_ms': collector_ns / 1e6,
+                'total_ms': (query_ns + rewrite_ns + collector_ns) / 1e6
+            })
+        
+        return {
+            'took': response.get('took', 0),
+            'total': response['hits']['total']['value'],
+            'shards': shards
+        }
+    
+    @staticmethod
+    def _aplicar_modo_lean(query_dict: Dict) -> Dict:
+        """
+        Reduce el cuerpo de la búsqueda a lo que necesita el procesador
+        
+        Args:
+            query_dict: Query de Elasticsearch
             
-        finally:
-            if csv_file:
-                csv_file.close()
+        Returns:
+            dict: Copia con _source limitado a message y @timestamp por docvalue_fields
+        """
+        body = dict(query_dict)
+        body['_source'] = LEAN_SOURCE
+        body['docvalue_fields'] = LEAN_DOCVALUE_FIELDS
+        return body
     
-    def get_documents_generator(
+    @staticmethod
+    def _lean_filter_path(incluir_sort: bool) -> List[str]:
+        """filter_path que descarta metadatos de respuesta y de cada hit"""
+        if incluir_sort:
+            return LEAN_FILTER_PATH
+        return LEAN_FILTER_PATH + ['-hits.hits.sort']
+    
+    def measure_response_bytes(
         self,
         query_dict: Dict,
-        index_pattern: Optional[str] = None
-    ) -> Iterator[Dict[str, Any]]:
+        index_pattern: Optional[str] = None,
+        sample_size: int = 200
+    ) -> Dict[str, float]:
         """
-        Obtiene generador de documentos para procesamiento directo
+        Mide los bytes de respuesta por documento en modo normal y lean
+        
+        Descarga una página de muestra en cada modo y mide su tamaño
+        serializado (JSON compacto, como lo envía Elasticsearch).
         
         Args:
             query_dict: Query de Elasticsearch
-            index_pattern: Patrón de índices
+            index_pattern: Patrón de índices (override del config)
+            sample_size: Documentos de la página de muestra
             
-        Yields:
-            dict: Documento con estructura compatible con procesador
+        Returns:
+            dict: bytes_por_doc_normal, bytes_por_doc_lean y ahorro_pct
         """
-        for doc in self.search_logs(query_dict, index_pattern):
-            # Retornar en formato compatible con el procesador CSV
-            yield {
-                'message': doc['_source'].get('message', ''),
-                '@timestamp': doc['_source'].get('@timestamp', ''),
-                '_id': doc['_id']
-            }
+        index = index_pattern or self.config.es_index
+        resultado = {}
+        
+        for modo, lean in (('normal', False), ('lean', True)):
+            body = self._aplicar_modo_lean(query_dict) if lean else dict(query_dict)
+            body['size'] = sample_size
+            params = {'filter_path': self._lean_filter_path(incluir_sort=False)} if lean else {}
+            
+            response = self.es.search(index=index, body=body, **params)
+            datos = getattr(response, 'body', response)
+            hits = datos.get('hits', {}).get('hits', [])
+            tamano = len(json.dumps(datos, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+            resultado[f'bytes_por_doc_{modo}'] = tamano / len(hits) if hits else 0.0
+        
+        normal = resultado['bytes_por_doc_normal']
+        resultado['ahorro_pct'] = (
+            (1 - resultado['bytes_por_doc_lean'] / normal) * 100 if normal else 0.0
+        )
+        return resultado
+    
+    def estimate_extraction(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str] = None,
+        windows: int = 0,
+        sample_size: int = 200
+    ) -> Dict[str, Any]:
+        """
+        Estima el coste de la extracción antes de lanzarla (--estimate)
+        
+        El _count corre en paralelo con una página de muestra pedida en bytes;
+        la latencia del _count hace de coste fijo por petición.
+        
+        Args:
+            query_dict: Query de Elasticsearch
+            index_pattern: Patrón de índices (override del config)
+            windows: Ventanas previstas para --windows (0 = window_workers)
+            sample_size: Documentos de la página de muestra
+            
+        Returns:
+            dict: Predicción por modo de descarga (ver estimador.estimar)
+            
+        Raises:
+            ValueError: Si no se encuentra el índice
+        """
+        index = index_pattern or self.config.es_index
+        
+        def contar() -> Tuple[int, float]:
+            inicio = time.perf_counter()
+            total = self.get_total_estimate(query_dict, index)
+            return total, time.perf_counter() - inicio
+        
+        executor = ThreadPoolExecutor(max_workers=1)
+        conteo = executor.submit(contar)
+        executor.shutdown(wait=False)
+        
+        body = dict(query_dict)
+        body['size'] = sample_size
+        body['track_total_hits'] = False
+        inicio = time.perf_counter()
+        try:
+            response = self._get_raw_client().search(index=index, body=body)
+        except NotFoundError:
+            raise self._error_indice_no_encontrado(index)
+        except (AuthenticationException, ConnectionError) as e:
+            raise self._error_conexion(e)
+        segundos = time.perf_counter() - inicio
+        
+        total, latencia_conteo = conteo.result()
+        muestra = estimador.medir_muestra(response.body, segundos)
+        muestra['latencia_conteo'] = latencia_conteo
+        limite = (
+            int(self.config.memory_limit_mb * 1024 * 1024) if self.config.memory_limit_mb
+            else estimador.limite_memoria()
+        )
+        return estimador.estimar(total, muestra, self.config, windows=windows, limite=limite)
+    
+    def search_logs(
+        self, 
+        query_dict: Dict, 
+        index_pattern: Optional[str] = None,
+        lean: bool = False
+    ) -> Iterator[Dict]:
+        """
+        Busca logs en Elasticsearch usando Scroll API
+        
+        Args:
+            query_dict: Query de Elasticsearch en formato dict
+            index_pattern: Patrón de índices (override del config)
+            lean: Pedir solo message/@timestamp y filtrar metadatos de la respuesta
+            
+        Yields:
+            dict: Documentos encontrados uno por uno
+            
+        Raises:
+            ValueError: Si no se encuentra el índice
+            Exception: Para errores de query o conexión
+        """
+        index = index_pattern or self.config.es_index
+        
+        try:
+            # En inicio rápido la primera búsqueda hace de comprobación
+            if not self.config.fast_start:
+                if not self.index_exists(index):
+                    raise self._error_indice_no_encontrado(index)
+                
+                index = self.prune_indices(query_dict, index)
+                if index is None:
+                    return
+            
+            # El scroll no expone hits.total: el _count corre en paralelo
+            self.start_total_count(query_dict, index)
+            
+            extra = {}
+            if lean:
+                query_dict = self._aplicar_modo_lean(query_dict)
+                filter_path = self._lean_filter_path(incluir_sort=False)
+                extra = {'filter_path': filter_path, 'scroll_kwargs': {'filter_path': filter_path}}
+            
+            # Usar scan helper para manejar paginación automáticamente
+            while True:
+                tamano = self.tamano_pagina.tamano
+                entregados = 0
+                self._esperar_monitor()
+                try:
+                    for doc in scan(
+                        self.es,
+                        index=index,
+                        query=query_dict,
+                        scroll=self.config.scroll_timeout,
+                        size=tamano,
+                        raise_on_error=True,
+                        **extra
+                    ):
+                        entregados += 1
+                        yield doc
+                        if entregados % tamano == 0:
+                            # scan pide la página siguiente al reanudar el generador
+                            self._esperar_monitor()
+                    break
+                except Exception as e:
+                    # El scroll fija el tamaño en la primera petición: solo se
+                    # puede reducir si aún no se entregó ningún documento
+                    if entregados or not self.tamano_pagina.reducir_por_error(e):
+                        raise
+                    print(
+                        f"⚠️  Scroll de {tamano:,} documentos por página rechazado "
+                        f"({type(e).__name__}); reintentando con {self.tamano_pagina.tamano:,}"
+                    )
+                finally:
+                    self.tamano_pagina.registrar_paginas(tamano, -(-entregados // tamano))
+                    self.estadisticas['tamano_pagina'] = self.tamano_pagina.resumen()
+        except ValueError:
+            # Re-raise ValueError como está (índice no encontrado)
+            raise
+        except NotFoundError:
+            raise self._error_indice_no_encontrado(index)
+        except (AuthenticationException, ConnectionError) as e:
+            raise self._error_conexion(e)
+        except Exception as e:
+            # Cualquier otro error se envuelve en Exception genérica
+            raise Exception(f"Error durante la búsqueda: {str(e)}")
+    
+    def download_to_csv(
+        self,
+        query_dict: Dict,
+        output_csv: str,
+        fields: Optional[List[str]] = None,
+        index_pattern: Optional[str] = None
+    ) -> int:
+        """
+        Descarga resultados de búsqueda a archivo CSV
+        
+        Las filas se escriben por lotes del tamaño de página con writerows y
+        un orden de columnas fijado de antemano. Con extensión .gz o .zst el
+        CSV se comprime en un hilo aparte mientras se descarga la página
+        siguiente.
+        
+        Args:
+            query_dict: Query de Elasticsearch
+            output_csv: Ruta del archivo CSV de salida (.csv, .csv.gz o .csv.zst)
+            fields: Lista de campos a incluir, en ese orden
+                (None = los del _source del primer documento)
+            index_pattern: Patrón de índices (override del config)
+            
+        Returns:
+            int: Número de documentos descargados
+            
+        Raises:
+            ValueError: Si se pide .zst y zstandard no está instalado
+        """
+        print(f"📥 Descargando logs a CSV: {output_csv}")
+        
+        count = 0
+        columnas = list(fields) if fields else None
+        lote: List[List[Any]] = []
+        tamano_lote = self.config.scroll_size
+        progreso = Progreso(self.get_known_total)
+        ultimo_aviso = time.monotonic()
+        
+        self.start_load_monitor()
+        try:
+            with EscritorCsv(output_csv) as escritor:
+                for doc in self._medir_primer_documento(self.search_logs(query_dict, index_pattern)):
+                    source = doc['_source']
+                    if not count and not lote:
+                        # Columnas del primer documento si no se especificaron
+                        if columnas is None:
+                            columnas = list(source.keys())
+                        escritor.escribir_cabecera(columnas)
+                    lote.append([source.get(columna, '') for columna in columnas])
+                    
+                    if len(lote) >= tamano_lote:
+                        escritor.escribir_filas(lote)
+                        count += len(lote)
+                        lote = []
+                        if time.monotonic() - ultimo_aviso >= INTERVALO_PROGRESO_CSV:
+                            print(f"  ✓ Descargados {count:,} documentos{progreso.describir(count)}...")
+                            ultimo_aviso = time.monotonic()
+                
+                if lote:
+                    escritor.escribir_filas(lote)
+                    count += len(lote)
+        finally:
+            self.stop_load_monitor()
+        
+        print(f"✅ Descarga completa: {count:,} documentos guardados en {output_csv}")
+        return count
+    
+    def download_to_csv_sql(
+        self,
+        query_dict: Dict,
+        output_csv: str,
+        fields: Optional[List[str]] = None,
+        index_pattern: Optional[str] = None
+    ) -> int:
+        """
+        Descarga resultados a CSV generado en el servidor con la API _sql
+        
+        El CSV llega por páginas (format=csv, fetch_size = tamaño de página)
+        y se escribe en disco sin decodificar: no hay JSON de _source ni
+        csv.DictWriter en el cliente. La query se aplica como filtro DSL.
+        Las columnas son las del mapping (orden alfabético) y los campos con
+        varios valores se exportan con el primero.
+        
+        Args:
+            query_dict: Query de Elasticsearch
+            output_csv: Ruta del archivo CSV de salida (.gz o .zst: comprimido)
+            fields: Lista de campos a incluir (None = todos los del mapping)
+            index_pattern: Patrón de índices (override del config)
+            
+        Returns:
+            int: Número de filas descargadas
+            
+        Raises:
+            ValueError: Si no se encuentra el índice
+            Exception: Para errores de conexión o de la consulta SQL
+        """
+        index = index_pattern or self.config.es_index
+        print(f"📥 Descargando logs a CSV con _sql: {output_csv}")
+        
+        cliente = self._get_raw_client()
+        count = 0
+        cabecera = None
+        cursor = None
+        progreso = Progreso(self.get_known_total)
+        inicio = time.monotonic()
+        self.start_total_count(query_dict, index)
+        
+        try:
+            with SalidaBinaria(output_csv) as csv_file:
+                response = cliente.sql.query(
+                    format='csv',
+                    query=construir_sql(index, fields),
+                    filter=filtro_sql(query_dict),
+                    fetch_size=self.config.scroll_size,
+                    field_multi_value_leniency=True,
+                    page_timeout=self.config.scroll_timeout
+                )
+                while True:
+                    bloque = response.body
+                    cursor = response.meta.headers.get('Cursor')
+                    if cabecera is None:
+                        # Solo la primera página trae la fila de columnas
+                        cabecera = primera_linea(bloque)
+                        csv_file.write(cabecera)
+                        self.estadisticas['primer_documento'] = time.monotonic() - inicio
+                    lineas = separar_cabecera(bloque, cabecera)
+                    csv_file.write(lineas)
+                    
+                    filas = contar_filas_csv(lineas)
+                    count += filas
+                    if filas:
+                        print(f"  ✓ Descargadas {count:,} filas{progreso.describir(count)}...")
+                    if not cursor:
+                        break
+                    response = cliente.sql.query(format='csv', cursor=cursor)
+                cursor = None
+        except NotFoundError:
+            raise self._error_indice_no_encontrado(index)
+        except (AuthenticationException, ConnectionError) as e:
+            raise self._error_conexion(e)
+        finally:
+            if cursor:
+                # Descarga interrumpida: liberar el contexto de búsqueda del servidor
+                try:
+                    self.es.sql.clear_cursor(cursor=cursor)
+                except Exception:
+                    pass
+        
+        print(f"✅ Descarga completa: {count:,} filas guardadas en {output_csv}")
+        return count
+    
+    def open_point_in_time(self, index: str) -> str:
+        """
+        Abre un Point in Time (PIT) sobre el índice
+        
+        Args:
+            index: Patrón de índices
+            
+        Returns:
+            str: Identificador del PIT
+            
+        Raises:
+            ValueError: Si no se encuentra el índice
+        """
+        try:
+            response = self.es.open_point_in_time(
+                index=index,
+                keep_alive=self.config.scroll_timeout
+            )
+        except NotFoundError:
+            raise self._error_indice_no_encontrado(index)
+        except (AuthenticationException, ConnectionError) as e:
+            raise self._error_conexion(e)
+        return response['id']
+    
+    def close_point_in_time(self, pit_id: str) -> None:
+        """Cierra un PIT ignorando errores (puede haber expirado)"""
+        try:
+            self.es.close_point_in_time(id=pit_id)
+        except Exception:
+            pass
+    
+    def iter_pages(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str] = None,
+        cursor: Optional[Dict[str, Any]] = None,
+        lean: bool = False,
+        raw: bool = False,
+        contar_total: bool = False,
+        espacio_cache: Optional[str] = None
+    ) -> Iterator[Tuple[Iterable[Dict], Dict[str, Any]]]:
+        """
+        Pagina resultados con PIT + search_after ordenando por @timestamp
+        
+        A diferencia del scroll, la posición se puede persistir: cada página va
+        acompañada de un cursor (último @timestamp y _ids ya vistos con ese
+        mismo valor) desde el que se puede continuar en otro proceso con un
+        PIT nuevo sin repetir ni perder documentos.
+        
+        Args:
+            query_dict: Query de Elasticsearch
+            index_pattern: Patrón de índices (override del config)
+            cursor: Posición desde la que continuar (opcional)
+            lean: Pedir solo message/@timestamp y filtrar metadatos de la respuesta
+            raw: Recibir la página en bytes y parsear los hits de uno en uno
+                (ver hit_parser); los hits llegan como iterador perezoso y el
+                cursor se completa al agotarlo
+            contar_total: Pedir track_total_hits en la primera página y
+                guardarlo en estadisticas['total'] (sin un _count aparte)
+            espacio_cache: Clave de la extracción en la caché de páginas
+                (None = sin caché; ver CachePaginas.clave_consulta)
+            
+        Yields:
+            tuple: (hits de la página, cursor tras procesar la página)
+        """
+        index = index_pattern or self.config.es_index
+        cursor = dict(cursor or {'ultimo_ts': None, 'ids': []})
+        
+        body = {k: v for k, v in query_dict.items() if k not in ('sort', 'size')}
+        params = {}
+        if lean:
+            body = self._aplicar_modo_lean(body)
+            params['filter_path'] = self._lean_filter_path(incluir_sort=True)
+        ultimo_ts = cursor.get('ultimo_ts')
+        omitir = set(cursor.get('ids', []))
+        if ultimo_ts is not None:
+            body = agregar_filtro(body, {
+                'range': {CAMPO_TIMESTAMP: {'gte': ultimo_ts, 'format': 'epoch_millis'}}
+            })
+        
+        # Al repetir desde la caché no se contacta con el cluster
+        pit_id = None if self.config.replay else self.open_point_in_time(index)
+        body['sort'] = [{CAMPO_TIMESTAMP: {'order': 'asc'}}]
+        body['track_total_hits'] = False
+        
+        # La primera página trae el total; en modo lean no se filtra hits.total
+        params_primera = dict(params)
+        if contar_total:
+            body['track_total_hits'] = True
+            if lean:
+                params_primera['filter_path'] = [
+                    f for f in params['filter_path'] if f != '-hits.total'
+                ]
+        
+        try:
+            search_after = None
+            while True:
+                body['pit'] = {'id': pit_id, 'keep_alive': self.config.scroll_timeout}
+                if search_after is not None:
+                    body['search_after'] = search_after
+                params_pagina = params if search_after is not None else params_primera
+                tamano = body['size'] = self.tamano_pagina.tamano
+                
+                inicio = time.monotonic()
+                try:
+                    response, bytes_pagina, desde_cache = self._pedir_pagina(
+                        body, params_pagina, raw, espacio_cache
+                    )
+                    if raw:
+                        datos = response
+                except Exception as e:
+                    # Timeout o circuit breaker: repetir la misma página más pequeña
+                    if not self.tamano_pagina.reducir_por_error(e):
+                        raise
+                    print(
+                        f"⚠️  Página de {tamano:,} documentos rechazada ({type(e).__name__}); "
+                        f"reintentando con {self.tamano_pagina.tamano:,}"
+                    )
+                    continue
+                segundos = time.monotonic() - inicio
+                
+                if raw:
+                    meta = {}
+                    seguimiento = {'search_after': None, 'recibidos': 0}
+                    cursor_pagina = dict(cursor)
+                    hits = _hits_con_cursor(
+                        iterar_hits_crudos(datos, meta), cursor_pagina,
+                        seguimiento, ultimo_ts, omitir
+                    )
+                    yield hits, cursor_pagina
+                    
+                    # Terminar de recorrer la página si el consumidor no lo hizo
+                    for _ in hits:
+                        pass
+                    self._observar_pagina(tamano, seguimiento['recibidos'], segundos, len(datos))
+                    del datos
+                    if not desde_cache:
+                        pit_id = meta.get('pit_id', pit_id)
+                    if body['track_total_hits']:
+                        self._registrar_total(meta.get('total'))
+                        body['track_total_hits'] = False
+                    if seguimiento['search_after'] is None:
+                        break
+                    search_after = seguimiento['search_after']
+                    cursor = cursor_pagina
+                    continue
+                
+                if not desde_cache:
+                    # Una página de la caché trae el PIT de cuando se grabó
+                    pit_id = response.get('pit_id', pit_id)
+                if body['track_total_hits']:
+                    self._registrar_total(response.get('hits', {}).get('total'))
+                    body['track_total_hits'] = False
+                hits = response.get('hits', {}).get('hits', [])
+                self._observar_pagina(tamano, len(hits), segundos, bytes_pagina)
+                if not hits:
+                    break
+                search_after = hits[-1]['sort']
+                
+                # Descartar los documentos del límite ya procesados antes
+                if omitir:
+                    hits = [
+                        h for h in hits
+                        if not (h['sort'][0] == ultimo_ts and h['_id'] in omitir)
+                    ]
+                    if search_after[0] != ultimo_ts:
+                        omitir = set()
+                
+                if hits:
+                    ts_pagina = hits[-1]['sort'][0]
+                    ids = [h['_id'] for h in hits if h['sort'][0] == ts_pagina]
+                    if ts_pagina == cursor['ultimo_ts']:
+                        ids = cursor['ids'] + ids
+                    cursor = {'ultimo_ts': ts_pagina, 'ids': ids}
+                    yield hits, dict(cursor)
+        finally:
+            if pit_id is not None:
+                self.close_point_in_time(pit_id)
+    
+    def _pedir_pagina(
+        self,
+        body: Dict,
+        params: Dict,
+        raw: bool,
+        espacio_cache: Optional[str]
+    ) -> Tuple[Any, int, bool]:
+        """
+        Pide una página al cluster o la lee de la caché de páginas
+        
+        Las páginas se piden siempre en bytes y se decodifican aquí si no es
+        modo crudo: así se conoce el tamaño real del JSON descomprimido, que
+        es el que limita ELASTICSEARCH_PAGE_MAX_MB (el Content-Length es el
+        del cuerpo comprimido con http_compress). Con caché, los bytes se
+        guardan comprimidos tal cual.
+        
+        Returns:
+            tuple: (respuesta, en bytes si raw; bytes del JSON sin comprimir;
+            True si la página salió de la caché)
+            
+        Raises:
+            ValueError: Si en --replay la página no está en la caché
+        """
+        if espacio_cache is None or self.cache_paginas is None:
+            response = self.limitador.ejecutar(
+                lambda: self._buscar_pagina(self._get_page_client(), dict(body), params)
+            )
+            datos = response.body
+            return (datos if raw else self._decodificar(datos)), len(datos), False
+        
+        clave = CachePaginas.clave_pagina(espacio_cache, body, params)
+        datos = self.cache_paginas.leer(clave)
+        desde_cache = datos is not None
+        if datos is None:
+            if self.config.replay:
+                raise ValueError(
+                    "❌ Página no encontrada en la caché (--replay): la extracción grabada "
+                    "está incompleta o se ha podado. Repite la descarga con --page-cache"
+                )
+            response = self.limitador.ejecutar(
+                lambda: self._buscar_pagina(self._get_page_client(), dict(body), params)
+            )
+            datos = response.body
+            self.cache_paginas.escribir(clave, datos)
+        self.estadisticas['cache_paginas'] = self.cache_paginas.resumen()
+        return (datos if raw else self._decodificar(datos)), len(datos), desde_cache
+    
+    def _buscar_pagina(self, cliente: Elasticsearch, body: Dict, params: Dict) -> Any:
+        """
+        Pide una página de search_after, duplicándola si tarda más que el p95
+        
+        Elasticsearch no admite 'preference' junto a un PIT, así que el
+        duplicado no puede elegir otra copia del shard: sale por el siguiente
+        nodo del round-robin; por eso con un solo host se desactiva. El
+        duplicado pasa por el limitador de concurrencia como cualquier página.
+        Cada petición lleva un X-Opaque-Id para cancelar la perdedora en el servidor.
+        """
+        if not self.cobertura.activo:
+            return cliente.search(body=body, **params)
+        
+        prefijo = f"extractor-{uuid.uuid4().hex[:12]}"
+        terminada = threading.Event()
+        
+        def peticion(intento: int) -> Any:
+            def buscar():
+                return cliente.options(opaque_id=f"{prefijo}-{intento}").search(body=body, **params)
+            if intento == 0:
+                # La original ya ocupa un hueco del limitador (_pedir_pagina)
+                return buscar()
+            # El duplicado es carga extra: también espera hueco, y no sale si la
+            # original terminó mientras tanto
+            return self.limitador.ejecutar(lambda: None if terminada.is_set() else buscar())
+        
+        try:
+            return self.cobertura.ejecutar(
+                peticion,
+                lambda intento: self._cancelar_busqueda(f"{prefijo}-{intento}")
+            )
+        finally:
+            terminada.set()
+    
+    def _cancelar_busqueda(self, opaque_id: str) -> None:
+        """Cancela en el servidor la búsqueda con ese X-Opaque-Id (sin garantías)"""
+        try:
+            tareas = self.es.tasks.list(actions='indices:data/read/search', detailed=True)
+            for nodo in tareas.get('nodes', {}).values():
+                for id_tarea, tarea in nodo.get('tasks', {}).items():
+                    if tarea.get('headers', {}).get('X-Opaque-Id') == opaque_id:
+                        self.es.tasks.cancel(task_id=id_tarea)
+        except Exception:
+            # Puede haber terminado ya o faltar el privilegio de gestionar tareas
+            pass
+    
+    def _observar_pagina(
+        self,
+        tamano: int,
+        docs: int,
+        segundos: float,
+        bytes_pagina: Optional[int]
+    ) -> None:
+        """Ajusta el tamaño de página y registra tamaños y concurrencia en las estadísticas"""
+        self.tamano_pagina.observar(tamano, docs, segundos, bytes_pagina)
+        self.estadisticas['tamano_pagina'] = self.tamano_pagina.resumen()
+        self.estadisticas['concurrencia'] = self.limitador.resumen()
+        if self.cobertura.activo:
+            self.estadisticas['cobertura'] = self.cobertura.resumen()
+    
+    @staticmethod
+    def _formatear_documento(doc: Dict) -> Dict[str, Any]:
+        """Convierte un hit al formato compatible con el procesador CSV"""
+        source = doc.get('_source', {})
+        timestamp = source.get('@timestamp')
+        if timestamp is None:
+            # En modo lean el @timestamp llega por docvalue_fields
+            timestamp = doc.get('fields', {}).get(CAMPO_TIMESTAMP, [''])[0]
+        return {
+            'message': source.get('message', ''),
+            '@timestamp': timestamp,
+            '_id': doc['_id']
+        }
+    
+    def iter_composite_values(
+        self,
+        query_dict: Dict,
+        campos: Dict[str, str],
+        index_pattern: Optional[str] = None,
+        page_size: Optional[int] = None
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Enumera los valores distintos de campos indexados con una agregación composite
+
+        Cada campo se pagina con su propio after_key, de modo que se obtienen
+        los valores distintos por campo (no las combinaciones entre campos).
+
+        Args:
+            query_dict: Query de Elasticsearch (solo se usa su cláusula 'query')
+            campos: Nombre de salida -> campo indexado en Elasticsearch
+            index_pattern: Patrón de índices (override del config)
+            page_size: Buckets por página (por defecto, scroll_size)
+
+        Yields:
+            tuple: (nombre_de_salida, valor) para cada valor distinto
+
+        Raises:
+            ValueError: Si el índice no existe o un campo no es agregable
+        """
+        index = index_pattern or self.config.es_index
+        query = query_dict.get('query', {'match_all': {}})
+        size = page_size or self.config.scroll_size
+
+        for nombre, campo in campos.items():
+            composite: Dict[str, Any] = {
+                'size': size,
+                'sources': [{'valor': {'terms': {'field': campo}}}]
+            }
+            while True:
+                try:
+                    response = self._buscar_sin_hits(index, {
+                        'query': query,
+                        'size': 0,
+                        'track_total_hits': False,
+                        'aggs': {'valores': {'composite': composite}}
+                    })
+                except NotFoundError:
+                    raise ValueError(f"❌ Índice no encontrado: {index}")
+                except RequestError as e:
+                    raise ValueError(
+                        f"❌ No se puede agregar por el campo '{campo}': {e}\n"
+                        f"Usa un campo keyword o numérico (p. ej. '{campo}.keyword')"
+                    )
+
+                agregacion = response['aggregations']['valores']
+                for bucket in agregacion['buckets']:
+                    yield nombre, bucket['key']['valor']
+
+                after_key = agregacion.get('after_key')
+                if not agregacion['buckets'] or after_key is None:
+                    break
+                composite['after'] = after_key
+
+    def iter_pipeline_values(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str] = None,
+        campo: Optional[str] = None
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Enumera los pares distintos que el pipeline de ingesta ya extrajo
+
+        Una agregación composite sobre el campo de pares sustituye a descargar
+        y parsear cada message. Los documentos indexados antes de instalar el
+        pipeline solo aparecen tras el relleno (install-pipeline --backfill).
+
+        Args:
+            query_dict: Query de Elasticsearch (solo se usa su cláusula 'query')
+            index_pattern: Patrón de índices (override del config)
+            campo: Campo de pares (por defecto, config.pipeline_field)
+
+        Yields:
+            tuple: (campo, valor) con el tipo original del JSON de Body
+        """
+        campo = campo or self.config.pipeline_field
+        for _, par in self.iter_composite_values(query_dict, {campo: campo}, index_pattern):
+            yield pipeline_ingesta.decodificar_par(par)
+
+    def install_ingest_pipeline(
+        self,
+        index_pattern: Optional[str] = None,
+        nombre: Optional[str] = None,
+        campo: Optional[str] = None,
+        mapping: bool = True,
+        default_pipeline: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Instala (o actualiza) el pipeline de ingesta que extrae los pares de Body
+
+        Args:
+            index_pattern: Índices a los que se añade el mapping (override del config)
+            nombre: Id del pipeline (por defecto, config.pipeline_name)
+            campo: Campo de pares (por defecto, config.pipeline_field)
+            mapping: Añadir el campo como keyword a los índices existentes
+            default_pipeline: Fijar index.default_pipeline en los índices
+                existentes, para que los documentos nuevos pasen por el pipeline
+
+        Returns:
+            dict: nombre, campo, mapping (bool o error) y default_pipeline
+
+        Raises:
+            ValueError: Si el usuario no tiene permisos o el cluster rechaza el pipeline
+        """
+        index = index_pattern or self.config.es_index
+        nombre = nombre or self.config.pipeline_name
+        campo = campo or self.config.pipeline_field
+        try:
+            self.es.ingest.put_pipeline(id=nombre, body=pipeline_ingesta.construir_pipeline(campo))
+        except RequestError as e:
+            raise ValueError(f"❌ El cluster rechazó el pipeline '{nombre}': {e}")
+        except (AuthenticationException, ConnectionError) as e:
+            raise self._error_conexion(e)
+
+        resultado = {'nombre': nombre, 'campo': campo, 'mapping': False, 'default_pipeline': False}
+        if mapping:
+            try:
+                self.es.indices.put_mapping(
+                    index=index, properties=pipeline_ingesta.mapping_campo(campo)
+                )
+                resultado['mapping'] = True
+            except NotFoundError:
+                raise self._error_indice_no_encontrado(index)
+            except RequestError as e:
+                # Un campo ya mapeado con otro tipo no impide usar el pipeline
+                resultado['mapping'] = f"{e}"
+        if default_pipeline:
+            self.es.indices.put_settings(
+                index=index, settings={'index': {'default_pipeline': nombre}}
+            )
+            resultado['default_pipeline'] = True
+        return resultado
+
+    def verify_ingest_pipeline(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str] = None,
+        muestras: int = 20,
+        nombre: Optional[str] = None,
+        campo: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Compara con _simulate el pipeline y el procesador en Python sobre documentos reales
+
+        Args:
+            query_dict: Query de la extracción (de ella salen las muestras)
+            index_pattern: Patrón de índices (override del config)
+            muestras: Documentos a comparar
+            nombre: Id del pipeline (por defecto, config.pipeline_name)
+            campo: Campo de pares (por defecto, config.pipeline_field)
+
+        Returns:
+            dict: documentos, coinciden y diferencias (las 5 primeras)
+        """
+        index = index_pattern or self.config.es_index
+        nombre = nombre or self.config.pipeline_name
+        campo = campo or self.config.pipeline_field
+        try:
+            response = self.es.search(index=index, body={
+                'query': query_dict.get('query', {'match_all': {}}),
+                'size': muestras,
+                '_source': ['message']
+            })
+        except NotFoundError:
+            raise self._error_indice_no_encontrado(index)
+        mensajes = [h['_source'].get('message', '') for h in response['hits']['hits']]
+
+        resultado = {'documentos': len(mensajes), 'coinciden': 0, 'diferencias': []}
+        if not mensajes:
+            return resultado
+        simulacion = self.es.ingest.simulate(
+            id=nombre, docs=[{'_source': {'message': m}} for m in mensajes]
+        )
+        for message, doc in zip(mensajes, simulacion['docs']):
+            if 'error' in doc:
+                diferencia = {'message': message, 'error': doc['error']}
+            else:
+                diferencia = pipeline_ingesta.comparar_documento(
+                    message, doc['doc']['_source'], campo
+                )
+            if diferencia is None:
+                resultado['coinciden'] += 1
+            elif len(resultado['diferencias']) < 5:
+                resultado['diferencias'].append(diferencia)
+        return resultado
+
+    def start_pipeline_backfill(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str] = None,
+        destino: Optional[str] = None,
+        slices: Any = 'auto',
+        requests_per_second: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        nombre: Optional[str] = None,
+        campo: Optional[str] = None
+    ) -> str:
+        """
+        Lanza en segundo plano el relleno de los documentos ya indexados
+
+        Sin destino se reescriben en sitio con _update_by_query; con destino
+        se copian con _reindex (op_type=create, para data streams). Solo se
+        procesan los documentos de la query sin la marca de la versión actual
+        del pipeline (ver pipeline_ingesta.consulta_relleno).
+
+        Args:
+            query_dict: Query de la extracción
+            index_pattern: Patrón de índices de origen (override del config)
+            destino: Índice de destino para _reindex (None = _update_by_query)
+            slices: Subtareas en paralelo ('auto' = una por shard)
+            requests_per_second: Documentos por segundo como máximo
+                (por defecto, config.backfill_rate; -1 = sin límite)
+            batch_size: Documentos por lote (por defecto, scroll_size)
+            nombre: Id del pipeline (por defecto, config.pipeline_name)
+            campo: Campo de pares (por defecto, config.pipeline_field)
+
+        Returns:
+            str: Id de la tarea (para get_task_progress)
+        """
+        index = index_pattern or self.config.es_index
+        nombre = nombre or self.config.pipeline_name
+        query = pipeline_ingesta.consulta_relleno(query_dict, campo or self.config.pipeline_field)
+        comunes = {
+            'slices': slices,
+            'requests_per_second': (
+                self.config.backfill_rate if requests_per_second is None else requests_per_second
+            ),
+            'conflicts': 'proceed',
+            'wait_for_completion': False
+        }
+        lote = batch_size or self.config.scroll_size
+        try:
+            if destino:
+                response = self.es.reindex(
+                    source={'index': index, 'query': query, 'size': lote},
+                    dest={'index': destino, 'pipeline': nombre, 'op_type': 'create'},
+                    **comunes
+                )
+            else:
+                response = self.es.update_by_query(
+                    index=index, query=query, pipeline=nombre, scroll_size=lote, **comunes
+                )
+        except NotFoundError:
+            raise self._error_indice_no_encontrado(index)
+        return response['task']
+
+    def get_task_progress(self, task_id: str) -> Dict[str, Any]:
+        """Progreso de una tarea de relleno (ver pipeline_ingesta.resumir_tarea)"""
+        try:
+            return pipeline_ingesta.resumir_tarea(self.es.tasks.get(task_id=task_id))
+        except NotFoundError:
+            raise ValueError(f"❌ Tarea no encontrada: {task_id}")
+
+    def cancel_task(self, task_id: str) -> None:
+        """Cancela una tarea de relleno (los lotes ya escritos se conservan)"""
+        self.es.tasks.cancel(task_id=task_id)
+
+    def iter_collapsed_messages(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str] = None,
+        campo: Optional[str] = None,
+        page_size: int = TAMANO_PAGINA_COLAPSO,
+        resumen: Optional[Dict[str, int]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Descarga un único representante por cada message distinto
+
+        Agrupa en el servidor con una agregación composite (sobre un campo
+        keyword o un hash SHA-1 de message calculado como runtime field) y
+        trae con top_hits un documento por grupo junto con su número de hits.
+
+        Args:
+            query_dict: Query de Elasticsearch (solo se usa su cláusula 'query')
+            index_pattern: Patrón de índices (override del config)
+            campo: Campo keyword con el mensaje completo (p. ej. 'message.keyword');
+                por defecto se agrupa por el hash del message
+            page_size: Grupos por página
+            resumen: Dict donde acumular 'grupos' descargados y 'documentos'
+                representados (opcional)
+
+        Yields:
+            dict: Documento en el formato del procesador con 'count' = hits del grupo
+
+        Raises:
+            ValueError: Si el índice no existe o el campo no es agregable
+        """
+        index = index_pattern or self.config.es_index
+        if resumen is None:
+            resumen = {}
+        resumen.setdefault('grupos', 0)
+        resumen.setdefault('documentos', 0)
+        body: Dict[str, Any] = {
+            'query': query_dict.get('query', {'match_all': {}}),
+            'size': 0,
+            'track_total_hits': False
+        }
+        if campo is None:
+            campo = CAMPO_HASH_MENSAJE
+            body['runtime_mappings'] = {CAMPO_HASH_MENSAJE: {
+                'type': 'keyword',
+                'script': {'source': SCRIPT_HASH_MENSAJE}
+            }}
+        composite: Dict[str, Any] = {
+            'size': page_size,
+            'sources': [{'mensaje': {'terms': {'field': campo}}}]
+        }
+        body['aggs'] = {'mensajes': {
+            'composite': composite,
+            'aggs': {'representante': {'top_hits': {
+                'size': 1, '_source': ['message', CAMPO_TIMESTAMP]
+            }}}
+        }}
+
+        while True:
+            try:
+                response = self._buscar_sin_hits(index, body)
+            except NotFoundError:
+                raise ValueError(f"❌ Índice no encontrado: {index}")
+            except RequestError as e:
+                raise ValueError(f"❌ No se puede agrupar por '{campo}': {e}")
+
+            agregacion = response['aggregations']['mensajes']
+            for bucket in agregacion['buckets']:
+                documento = self._formatear_documento(
+                    bucket['representante']['hits']['hits'][0]
+                )
+                documento['count'] = bucket['doc_count']
+                resumen['grupos'] += 1
+                resumen['documentos'] += bucket['doc_count']
+                yield documento
+
+            after_key = agregacion.get('after_key')
+            if not agregacion['buckets'] or after_key is None:
+                break
+            composite['after'] = after_key
+
+    def calcular_ventanas(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str] = None,
+        num_ventanas: int = 8
+    ) -> List[List[int]]:
+        """
+        Divide el rango de @timestamp de la query en ventanas de tamaño similar
+        
+        Usa un date_histogram con la propia query para que cada ventana
+        contenga aproximadamente el mismo número de documentos.
+        
+        Args:
+            query_dict: Query de Elasticsearch (con filtro de @timestamp)
+            index_pattern: Patrón de índices (override del config)
+            num_ventanas: Número de ventanas deseado
+            
+        Returns:
+            list: Ventanas [inicio_ms, fin_ms) consecutivas que cubren el rango
+        """
+        index = index_pattern or self.config.es_index
+        query = query_dict.get('query', {'match_all': {}})
+        inicio, fin = extraer_rango_timestamp(query_dict)
+        
+        if inicio is None or fin is None:
+            response = self.es.search(index=index, body={
+                'query': query,
+                'size': 0,
+                'aggs': {
+                    'min_ts': {'min': {'field': CAMPO_TIMESTAMP}},
+                    'max_ts': {'max': {'field': CAMPO_TIMESTAMP}}
+                }
+            })
+            aggs = response['aggregations']
+            if aggs['min_ts']['value'] is None:
+                return []
+            if inicio is None:
+                inicio = int(aggs['min_ts']['value'])
+            if fin is None:
+                fin = int(aggs['max_ts']['value']) + 1
+        
+        if num_ventanas <= 1 or fin - inicio <= num_ventanas:
+            return [[inicio, fin]]
+        
+        intervalo = max(1000, -(-(fin - inicio) // (num_ventanas * BUCKETS_POR_VENTANA)))
+        response = self.es.search(index=index, body={
+            'query': query,
+            'size': 0,
+            'aggs': {
+                'por_tiempo': {
+                    'date_histogram': {
+                        'field': CAMPO_TIMESTAMP,
+                        'fixed_interval': f"{intervalo}ms",
+                        'min_doc_count': 1
+                    }
+                }
+            }
+        })
+        buckets = response['aggregations']['por_tiempo']['buckets']
+        total = sum(b['doc_count'] for b in buckets)
+        if total == 0:
+            return [[inicio, fin]]
+        # Los buckets dan el total de la descarga sin un _count aparte
+        self.estadisticas['total'] = total
+        
+        # Cortar en los límites de bucket cada vez que se alcanza el objetivo
+        objetivo = total / num_ventanas
+        ventanas = []
+        desde = inicio
+        acumulado = 0
+        for bucket in buckets:
+            acumulado += bucket['doc_count']
+            corte = min(int(bucket['key']) + intervalo, fin)
+            if (
+                len(ventanas) < num_ventanas - 1
+                and acumulado >= objetivo * (len(ventanas) + 1)
+                and desde < corte < fin
+            ):
+                ventanas.append([desde, corte])
+                desde = corte
+        ventanas.append([desde, fin])
+        return ventanas
+    
+    def _descargar_ventana(
+        self,
+        particion: str,
+        query_ventana: Dict,
+        index: Optional[str],
+        cursor: Optional[Dict[str, Any]],
+        cola: queue.Queue,
+        cancelado: threading.Event,
+        opciones: Dict[str, Any]
+    ) -> None:
+        """
+        Descarga una ventana completa con reintentos independientes
+        
+        Cada reintento continúa desde el cursor de la última página entregada,
+        de modo que un fallo no repite ni pierde documentos de la ventana.
+        """
+        intentos = 0
+        while not cancelado.is_set():
+            try:
+                for hits, cursor in self.iter_pages(query_ventana, index, cursor, **opciones):
+                    if opciones.get('raw'):
+                        # La página cruda se parsea en este hilo antes de entregarla
+                        hits = list(hits)
+                    if not _poner_en_cola(cola, (particion, hits, cursor), cancelado):
+                        return
+                final = dict(cursor or {}, terminado=True)
+                _poner_en_cola(cola, (particion, [], final), cancelado)
+                return
+            except Exception as e:
+                intentos += 1
+                if intentos > self.config.window_retries:
+                    _poner_en_cola(cola, (particion, e, cursor), cancelado)
+                    return
+                print(
+                    f"⚠️  Ventana {particion}: reintento "
+                    f"{intentos}/{self.config.window_retries} tras error: {e}"
+                )
+                time.sleep(min(2 ** intentos, 30))
+    
+    def iter_window_pages(
+        self,
+        query_dict: Dict,
+        ventanas: List[List[int]],
+        index_pattern: Optional[str] = None,
+        cursores: Optional[Dict[str, Dict[str, Any]]] = None,
+        **opciones
+    ) -> Iterator[Tuple[str, List[Dict], Dict[str, Any]]]:
+        """
+        Descarga en paralelo las ventanas de tiempo y entrega sus páginas
+        
+        Args:
+            query_dict: Query de Elasticsearch
+            ventanas: Ventanas [inicio_ms, fin_ms) (ver calcular_ventanas)
+            index_pattern: Patrón de índices (override del config)
+            cursores: Posición ya procesada de cada ventana (reanudación)
+            **opciones: Opciones de iter_pages (lean, raw, espacio_cache)
+            
+        Yields:
+            tuple: (id de ventana, hits, cursor); una página vacía con
+            cursor['terminado'] indica que la ventana se completó
+            
+        Raises:
+            Exception: Si una ventana agota sus reintentos
+        """
+        cursores = cursores or {}
+        pendientes = [
+            (str(i), ventana) for i, ventana in enumerate(ventanas)
+            if not cursores.get(str(i), {}).get('terminado', False)
+        ]
+        if not pendientes:
+            return
+        
+        workers = max(1, min(self.config.window_workers, len(pendientes)))
+        cola = queue.Queue(maxsize=workers * 2)
+        cancelado = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=workers)
+        
+        for particion, (desde, hasta) in pendientes:
+            query_ventana = agregar_filtro(query_dict, {
+                'range': {CAMPO_TIMESTAMP: {
+                    'gte': desde, 'lt': hasta, 'format': 'epoch_millis'
+                }}
+            })
+            executor.submit(
+                self._descargar_ventana, particion, query_ventana, index_pattern,
+                cursores.get(particion), cola, cancelado, opciones
+            )
+        
+        restantes = len(pendientes)
+        completadas = len(ventanas) - restantes
+        try:
+            while restantes:
+                particion, hits, cursor = cola.get()
+                if isinstance(hits, Exception):
+                    raise Exception(f"La ventana {particion} falló tras reintentos: {hits}")
+                if cursor.get('terminado'):
+                    restantes -= 1
+                    completadas += 1
+                    print(f"  🪟 Ventana {particion} completada ({completadas}/{len(ventanas)})")
+                yield particion, hits, cursor
+        finally:
+            cancelado.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def get_documents_generator(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str] = None,
+        checkpoint=None,
+        windows: int = 0,
+        lean: bool = False,
+        raw: bool = False,
+        marca_agua=None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Obtiene generador de documentos para procesamiento directo
+        
+        Args:
+            query_dict: Query de Elasticsearch
+            index_pattern: Patrón de índices
+            checkpoint: Checkpoint donde registrar el avance (opcional);
+                activa la paginación reanudable con PIT + search_after
+            windows: Número de ventanas de tiempo a descargar en paralelo
+                (0 = descarga secuencial)
+            lean: Transporte reducido (filter_path, _source mínimo y
+                @timestamp por docvalue_fields)
+            raw: Parsear las páginas en bytes de forma incremental
+                (usa PIT + search_after)
+            marca_agua: MarcaAgua a actualizar con el mayor @timestamp
+                procesado (opcional; usa PIT + search_after)
+            
+        Yields:
+            dict: Documento con estructura compatible con procesador
+        """
+        self.start_load_monitor()
+        try:
+            yield from self._medir_primer_documento(self._iter_documentos(
+                query_dict, index_pattern, checkpoint, windows, lean, raw, marca_agua
+            ))
+        finally:
+            self.stop_load_monitor()
+            self.cobertura.cerrar()
+            if self.cache_paginas is not None and not self.config.replay:
+                podadas = self.cache_paginas.podar()
+                if podadas['paginas']:
+                    print(
+                        f"🧹 Caché de páginas: {podadas['paginas']:,} páginas antiguas borradas "
+                        f"({podadas['bytes'] / 1024 / 1024:.1f} MB)"
+                    )
+    
+    def start_load_monitor(self) -> None:
+        """
+        Arranca el monitor de carga si la política lo activa (config.load_monitor)
+        
+        Frena o pausa las descargas mientras el cluster está ocupado: las
+        búsquedas del limitador (PIT + search_after, ventanas) y cada página
+        del scroll (search_logs, download_to_csv).
+        """
+        if not self.config.load_monitor or self.config.replay or self.monitor is not None:
+            return
+        self.monitor = MonitorCarga(self.es, self.limitador, self.config)
+        self.monitor.iniciar()
+    
+    def _esperar_monitor(self) -> None:
+        """Aplica la pausa o el frenado del monitor de carga antes de una página de scroll"""
+        monitor = self.monitor
+        if monitor is not None:
+            monitor.esperar_turno()
+    
+    def stop_load_monitor(self) -> None:
+        """Detiene el monitor de carga y guarda sus decisiones en las estadísticas"""
+        if self.monitor is None:
+            return
+        self.monitor.detener()
+        self.estadisticas['monitor_carga'] = self.monitor.resumen()
+        self.monitor = None
+    
+    def _iter_documentos(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str],
+        checkpoint,
+        windows: int,
+        lean: bool,
+        raw: bool,
+        marca_agua
+    ) -> Iterator[Dict[str, Any]]:
+        """Documentos de get_documents_generator según el modo de descarga"""
+        usar_cache = self.cache_paginas is not None
+        if checkpoint is None and marca_agua is None and not windows and not raw and not usar_cache:
+            for doc in self.search_logs(query_dict, index_pattern, lean=lean):
+                # Retornar en formato compatible con el procesador CSV
+                yield self._formatear_documento(doc)
+            return
+        
+        # Las páginas se guardan con el índice pedido (la poda no cambia los resultados)
+        espacio_cache = None
+        grabada = None
+        if usar_cache:
+            query_dict, espacio_cache, grabada = self._preparar_cache_paginas(
+                query_dict, index_pattern
+            )
+        
+        if not self.config.fast_start and not self.config.replay:
+            index_pattern = self.prune_indices(query_dict, index_pattern)
+            if index_pattern is None:
+                return
+        
+        cursores = checkpoint.cursores if checkpoint else {}
+        ventanas = checkpoint.extra.get('ventanas') if checkpoint else None
+        
+        if grabada is not None:
+            # Al repetir manda el modo con el que se grabó la extracción
+            ventanas = grabada.get('ventanas')
+        elif ventanas is None and windows and not cursores:
+            # Al reanudar manda el modo con el que se creó el checkpoint
+            print(f"🪟 Calculando {windows} ventanas de tiempo...")
+            ventanas = self.calcular_ventanas(query_dict, index_pattern, windows)
+            if checkpoint:
+                checkpoint.extra['ventanas'] = ventanas
+        
+        if espacio_cache is not None and not self.config.replay:
+            self.cache_paginas.registrar_consulta(espacio_cache, {
+                'query': query_dict, 'ventanas': ventanas
+            })
+        
+        if ventanas is not None:
+            if self.estadisticas['total'] is None and not cursores and not self.config.replay:
+                self.start_total_count(query_dict, index_pattern)
+            paginas = self.iter_window_pages(
+                query_dict, ventanas, index_pattern, cursores,
+                lean=lean, raw=raw, espacio_cache=espacio_cache
+            )
+        else:
+            paginas = self._iter_particion_unica(
+                query_dict, index_pattern, cursores,
+                lean=lean, raw=raw, espacio_cache=espacio_cache
+            )
+        
+        for particion, hits, cursor in paginas:
+            for doc in hits:
+                yield self._formatear_documento(doc)
+            # Al pedir la siguiente página el consumidor ya procesó esta
+            if marca_agua:
+                marca_agua.observar(cursor)
+            if checkpoint:
+                checkpoint.actualizar_cursor(particion, cursor)
+                checkpoint.guardar_si_toca()
+        
+        if checkpoint:
+            checkpoint.guardar()
+    
+    def _preparar_cache_paginas(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str]
+    ) -> Tuple[Dict, str, Optional[Dict[str, Any]]]:
+        """
+        Query con el rango de tiempo absoluto y clave de la extracción en la caché
+        
+        Al grabar se congelan las fechas relativas ("now-7d"): las páginas
+        quedan asociadas a un rango fijo. Al repetir (--replay) se usa la query
+        congelada de la última grabación de la misma query original e índice.
+        
+        Returns:
+            tuple: (query a descargar, clave de la extracción, datos de la
+            grabación si es --replay)
+            
+        Raises:
+            ValueError: Si en --replay no hay ninguna grabación
+        """
+        index = index_pattern or self.config.es_index
+        clave = CachePaginas.clave_consulta(self.config.es_host, query_dict, index)
+        if not self.config.replay:
+            return resolver_fechas_relativas(query_dict), clave, None
+        
+        grabada = self.cache_paginas.consulta(clave)
+        if grabada is None:
+            raise ValueError(
+                f"❌ No hay ninguna extracción grabada para esta query sobre {index}\n"
+                f"Graba una primero con la misma orden y --page-cache"
+            )
+        print(f"📼 Repitiendo desde la caché la extracción grabada sobre {index}")
+        return grabada['query'], clave, grabada
+    
+    def _iter_particion_unica(
+        self,
+        query_dict: Dict,
+        index_pattern: Optional[str],
+        cursores: Dict[str, Dict[str, Any]],
+        **opciones
+    ) -> Iterator[Tuple[str, Iterable[Dict], Dict[str, Any]]]:
+        """Páginas de una descarga secuencial, con el mismo formato que las ventanas"""
+        particion = 'total'
+        cursor = cursores.get(particion)
+        if cursor and cursor.get('terminado'):
+            return
+        
+        for hits, cursor in self.iter_pages(
+            query_dict, index_pattern, cursor, contar_total=True, **opciones
+        ):
+            yield particion, hits, cursor
+        yield particion, [], dict(cursor or {}, terminado=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Estimación previa del coste de una extracción (--estimate)
+Con el total del _count y una página de muestra (bytes por documento,
+latencia, expansión al decodificar y coste de procesar cada message) predice
+bytes, duración y memoria pico de cada modo de descarga antes de empezar
+"""
+
+import gzip
+import json
+import math
+import os
+import re
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from data_processor import procesar_mensaje
+
+MB = 1024 * 1024
+
+# Fracción del límite de memoria y del keep-alive a partir de la cual se avisa
+UMBRAL_MEMORIA = 0.8
+UMBRAL_KEEP_ALIVE = 0.5
+
+# Memoria del proceso sin contar las páginas (intérprete, cliente, librerías)
+MEMORIA_BASE = 80 * MB
+
+# Ventanas máximas que se recomiendan aunque la red siga siendo el cuello de botella
+MAX_VENTANAS_RECOMENDADAS = 16
+
+_UNIDADES = {'d': 86400, 'h': 3600, 'm': 60, 's': 1, 'ms': 0.001, 'micros': 1e-6, 'nanos': 1e-9}
+
+
+def duracion_segundos(texto: str) -> float:
+    """
+    Convierte una duración de Elasticsearch ('5m', '90s', '1h') a segundos
+
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*(d|h|m|s|ms|micros|nanos)\s*', str(texto))
+    if not match:
+        raise ValueError(f"❌ Duración no válida: {texto}")
+    return float(match.group(1)) * _UNIDADES[match.group(2)]
+
+
+def limite_memoria() -> Optional[int]:
+    """
+    Memoria disponible para el proceso: límite del cgroup (contenedores) o
+    memoria física, la menor de las dos
+
+    Returns:
+        int: Bytes, o None si no se puede averiguar (p. ej. en Windows)
+    """
+    limites = []
+    for ruta in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                valor = f.read().strip()
+        except OSError:
+            continue
+        # 'max' (v2) o un número enorme (v1) indican que no hay límite
+        if valor.isdigit() and int(valor) < 2 ** 60:
+            limites.append(int(valor))
+    try:
+        limites.append(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES'))
+    except (AttributeError, ValueError, OSError):
+        pass
+    return min(limites) if limites else None
+
+
+def medir_muestra(datos: bytes, segundos: float) -> Dict[str, Any]:
+    """
+    Mide una página de muestra en bytes, tal como llega del cluster
+
+    Args:
+        datos: Cuerpo JSON de la respuesta de _search
+        segundos: Latencia de la petición
+
+    Returns:
+        dict: docs, bytes_doc, bytes_doc_lean (solo _id, message y
+        @timestamp, como en --lean), ratio_gzip, expansion (memoria de los
+        objetos decodificados / bytes), proceso_doc (segundos de decodificar
+        y procesar un documento), bytes_csv_doc y segundos
+    """
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        respuesta = json.loads(datos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    decodificar = time.perf_counter() - inicio
+
+    hits = respuesta.get('hits', {}).get('hits', [])
+    docs = len(hits)
+    inicio = time.perf_counter()
+    for hit in hits:
+        procesar_mensaje((hit.get('_source') or {}).get('message', ''))
+    procesar = time.perf_counter() - inicio
+
+    lean = b''.join(
+        json.dumps({
+            '_id': hit.get('_id'),
+            '_source': {'message': (hit.get('_source') or {}).get('message')},
+            'fields': {'@timestamp': [(hit.get('_source') or {}).get('@timestamp')]}
+        }, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        for hit in hits
+    )
+    csv = sum(
+        len(str((hit.get('_source') or {}).get('message', '')).encode('utf-8')) + 32
+        for hit in hits
+    )
+    return {
+        'docs': docs,
+        'bytes_doc': len(datos) / docs if docs else 0.0,
+        'bytes_doc_lean': len(lean) / docs if docs else 0.0,
+        'ratio_gzip': len(gzip.compress(datos, compresslevel=6)) / len(datos) if datos else 1.0,
+        'expansion': pico / len(datos) if datos else 0.0,
+        'proceso_doc': (decodificar + procesar) / docs if docs else 0.0,
+        'bytes_csv_doc': csv / docs if docs else 0.0,
+        'segundos': segundos
+    }
+
+
+def tamano_pagina_estimado(config, bytes_doc: float, t_fijo: float, t_doc: float) -> int:
+    """
+    Tamaño al que converge el tamaño de página adaptativo
+
+    El mayor tamaño que no supera ELASTICSEARCH_SCROLL_SIZE_MAX, ni
+    ELASTICSEARCH_PAGE_MAX_MB, ni la latencia objetivo por página.
+    """
+    if not config.adaptive_page_size:
+        return config.scroll_size
+    tamano = config.scroll_size_max
+    if bytes_doc:
+        tamano = min(tamano, int(config.page_max_mb * MB / bytes_doc))
+    if t_doc:
+        tamano = min(tamano, int(max(0.0, config.page_target_seconds - t_fijo) / t_doc))
+    return max(config.scroll_size_min, tamano)
+
+
+def estimar(
+    total: int,
+    muestra: Dict[str, Any],
+    config,
+    windows: int = 0,
+    limite: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Predice el coste de cada modo de descarga
+
+    La latencia de una página se modela como un coste fijo por petición (la
+    del _count, que apenas devuelve bytes) más un coste por documento
+    proporcional a sus bytes, medido con la página de muestra.
+
+    Args:
+        total: Documentos que coinciden con la query
+        muestra: Medidas de medir_muestra, con latencia_conteo
+        config: Configuración (tamaños de página, keep-alive, compresión)
+        windows: Ventanas de --windows (0 = ELASTICSEARCH_WINDOW_WORKERS)
+        limite: Memoria disponible en bytes (None = sin comprobar)
+
+    Returns:
+        dict: total, muestra, limite_memoria, keep_alive, modos (nombre,
+        tamano, paginas, bytes, bytes_red, segundos, memoria, avisos),
+        bytes_csv, ventanas_recomendadas y avisos generales
+    """
+    t_fijo = min(muestra.get('latencia_conteo', 0.0), muestra['segundos'])
+    t_doc = (muestra['segundos'] - t_fijo) / muestra['docs'] if muestra['docs'] else 0.0
+    keep_alive = duracion_segundos(config.scroll_timeout)
+    ventanas = windows or config.window_workers
+    ratio_red = muestra['ratio_gzip'] if config.http_compress else 1.0
+    adaptativo = tamano_pagina_estimado(config, muestra['bytes_doc'], t_fijo, t_doc)
+
+    # (nombre, tamaño, bytes por doc, descargas en paralelo, páginas en memoria, decodifica)
+    definiciones = [
+        ('scroll', config.scroll_size, muestra['bytes_doc'], 1, 1, True),
+        ('scroll --lean', config.scroll_size, muestra['bytes_doc_lean'], 1, 1, True),
+        ('search_after (PIT)', adaptativo, muestra['bytes_doc'], 1, 1, True),
+        (f'--windows {ventanas}', adaptativo, muestra['bytes_doc'], ventanas, 3 * ventanas + 1, True),
+        ('--incremental-parse', adaptativo, muestra['bytes_doc'], 1, 1, False)
+    ]
+
+    modos = []
+    for nombre, tamano, bytes_doc, paralelo, en_memoria, decodifica in definiciones:
+        escala = bytes_doc / muestra['bytes_doc'] if muestra['bytes_doc'] else 1.0
+        paginas = math.ceil(total / tamano) if total else 0
+        t_pagina = t_fijo + t_doc * escala * tamano
+        # --lean reduce los bytes en red, pero el message se procesa igual
+        t_proceso = muestra['proceso_doc'] * tamano
+        if paralelo > 1:
+            # Las ventanas descargan mientras se procesa: manda el más lento de los dos
+            segundos = max(paginas * t_pagina / paralelo, paginas * t_proceso)
+        else:
+            segundos = paginas * (t_pagina + t_proceso)
+        bytes_pagina = bytes_doc * tamano
+        # Una página decodificada ocupa sus bytes más los objetos de Python
+        por_pagina = bytes_pagina * (1 + muestra['expansion']) if decodifica else bytes_pagina
+        memoria = MEMORIA_BASE + en_memoria * por_pagina
+
+        avisos = []
+        if limite and memoria > UMBRAL_MEMORIA * limite:
+            avisos.append(
+                f"memoria pico ~{memoria / MB:,.0f} MB: más del {UMBRAL_MEMORIA:.0%} "
+                f"del límite ({limite / MB:,.0f} MB)"
+            )
+        # Con ventanas, cada una espera a que el procesamiento vacíe la cola
+        ciclo = t_pagina + t_proceso * (en_memoria if paralelo > 1 else 1)
+        if ciclo > UMBRAL_KEEP_ALIVE * keep_alive:
+            avisos.append(
+                f"~{ciclo:,.0f} s entre páginas: el scroll/PIT puede caducar "
+                f"(keep-alive {config.scroll_timeout}, ELASTICSEARCH_SCROLL_TIMEOUT)"
+            )
+        if bytes_pagina > config.page_max_mb * MB:
+            avisos.append(
+                f"páginas de {bytes_pagina / MB:,.0f} MB: reduce ELASTICSEARCH_SCROLL_SIZE o usa --lean"
+            )
+        modos.append({
+            'nombre': nombre,
+            'tamano': tamano,
+            'paginas': paginas,
+            'bytes': total * bytes_doc,
+            'bytes_red': total * bytes_doc * ratio_red,
+            'segundos': segundos,
+            'memoria': memoria,
+            'avisos': avisos
+        })
+
+    # Ventanas a partir de las cuales el procesamiento local es el cuello de botella
+    t_pagina = t_fijo + t_doc * adaptativo
+    t_proceso = muestra['proceso_doc'] * adaptativo
+    recomendadas = (
+        min(MAX_VENTANAS_RECOMENDADAS, max(1, math.ceil(t_pagina / t_proceso)))
+        if t_proceso else MAX_VENTANAS_RECOMENDADAS
+    )
+    avisos_generales: List[str] = []
+    if total and not muestra['docs']:
+        avisos_generales.append("la página de muestra llegó vacía: las estimaciones no son fiables")
+    if all(modo['avisos'] for modo in modos):
+        avisos_generales.append("ningún modo queda dentro de los límites: divide el rango de la query")
+
+    return {
+        'total': total,
+        'muestra': muestra,
+        'limite_memoria': limite,
+        'keep_alive': keep_alive,
+        'modos': modos,
+        'bytes_csv': total * muestra['bytes_csv_doc'],
+        'ventanas_recomendadas': recomendadas,
+        'avisos': avisos_generales
+    }
@@ -12,6 +12,7 @@ from typing import Dict
 
 # Importar funciones desde el módulo refactorizado
 from data_processor import procesar_mensaje
+from salida_csv import abrir_csv_texto
 
 # ===========================================
 # CONFIGURACIÓN - Modifica estas rutas según necesites
@@ -45,7 +46,8 @@ def procesar_csv(input_path: str, output_path: str) -> Dict[str, int]:
     
     # Crear generador de registros desde CSV
     def csv_generator():
-        with open(input_file, 'r', encoding='utf-8-sig') as csvfile:
+        # .csv.gz y .csv.zst se descomprimen sobre la marcha
+        with abrir_csv_texto(input_file) as csvfile:
             reader = csv.DictReader(csvfile)
             for row in reader:
                 yield row
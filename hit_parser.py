@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Parser incremental de páginas de búsqueda en bytes crudos
+Recorre hits.hits[] de una respuesta de Elasticsearch sin construir el árbol
+completo de diccionarios: solo se materializan _id, sort, message y @timestamp
+de cada hit, uno a uno, y el resto de valores se salta a nivel de bytes
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover - depende del entorno
+    _loads = json.loads
+
+# Campos del hit que necesita el procesador
+CAMPOS_SOURCE = ('message', '@timestamp')
+CAMPOS_FIELDS = ('@timestamp',)
+
+# Claves de primer nivel pequeñas que interesa conservar (PIT, scroll, shards)
+CLAVES_META = ('pit_id', '_scroll_id', '_shards', 'took', 'timed_out')
+
+_ESPACIOS = re.compile(rb'[ \t\n\r]*')
+_CADENA = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_ESCALAR = re.compile(rb'[^,}\]\s]+')
+_ESTRUCTURA = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]', re.S)
+
+
+class _LectorJson:
+    """Cursor sobre un documento JSON en bytes que permite leer o saltar valores"""
+    
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self.pos = 0
+    
+    def _siguiente(self) -> bytes:
+        """Salta espacios y devuelve el siguiente byte sin consumirlo"""
+        self.pos = _ESPACIOS.match(self.raw, self.pos).end()
+        return self.raw[self.pos:self.pos + 1]
+    
+    def _error(self, esperado: str) -> ValueError:
+        return ValueError(f"JSON inválido en la posición {self.pos}: se esperaba {esperado}")
+    
+    def claves(self) -> Iterator[str]:
+        """
+        Itera las claves de un objeto
+        
+        Tras cada clave el llamador debe consumir su valor con leer() o saltar().
+        """
+        if self._siguiente() != b'{':
+            raise self._error("'{'")
+        self.pos += 1
+        if self._siguiente() == b'}':
+            self.pos += 1
+            return
+        
+        while True:
+            self._siguiente()
+            match = _CADENA.match(self.raw, self.pos)
+            if not match:
+                raise self._error('una clave')
+            token = match.group(0)
+            clave = token[1:-1].decode('utf-8') if b'\\' not in token else json.loads(token)
+            self.pos = match.end()
+            if self._siguiente() != b':':
+                raise self._error("':'")
+            self.pos += 1
+            
+            yield clave
+            
+            separador = self._siguiente()
+            self.pos += 1
+            if separador == b'}':
+                return
+            if separador != b',':
+                raise self._error("',' o '}'")
+    
+    def elementos(self) -> Iterator[None]:
+        """
+        Itera los elementos de un array
+        
+        En cada paso el llamador debe consumir el elemento con leer() o saltar().
+        """
+        if self._siguiente() != b'[':
+            raise self._error("'['")
+        self.pos += 1
+        if self._siguiente() == b']':
+            self.pos += 1
+            return
+        
+        while True:
+            yield None
+            separador = self._siguiente()
+            self.pos += 1
+            if separador == b']':
+                return
+            if separador != b',':
+                raise self._error("',' o ']'")
+    
+    def saltar(self) -> None:
+        """Avanza sobre el valor actual sin decodificarlo"""
+        inicial = self._siguiente()
+        if inicial == b'"':
+            match = _CADENA.match(self.raw, self.pos)
+            if not match:
+                raise self._error('una cadena')
+            self.pos = match.end()
+        elif inicial in (b'{', b'['):
+            profundidad = 0
+            for match in _ESTRUCTURA.finditer(self.raw, self.pos):
+                token = match.group(0)
+                if token in (b'{', b'['):
+                    profundidad += 1
+                elif token in (b'}', b']'):
+                    profundidad -= 1
+                    if profundidad == 0:
+                        self.pos = match.end()
+                        return
+            raise self._error('el cierre del valor')
+        else:
+            match = _ESCALAR.match(self.raw, self.pos)
+            if not match:
+                raise self._error('un valor')
+            self.pos = match.end()
+    
+    def leer(self) -> Any:
+        """Decodifica el valor actual"""
+        inicio = self.pos = _ESPACIOS.match(self.raw, self.pos).end()
+        self.saltar()
+        return _loads(self.raw[inicio:self.pos])
+
+
+def _leer_hit(lector: _LectorJson) -> Dict[str, Any]:
+    """Lee un hit materializando solo _id, sort, message y @timestamp"""
+    hit: Dict[str, Any] = {}
+    for clave in lector.claves():
+        if clave == '_id' or clave == 'sort':
+            hit[clave] = lector.leer()
+        elif clave == '_source':
+            source = {}
+            for campo in lector.claves():
+                if campo in CAMPOS_SOURCE:
+                    source[campo] = lector.leer()
+                else:
+                    lector.saltar()
+            hit['_source'] = source
+        elif clave == 'fields':
+            fields = {}
+            for campo in lector.claves():
+                if campo in CAMPOS_FIELDS:
+                    fields[campo] = lector.leer()
+                else:
+                    lector.saltar()
+            hit['fields'] = fields
+        else:
+            lector.saltar()
+    return hit
+
+
+def iterar_hits_crudos(
+    raw: bytes,
+    meta: Optional[Dict[str, Any]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Itera los hits de una respuesta de búsqueda en bytes, uno a uno
+    
+    Args:
+        raw: Cuerpo de la respuesta sin decodificar
+        meta: Diccionario donde guardar pit_id, _scroll_id, _shards, hits.total
+            (como 'total'), etc.; se rellena a medida que el parser los encuentra
+        
+    Yields:
+        dict: Hit reducido con _id, sort, _source (message, @timestamp) y fields
+        
+    Raises:
+        ValueError: Si el JSON está mal formado
+    """
+    if meta is None:
+        meta = {}
+    lector = _LectorJson(raw)
+    
+    for clave in lector.claves():
+        if clave == 'hits':
+            for clave_hits in lector.claves():
+                if clave_hits == 'hits':
+                    for _ in lector.elementos():
+                        yield _leer_hit(lector)
+                elif clave_hits == 'total':
+                    # Llega antes que hits.hits: disponible desde el primer hit
+                    meta['total'] = lector.leer()
+                else:
+                    lector.saltar()
+        elif clave in CLAVES_META:
+            meta[clave] = lector.leer()
+        else:
+            lector.saltar()
@@ -62,6 +62,9 @@ def comando_elasticsearch(args):
         config = load_config()
         print(f"✓ Configuración cargada: {config.es_host}")
         
+        if not args.output_json and (not args.estimate or args.delta):
+            raise ValueError("❌ --output-json es obligatorio (salvo con --estimate)")
+        
         # Cargar query
         query_dict = cargar_query(args.query_file)
         
@@ -72,28 +75,119 @@ def comando_elasticsearch(args):
             print()
         
         # Conectar a Elasticsearch
+        if args.fast_start:
+            config.fast_start = True
+        if args.load_monitor:
+            config.load_monitor = True
+        if args.hedge:
+            config.hedge_requests = True
+        if args.async_search:
+            config.async_search = True
+        if args.page_cache:
+            config.page_cache = True
+        if args.replay:
+            config.replay = True
+        if (args.page_cache or args.replay) and (
+            args.output_csv or args.aggregate_fields or args.from_pipeline or args.collapse
+        ):
+            raise ValueError(
+                "❌ --page-cache y --replay solo se admiten en el procesamiento directo "
+                "(sin --output-csv, --aggregate-fields, --from-pipeline ni --collapse)"
+            )
+        if config.replay and args.estimate:
+            raise ValueError("❌ --estimate necesita el cluster: no se combina con --replay")
+        if config.replay and (args.delta or args.checkpoint or args.resume):
+            raise ValueError("❌ --replay no se combina con --delta ni --checkpoint/--resume")
         print("🔌 Conectando a Elasticsearch...")
         client = ElasticsearchClient(config)
+        if args.refresh_metadata:
+            client.invalidate_metadata()
         
-        # Test de conexión
-        info = client.test_connection()
-        print(f"✅ Conectado a: {info['cluster_name']} (v{info['version']})")
+        # Test de conexión (en inicio rápido lo hace la primera búsqueda)
+        if config.replay:
+            print("📼 Modo --replay: los documentos se leen de la caché de páginas, sin cluster")
+        elif config.fast_start:
+            print("⚡ Inicio rápido: la primera búsqueda valida la conexión y las credenciales")
+        else:
+            info = client.test_connection()
+            print(f"✅ Conectado a: {info['cluster_name']} (v{info['version']})")
         
         # Obtener estimación de documentos
         index = args.index or config.es_index
         print(f"📊 Índice: {index}")
         
-        total_est = client.get_total_estimate(query_dict, index)
-        if total_est > 0:
-            print(f"📊 Documentos estimados: {total_est:,}")
+        if args.collapse and (
+            args.output_csv or args.aggregate_fields or args.from_pipeline or args.delta
+            or args.windows or args.checkpoint or args.resume or args.incremental_parse
+        ):
+            raise ValueError(
+                "❌ --collapse no se combina con --output-csv, --aggregate-fields, --from-pipeline, "
+                "--delta, --windows, --checkpoint/--resume ni --incremental-parse"
+            )
+        
+        if args.from_pipeline and (args.aggregate_fields or args.output_csv):
+            raise ValueError("❌ --from-pipeline no se combina con --aggregate-fields ni --output-csv")
+        
+        if args.sql_export and not args.output_csv:
+            raise ValueError("❌ --sql-export requiere --output-csv")
+        
+        if config.load_monitor and (
+            args.aggregate_fields or args.from_pipeline or args.collapse or args.sql_export
+        ):
+            # Solo se frenan las páginas de documentos (scroll, PIT + search_after, ventanas)
+            print(
+                "⚠️  --load-monitor no tiene efecto con --aggregate-fields, --from-pipeline, "
+                "--collapse ni --sql-export: esas descargas no se frenan"
+            )
+        
+        # Ejecución incremental: solo documentos posteriores a la marca de agua
+        marca_agua = None
+        if args.delta:
+            if args.aggregate_fields or args.from_pipeline or args.output_csv:
+                raise ValueError(
+                    "❌ --delta solo se admite en el procesamiento directo "
+                    "(sin --output-csv, --aggregate-fields ni --from-pipeline)"
+                )
+            marca_agua = preparar_marca_agua(args, query_dict, index)
+            query_dict = marca_agua.aplicar(query_dict)
+        
+        if args.optimize_query:
+            query_dict, cambios = client.optimize_query(query_dict, index)
+            print(f"🛠️  Query optimizada ({len(cambios)} cambio(s))")
+            for cambio in cambios:
+                print(f"   - {cambio}")
         
         print()
         
-        # Decisión: CSV intermedio o directo a JSON
-        if args.output_csv:
+        if args.estimate:
+            print("🔮 Estimando el coste con el _count y una página de muestra...")
+            mostrar_estimacion(client.estimate_extraction(query_dict, index, windows=args.windows))
+            return
+        
+        # Decisión: agregación en servidor, CSV intermedio o directo a JSON
+        if args.aggregate_fields:
+            # Opción 0: Valores distintos de campos indexados (sin descargar documentos)
+            from data_processor import procesar_valores_agregados
+            campos = parsear_campos_agregados(args.aggregate_fields)
+            print(f"🧮 Agregando en el servidor: {', '.join(campos.values())}")
+            valores = client.iter_composite_values(query_dict, campos, index)
+            stats = procesar_valores_agregados(valores, args.output_json)
+            
+        elif args.from_pipeline:
+            # Opción 0b: Pares ya extraídos al indexar por el pipeline de ingesta
+            from data_processor import procesar_valores_agregados
+            print(f"🧮 Agregando los pares del pipeline de ingesta: {config.pipeline_field}")
+            valores = client.iter_pipeline_values(query_dict, index)
+            stats = procesar_valores_agregados(valores, args.output_json)
+            
+        elif args.output_csv:
             # Opción A: Descargar a CSV, luego procesar
             print(f"📥 Descargando a CSV intermedio: {args.output_csv}")
-            count = client.download_to_csv(query_dict, args.output_csv, index_pattern=index)
+            if args.sql_export:
+                # CSV generado en el servidor, escrito tal cual llega
+                count = client.download_to_csv_sql(query_dict, args.output_csv, index_pattern=index)
+            else:
+                count = client.download_to_csv(query_dict, args.output_csv, index_pattern=index)
             
             if count == 0:
                 print("⚠️  No se encontraron documentos que coincidan con la query")
@@ -106,17 +200,110 @@ def comando_elasticsearch(args):
             
         else:
             # Opción B: Procesamiento directo sin CSV intermedio
-            print("📥 Descargando y procesando directamente a JSON...")
-            docs_generator = client.get_documents_generator(query_dict, index)
-            stats = procesar_registros_iterable(docs_generator, args.output_json, show_progress=True)
+            checkpoint = None
+            if args.checkpoint or args.resume:
+                checkpoint = preparar_checkpoint(args, query_dict, index, config)
+                query_dict = checkpoint.query
+            
+            lean = args.lean or config.lean_fetch
+            if lean and args.verbose:
+                medicion = client.measure_response_bytes(query_dict, index)
+                print(
+                    f"📦 Bytes por documento: {medicion['bytes_por_doc_normal']:,.0f} → "
+                    f"{medicion['bytes_por_doc_lean']:,.0f} en modo lean "
+                    f"(ahorro {medicion['ahorro_pct']:.0f}%)"
+                )
+            
+            estado = checkpoint.estado if checkpoint else {}
+            if marca_agua:
+                # Los valores nuevos se fusionan con la salida anterior
+                from data_processor import cargar_valores_unicos
+                estado.setdefault('valores_unicos', set()).update(
+                    cargar_valores_unicos(args.output_json)
+                )
+            
+            resumen_colapso = {}
+            if args.collapse:
+                # Un representante por message distinto, con su número de hits
+                print("📥 Descargando mensajes distintos (colapso en el servidor)...")
+                docs_generator = client.iter_collapsed_messages(
+                    query_dict, index, campo=args.collapse_field, resumen=resumen_colapso
+                )
+            else:
+                print("📥 Descargando y procesando directamente a JSON...")
+                docs_generator = client.get_documents_generator(
+                    query_dict, index, checkpoint=checkpoint, windows=args.windows, lean=lean,
+                    raw=args.incremental_parse, marca_agua=marca_agua
+                )
+            stats = procesar_registros_iterable(
+                docs_generator,
+                args.output_json,
+                show_progress=True,
+                estado=estado,
+                obtener_total=client.get_known_total
+            )
+            
+            if resumen_colapso:
+                print(
+                    f"📉 Descargados {resumen_colapso['grupos']:,} mensajes distintos en lugar de "
+                    f"{resumen_colapso['documentos']:,} documentos"
+                )
+            
+            # Extracción completa: el checkpoint ya no es necesario
+            if checkpoint:
+                checkpoint.eliminar()
+            
+            # La marca solo avanza cuando la salida fusionada ya está escrita
+            if marca_agua and marca_agua.ultimo_ts is not None:
+                marca_agua.guardar()
+                print(f"💧 Marca de agua actualizada: {marca_agua.path}")
+        
+        if client.estadisticas['primer_documento'] is not None:
+            print(f"⏱️  Primer documento a los {client.estadisticas['primer_documento']:.2f} s")
+        cache = client.estadisticas.get('cache_paginas')
+        if cache:
+            print(
+                f"💾 Caché de páginas: {cache['aciertos']:,} páginas leídas de disco, "
+                f"{cache['fallos']:,} descargadas ({cache['bytes_escritos'] / 1024 / 1024:.1f} MB "
+                f"comprimidos escritos)"
+            )
+        tamanos = client.estadisticas.get('tamano_pagina')
+        if tamanos and config.adaptive_page_size:
+            print(
+                f"📐 Tamaño de página: {tamanos['inicial']:,} → {tamanos['final']:,} "
+                f"(usados {tamanos['minimo_usado']:,}-{tamanos['maximo_usado']:,}, "
+                f"{tamanos['aumentos']} aumentos, {tamanos['reducciones']} reducciones)"
+            )
+        concurrencia = client.estadisticas.get('concurrencia')
+        if concurrencia and (concurrencia['rechazos'] or concurrencia['pausas']):
+            print(
+                f"🚦 Concurrencia: hasta {concurrencia['limite_maximo']} búsquedas simultáneas, "
+                f"{concurrencia['rechazos']} rechazos, {concurrencia['reintentos']} reintentos, "
+                f"{concurrencia['pausas']} pausas"
+            )
+        cobertura = client.estadisticas.get('cobertura')
+        if cobertura:
+            print(
+                f"🪞 Cobertura: {cobertura['duplicadas']} de {cobertura['peticiones']:,} páginas "
+                f"duplicadas ({cobertura['tasa']:.1%}), {cobertura['ganadas_por_duplicado']} "
+                f"resueltas por el duplicado"
+            )
+        carga = client.estadisticas.get('monitor_carga')
+        if carga:
+            muestras = carga['muestras']
+            print(
+                f"📡 Monitor de carga: {muestras['normal']} muestras normales, "
+                f"{muestras['frenar']} frenando, {muestras['pausar']} en pausa"
+            )
         
         # Resumen final
         print()
         print("=" * 60)
         print("  ✅ PROCESO COMPLETADO EXITOSAMENTE")
         print("=" * 60)
-        print(f"  📋 Registros procesados: {stats['registros_procesados']:,}")
-        print(f"  📊 Registros con valores: {stats.get('registros_con_valores', 'N/A'):,}")
+        if not (args.aggregate_fields or args.from_pipeline):
+            print(f"  📋 Registros procesados: {stats['registros_procesados']:,}")
+            print(f"  📊 Registros con valores: {stats.get('registros_con_valores', 'N/A'):,}")
         print(f"  📊 Valores únicos extraídos: {stats['valores_unicos']}")
         print(f"  📁 Archivo de salida JSON: {args.output_json}")
         if args.output_csv:
@@ -133,6 +320,52 @@ def comando_elasticsearch(args):
         sys.exit(1)
 
 
+def mostrar_estimacion(estimacion: Dict[str, Any]) -> None:
+    """Imprime la predicción de --estimate como tabla, con sus avisos"""
+    from estimador import MAX_VENTANAS_RECOMENDADAS
+    from progreso import formatear_duracion
+    
+    mb = 1024 * 1024
+    muestra = estimacion['muestra']
+    print(f"  📊 Documentos: {estimacion['total']:,}")
+    print(
+        f"  📦 Muestra de {muestra['docs']:,} docs en {muestra['segundos'] * 1000:,.0f} ms "
+        f"(_count {muestra['latencia_conteo'] * 1000:,.0f} ms): "
+        f"{muestra['bytes_doc']:,.0f} B/doc ({muestra['bytes_doc_lean']:,.0f} en lean), "
+        f"gzip {muestra['ratio_gzip']:.0%}, x{muestra['expansion']:.1f} al decodificar"
+    )
+    if estimacion['limite_memoria']:
+        print(f"  🧠 Memoria disponible: {estimacion['limite_memoria'] / mb:,.0f} MB")
+    print()
+    print(f"  {'modo':<20} | {'página':>6} | {'páginas':>9} | {'MB en red':>10} | "
+          f"{'duración':>9} | {'memoria':>9}")
+    print(f"  {'-' * 20}-+-{'-' * 6}-+-{'-' * 9}-+-{'-' * 10}-+-{'-' * 9}-+-{'-' * 9}")
+    for modo in estimacion['modos']:
+        print(
+            f"  {modo['nombre']:<20} | {modo['tamano']:>6,} | {modo['paginas']:>9,} | "
+            f"{modo['bytes_red'] / mb:>10,.0f} | {formatear_duracion(modo['segundos']):>9} | "
+            f"{modo['memoria'] / mb:>6,.0f} MB"
+        )
+    print()
+    print(f"  💾 CSV intermedio (--output-csv): ~{estimacion['bytes_csv'] / mb:,.0f} MB en disco")
+    if estimacion['ventanas_recomendadas'] < MAX_VENTANAS_RECOMENDADAS:
+        print(
+            f"  🪟 --windows recomendado: {estimacion['ventanas_recomendadas']} "
+            f"(con más, el procesamiento local no da abasto)"
+        )
+    else:
+        print(
+            f"  🪟 --windows recomendado: {MAX_VENTANAS_RECOMENDADAS} "
+            f"(máximo sugerido; la red sigue siendo el cuello de botella)"
+        )
+    for modo in estimacion['modos']:
+        for aviso in modo['avisos']:
+            print(f"  ⚠️  {modo['nombre']}: {aviso}")
+    for aviso in estimacion['avisos']:
+        print(f"  ⚠️  {aviso}")
+    print("  (la memoria no incluye los valores únicos acumulados)")
+
+
 def comando_test_connection(args):
     """Prueba la conexión con Elasticsearch"""
     from config import load_config
@@ -189,6 +422,350 @@ def comando_test_connection(args):
         sys.exit(1)
 
 
+def comando_explain(args):
+    """Compara con la Profile API la query original y la optimizada"""
+    from config import load_config
+    from elasticsearch_client import ElasticsearchClient
+    
+    try:
+        print("=" * 60)
+        print("  PROFILE DE QUERY (ORIGINAL VS OPTIMIZADA)")
+        print("=" * 60)
+        print()
+        
+        config = load_config()
+        index = args.index or config.es_index
+        query_dict = cargar_query(args.query_file)
+        
+        client = ElasticsearchClient(config)
+        optimizada, cambios = client.optimize_query(query_dict, index)
+        
+        print(f"📊 Índice: {index}")
+        if cambios:
+            print("🛠️  Reescrituras aplicadas:")
+            for cambio in cambios:
+                print(f"   - {cambio}")
+        else:
+            print("✓ No hay reescrituras aplicables para este mapping")
+        if args.verbose:
+            print("\n📋 Query optimizada:")
+            print(json.dumps(optimizada, indent=2, ensure_ascii=False))
+        print()
+        
+        perfiles = {
+            'original': client.profile_query(query_dict, index),
+            'optimizada': client.profile_query(optimizada, index)
+        }
+        
+        print(f"  {'shard':<40} | {'original (ms)':>13} | {'optimizada (ms)':>15}")
+        print(f"  {'-' * 40}-+-{'-' * 13}-+-{'-' * 15}")
+        tiempos_opt = {s['shard']: s['total_ms'] for s in perfiles['optimizada']['shards']}
+        for shard in perfiles['original']['shards']:
+            print(
+                f"  {shard['shard'][:40]:<40} | {shard['total_ms']:>13.1f} | "
+                f"{tiempos_opt.get(shard['shard'], 0):>15.1f}"
+            )
+        print()
+        
+        for nombre, perfil in perfiles.items():
+            total_shards = sum(s['total_ms'] for s in perfil['shards'])
+            print(
+                f"  {nombre:<11} took={perfil['took']:,} ms  "
+                f"shards={total_shards:,.1f} ms  hits={perfil['total']:,}"
+            )
+        
+        if perfiles['original']['total'] != perfiles['optimizada']['total']:
+            print("\n⚠️  El número de hits difiere: revisa las reescrituras antes de usar --optimize-query")
+        print("=" * 60)
+        
+    except ValueError as e:
+        print(f"\n{e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+def comando_cache(args):
+    """Muestra o poda la caché de páginas en disco (--page-cache)"""
+    from datetime import datetime
+    from cache_paginas import CachePaginas
+    from config import Config
+    
+    try:
+        # No hacen falta credenciales: solo se usan los ajustes de la caché
+        config = Config()
+        cache = CachePaginas(directorio=config.page_cache_dir or None)
+        
+        if args.accion == 'prune':
+            if args.all:
+                max_bytes, max_edad = 0, 0
+            else:
+                max_mb = config.page_cache_max_mb if args.max_mb is None else args.max_mb
+                max_dias = (
+                    config.page_cache_max_age_days if args.max_age_days is None else args.max_age_days
+                )
+                max_bytes, max_edad = int(max_mb * 1024 * 1024), max_dias * 86400
+            borradas = cache.podar(max_bytes=max_bytes, max_edad_segundos=max_edad)
+            print(
+                f"🧹 Borradas {borradas['paginas']:,} páginas "
+                f"({borradas['bytes'] / 1024 / 1024:.1f} MB)"
+            )
+        
+        estado = cache.estado()
+        print(f"💾 Caché de páginas: {estado['directorio']}")
+        print(f"  📄 Páginas: {estado['paginas']:,}")
+        print(f"  📦 Tamaño: {estado['bytes'] / 1024 / 1024:.1f} MB "
+              f"(límite {config.page_cache_max_mb:,.0f} MB)")
+        print(f"  📼 Extracciones grabadas: {estado['extracciones']:,}")
+        if estado['mas_antigua'] is not None:
+            formato = '%Y-%m-%d %H:%M'
+            print(
+                f"  🕒 Último uso: de {datetime.fromtimestamp(estado['mas_antigua']).strftime(formato)} "
+                f"a {datetime.fromtimestamp(estado['mas_reciente']).strftime(formato)}"
+            )
+        
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+def comando_async_search(args):
+    """Envía una búsqueda asíncrona, sigue su progreso o recupera su resultado por id"""
+    from config import load_config
+    from elasticsearch_client import ElasticsearchClient
+    
+    def mostrar_progreso(estado):
+        shards = estado['shards']
+        hits = estado['total_hits']
+        print(
+            f"  ⏳ En curso: {shards['completados']}/{shards['total'] or '?'} shards"
+            + (f", {hits:,} hits parciales" if hits is not None else "")
+        )
+    
+    try:
+        config = load_config()
+        client = ElasticsearchClient(config)
+        
+        if args.id and args.cancel:
+            if client.delete_async_search(args.id):
+                print(f"🗑️  Búsqueda {args.id} cancelada y borrada")
+            else:
+                print(f"⚠️  La búsqueda {args.id} ya no existe")
+            return
+        
+        if args.id:
+            estado = client.get_async_search(args.id)
+        else:
+            index = args.index or config.es_index
+            query_dict = cargar_query(args.query_file)
+            print(f"📤 Enviando búsqueda asíncrona sobre {index}...")
+            estado = client.submit_async_search(query_dict, index)
+        
+        print(f"🆔 Id: {estado['id']}")
+        if args.no_wait and estado['en_curso']:
+            mostrar_progreso(estado)
+            print(f"💡 Recupera el resultado con: python main.py async-search --id {estado['id']}")
+            return
+        
+        while estado['en_curso']:
+            mostrar_progreso(estado)
+            estado = client.get_async_search(estado['id'], config.async_wait)
+        
+        if estado['error']:
+            raise Exception(f"La búsqueda terminó con error: {estado['error']}")
+        
+        respuesta = estado['respuesta']
+        print(f"✅ Completada en {respuesta.get('took', 0):,} ms")
+        if estado['total_hits'] is not None:
+            print(f"  📊 Hits: {estado['total_hits']:,}")
+        if respuesta.get('aggregations'):
+            print(f"  🧮 Agregaciones: {', '.join(respuesta['aggregations'])}")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(respuesta, f, indent=2, ensure_ascii=False)
+            print(f"  📁 Respuesta guardada en {args.output}")
+        
+    except ValueError as e:
+        print(f"\n{e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+def comando_install_pipeline(args):
+    """Instala el pipeline de ingesta que extrae los pares de Body y rellena los documentos existentes"""
+    from config import Config, load_config
+    from elasticsearch_client import ElasticsearchClient
+    from pipeline_ingesta import construir_pipeline
+    
+    try:
+        if args.print:
+            # Sin credenciales: solo se genera la definición
+            campo = args.field or Config().pipeline_field
+            print(json.dumps(construir_pipeline(campo), indent=2, ensure_ascii=False))
+            return
+        
+        config = load_config()
+        nombre = args.name or config.pipeline_name
+        campo = args.field or config.pipeline_field
+        client = ElasticsearchClient(config)
+        index = args.index or config.es_index
+        
+        if args.task:
+            if args.cancel:
+                client.cancel_task(args.task)
+                print(f"🛑 Tarea {args.task} cancelada (los lotes ya procesados se conservan)")
+                return
+            seguir_relleno(client, args.task)
+            return
+        
+        print("=" * 60)
+        print("  PIPELINE DE INGESTA (EXTRACCIÓN AL INDEXAR)")
+        print("=" * 60)
+        print()
+        
+        query_dict = cargar_query(args.query_file)
+        resultado = client.install_ingest_pipeline(
+            index, nombre, campo, mapping=not args.no_mapping, default_pipeline=args.default_pipeline
+        )
+        print(f"✅ Pipeline '{nombre}' instalado: pares no nulos en el campo '{campo}'")
+        if resultado['mapping'] is True:
+            print(f"  🗺️  Campo '{campo}' añadido como keyword a {index}")
+        elif resultado['mapping']:
+            print(f"  ⚠️  No se pudo añadir el mapping: {resultado['mapping']}")
+        if resultado['default_pipeline']:
+            print(f"  📌 index.default_pipeline = {nombre} en {index}")
+        
+        if args.verify:
+            print(f"\n🔍 Comparando con _simulate {args.verify} documentos reales...")
+            verificacion = client.verify_ingest_pipeline(query_dict, index, args.verify, nombre, campo)
+            print(f"  ✓ {verificacion['coinciden']} de {verificacion['documentos']} coinciden "
+                  f"con el procesador en Python")
+            for diferencia in verificacion['diferencias']:
+                print(f"  ✗ {diferencia['message'][:100]}")
+                print(f"      esperado: {diferencia.get('esperado')}  "
+                      f"obtenido: {diferencia.get('obtenido', diferencia.get('error'))}")
+            if verificacion['coinciden'] < verificacion['documentos'] and args.backfill:
+                raise ValueError("❌ El pipeline no coincide con el procesador: no se lanza el relleno")
+        
+        if args.backfill:
+            destino = args.dest
+            operacion = f"_reindex hacia {destino}" if destino else "_update_by_query"
+            print(f"\n📝 Relleno de documentos existentes con {operacion} "
+                  f"(slices={args.slices}, "
+                  f"{args.rate if args.rate is not None else config.backfill_rate:g} docs/s)")
+            slices = args.slices if args.slices == 'auto' else int(args.slices)
+            task_id = client.start_pipeline_backfill(
+                query_dict, index, destino=destino, slices=slices,
+                requests_per_second=args.rate, batch_size=args.batch_size,
+                nombre=nombre, campo=campo
+            )
+            print(f"🆔 Tarea: {task_id}")
+            if args.no_wait:
+                print(f"💡 Sigue el progreso con: python main.py install-pipeline --task {task_id}")
+                return
+            seguir_relleno(client, task_id)
+        
+        print()
+        print("💡 Para que los índices nuevos pasen por el pipeline, añade a su index template")
+        print(f"   \"index.default_pipeline\": \"{nombre}\" y el campo '{campo}' como keyword")
+        print("💡 Extracción por agregación: "
+              "python main.py elasticsearch --from-pipeline --output-json salida.json")
+        
+    except ValueError as e:
+        print(f"\n{e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+def seguir_relleno(client, task_id: str, intervalo: float = 5.0) -> None:
+    """Muestra el progreso de una tarea de relleno hasta que termina (Ctrl+C la deja corriendo)"""
+    import time
+    
+    try:
+        while True:
+            progreso = client.get_task_progress(task_id)
+            if progreso['completada']:
+                break
+            ritmo = progreso['procesados'] / progreso['segundos'] if progreso['segundos'] else 0
+            print(f"  ⏳ {progreso['procesados']:,}/{progreso['total']:,} documentos "
+                  f"({ritmo:,.0f} docs/s, {progreso['conflictos']:,} conflictos)")
+            time.sleep(intervalo)
+    except KeyboardInterrupt:
+        print(f"\n⚠️  La tarea sigue en el servidor: python main.py install-pipeline --task {task_id}"
+              f" [--cancel]")
+        return
+    
+    if progreso['error']:
+        raise Exception(f"El relleno terminó con error: {progreso['error']}")
+    print(f"✅ Relleno completado: {progreso['procesados']:,} documentos en "
+          f"{progreso['segundos']:,.0f} s")
+    if progreso['fallos']:
+        print(f"  ⚠️  {progreso['fallos']:,} documentos rechazados (ver la tarea en _tasks)")
+
+
+def preparar_checkpoint(args, query_dict: Dict[str, Any], index: str, config):
+    """
+    Crea el checkpoint de la extracción o lo carga si se pidió --resume
+    
+    Args:
+        args: Argumentos CLI (checkpoint_file, resume, output_json)
+        query_dict: Query original
+        index: Patrón de índices
+        config: Configuración cargada
+        
+    Returns:
+        Checkpoint: Checkpoint con la query congelada (fechas absolutas)
+    """
+    from checkpoint import Checkpoint
+    from query_utils import clave_query, resolver_fechas_relativas
+    
+    ruta = args.checkpoint_file or f"{args.output_json}.checkpoint"
+    checkpoint = Checkpoint(ruta, clave_query(query_dict, index), config.checkpoint_interval)
+    
+    if args.resume and checkpoint.cargar():
+        print(f"♻️  Reanudando desde checkpoint: {ruta}")
+        print(f"   Registros ya procesados: {checkpoint.estado['registros_procesados']:,}")
+    else:
+        if args.resume:
+            print(f"⚠️  No existe checkpoint en {ruta}; se empieza desde el principio")
+        # Congelar "now" para que una reanudación use la misma ventana temporal
+        checkpoint.query = resolver_fechas_relativas(query_dict)
+        print(f"💾 Checkpoints periódicos en: {ruta}")
+    
+    return checkpoint
+
+
+def preparar_marca_agua(args, query_dict: Dict[str, Any], index: str):
+    """
+    Carga la marca de agua de la query para una ejecución incremental
+    
+    Args:
+        args: Argumentos CLI (delta_file, output_json)
+        query_dict: Query original (antes de reescribir el rango)
+        index: Patrón de índices
+        
+    Returns:
+        MarcaAgua: Marca cargada, o vacía si es la primera ejecución
+    """
+    from marca_agua import MarcaAgua
+    from query_utils import clave_query
+    
+    ruta = args.delta_file or f"{args.output_json}.delta"
+    marca_agua = MarcaAgua(ruta, clave_query(query_dict, index))
+    
+    if marca_agua.cargar():
+        print(f"💧 Ejecución incremental desde la marca: {ruta}")
+    else:
+        print(f"💧 Sin marca previa en {ruta}; se procesa el rango completo")
+    
+    return marca_agua
+
+
 def cargar_query(query_file: str = None) -> Dict[str, Any]:
     """
     Carga query desde archivo JSON o retorna query por defecto
@@ -224,6 +801,35 @@ def cargar_query(query_file: str = None) -> Dict[str, Any]:
         }
 
 
+def parsear_campos_agregados(texto: str) -> Dict[str, str]:
+    """
+    Interpreta la lista de --aggregate-fields
+    
+    Cada elemento es un campo indexado o "nombre=campo" cuando el nombre de
+    salida difiere del campo en Elasticsearch (p. ej. "idEstudio=labels.idEstudio").
+    
+    Args:
+        texto: Lista separada por comas
+        
+    Returns:
+        dict: Nombre de salida -> campo indexado
+        
+    Raises:
+        ValueError: Si la lista está vacía
+    """
+    campos = {}
+    for elemento in texto.split(','):
+        elemento = elemento.strip()
+        if not elemento:
+            continue
+        nombre, _, campo = elemento.partition('=')
+        campos[nombre.strip()] = campo.strip() or nombre.strip()
+    
+    if not campos:
+        raise ValueError("❌ --aggregate-fields necesita al menos un campo")
+    return campos
+
+
 def main():
     """Función principal con argumentos CLI"""
     parser = argparse.ArgumentParser(
@@ -241,9 +847,52 @@ Ejemplos de uso:
   # Descargar desde Elasticsearch con CSV intermedio
   python main.py elasticsearch --output-csv logs.csv --output-json salida.json
 
+  # CSV intermedio comprimido (.csv.gz, o .csv.zst con zstandard)
+  python main.py elasticsearch --output-csv logs.csv.zst --output-json salida.json
+
+  # CSV intermedio generado en el servidor (API _sql)
+  python main.py elasticsearch --output-csv logs.csv --sql-export --output-json salida.json
+
+  # Estimar bytes, duración y memoria de cada modo antes de descargar
+  python main.py elasticsearch --estimate --windows 8
+
   # Usar query personalizada
   python main.py elasticsearch --query-file queries/custom.json --output-json salida.json
 
+  # Descarga paralela en 8 ventanas de tiempo
+  python main.py elasticsearch --output-json salida.json --windows 8
+
+  # Páginas grandes con poca memoria (parser incremental de hits)
+  python main.py elasticsearch --output-json salida.json --incremental-parse
+
+  # Un documento por cada message distinto (índices con reintentos repetidos)
+  python main.py elasticsearch --output-json salida.json --collapse
+
+  # Valores distintos de campos indexados, calculados en el servidor
+  python main.py elasticsearch --output-json salida.json --aggregate-fields idEstudio,idPlanEstudio
+
+  # Ejecución diaria incremental (solo documentos nuevos)
+  python main.py elasticsearch --output-json salida.json --delta
+
+  # Extracción larga reanudable
+  python main.py elasticsearch --output-json salida.json --checkpoint
+  python main.py elasticsearch --output-json salida.json --resume
+
+  # Coste por shard de la query original frente a la optimizada
+  python main.py explain --query-file queries/custom.json
+
+  # Agregación pesada con _async_search (progreso parcial; reanudable con --id)
+  python main.py async-search --query-file queries/agregacion.json --output resultado.json
+
+  # Grabar una extracción y repetirla desde disco al ajustar las reglas
+  python main.py elasticsearch --output-json datos.json --page-cache
+  python main.py elasticsearch --output-json datos.json --replay
+  python main.py cache stats
+
+  # Extraer los pares al indexar (pipeline de ingesta) y rellenar lo ya indexado
+  python main.py install-pipeline --backfill --rate 2000
+  python main.py elasticsearch --output-json salida.json --from-pipeline
+
   # Probar conexión
   python main.py test-connection
         """
@@ -264,16 +913,157 @@ Ejemplos de uso:
     parser_es = subparsers.add_parser('elasticsearch', help='Descargar desde Elasticsearch')
     parser_es.add_argument('--query-file', '-q',
                           help='Archivo JSON con query personalizada (opcional)')
-    parser_es.add_argument('--output-json', '-o', required=True,
-                          help='Archivo JSON de salida')
+    parser_es.add_argument('--output-json', '-o',
+                          help='Archivo JSON de salida (obligatorio salvo con --estimate)')
     parser_es.add_argument('--output-csv', '-c',
-                          help='Guardar CSV intermedio (opcional)')
+                          help='Guardar CSV intermedio (opcional; .csv.gz o .csv.zst lo comprimen)')
+    parser_es.add_argument('--sql-export', action='store_true',
+                          help='Generar el CSV de --output-csv en el servidor con la API _sql '
+                               '(páginas con cursor escritas sin re-codificar)')
     parser_es.add_argument('--index', '-idx',
                           help='Patrón de índices (override de .env)')
     parser_es.add_argument('--verbose', '-v', action='store_true',
                           help='Mostrar query y detalles adicionales')
+    parser_es.add_argument('--estimate', action='store_true',
+                          help='Estimar bytes, duración y memoria de cada modo de descarga con el '
+                               '_count y una página de muestra, sin descargar')
+    parser_es.add_argument('--windows', type=int, default=0,
+                          help='Dividir el rango de @timestamp en N ventanas descargadas en paralelo')
+    parser_es.add_argument('--lean', action='store_true',
+                          help='Transporte reducido: solo message/@timestamp y sin metadatos de hits')
+    parser_es.add_argument('--incremental-parse', action='store_true',
+                          help='Recorrer los hits sobre los bytes de la respuesta sin decodificar la página entera')
+    parser_es.add_argument('--refresh-metadata', action='store_true',
+                          help='Ignorar la caché de metadatos (índices, mappings) y consultarlos de nuevo')
+    parser_es.add_argument('--fast-start', action='store_true',
+                          help='Sin comprobaciones previas (ping, info, existencia, poda): '
+                               'la primera búsqueda valida conexión y credenciales')
+    parser_es.add_argument('--load-monitor', action='store_true',
+                          help='Frenar o pausar la descarga según la cola search y la salud '
+                               'del cluster (política en ELASTICSEARCH_LOAD_*)')
+    parser_es.add_argument('--hedge', action='store_true',
+                          help='Duplicar las páginas de search_after más lentas que el p95 '
+                               '(presupuesto en ELASTICSEARCH_HEDGE_BUDGET)')
+    parser_es.add_argument('--async-search', action='store_true',
+                          help='Conteo y agregaciones (--aggregate-fields, --collapse) con '
+                               '_async_search en lugar de una petición bloqueante')
+    parser_es.add_argument('--page-cache', action='store_true',
+                          help='Guardar en disco las páginas descargadas (comprimidas) para --replay')
+    parser_es.add_argument('--replay', action='store_true',
+                          help='Repetir la última extracción grabada con --page-cache desde disco, '
+                               'sin contactar con el cluster')
+    parser_es.add_argument('--optimize-query', action='store_true',
+                          help='Reescribir formas costosas (wildcard con comodín inicial, must) '
+                               'según el mapping de los índices')
+    parser_es.add_argument('--collapse', action='store_true',
+                          help='Descargar un solo documento por cada message distinto '
+                               '(agrupado en el servidor) con su número de hits')
+    parser_es.add_argument('--collapse-field',
+                          help='Campo keyword con el message completo para --collapse '
+                               '(default: hash SHA-1 calculado en el servidor)')
+    parser_es.add_argument('--aggregate-fields',
+                          help='Campos indexados (a,b o nombre=campo) cuyos valores distintos se '
+                               'obtienen con una agregación composite, sin descargar documentos')
+    parser_es.add_argument('--from-pipeline', action='store_true',
+                          help='Agregar los pares que el pipeline de ingesta (install-pipeline) '
+                               'ya extrajo al indexar, sin descargar documentos')
+    parser_es.add_argument('--delta', action='store_true',
+                          help='Ejecución incremental: solo documentos nuevos desde la última '
+                               'ejecución, fusionados con el JSON de salida existente')
+    parser_es.add_argument('--delta-file',
+                          help='Ruta de la marca de agua (default: <output-json>.delta)')
+    parser_es.add_argument('--checkpoint', action='store_true',
+                          help='Guardar checkpoints periódicos para poder reanudar')
+    parser_es.add_argument('--checkpoint-file',
+                          help='Ruta del checkpoint (default: <output-json>.checkpoint)')
+    parser_es.add_argument('--resume', action='store_true',
+                          help='Reanudar desde el último checkpoint (implica --checkpoint)')
     parser_es.set_defaults(func=comando_elasticsearch)
     
+    # Subcomando: explain
+    parser_explain = subparsers.add_parser(
+        'explain', help='Comparar con la Profile API la query original y la optimizada'
+    )
+    parser_explain.add_argument('--query-file', '-q',
+                               help='Archivo JSON con query personalizada (opcional)')
+    parser_explain.add_argument('--index', '-idx',
+                               help='Patrón de índices (override de .env)')
+    parser_explain.add_argument('--verbose', '-v', action='store_true',
+                               help='Mostrar la query optimizada')
+    parser_explain.set_defaults(func=comando_explain)
+    
+    # Subcomando: cache
+    parser_cache = subparsers.add_parser('cache', help='Estado y poda de la caché de páginas')
+    parser_cache.add_argument('accion', choices=['stats', 'prune'],
+                             help='stats: mostrar el estado; prune: borrar páginas antiguas')
+    parser_cache.add_argument('--max-mb', type=float,
+                             help='Con prune: tamaño máximo en MB (default: ELASTICSEARCH_PAGE_CACHE_MAX_MB)')
+    parser_cache.add_argument('--max-age-days', type=float,
+                             help='Con prune: antigüedad máxima en días '
+                                  '(default: ELASTICSEARCH_PAGE_CACHE_MAX_AGE_DAYS)')
+    parser_cache.add_argument('--all', action='store_true',
+                             help='Con prune: vaciar la caché')
+    parser_cache.set_defaults(func=comando_cache)
+    
+    # Subcomando: async-search
+    parser_async = subparsers.add_parser(
+        'async-search', help='Búsqueda asíncrona (_async_search) para queries y agregaciones pesadas'
+    )
+    parser_async.add_argument('--query-file', '-q',
+                             help='Archivo JSON con el cuerpo de la búsqueda (query, aggs, size)')
+    parser_async.add_argument('--index', '-idx',
+                             help='Patrón de índices (override de .env)')
+    parser_async.add_argument('--id',
+                             help='Id de una búsqueda ya enviada: seguir su progreso o recuperar el resultado')
+    parser_async.add_argument('--no-wait', action='store_true',
+                             help='Enviar y mostrar el id sin esperar a que termine')
+    parser_async.add_argument('--cancel', action='store_true',
+                             help='Con --id: cancelar la búsqueda y borrar su resultado')
+    parser_async.add_argument('--output', '-o',
+                             help='Guardar la respuesta final en un archivo JSON')
+    parser_async.set_defaults(func=comando_async_search)
+    
+    # Subcomando: install-pipeline
+    parser_pipeline = subparsers.add_parser(
+        'install-pipeline', help='Instalar el pipeline de ingesta que extrae los pares de Body al indexar'
+    )
+    parser_pipeline.add_argument('--query-file', '-q',
+                                help='Query de los documentos a verificar y rellenar (opcional)')
+    parser_pipeline.add_argument('--index', '-idx',
+                                help='Patrón de índices (override de .env)')
+    parser_pipeline.add_argument('--name',
+                                help='Id del pipeline (default: ELASTICSEARCH_PIPELINE_NAME)')
+    parser_pipeline.add_argument('--field',
+                                help='Campo keyword de los pares (default: ELASTICSEARCH_PIPELINE_FIELD)')
+    parser_pipeline.add_argument('--print', action='store_true',
+                                help='Mostrar la definición del pipeline sin instalarla')
+    parser_pipeline.add_argument('--no-mapping', action='store_true',
+                                help='No añadir el campo como keyword a los índices existentes')
+    parser_pipeline.add_argument('--default-pipeline', action='store_true',
+                                help='Fijar index.default_pipeline en los índices existentes')
+    parser_pipeline.add_argument('--verify', type=int, default=20,
+                                help='Documentos reales a comparar con _simulate (0 = no comparar)')
+    parser_pipeline.add_argument('--backfill', action='store_true',
+                                help='Procesar los documentos ya indexados (_update_by_query, '
+                                     'o _reindex con --dest)')
+    parser_pipeline.add_argument('--dest',
+                                help='Con --backfill: copiar a este índice con _reindex en lugar '
+                                     'de reescribir en sitio')
+    parser_pipeline.add_argument('--slices', default='auto',
+                                help='Con --backfill: subtareas en paralelo (default: auto, una por shard)')
+    parser_pipeline.add_argument('--rate', type=float,
+                                help='Con --backfill: documentos por segundo como máximo '
+                                     '(default: ELASTICSEARCH_BACKFILL_RATE; -1 = sin límite)')
+    parser_pipeline.add_argument('--batch-size', type=int,
+                                help='Con --backfill: documentos por lote (default: ELASTICSEARCH_SCROLL_SIZE)')
+    parser_pipeline.add_argument('--no-wait', action='store_true',
+                                help='Con --backfill: lanzar la tarea y mostrar su id sin esperar')
+    parser_pipeline.add_argument('--task',
+                                help='Seguir el progreso de un relleno ya lanzado')
+    parser_pipeline.add_argument('--cancel', action='store_true',
+                                help='Con --task: cancelar el relleno')
+    parser_pipeline.set_defaults(func=comando_install_pipeline)
+    
     # Subcomando: test-connection
     parser_test = subparsers.add_parser('test-connection', help='Probar conexión con Elasticsearch')
     parser_test.set_defaults(func=comando_test_connection)
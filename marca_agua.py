@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Marca de agua para ejecuciones incrementales (--delta)
+Persiste, por cada combinación query + índice, el mayor @timestamp procesado
+y los _id con ese mismo valor, para que la siguiente ejecución descargue
+solo los documentos nuevos
+"""
+
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from checkpoint import escribir_json_atomico
+from query_utils import agregar_filtro, desplazar_inicio_rango, formatear_fecha
+
+
+class MarcaAgua:
+    """Posición máxima ya procesada de una extracción diaria"""
+
+    def __init__(self, path: str, clave: str):
+        """
+        Inicializa la marca de agua
+
+        Args:
+            path: Archivo de estado (puede contener marcas de varias queries)
+            clave: Hash de query + índice (ver query_utils.clave_query)
+        """
+        self.path = Path(path)
+        self.clave = clave
+        self.ultimo_ts: Optional[int] = None
+        self.ids: List[str] = []
+        self.anterior: Optional[int] = None
+
+    def cargar(self) -> bool:
+        """
+        Carga la marca de la query desde disco si existe
+
+        Returns:
+            bool: True si había una marca previa para esta query
+        """
+        marca = self._leer_todas().get(self.clave)
+        if not marca:
+            return False
+        self.ultimo_ts = marca['ultimo_ts']
+        self.ids = list(marca.get('ids', []))
+        self.anterior = self.ultimo_ts
+        return True
+
+    def aplicar(self, query_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Reescribe la query para empezar en la marca sin repetir sus documentos
+
+        El rango de @timestamp pasa a empezar en la marca (inclusive) y los
+        _id ya procesados con ese mismo @timestamp se excluyen.
+
+        Args:
+            query_dict: Query original
+
+        Returns:
+            dict: Copia de la query restringida a los documentos nuevos
+        """
+        if self.ultimo_ts is None:
+            return query_dict
+
+        resultado = desplazar_inicio_rango(query_dict, self.ultimo_ts)
+        if self.ids:
+            resultado = agregar_filtro(resultado, {
+                'bool': {'must_not': [{'ids': {'values': list(self.ids)}}]}
+            })
+        return resultado
+
+    def observar(self, cursor: Optional[Dict[str, Any]]) -> None:
+        """
+        Actualiza la marca con el cursor de una página procesada
+
+        Args:
+            cursor: Cursor de iter_pages ({'ultimo_ts', 'ids'})
+        """
+        if not cursor or cursor.get('ultimo_ts') is None:
+            return
+        ts = cursor['ultimo_ts']
+        if self.ultimo_ts is None or ts > self.ultimo_ts:
+            self.ultimo_ts = ts
+            self.ids = list(cursor.get('ids', []))
+        elif ts == self.ultimo_ts:
+            self.ids = sorted(set(self.ids) | set(cursor.get('ids', [])))
+
+    def guardar(self) -> None:
+        """Escribe la marca de forma atómica conservando las de otras queries"""
+        marcas = self._leer_todas()
+        marcas[self.clave] = {
+            'ultimo_ts': self.ultimo_ts,
+            'ids': self.ids,
+            'ultimo_ts_iso': formatear_fecha(
+                datetime.fromtimestamp(self.ultimo_ts / 1000, tz=timezone.utc)
+            ) if self.ultimo_ts is not None else None,
+            'actualizado': formatear_fecha(datetime.now(timezone.utc))
+        }
+        escribir_json_atomico(self.path, marcas)
+
+    def _leer_todas(self) -> Dict[str, Any]:
+        """Lee el archivo de estado completo (vacío si no existe)"""
+        if not self.path.exists():
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Caché de metadatos del cluster (listas de índices, existencia y mappings)
+Entradas con TTL, persistencia opcional en el directorio de caché del usuario
+y revalidación tipo ETag con la versión del estado del cluster
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from checkpoint import escribir_json_atomico
+
+NOMBRE_APLICACION = 'extractor-elasticsearch'
+
+
+def directorio_cache_usuario() -> Path:
+    """
+    Directorio de caché del usuario según la plataforma
+
+    Returns:
+        Path: %LOCALAPPDATA% en Windows, ~/Library/Caches en macOS y
+        $XDG_CACHE_HOME (o ~/.cache) en el resto
+    """
+    if sys.platform == 'win32':
+        base = Path(os.getenv('LOCALAPPDATA', Path.home() / 'AppData' / 'Local'))
+    elif sys.platform == 'darwin':
+        base = Path.home() / 'Library' / 'Caches'
+    else:
+        base = Path(os.getenv('XDG_CACHE_HOME', Path.home() / '.cache'))
+    return base / NOMBRE_APLICACION
+
+
+def ruta_cache_cluster(host: str, usuario: Optional[str]) -> Path:
+    """Archivo de caché propio de un cluster y usuario (los permisos pueden variar)"""
+    huella = hashlib.sha256(f"{host}|{usuario or ''}".encode('utf-8')).hexdigest()[:16]
+    return directorio_cache_usuario() / f"metadatos-{huella}.json"
+
+
+class CacheMetadatos:
+    """Caché TTL de metadatos con revalidación por versión"""
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        ruta: Optional[Path] = None,
+        validador: Optional[Callable[[], Optional[str]]] = None
+    ):
+        """
+        Inicializa la caché
+
+        Args:
+            ttl: Segundos en los que una entrada se usa sin consultar al cluster
+                (0 desactiva la caché)
+            ruta: Archivo JSON donde persistir las entradas (opcional)
+            validador: Función que devuelve la versión actual de los metadatos
+                (como un ETag); si coincide con la de una entrada caducada, la
+                entrada se renueva sin recargarla
+        """
+        self.ttl = ttl
+        self.ruta = Path(ruta) if ruta else None
+        self.validador = validador
+        self.entradas: Dict[str, Dict[str, Any]] = {}
+        self.estadisticas = {'aciertos': 0, 'revalidaciones': 0, 'cargas': 0}
+        self._lock = threading.Lock()
+        self._cargar_de_disco()
+
+    def obtener(
+        self,
+        clave: str,
+        cargar: Callable[[], Any],
+        validador: Optional[Callable[[], Optional[str]]] = None
+    ) -> Any:
+        """
+        Devuelve el valor de la clave, consultando al cluster solo si hace falta
+
+        Es seguro entre hilos (peticiones del servidor web): el lock protege
+        las entradas, pero no se mantiene mientras se consulta al cluster.
+
+        Args:
+            clave: Identificador de la entrada (p. ej. 'indices:logs-*')
+            cargar: Función que obtiene el valor del cluster
+            validador: Validador para esta consulta (por defecto, el de la caché)
+
+        Returns:
+            Valor cacheado o recién cargado
+        """
+        if self.ttl <= 0:
+            with self._lock:
+                self.estadisticas['cargas'] += 1
+            return cargar()
+
+        ahora = time.time()
+        with self._lock:
+            entrada = self.entradas.get(clave)
+            if entrada and ahora - entrada['guardado'] < self.ttl:
+                self.estadisticas['aciertos'] += 1
+                return entrada['valor']
+
+        validador = validador or self.validador
+        if entrada is None and validador is not None:
+            # Sin entrada no hay nada que revalidar: la versión se pide en
+            # paralelo con la carga, solo para guardarla con el valor
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                futuro = executor.submit(self._version_actual, validador)
+                valor = cargar()
+                version = futuro.result()
+            self._almacenar(clave, valor, ahora, version)
+            return valor
+
+        version = self._version_actual(validador)
+        if entrada and version is not None and entrada.get('version') == version:
+            with self._lock:
+                self.estadisticas['revalidaciones'] += 1
+                entrada['guardado'] = ahora
+                self._guardar_en_disco()
+            return entrada['valor']
+
+        valor = cargar()
+        self._almacenar(clave, valor, ahora, version)
+        return valor
+
+    def leer(self, clave: str) -> Any:
+        """
+        Valor guardado de la clave sin mirar el TTL, o None si no está
+
+        Para entradas que el llamador valida por su cuenta (p. ej. el rango de
+        @timestamp de un índice, válido mientras no cambie su docs.count).
+        """
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entrada = self.entradas.get(clave)
+            if entrada is None:
+                return None
+            self.estadisticas['aciertos'] += 1
+            return entrada['valor']
+
+    def guardar(self, valores: Dict[str, Any]) -> None:
+        """Guarda varias entradas de una vez (una sola escritura en disco)"""
+        if self.ttl <= 0 or not valores:
+            return
+        ahora = time.time()
+        with self._lock:
+            for clave, valor in valores.items():
+                self.entradas[clave] = {'valor': valor, 'guardado': ahora, 'version': None}
+            self.estadisticas['cargas'] += len(valores)
+            self._guardar_en_disco()
+
+    def invalidar(self, prefijo: Optional[str] = None) -> int:
+        """
+        Elimina entradas de la caché
+
+        Args:
+            prefijo: Solo las claves que empiezan así (None = todas)
+
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        with self._lock:
+            claves = [c for c in self.entradas if prefijo is None or c.startswith(prefijo)]
+            for clave in claves:
+                del self.entradas[clave]
+            if claves:
+                self._guardar_en_disco()
+        return len(claves)
+
+    def invalidar_clave(self, clave: str) -> bool:
+        """
+        Elimina exactamente una entrada (sin afectar a las que empiezan igual)
+
+        Returns:
+            bool: True si la entrada existía
+        """
+        with self._lock:
+            if self.entradas.pop(clave, None) is None:
+                return False
+            self._guardar_en_disco()
+        return True
+
+    def _almacenar(self, clave: str, valor: Any, ahora: float, version: Optional[str]) -> None:
+        """Guarda una entrada recién cargada"""
+        with self._lock:
+            self.estadisticas['cargas'] += 1
+            self.entradas[clave] = {'valor': valor, 'guardado': ahora, 'version': version}
+            self._guardar_en_disco()
+
+    @staticmethod
+    def _version_actual(validador: Optional[Callable[[], Optional[str]]]) -> Optional[str]:
+        """Versión de los metadatos del cluster, o None si no se puede obtener"""
+        if validador is None:
+            return None
+        try:
+            return validador()
+        except Exception:
+            return None
+
+    def _cargar_de_disco(self) -> None:
+        """Lee las entradas persistidas (un archivo corrupto se ignora)"""
+        if self.ruta is None or not self.ruta.exists():
+            return
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                self.entradas = json.load(f)
+        except (OSError, ValueError):
+            self.entradas = {}
+
+    def _guardar_en_disco(self) -> None:
+        """Persiste las entradas; un fallo de escritura no interrumpe la extracción"""
+        if self.ruta is None:
+            return
+        try:
+            escribir_json_atomico(self.ruta, self.entradas)
+        except OSError as e:
+            print(f"⚠ Advertencia: No se pudo guardar la caché de metadatos: {e}")
+            self.ruta = None
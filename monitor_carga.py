@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Monitor de carga del cluster para extracciones pesadas
+Consulta periódicamente _nodes/stats/thread_pool (cola y rechazos del pool
+search) y _cluster/health, y frena o pausa las descargas antes de que el
+tráfico de negocio sufra rechazos
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Decisiones del monitor
+NORMAL = 'normal'
+FRENAR = 'frenar'
+PAUSAR = 'pausar'
+
+# Decisiones conservadas en las estadísticas (solo los cambios)
+MAX_DECISIONES_REGISTRADAS = 100
+
+# Respiro entre páginas del scroll mientras se frena (una sola petición no se
+# puede limitar con el tope de búsquedas simultáneas)
+PAUSA_FRENAR_SEGUNDOS = 1.0
+
+
+class MonitorCarga:
+    """
+    Hilo en segundo plano que ajusta el limitador según la carga del cluster
+
+    La paginación con PIT + search_after y las ventanas pasan por el
+    limitador; el scroll consulta esperar_turno antes de cada página.
+    """
+
+    def __init__(self, es, limitador, config):
+        """
+        Inicializa el monitor
+
+        Args:
+            es: Cliente Elasticsearch
+            limitador: LimitadorConcurrencia de las descargas
+            config: Config con la política (load_monitor_*)
+        """
+        self.es = es
+        self.limitador = limitador
+        self.intervalo = config.load_monitor_interval
+        self.cola_frenar = config.load_queue_throttle
+        self.cola_pausar = config.load_queue_pause
+        self.pausar_en_rojo = config.load_pause_on_red
+        self.decision = NORMAL
+        self.decisiones: List[Dict[str, Any]] = []
+        self.contadores = {NORMAL: 0, FRENAR: 0, PAUSAR: 0}
+        self.errores = 0
+        self._rechazos_previos: Optional[int] = None
+        self._inicio = time.monotonic()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def iniciar(self) -> None:
+        """Arranca el hilo de muestreo (idempotente)"""
+        if self._hilo is not None:
+            return
+        self._hilo = threading.Thread(target=self._bucle, name='monitor-carga', daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        """Detiene el hilo y retira el tope del limitador"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+        self.limitador.aplicar_techo(None)
+
+    def esperar_turno(self) -> None:
+        """
+        Punto de control de las descargas que no pasan por el limitador (scroll)
+
+        Con 'pausar' espera a que termine la pausa; con 'frenar' deja
+        PAUSA_FRENAR_SEGUNDOS entre páginas. Vuelve enseguida si el monitor
+        ya se detuvo.
+        """
+        if self._detener.is_set():
+            return
+        self.limitador.esperar_pausa()
+        if self.decision == FRENAR:
+            self._detener.wait(PAUSA_FRENAR_SEGUNDOS)
+
+    def muestrear(self) -> Dict[str, Any]:
+        """
+        Lee la carga del cluster
+
+        Returns:
+            dict: cola (máxima del pool search entre nodos), rechazos (nuevos
+            desde la muestra anterior) y estado (green/yellow/red)
+        """
+        stats = self.es.nodes.stats(
+            metric='thread_pool',
+            filter_path='nodes.*.thread_pool.search.queue,nodes.*.thread_pool.search.rejected'
+        )
+        pools = [
+            nodo.get('thread_pool', {}).get('search', {})
+            for nodo in stats.get('nodes', {}).values()
+        ]
+        cola = max((pool.get('queue', 0) for pool in pools), default=0)
+        rechazados = sum(pool.get('rejected', 0) for pool in pools)
+        nuevos = 0 if self._rechazos_previos is None else max(0, rechazados - self._rechazos_previos)
+        self._rechazos_previos = rechazados
+
+        salud = self.es.cluster.health(filter_path='status')
+        return {'cola': cola, 'rechazos': nuevos, 'estado': salud.get('status')}
+
+    def decidir(self, muestra: Dict[str, Any]) -> str:
+        """
+        Aplica la política a una muestra
+
+        Args:
+            muestra: Resultado de muestrear
+
+        Returns:
+            str: 'pausar' (cola muy llena o cluster en rojo), 'frenar' (cola
+            por encima del umbral o rechazos nuevos) o 'normal'
+        """
+        if muestra['cola'] >= self.cola_pausar or (
+            self.pausar_en_rojo and muestra['estado'] == 'red'
+        ):
+            return PAUSAR
+        if muestra['cola'] >= self.cola_frenar or muestra['rechazos'] > 0:
+            return FRENAR
+        return NORMAL
+
+    def aplicar(self, decision: str, muestra: Dict[str, Any]) -> None:
+        """Traslada la decisión al limitador y la registra si cambia"""
+        self.contadores[decision] += 1
+        if decision == PAUSAR:
+            # Hasta la siguiente muestra, que decidirá si se reanuda
+            self.limitador.pausar(self.intervalo)
+        self.limitador.aplicar_techo(1 if decision in (FRENAR, PAUSAR) else None)
+
+        if decision != self.decision:
+            print(
+                f"📡 Carga del cluster: {decision} (cola search {muestra['cola']}, "
+                f"{muestra['rechazos']} rechazos nuevos, estado {muestra['estado']})"
+            )
+            if len(self.decisiones) < MAX_DECISIONES_REGISTRADAS:
+                self.decisiones.append(dict(
+                    muestra,
+                    decision=decision,
+                    segundo=round(time.monotonic() - self._inicio, 1)
+                ))
+        self.decision = decision
+
+    def resumen(self) -> Dict[str, Any]:
+        """Muestras por decisión y cambios de decisión, para las estadísticas"""
+        return {
+            'muestras': dict(self.contadores),
+            'decision_actual': self.decision,
+            'cambios': list(self.decisiones),
+            'errores': self.errores
+        }
+
+    def _bucle(self) -> None:
+        """Muestrea al arrancar y cada intervalo hasta que se detenga el monitor"""
+        fallando = False
+        while True:
+            try:
+                muestra = self.muestrear()
+            except Exception as e:
+                # Sin permiso 'monitor' o error puntual: no frenar la descarga
+                # por ello y volver a intentarlo en la siguiente muestra
+                self.errores += 1
+                if not fallando:
+                    print(
+                        f"⚠ Advertencia: Monitor de carga sin muestra ({e}); "
+                        f"reintentando cada {self.intervalo:.0f} s"
+                    )
+                fallando = True
+                self.limitador.aplicar_techo(None)
+                self.decision = NORMAL
+            else:
+                if fallando:
+                    print("📡 Monitor de carga: muestras recuperadas")
+                fallando = False
+                self.aplicar(self.decidir(muestra), muestra)
+            if self._detener.wait(self.intervalo):
+                return
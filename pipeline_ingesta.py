@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pipeline de ingesta que extrae los valores de Body en el momento de indexar
+Reproduce en el servidor normalizar_json + extraer_valores_no_nulos (grok,
+json y un script painless) y guarda cada par no nulo como "campo=<valor JSON>"
+en un campo keyword, de modo que la extracción se reduce a una agregación.
+Cada documento procesado lleva además la versión del pipeline en
+<campo>_version, tenga pares o no, para que el relleno no lo repita
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from data_processor import clave_valor, procesar_mensaje
+
+NOMBRE_PIPELINE = 'extractor-body-where'
+CAMPO_DESTINO = 'body_where'
+VERSION_PIPELINE = 2
+
+# Campos auxiliares del pipeline (se borran antes de indexar)
+CAMPO_BODY = 'extractor_body'
+CAMPO_JSON = 'extractor_where'
+
+# El mismo patrón que normalizar_json: Body: {"where":[...]} no codicioso
+PATRON_BODY = r'\{"where":\[.*?\]\}'
+
+# Los valores se codifican como JSON (también listas y objetos) para conservar el tipo
+SCRIPT_PARES = r"""
+String aJson(def valor) {
+  if (valor == null) {
+    return 'null';
+  }
+  if (valor instanceof String) {
+    return '"' + valor.replace('\\', '\\\\').replace('"', '\\"') + '"';
+  }
+  if (valor instanceof Map) {
+    List partes = new ArrayList();
+    for (def entrada : valor.entrySet()) {
+      partes.add(aJson(String.valueOf(entrada.getKey())) + ':' + aJson(entrada.getValue()));
+    }
+    return '{' + String.join(',', partes) + '}';
+  }
+  if (valor instanceof List) {
+    List partes = new ArrayList();
+    for (def elemento : valor) {
+      partes.add(aJson(elemento));
+    }
+    return '[' + String.join(',', partes) + ']';
+  }
+  return String.valueOf(valor);
+}
+
+def cuerpo = ctx[params.origen];
+if (cuerpo instanceof Map && cuerpo.where instanceof List) {
+  List pares = new ArrayList();
+  for (def item : cuerpo.where) {
+    if (item instanceof Map && item.value != null) {
+      pares.add(item.field + '=' + aJson(item.value));
+    }
+  }
+  if (!pares.isEmpty()) {
+    ctx[params.destino] = pares;
+  }
+}
+ctx.remove(params.origen);
+""".strip()
+
+# Un valor de texto largo no se descarta al indexar (límite de Lucene: 32766 bytes)
+IGNORE_ABOVE = 8191
+
+
+def campo_version(campo: str = CAMPO_DESTINO) -> str:
+    """Campo con la versión del pipeline que procesó el documento"""
+    return f"{campo}_version"
+
+
+def construir_pipeline(campo: str = CAMPO_DESTINO) -> Dict[str, Any]:
+    """
+    Definición del pipeline de ingesta
+
+    Args:
+        campo: Campo keyword donde se guardan los pares no nulos
+
+    Returns:
+        dict: Cuerpo de PUT _ingest/pipeline/<nombre>
+    """
+    return {
+        'description': 'Extrae los pares no nulos de Body: {"where":[...]} del campo message',
+        'version': VERSION_PIPELINE,
+        'processors': [
+            {'grok': {
+                'if': "ctx.message instanceof String && ctx.message.contains('Body:')",
+                'field': 'message',
+                'patterns': [f'Body:\\s*%{{BODY_WHERE:{CAMPO_BODY}}}'],
+                'pattern_definitions': {'BODY_WHERE': PATRON_BODY},
+                'ignore_failure': True
+            }},
+            {'json': {
+                'if': f"ctx.{CAMPO_BODY} != null",
+                'field': CAMPO_BODY,
+                'target_field': CAMPO_JSON,
+                'ignore_failure': True
+            }},
+            {'remove': {'field': CAMPO_BODY, 'ignore_missing': True}},
+            {'script': {
+                'if': f"ctx.{CAMPO_JSON} != null",
+                'lang': 'painless',
+                'source': SCRIPT_PARES,
+                'params': {'origen': CAMPO_JSON, 'destino': campo},
+                'ignore_failure': True
+            }},
+            {'remove': {'field': CAMPO_JSON, 'ignore_missing': True}},
+            # Marca de procesado, también sin pares: el relleno no vuelve a reescribirlo
+            {'set': {'field': campo_version(campo), 'value': VERSION_PIPELINE}}
+        ],
+        '_meta': {'generado_por': 'extractor-elasticsearch', 'campo': campo}
+    }
+
+
+def mapping_campo(campo: str = CAMPO_DESTINO) -> Dict[str, Any]:
+    """Propiedades de mapping del campo de pares (keyword agregable) y de su versión"""
+    return {
+        campo: {'type': 'keyword', 'ignore_above': IGNORE_ABOVE},
+        campo_version(campo): {'type': 'integer'}
+    }
+
+
+def codificar_par(field: str, value: Any) -> str:
+    """
+    Codificación de un par en Python, equivalente a la del script painless
+
+    Sirve para simular el pipeline fuera del cluster (tests y comparaciones).
+    """
+    return f"{field}={_a_json(value)}"
+
+
+def _a_json(value: Any) -> str:
+    """JSON compacto con el mismo escapado que la función aJson del script"""
+    if value is None:
+        return 'null'
+    if isinstance(value, str):
+        return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, dict):
+        return '{' + ','.join(f"{_a_json(str(k))}:{_a_json(v)}" for k, v in value.items()) + '}'
+    if isinstance(value, list):
+        return '[' + ','.join(_a_json(v) for v in value) + ']'
+    return str(value)
+
+
+def decodificar_par(par: str) -> Tuple[str, Any]:
+    """
+    Convierte "campo=<valor JSON>" en la tupla (campo, valor) de la salida
+
+    Un valor que no es JSON válido (p. ej. un objeto escrito como {a=1} por
+    la versión 1 del pipeline) se devuelve como texto.
+    """
+    field, _, texto = par.partition('=')
+    try:
+        return field, json.loads(texto, strict=False)
+    except ValueError:
+        return field, texto
+
+
+def consulta_relleno(query_dict: Dict[str, Any], campo: str = CAMPO_DESTINO) -> Dict[str, Any]:
+    """
+    Query del relleno (_update_by_query/_reindex): la de la extracción, sin
+    los documentos que ya pasaron por esta versión del pipeline
+
+    Se filtra por la marca de versión y no por el campo de pares, que no
+    existe en los documentos sin pares no nulos: relanzar un
+    _update_by_query continúa donde se quedó y reprocesa lo que hizo una
+    versión anterior. Con _reindex la marca queda en el destino, así que
+    relanzarlo recorre de nuevo el origen (op_type=create omite lo copiado).
+    """
+    return {
+        'bool': {
+            'filter': [query_dict.get('query', {'match_all': {}})],
+            'must_not': [{'term': {campo_version(campo): VERSION_PIPELINE}}]
+        }
+    }
+
+
+def resumir_tarea(respuesta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Progreso de una tarea de relleno en un formato común
+
+    Args:
+        respuesta: Respuesta de tasks.get
+
+    Returns:
+        dict: completada, total, procesados, conflictos, segundos, fallos
+        (número de documentos rechazados) y error
+    """
+    tarea = respuesta.get('task') or {}
+    estado = tarea.get('status') or {}
+    final = respuesta.get('response') or {}
+    return {
+        'completada': bool(respuesta.get('completed')),
+        'total': estado.get('total', 0),
+        'procesados': sum(estado.get(k, 0) for k in ('created', 'updated', 'deleted', 'noops')),
+        'conflictos': estado.get('version_conflicts', 0),
+        'segundos': tarea.get('running_time_in_nanos', 0) / 1e9,
+        'fallos': len(final.get('failures') or []),
+        'error': respuesta.get('error')
+    }
+
+
+def _clave_valores(valores: List[Tuple[str, Any]]) -> set:
+    """Pares tal y como quedarían en la salida, comparables aunque sean listas u objetos"""
+    return {(field, json.dumps(clave_valor(value), sort_keys=True)) for field, value in valores}
+
+
+def comparar_documento(
+    message: str,
+    source: Dict[str, Any],
+    campo: str = CAMPO_DESTINO
+) -> Optional[Dict[str, Any]]:
+    """
+    Compara los pares del pipeline con los que extrae el procesador en Python
+
+    Args:
+        message: Mensaje original
+        source: _source del documento tras el pipeline (_simulate)
+        campo: Campo de pares
+
+    Returns:
+        dict: Diferencia (message, esperado, obtenido), o None si coinciden
+    """
+    esperado = [(v['field'], v['value']) for v in procesar_mensaje(message)]
+    pares = source.get(campo) or []
+    obtenido = [decodificar_par(p) for p in ([pares] if isinstance(pares, str) else pares)]
+    if _clave_valores(esperado) == _clave_valores(obtenido):
+        return None
+    return {'message': message, 'esperado': esperado, 'obtenido': obtenido}
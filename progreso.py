@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Progreso de descargas y procesamiento
+Añade porcentaje y tiempo estimado (ETA) a los mensajes de progreso en cuanto
+se conoce el total de documentos
+"""
+
+import time
+from typing import Callable, Optional
+
+
+def formatear_duracion(segundos: float) -> str:
+    """Formatea una duración como '1h 02m', '3m 05s' o '12s'"""
+    segundos = max(0, int(round(segundos)))
+    horas, resto = divmod(segundos, 3600)
+    minutos, segundos = divmod(resto, 60)
+    if horas:
+        return f"{horas}h {minutos:02d}m"
+    if minutos:
+        return f"{minutos}m {segundos:02d}s"
+    return f"{segundos}s"
+
+
+class Progreso:
+    """Porcentaje y ETA de una descarga cuyo total puede llegar más tarde"""
+    
+    def __init__(self, obtener_total: Optional[Callable[[], Optional[int]]] = None):
+        """
+        Inicializa el seguimiento
+        
+        Args:
+            obtener_total: Función que devuelve el total de documentos o None
+                mientras no se conozca (p. ej. ElasticsearchClient.get_known_total)
+        """
+        self.obtener_total = obtener_total
+        self.total: Optional[int] = None
+        self.inicio = time.monotonic()
+    
+    def describir(self, hechos: int) -> str:
+        """
+        Sufijo de progreso para un mensaje
+        
+        Args:
+            hechos: Documentos completados en esta ejecución
+            
+        Returns:
+            str: ' (12.0% de 100,000, ETA 3m 05s)', o '' si el total no se conoce
+        """
+        if self.total is None and self.obtener_total is not None:
+            self.total = self.obtener_total()
+        if not self.total or hechos <= 0:
+            return ""
+        
+        porcentaje = min(100.0, 100.0 * hechos / self.total)
+        transcurrido = time.monotonic() - self.inicio
+        eta = transcurrido * max(0, self.total - hechos) / hechos
+        return f" ({porcentaje:.1f}% de {self.total:,}, ETA {formatear_duracion(eta)})"
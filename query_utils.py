@@ -0,0 +1,511 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Utilidades para manipular queries de Elasticsearch
+Resolución de fechas relativas (date math), rangos de @timestamp, claves de query
+y reescritura de formas costosas (wildcard con comodín inicial) a equivalentes baratos
+"""
+
+import copy
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+
+CAMPO_TIMESTAMP = '@timestamp'
+
+# Tokens de date math: "-7d", "+1h", "/d"
+_PATRON_OPERACION = re.compile(r'([+-]\d+|/)([yMwdhHms])')
+
+_UNIDADES_FIJAS = {
+    'w': timedelta(weeks=1),
+    'd': timedelta(days=1),
+    'h': timedelta(hours=1),
+    'H': timedelta(hours=1),
+    'm': timedelta(minutes=1),
+    's': timedelta(seconds=1),
+}
+
+
+def _sumar_meses(fecha: datetime, meses: int) -> datetime:
+    """Suma meses respetando el último día de cada mes"""
+    total = fecha.year * 12 + (fecha.month - 1) + meses
+    anio, mes = divmod(total, 12)
+    mes += 1
+    # Último día del mes destino
+    siguiente = datetime(anio + (mes // 12), (mes % 12) + 1, 1, tzinfo=fecha.tzinfo)
+    ultimo_dia = (siguiente - timedelta(days=1)).day
+    return fecha.replace(year=anio, month=mes, day=min(fecha.day, ultimo_dia))
+
+
+def _redondear(fecha: datetime, unidad: str, hacia_arriba: bool) -> datetime:
+    """Redondea una fecha a la unidad indicada (como '/d' en date math)"""
+    if unidad == 'y':
+        inicio = fecha.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        siguiente = inicio.replace(year=inicio.year + 1)
+    elif unidad == 'M':
+        inicio = fecha.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        siguiente = _sumar_meses(inicio, 1)
+    elif unidad == 'w':
+        inicio = (fecha - timedelta(days=fecha.weekday())).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        siguiente = inicio + timedelta(weeks=1)
+    elif unidad == 'd':
+        inicio = fecha.replace(hour=0, minute=0, second=0, microsecond=0)
+        siguiente = inicio + timedelta(days=1)
+    elif unidad in ('h', 'H'):
+        inicio = fecha.replace(minute=0, second=0, microsecond=0)
+        siguiente = inicio + timedelta(hours=1)
+    elif unidad == 'm':
+        inicio = fecha.replace(second=0, microsecond=0)
+        siguiente = inicio + timedelta(minutes=1)
+    else:
+        inicio = fecha.replace(microsecond=0)
+        siguiente = inicio + timedelta(seconds=1)
+
+    if hacia_arriba:
+        return siguiente - timedelta(milliseconds=1)
+    return inicio
+
+
+def _aplicar_date_math(base: datetime, expresion: str, hacia_arriba: bool) -> datetime:
+    """Aplica operaciones de date math ("-7d/d") sobre una fecha base"""
+    fecha = base
+    posicion = 0
+    for match in _PATRON_OPERACION.finditer(expresion):
+        if match.start() != posicion:
+            raise ValueError(f"Expresión de fecha no soportada: {expresion}")
+        posicion = match.end()
+        operacion, unidad = match.groups()
+
+        if operacion == '/':
+            fecha = _redondear(fecha, unidad, hacia_arriba)
+            continue
+
+        cantidad = int(operacion)
+        if unidad == 'y':
+            fecha = _sumar_meses(fecha, cantidad * 12)
+        elif unidad == 'M':
+            fecha = _sumar_meses(fecha, cantidad)
+        else:
+            fecha = fecha + cantidad * _UNIDADES_FIJAS[unidad]
+
+    if posicion != len(expresion):
+        raise ValueError(f"Expresión de fecha no soportada: {expresion}")
+    return fecha
+
+
+def parsear_fecha(
+    valor: Any,
+    ahora: Optional[datetime] = None,
+    hacia_arriba: bool = False
+) -> datetime:
+    """
+    Convierte un valor de fecha de Elasticsearch a datetime UTC
+
+    Soporta epoch_millis, fechas ISO 8601 y date math ("now-7d/d", "2026-02-10||+1d").
+
+    Args:
+        valor: Valor del rango (str o número)
+        ahora: Instante de referencia para "now" (por defecto, el actual)
+        hacia_arriba: Redondear hacia arriba (semántica de 'lte' y 'gt')
+
+    Returns:
+        datetime: Fecha con zona horaria UTC
+
+    Raises:
+        ValueError: Si el valor no se puede interpretar
+    """
+    if isinstance(valor, (int, float)):
+        return datetime.fromtimestamp(valor / 1000, tz=timezone.utc)
+
+    texto = str(valor).strip()
+    if texto.isdigit():
+        return datetime.fromtimestamp(int(texto) / 1000, tz=timezone.utc)
+
+    if texto.startswith('now'):
+        base = ahora or datetime.now(timezone.utc)
+        return _aplicar_date_math(base, texto[3:], hacia_arriba)
+
+    anclaje, _, expresion = texto.partition('||')
+    fecha = datetime.fromisoformat(anclaje.replace('Z', '+00:00'))
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    fecha = fecha.astimezone(timezone.utc)
+
+    # Las fechas sin hora con 'lte'/'gt' cubren el día completo
+    if hacia_arriba and 'T' not in anclaje and len(anclaje) <= 10:
+        fecha = _redondear(fecha, 'd', hacia_arriba=True)
+
+    return _aplicar_date_math(fecha, expresion, hacia_arriba)
+
+
+def a_epoch_millis(fecha: datetime) -> int:
+    """Convierte un datetime a milisegundos desde epoch"""
+    return int(round(fecha.timestamp() * 1000))
+
+
+def formatear_fecha(fecha: datetime) -> str:
+    """Formatea un datetime como ISO 8601 con milisegundos (strict_date_optional_time)"""
+    return fecha.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.') + \
+        f"{fecha.microsecond // 1000:03d}Z"
+
+
+def _iterar_clausulas_rango(nodo: Any, campo: str):
+    """Recorre toda la query y produce cada cláusula {"range": {campo: {...}}}"""
+    if isinstance(nodo, dict):
+        rango = nodo.get('range')
+        if isinstance(rango, dict) and isinstance(rango.get(campo), dict):
+            yield rango
+        for valor in nodo.values():
+            yield from _iterar_clausulas_rango(valor, campo)
+    elif isinstance(nodo, list):
+        for elemento in nodo:
+            yield from _iterar_clausulas_rango(elemento, campo)
+
+
+def _iterar_rangos_obligatorios(nodo: Any, campo: str):
+    """
+    Produce los rangos sobre el campo que todo documento devuelto cumple
+
+    Solo sigue la raíz de la query y bool.filter/bool.must: un rango dentro de
+    must_not, should o de un nested/function_score no acota los documentos.
+    """
+    if not isinstance(nodo, dict):
+        return
+    rango = nodo.get('range')
+    if isinstance(rango, dict) and isinstance(rango.get(campo), dict):
+        yield rango
+    booleana = nodo.get('bool')
+    if isinstance(booleana, dict):
+        for ocurrencia in ('filter', 'must'):
+            clausulas = booleana.get(ocurrencia) or []
+            if isinstance(clausulas, dict):
+                clausulas = [clausulas]
+            for clausula in clausulas:
+                yield from _iterar_rangos_obligatorios(clausula, campo)
+
+
+def _limites_en_millis(
+    limites: Dict[str, Any],
+    ahora: Optional[datetime] = None
+) -> Tuple[Optional[int], Optional[int]]:
+    """Convierte los límites de un rango a [inicio, fin) en epoch_millis"""
+    inicio = None
+    fin = None
+    if 'gte' in limites:
+        inicio = a_epoch_millis(parsear_fecha(limites['gte'], ahora))
+    if 'gt' in limites:
+        valor = a_epoch_millis(parsear_fecha(limites['gt'], ahora, hacia_arriba=True)) + 1
+        inicio = valor if inicio is None else max(inicio, valor)
+    if 'lt' in limites:
+        fin = a_epoch_millis(parsear_fecha(limites['lt'], ahora))
+    if 'lte' in limites:
+        valor = a_epoch_millis(parsear_fecha(limites['lte'], ahora, hacia_arriba=True)) + 1
+        fin = valor if fin is None else min(fin, valor)
+    return inicio, fin
+
+
+def resolver_fechas_relativas(
+    query_dict: Dict[str, Any],
+    ahora: Optional[datetime] = None,
+    campo: str = CAMPO_TIMESTAMP
+) -> Dict[str, Any]:
+    """
+    Congela las expresiones "now..." de los rangos sobre el campo de tiempo
+
+    Permite repetir una misma query más tarde (reanudación, caché) sobre
+    exactamente la misma ventana temporal.
+
+    Args:
+        query_dict: Query de Elasticsearch
+        ahora: Instante de referencia (por defecto, el actual)
+        campo: Campo de fecha a resolver
+
+    Returns:
+        dict: Copia de la query con fechas absolutas
+    """
+    ahora = ahora or datetime.now(timezone.utc)
+    resultado = copy.deepcopy(query_dict)
+
+    for rango in _iterar_clausulas_rango(resultado, campo):
+        limites = rango[campo]
+        for operador in ('gte', 'gt', 'lte', 'lt'):
+            valor = limites.get(operador)
+            if isinstance(valor, str) and valor.strip().startswith('now'):
+                hacia_arriba = operador in ('lte', 'gt')
+                limites[operador] = formatear_fecha(
+                    parsear_fecha(valor, ahora, hacia_arriba)
+                )
+
+    return resultado
+
+
+def extraer_rango_timestamp(
+    query_dict: Dict[str, Any],
+    ahora: Optional[datetime] = None,
+    campo: str = CAMPO_TIMESTAMP
+) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Obtiene el rango [inicio, fin) en epoch_millis del filtro de tiempo de la query
+
+    Solo cuentan los rangos obligatorios (raíz, bool.filter y bool.must); los de
+    must_not o should no acotan los documentos que devuelve la query.
+
+    Args:
+        query_dict: Query de Elasticsearch
+        ahora: Instante de referencia para "now"
+        campo: Campo de fecha
+
+    Returns:
+        tuple: (inicio_ms, fin_ms) con fin exclusivo; None si no hay límite
+    """
+    inicio = None
+    fin = None
+
+    for rango in _iterar_rangos_obligatorios(query_dict.get('query'), campo):
+        desde, hasta = _limites_en_millis(rango[campo], ahora)
+        if desde is not None:
+            inicio = desde if inicio is None else max(inicio, desde)
+        if hasta is not None:
+            fin = hasta if fin is None else min(fin, hasta)
+
+    return inicio, fin
+
+
+def agregar_filtro(query_dict: Dict[str, Any], filtro: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Añade una cláusula en contexto filter sin alterar la semántica de la query original
+
+    Args:
+        query_dict: Query de Elasticsearch (cuerpo completo)
+        filtro: Cláusula a añadir, p. ej. {"range": {...}}
+
+    Returns:
+        dict: Copia de la query con el filtro añadido
+    """
+    resultado = copy.deepcopy(query_dict)
+    query = resultado.get('query')
+
+    if query is None:
+        resultado['query'] = {'bool': {'filter': [filtro]}}
+    elif list(query.keys()) == ['bool']:
+        filtros = query['bool'].get('filter', [])
+        if isinstance(filtros, dict):
+            filtros = [filtros]
+        query['bool']['filter'] = list(filtros) + [filtro]
+    else:
+        resultado['query'] = {'bool': {'must': [query], 'filter': [filtro]}}
+
+    return resultado
+
+
+def desplazar_inicio_rango(
+    query_dict: Dict[str, Any],
+    desde_ms: int,
+    campo: str = CAMPO_TIMESTAMP
+) -> Dict[str, Any]:
+    """
+    Adelanta el inicio de los rangos sobre el campo de tiempo hasta desde_ms
+
+    Los rangos que ya empiezan después se respetan, y los de must_not o should
+    no se tocan; si la query no filtra por el campo, se añade el rango en
+    contexto filter.
+
+    Args:
+        query_dict: Query de Elasticsearch
+        desde_ms: Nuevo inicio (inclusivo) en epoch_millis
+        campo: Campo de fecha
+
+    Returns:
+        dict: Copia de la query con el rango reescrito
+    """
+    resultado = copy.deepcopy(query_dict)
+    desde = formatear_fecha(parsear_fecha(desde_ms))
+    encontrado = False
+
+    for rango in _iterar_rangos_obligatorios(resultado.get('query'), campo):
+        encontrado = True
+        limites = rango[campo]
+        inicio, _ = _limites_en_millis(limites)
+        if inicio is not None and inicio >= desde_ms:
+            continue
+        limites.pop('gt', None)
+        limites['gte'] = desde
+        formato = limites.get('format')
+        if formato and 'strict_date_optional_time' not in formato:
+            limites['format'] = f"{formato}||strict_date_optional_time"
+
+    if not encontrado:
+        resultado = agregar_filtro(resultado, {'range': {campo: {'gte': desde}}})
+    return resultado
+
+
+def clave_query(query_dict: Dict[str, Any], index: str) -> str:
+    """
+    Genera una clave estable (hash) para una combinación query + índice
+
+    Args:
+        query_dict: Query de Elasticsearch
+        index: Patrón de índices
+
+    Returns:
+        str: Hash SHA-256 en hexadecimal (16 caracteres)
+    """
+    normalizada = json.dumps(
+        {'query': query_dict, 'index': index},
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(normalizada.encode('utf-8')).hexdigest()[:16]
+
+
+def _leer_wildcard(cuerpo: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """Devuelve (campo, patrón) de una cláusula wildcard simple, o None"""
+    if len(cuerpo) != 1:
+        return None
+    campo, valor = next(iter(cuerpo.items()))
+    if isinstance(valor, dict):
+        if set(valor) - {'value', 'wildcard', 'boost'}:
+            return None
+        valor = valor.get('value', valor.get('wildcard'))
+    if not isinstance(valor, str):
+        return None
+    return campo, valor
+
+
+def campos_con_wildcard(query_dict: Dict[str, Any]) -> List[str]:
+    """
+    Lista los campos usados en cláusulas wildcard de la query
+
+    Args:
+        query_dict: Query de Elasticsearch
+
+    Returns:
+        list: Campos sin repetir, en orden de aparición
+    """
+    campos: List[str] = []
+
+    def recorrer(nodo: Any) -> None:
+        if isinstance(nodo, dict):
+            wildcard = nodo.get('wildcard')
+            if isinstance(wildcard, dict):
+                leido = _leer_wildcard(wildcard)
+                if leido and leido[0] not in campos:
+                    campos.append(leido[0])
+            for valor in nodo.values():
+                recorrer(valor)
+        elif isinstance(nodo, list):
+            for elemento in nodo:
+                recorrer(elemento)
+
+    recorrer(query_dict.get('query'))
+    return campos
+
+
+def _optimizar_wildcard(
+    cuerpo: Dict[str, Any],
+    tipos_campos: Dict[str, str],
+    cambios: List[str],
+    parametros_campos: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Optional[Dict[str, Any]]:
+    """Reescribe una cláusula wildcard según el tipo del campo, o None si no aplica"""
+    leido = _leer_wildcard(cuerpo)
+    if leido is None:
+        return None
+    campo, patron = leido
+
+    # Solo un keyword compara el valor completo igual que un subcampo wildcard;
+    # sobre un text el wildcard se evalúa contra cada término analizado
+    if tipos_campos.get(campo) != 'keyword' or parametros_campos is None:
+        return None
+
+    # Subcampo de tipo wildcard: mismo patrón, resuelto con su índice de n-gramas.
+    # Con otro ignore_above o normalizer indexaría valores distintos
+    for nombre, tipo in sorted(tipos_campos.items()):
+        if tipo != 'wildcard' or not nombre.startswith(f"{campo}."):
+            continue
+        if campo not in parametros_campos or nombre not in parametros_campos:
+            continue
+        if parametros_campos[campo] != parametros_campos[nombre]:
+            continue
+        cambios.append(f"wildcard '{patron}' en {campo} → subcampo wildcard {nombre}")
+        return {'wildcard': {nombre: {'value': patron}}}
+
+    # Sin subcampo wildcard no hay reescritura equivalente: un match_phrase
+    # compara tokens analizados completos, no subcadenas de cada término
+    return None
+
+
+def _optimizar_nodo(
+    nodo: Any,
+    tipos_campos: Dict[str, str],
+    cambios: List[str],
+    parametros_campos: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Any:
+    """Aplica las reglas de optimización a una cláusula y a sus hijas"""
+    if not isinstance(nodo, dict) or len(nodo) != 1:
+        return nodo
+    tipo, cuerpo = next(iter(nodo.items()))
+
+    if tipo == 'wildcard' and isinstance(cuerpo, dict):
+        return _optimizar_wildcard(cuerpo, tipos_campos, cambios, parametros_campos) or nodo
+
+    if tipo != 'bool' or not isinstance(cuerpo, dict):
+        return nodo
+
+    for ocurrencia in ('must', 'filter', 'should', 'must_not'):
+        clausulas = cuerpo.get(ocurrencia)
+        if clausulas is None:
+            continue
+        if isinstance(clausulas, dict):
+            clausulas = [clausulas]
+        cuerpo[ocurrencia] = [
+            _optimizar_nodo(c, tipos_campos, cambios, parametros_campos) for c in clausulas
+        ]
+
+    # El extractor no usa _score: en contexto filter no se puntúa y se cachea
+    if cuerpo.get('must'):
+        cambios.append(f"{len(cuerpo['must'])} cláusula(s) de must → filter")
+        cuerpo['filter'] = cuerpo.pop('must') + cuerpo.get('filter', [])
+
+    return nodo
+
+
+def optimizar_query(
+    query_dict: Dict[str, Any],
+    tipos_campos: Optional[Dict[str, str]] = None,
+    parametros_campos: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Reescribe formas de query costosas en equivalentes más baratos
+
+    Reglas:
+      - must → filter: sin cálculo de score y con caché de filtros por segmento
+      - wildcard sobre un keyword con subcampo de tipo wildcard → ese subcampo
+
+    Solo se aplican reescrituras que devuelven los mismos documentos. La
+    regla de wildcard solo se aplica si se conoce el tipo de los campos
+    (ver ElasticsearchClient.get_field_types) y el campo y el subcampo tienen
+    el mismo ignore_above y normalizer (ver get_field_mapping_params).
+
+    Args:
+        query_dict: Query de Elasticsearch
+        tipos_campos: Campo -> tipo del mapping (incluidos subcampos)
+        parametros_campos: Campo -> {ignore_above, normalizer} del mapping
+
+    Returns:
+        tuple: (copia de la query reescrita, descripción de cada cambio)
+    """
+    resultado = copy.deepcopy(query_dict)
+    cambios: List[str] = []
+    if 'query' in resultado:
+        resultado['query'] = _optimizar_nodo(
+            resultado['query'], tipos_campos or {}, cambios, parametros_campos
+        )
+    return resultado, cambios
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Escritura de CSV por lotes, con búfer grande y compresión opcional
+La extensión de la ruta decide el formato (.gz → gzip, .zst → zstd). La
+compresión y la escritura en disco corren en un hilo aparte, solapadas con
+la descarga de la página siguiente (zlib y zstandard liberan el GIL)
+"""
+
+import csv
+import gzip
+import io
+import queue
+import threading
+import zlib
+from typing import Any, List, Optional, Sequence, TextIO
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depende del entorno
+    zstandard = None
+
+# Búfer del archivo en disco: pocas llamadas a write aunque los lotes sean pequeños
+TAMANO_BUFFER = 1024 * 1024
+
+# Lotes pendientes de comprimir; si la compresión no da abasto, frena la descarga
+BLOQUES_EN_COLA = 8
+
+NIVEL_GZIP = 6
+NIVEL_ZSTD = 3
+
+
+def formato_compresion(ruta: str) -> Optional[str]:
+    """
+    Formato de compresión según la extensión
+
+    Returns:
+        str: 'gzip' (.gz), 'zstd' (.zst, .zstd) o None (sin comprimir)
+    """
+    ruta = str(ruta).lower()
+    if ruta.endswith('.gz'):
+        return 'gzip'
+    if ruta.endswith(('.zst', '.zstd')):
+        return 'zstd'
+    return None
+
+
+def _comprobar_zstd() -> None:
+    """Error claro si se pide .zst sin la dependencia opcional"""
+    if zstandard is None:
+        raise ValueError("❌ Para leer o escribir .zst instala zstandard: pip install zstandard")
+
+
+class SalidaBinaria:
+    """Archivo de salida en bytes, comprimido en segundo plano según la extensión"""
+
+    def __init__(self, ruta: str):
+        """
+        Abre el archivo de salida
+
+        Args:
+            ruta: Ruta del archivo; .gz y .zst activan la compresión
+
+        Raises:
+            ValueError: Si se pide .zst y zstandard no está instalado
+        """
+        self.formato = formato_compresion(ruta)
+        if self.formato == 'zstd':
+            _comprobar_zstd()
+        self._archivo = open(ruta, 'wb', buffering=TAMANO_BUFFER)
+        self._error: Optional[BaseException] = None
+        self._cola: Optional[queue.Queue] = None
+        self._hilo: Optional[threading.Thread] = None
+        if self.formato is None:
+            return
+
+        if self.formato == 'gzip':
+            # wbits=31: flujo deflate con cabecera gzip, legible con gzip.open
+            self._compresor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+        else:
+            self._compresor = zstandard.ZstdCompressor(level=NIVEL_ZSTD).compressobj()
+        self._cola = queue.Queue(maxsize=BLOQUES_EN_COLA)
+        self._hilo = threading.Thread(target=self._comprimir, name='compresion-csv', daemon=True)
+        self._hilo.start()
+
+    def write(self, datos: bytes) -> None:
+        """
+        Escribe un bloque (comprimido en segundo plano si procede)
+
+        Raises:
+            Exception: El error del hilo de compresión, si falló (p. ej. disco lleno)
+        """
+        if self._error is not None:
+            raise self._error
+        if not datos:
+            return
+        if self._cola is None:
+            self._archivo.write(datos)
+        else:
+            self._cola.put(datos)
+
+    def close(self) -> None:
+        """Termina la compresión pendiente y cierra el archivo"""
+        try:
+            if self._hilo is not None:
+                self._cola.put(None)
+                self._hilo.join()
+                self._hilo = None
+        finally:
+            self._archivo.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self) -> 'SalidaBinaria':
+        return self
+
+    def __exit__(self, *excepcion) -> None:
+        self.close()
+
+    def _comprimir(self) -> None:
+        """Hilo de compresión: comprime y escribe los bloques en orden"""
+        terminado = False
+        try:
+            while True:
+                bloque = self._cola.get()
+                if bloque is None:
+                    terminado = True
+                    break
+                self._archivo.write(self._compresor.compress(bloque))
+            self._archivo.write(self._compresor.flush())
+        except BaseException as e:
+            self._error = e
+            # Seguir vaciando la cola para que el productor no se quede bloqueado
+            while not terminado and self._cola.get() is not None:
+                pass
+
+
+class EscritorCsv:
+    """CSV escrito por lotes (writerows) sobre una SalidaBinaria"""
+
+    def __init__(self, ruta: str):
+        """
+        Abre el CSV de salida
+
+        Args:
+            ruta: Ruta del archivo (.csv, .csv.gz o .csv.zst)
+        """
+        self.salida = SalidaBinaria(ruta)
+        self._texto = io.StringIO()
+        self._writer = csv.writer(self._texto)
+
+    def escribir_filas(self, filas: Sequence[Sequence[Any]]) -> None:
+        """Codifica un lote de filas de una vez y lo entrega a la salida"""
+        self._writer.writerows(filas)
+        self.salida.write(self._texto.getvalue().encode('utf-8'))
+        self._texto.seek(0)
+        self._texto.truncate()
+
+    def escribir_cabecera(self, columnas: List[str]) -> None:
+        """Escribe la fila de nombres de columna"""
+        self.escribir_filas([columnas])
+
+    def close(self) -> None:
+        """Cierra la salida (espera a la compresión pendiente)"""
+        self.salida.close()
+
+    def __enter__(self) -> 'EscritorCsv':
+        return self
+
+    def __exit__(self, *excepcion) -> None:
+        self.close()
+
+
+def abrir_csv_texto(ruta: str) -> TextIO:
+    """
+    Abre un CSV para lectura, descomprimiendo .gz y .zst sobre la marcha
+
+    Returns:
+        TextIO: Archivo de texto (utf-8, sin BOM) listo para csv.reader
+
+    Raises:
+        ValueError: Si es .zst y zstandard no está instalado
+    """
+    formato = formato_compresion(ruta)
+    if formato == 'gzip':
+        return gzip.open(ruta, 'rt', encoding='utf-8-sig', newline='')
+    if formato == 'zstd':
+        _comprobar_zstd()
+        lector = zstandard.ZstdDecompressor().stream_reader(open(ruta, 'rb'))
+        return io.TextIOWrapper(lector, encoding='utf-8-sig', newline='')
+    return open(ruta, 'r', encoding='utf-8-sig', newline='')
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Serializadores JSON para el transporte de Elasticsearch
+Decodifica las páginas de respuesta con orjson si está instalado y, si no,
+con el módulo json estándar, sin que cambie ningún llamador
+"""
+
+from typing import Any
+
+from elasticsearch.serializer import JsonSerializer, TextSerializer
+from elastic_transport import SerializationError
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+# Claves no-str (p. ej. int) como hace json.dumps
+_OPCIONES_ORJSON = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+class FastJsonSerializer(JsonSerializer):
+    """Serializador application/json basado en orjson con fallback a json estándar"""
+    
+    mimetype = 'application/json'
+    
+    @property
+    def usa_orjson(self) -> bool:
+        """Indica si orjson está disponible"""
+        return orjson is not None
+    
+    def loads(self, data: bytes) -> Any:
+        """Decodifica el cuerpo de una respuesta"""
+        if orjson is None:
+            return super().loads(data)
+        
+        # Algunas respuestas declaran JSON pero llegan vacías
+        if data == b"":
+            return None
+        
+        try:
+            return orjson.loads(data)
+        except (ValueError, TypeError) as e:
+            raise SerializationError(
+                message=f"Unable to deserialize as JSON: {data!r}", errors=(e,)
+            )
+    
+    def dumps(self, data: Any) -> bytes:
+        """Codifica el cuerpo de una petición"""
+        if orjson is None or isinstance(data, (str, bytes)):
+            return super().dumps(data)
+        
+        try:
+            return orjson.dumps(data, default=self.default, option=_OPCIONES_ORJSON)
+        except TypeError:
+            # Enteros de más de 64 bits u otros tipos que orjson no admite
+            return super().dumps(data)
+
+
+class RawJsonSerializer(FastJsonSerializer):
+    """Serializador que entrega las respuestas JSON como bytes sin decodificar"""
+    
+    def loads(self, data: bytes) -> Any:
+        """Devuelve el cuerpo tal cual (lo parsea hit_parser de forma incremental)"""
+        return data
+
+
+class RawTextSerializer(TextSerializer):
+    """Serializador que entrega las respuestas de texto (csv, tsv) como bytes"""
+    
+    def loads(self, data: bytes) -> Any:
+        """Devuelve el cuerpo tal cual (exportador_sql lo escribe directamente)"""
+        return data
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tamaño de página adaptativo para scroll y search_after
+Ajusta los documentos por página según la latencia y los bytes observados
+(AIMD: aumento aditivo mientras las páginas son rápidas, reducción
+multiplicativa ante páginas lentas o enormes, timeouts y circuit breakers)
+"""
+
+import threading
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from elasticsearch.exceptions import ConnectionTimeout
+
+ERROR_CIRCUIT_BREAKER = 'circuit_breaking_exception'
+
+
+def es_error_de_sobrecarga(error: Exception) -> bool:
+    """
+    Indica si un error se debe a una página demasiado grande para el cluster
+
+    Args:
+        error: Excepción de una búsqueda
+
+    Returns:
+        bool: True para timeouts y circuit_breaking_exception
+    """
+    if isinstance(error, ConnectionTimeout):
+        return True
+    return ERROR_CIRCUIT_BREAKER in str(getattr(error, 'error', '')) or \
+        ERROR_CIRCUIT_BREAKER in str(error)
+
+
+class TamanoPaginaAdaptativo:
+    """Controlador AIMD del tamaño de página, compartido por todas las descargas"""
+
+    def __init__(
+        self,
+        inicial: int,
+        minimo: int,
+        maximo: int,
+        objetivo_segundos: float = 2.0,
+        max_bytes: Optional[int] = None,
+        activo: bool = True
+    ):
+        """
+        Inicializa el controlador
+
+        Args:
+            inicial: Tamaño de la primera página (ELASTICSEARCH_SCROLL_SIZE)
+            minimo: Tamaño mínimo
+            maximo: Tamaño máximo
+            objetivo_segundos: Latencia por página por encima de la cual se reduce
+            max_bytes: Bytes por página por encima de los cuales se reduce (opcional)
+            activo: False mantiene siempre el tamaño inicial
+        """
+        self.minimo = max(1, min(minimo, maximo))
+        self.maximo = max(maximo, self.minimo)
+        self.inicial = min(max(inicial, self.minimo), self.maximo) if activo else inicial
+        self.objetivo_segundos = objetivo_segundos
+        self.max_bytes = max_bytes
+        self.activo = activo
+        self.paso = max(1, self.inicial // 4)
+        self.tamano = self.inicial
+        self.paginas_por_tamano: Counter = Counter()
+        self.aumentos = 0
+        self.reducciones = 0
+        self._lock = threading.Lock()
+
+    def observar(self, tamano: int, docs: int, segundos: float, bytes_pagina: Optional[int] = None) -> int:
+        """
+        Ajusta el tamaño con el resultado de una página
+
+        Args:
+            tamano: Tamaño con el que se pidió la página
+            docs: Documentos recibidos
+            segundos: Latencia de la petición
+            bytes_pagina: Bytes de la respuesta, si se conocen
+
+        Returns:
+            int: Tamaño para la siguiente página
+        """
+        with self._lock:
+            self.paginas_por_tamano[tamano] += 1
+            if not self.activo:
+                return self.tamano
+
+            demasiados_bytes = (
+                self.max_bytes is not None and bytes_pagina is not None
+                and bytes_pagina > self.max_bytes
+            )
+            if segundos > self.objetivo_segundos or demasiados_bytes:
+                nuevo = tamano // 2
+                if demasiados_bytes and docs:
+                    # Ajustar directamente a los bytes por documento observados
+                    nuevo = min(nuevo, int(self.max_bytes * docs / bytes_pagina))
+                self._reducir_a(nuevo)
+            elif docs >= tamano and self.tamano < self.maximo:
+                # Página llena y rápida: probablemente caben más documentos
+                self.tamano = min(self.maximo, max(self.tamano, tamano) + self.paso)
+                self.aumentos += 1
+            return self.tamano
+
+    def registrar_paginas(self, tamano: int, paginas: int) -> None:
+        """Cuenta páginas de tamaño fijo (scroll) sin ajustar el tamaño"""
+        if paginas > 0:
+            with self._lock:
+                self.paginas_por_tamano[tamano] += paginas
+
+    def reducir_por_error(self, error: Exception) -> bool:
+        """
+        Reduce el tamaño tras un timeout o circuit breaker
+
+        Args:
+            error: Excepción de la búsqueda
+
+        Returns:
+            bool: True si la página se puede reintentar con un tamaño menor;
+            False si el error es de otro tipo o ya se está en el mínimo
+        """
+        if not self.activo or not es_error_de_sobrecarga(error):
+            return False
+        with self._lock:
+            if self.tamano <= self.minimo:
+                return False
+            self._reducir_a(self.tamano // 2)
+            return True
+
+    def resumen(self) -> Dict[str, Any]:
+        """Tamaños usados en la ejecución, para las estadísticas"""
+        with self._lock:
+            usados = sorted(self.paginas_por_tamano)
+            return {
+                'inicial': self.inicial,
+                'final': self.tamano,
+                'minimo_usado': usados[0] if usados else None,
+                'maximo_usado': usados[-1] if usados else None,
+                'paginas_por_tamano': dict(sorted(self.paginas_por_tamano.items())),
+                'aumentos': self.aumentos,
+                'reducciones': self.reducciones
+            }
+
+    def _reducir_a(self, nuevo: int) -> None:
+        """Reducción multiplicativa acotada al mínimo (con el lock tomado)"""
+        nuevo = max(self.minimo, nuevo)
+        if nuevo < self.tamano:
+            self.reducciones += 1
+        self.tamano = min(self.tamano, nuevo)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo busqueda_asincrona
+"""
+
+from unittest.mock import Mock
+
+import pytest
+from elasticsearch.exceptions import NotFoundError
+import busqueda_asincrona
+
+
+def respuesta_asincrona(en_curso, completados=0, total_hits=None, aggs=None):
+    """Respuesta de _async_search con el progreso indicado"""
+    cuerpo = {'took': 10, '_shards': {'total': 4, 'successful': completados, 'skipped': 0, 'failed': 0}}
+    if total_hits is not None:
+        cuerpo['hits'] = {'total': {'value': total_hits, 'relation': 'eq'}, 'hits': []}
+    if aggs is not None:
+        cuerpo['aggregations'] = aggs
+    return {'id': 'FmRl', 'is_running': en_curso, 'is_partial': en_curso, 'response': cuerpo}
+
+
+class TestResumir:
+    """Tests para el estado normalizado"""
+    
+    def test_resume_progreso_y_total(self):
+        """Test: Extrae id, shards completados y total de hits"""
+        estado = busqueda_asincrona.resumir(respuesta_asincrona(True, completados=3, total_hits=120))
+        
+        assert estado['id'] == 'FmRl'
+        assert estado['en_curso'] and estado['parcial']
+        assert estado['shards'] == {'completados': 3, 'total': 4}
+        assert estado['total_hits'] == 120
+        assert estado['error'] is None
+    
+    def test_respuesta_sin_cuerpo(self):
+        """Test: Una respuesta sin 'response' no rompe el resumen"""
+        estado = busqueda_asincrona.resumir({'id': 'x', 'is_running': True})
+        
+        assert estado['total_hits'] is None
+        assert estado['respuesta'] == {}
+
+
+class TestEnviarYEsperar:
+    """Tests para el envío y el sondeo por id"""
+    
+    def test_envia_con_keep_on_completion(self):
+        """Test: El envío pide conservar el resultado y espera en milisegundos"""
+        es = Mock()
+        es.async_search.submit.return_value = respuesta_asincrona(True)
+        
+        estado = busqueda_asincrona.enviar(es, 'logs-*', {'size': 0}, espera_segundos=1.5)
+        
+        assert estado['en_curso']
+        kwargs = es.async_search.submit.call_args.kwargs
+        assert kwargs['keep_on_completion'] is True
+        assert kwargs['wait_for_completion_timeout'] == '1500ms'
+    
+    def test_espera_hasta_el_final_con_progreso(self):
+        """Test: Sondea por id e informa de cada estado parcial"""
+        es = Mock()
+        es.async_search.get.side_effect = [
+            respuesta_asincrona(True, completados=2, total_hits=50),
+            respuesta_asincrona(False, completados=4, total_hits=100, aggs={'por_nivel': {}})
+        ]
+        progreso = []
+        inicial = busqueda_asincrona.resumir(respuesta_asincrona(True))
+        
+        final = busqueda_asincrona.esperar(es, inicial, espera_segundos=2, al_progreso=progreso.append)
+        
+        assert not final['en_curso']
+        assert final['total_hits'] == 100
+        assert [e['shards']['completados'] for e in progreso] == [0, 2]
+        assert es.async_search.get.call_args.kwargs == {
+            'id': 'FmRl', 'wait_for_completion_timeout': '2000ms'
+        }
+    
+    def test_id_caducado(self):
+        """Test: Un id que ya no existe da un ValueError claro"""
+        es = Mock()
+        es.async_search.get.side_effect = NotFoundError('no', Mock(status=404), {})
+        
+        with pytest.raises(ValueError, match='no encontrada o caducada'):
+            busqueda_asincrona.consultar(es, 'viejo')
+    
+    def test_cancelar(self):
+        """Test: Cancelar devuelve False si el id ya no existe"""
+        es = Mock()
+        assert busqueda_asincrona.cancelar(es, 'FmRl') is True
+        
+        es.async_search.delete.side_effect = NotFoundError('no', Mock(status=404), {})
+        assert busqueda_asincrona.cancelar(es, 'FmRl') is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo cache_paginas
+"""
+
+import os
+import time
+
+import pytest
+from cache_paginas import CachePaginas
+
+
+def envejecer(cache, clave, segundos):
+    """Retrasa la fecha de último uso de una página"""
+    ruta = cache._ruta_pagina(clave)
+    instante = time.time() - segundos
+    os.utime(ruta, (instante, instante))
+
+
+class TestClaves:
+    """Tests para las claves de extracción y de página"""
+    
+    def test_clave_de_pagina_ignora_pit_y_tamano(self):
+        """Test: El PIT y el tamaño no cambian la clave; search_after sí"""
+        body = {'query': {'match_all': {}}, 'sort': ['@timestamp'], 'pit': {'id': 'a'}, 'size': 10}
+        otra = dict(body, pit={'id': 'b'}, size=500, track_total_hits=True)
+        siguiente = dict(body, search_after=[1000, 3])
+        
+        clave = CachePaginas.clave_pagina('x', body, {})
+        assert clave == CachePaginas.clave_pagina('x', otra, {})
+        assert clave != CachePaginas.clave_pagina('x', siguiente, {})
+        assert clave != CachePaginas.clave_pagina('y', body, {})
+        assert clave != CachePaginas.clave_pagina('x', body, {'filter_path': ['hits.hits._id']})
+    
+    def test_clave_de_extraccion_incluye_cluster(self):
+        """Test: La misma query en otro cluster es otra extracción"""
+        query = {'query': {'match_all': {}}}
+        
+        assert CachePaginas.clave_consulta('https://a:9200', query, 'logs-*') != \
+            CachePaginas.clave_consulta('https://b:9200', query, 'logs-*')
+
+
+class TestCachePaginas:
+    """Tests para la clase CachePaginas"""
+    
+    def test_escribe_comprimido_y_lee(self, tmp_path):
+        """Test: La página se guarda comprimida y se lee igual"""
+        cache = CachePaginas(tmp_path)
+        datos = b'{"hits":{"hits":[' + b'{"_id":"1","_source":{"message":"m"}},' * 200 + b'{}]}}'
+        
+        assert cache.leer('ab12') is None
+        cache.escribir('ab12', datos)
+        
+        assert cache.leer('ab12') == datos
+        assert cache.estado()['bytes'] < len(datos)
+        assert cache.resumen()['aciertos'] == 1
+        assert cache.resumen()['fallos'] == 1
+    
+    def test_registra_la_extraccion(self, tmp_path):
+        """Test: La query congelada se guarda y se recupera por clave"""
+        cache = CachePaginas(tmp_path)
+        cache.registrar_consulta('c1', {'query': {'match_all': {}}, 'ventanas': None})
+        
+        assert cache.consulta('c1')['query'] == {'match_all': {}}
+        assert cache.consulta('otra') is None
+        assert cache.estado()['extracciones'] == 1
+    
+    def test_poda_por_antiguedad(self, tmp_path):
+        """Test: Se borran las páginas no usadas en más de max_edad"""
+        cache = CachePaginas(tmp_path, max_edad_segundos=3600)
+        cache.escribir('aa01', b'vieja')
+        cache.escribir('bb02', b'nueva')
+        envejecer(cache, 'aa01', 7200)
+        
+        borradas = cache.podar()
+        
+        assert borradas['paginas'] == 1
+        assert cache.leer('aa01') is None
+        assert cache.leer('bb02') == b'nueva'
+    
+    def test_poda_por_tamano_las_menos_usadas(self, tmp_path):
+        """Test: Por encima del tamaño se borran primero las de uso más antiguo"""
+        cache = CachePaginas(tmp_path)
+        for i, clave in enumerate(['aa01', 'bb02', 'cc03']):
+            cache.escribir(clave, os.urandom(1000))
+            envejecer(cache, clave, 100 - i)
+        tamano = cache.estado()['bytes']
+        
+        cache.podar(max_bytes=tamano - 1)
+        
+        assert cache.estado()['paginas'] == 2
+        assert cache.leer('aa01') is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo checkpoint
+"""
+
+import pytest
+import json
+from checkpoint import Checkpoint, escribir_json_atomico
+
+
+class TestEscribirJsonAtomico:
+    """Tests para la función escribir_json_atomico"""
+    
+    def test_escribe_sin_dejar_temporales(self, tmp_path):
+        """Test: Escribe el JSON y no deja el archivo temporal"""
+        destino = tmp_path / "estado.json"
+        escribir_json_atomico(destino, {"a": 1})
+        
+        assert json.loads(destino.read_text(encoding='utf-8')) == {"a": 1}
+        assert not (tmp_path / "estado.json.tmp").exists()
+
+
+class TestCheckpoint:
+    """Tests para la clase Checkpoint"""
+    
+    def test_guarda_y_carga_estado(self, tmp_path):
+        """Test: El estado sobrevive a un guardado y una carga"""
+        ruta = tmp_path / "salida.json.checkpoint"
+        checkpoint = Checkpoint(str(ruta), clave="abc")
+        checkpoint.query = {"query": {"match_all": {}}}
+        checkpoint.estado['valores_unicos'].update({("id", 100), ("nombre", "x")})
+        checkpoint.estado['registros_procesados'] = 42
+        checkpoint.actualizar_cursor('total', {'ultimo_ts': 1000, 'ids': ['a']})
+        checkpoint.guardar()
+        
+        reanudado = Checkpoint(str(ruta), clave="abc")
+        
+        assert reanudado.cargar() is True
+        assert reanudado.query == {"query": {"match_all": {}}}
+        assert reanudado.estado['valores_unicos'] == {("id", 100), ("nombre", "x")}
+        assert reanudado.estado['registros_procesados'] == 42
+        assert reanudado.cursores['total'] == {'ultimo_ts': 1000, 'ids': ['a']}
+    
+    def test_cargar_sin_archivo(self, tmp_path):
+        """Test: Sin archivo previo no carga nada"""
+        checkpoint = Checkpoint(str(tmp_path / "no_existe"), clave="abc")
+        assert checkpoint.cargar() is False
+    
+    def test_rechaza_checkpoint_de_otra_query(self, tmp_path):
+        """Test: Lanza ValueError si la clave no coincide"""
+        ruta = tmp_path / "cp"
+        Checkpoint(str(ruta), clave="abc").guardar()
+        
+        with pytest.raises(ValueError) as excinfo:
+            Checkpoint(str(ruta), clave="otra").cargar()
+        
+        assert 'otra query' in str(excinfo.value)
+    
+    def test_guardar_si_toca_respeta_intervalo(self, tmp_path):
+        """Test: Solo escribe cuando ha pasado el intervalo"""
+        ruta = tmp_path / "cp"
+        checkpoint = Checkpoint(str(ruta), clave="abc", intervalo=3600)
+        assert checkpoint.guardar_si_toca() is False
+        assert not ruta.exists()
+        
+        checkpoint.intervalo = 0
+        assert checkpoint.guardar_si_toca() is True
+        assert ruta.exists()
+    
+    def test_particion_terminada(self, tmp_path):
+        """Test: Detecta particiones completadas"""
+        checkpoint = Checkpoint(str(tmp_path / "cp"), clave="abc")
+        checkpoint.actualizar_cursor('total', {'terminado': True})
+        
+        assert checkpoint.particion_terminada('total') is True
+        assert checkpoint.particion_terminada('otra') is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
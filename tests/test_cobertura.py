@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo cobertura
+"""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from cobertura import MIN_MUESTRAS, CoberturaPeticiones
+
+
+def crear_cobertura(latencia=0.01, **kwargs):
+    """Política con suficientes muestras para tener umbral"""
+    cobertura = CoberturaPeticiones(**kwargs)
+    cobertura.latencias.extend([latencia] * MIN_MUESTRAS)
+    return cobertura
+
+
+class TestCoberturaPeticiones:
+    """Tests para la clase CoberturaPeticiones"""
+    
+    def test_sin_muestras_no_duplica(self):
+        """Test: Sin latencias suficientes no hay umbral ni duplicados"""
+        cobertura = CoberturaPeticiones()
+        
+        assert cobertura.umbral() is None
+        assert cobertura.ejecutar(lambda intento: intento) == 0
+        assert cobertura.resumen()['duplicadas'] == 0
+        cobertura.cerrar()
+    
+    def test_duplica_la_peticion_lenta_y_gana_el_duplicado(self):
+        """Test: Si la original supera el p95 se lanza un duplicado y se usa el primero"""
+        cobertura = crear_cobertura(presupuesto=1.0)
+        liberar = threading.Event()
+        cancelados = []
+        
+        def peticion(intento):
+            if intento == 0:
+                liberar.wait(5)
+                return 'original'
+            return 'duplicado'
+        
+        def cancelar(intento):
+            cancelados.append(intento)
+            liberar.set()
+        
+        assert cobertura.ejecutar(peticion, cancelar) == 'duplicado'
+        assert liberar.wait(5)
+        cobertura.cerrar()
+        
+        resumen = cobertura.resumen()
+        assert resumen['duplicadas'] == 1
+        assert resumen['ganadas_por_duplicado'] == 1
+        assert cancelados == [0]
+    
+    def test_respeta_el_presupuesto(self):
+        """Test: No se duplica más de la fracción permitida de peticiones"""
+        cobertura = CoberturaPeticiones(presupuesto=0.1)
+        
+        # Todas las peticiones superan el umbral
+        with patch.object(cobertura, 'umbral', return_value=0.0):
+            for _ in range(20):
+                cobertura.ejecutar(lambda intento: time.sleep(0.01))
+        cobertura.cerrar()
+        
+        resumen = cobertura.resumen()
+        assert resumen['peticiones'] == 20
+        assert resumen['duplicadas'] == 2
+        assert resumen['tasa'] == pytest.approx(0.1)
+    
+    def test_sin_duplicado_gratis_al_empezar(self):
+        """Test: Hasta que el presupuesto cubre un duplicado entero no se duplica"""
+        cobertura = CoberturaPeticiones(presupuesto=0.1)
+        
+        with patch.object(cobertura, 'umbral', return_value=0.0):
+            for _ in range(9):
+                cobertura.ejecutar(lambda intento: time.sleep(0.01))
+            assert cobertura.resumen()['duplicadas'] == 0
+            cobertura.ejecutar(lambda intento: time.sleep(0.01))
+        cobertura.cerrar()
+        
+        assert cobertura.resumen()['duplicadas'] == 1
+    
+    def test_error_de_la_original_sin_duplicado(self):
+        """Test: Si la original falla y no hay duplicado se propaga su error"""
+        cobertura = CoberturaPeticiones()
+        
+        def peticion(intento):
+            raise ValueError('fallo')
+        
+        with pytest.raises(ValueError):
+            cobertura.ejecutar(peticion)
+        cobertura.cerrar()
+    
+    def test_inactivo_ejecuta_una_vez(self):
+        """Test: Desactivada, la petición se ejecuta directamente sin contar"""
+        cobertura = crear_cobertura(activo=False)
+        llamadas = []
+        
+        assert cobertura.ejecutar(lambda intento: llamadas.append(intento) or 'ok') == 'ok'
+        assert llamadas == [0]
+        assert cobertura.resumen()['peticiones'] == 0
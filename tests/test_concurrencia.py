@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo concurrencia
+"""
+
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from elasticsearch.exceptions import ApiError
+from concurrencia import LimitadorConcurrencia, es_rechazo
+
+
+def crear_error(estado, tipo):
+    """ApiError con el código HTTP y el tipo de error indicados"""
+    return ApiError(tipo, meta=Mock(status=estado), body={'error': {'type': tipo}})
+
+
+class TestEsRechazo:
+    """Tests para la clasificación de rechazos"""
+    
+    def test_clasifica_errores(self):
+        """Test: 429/503 son rechazos; el circuit breaker y otros errores no"""
+        assert es_rechazo(crear_error(429, 'es_rejected_execution_exception'))
+        assert es_rechazo(crear_error(503, 'search_phase_execution_exception'))
+        assert not es_rechazo(crear_error(429, 'circuit_breaking_exception'))
+        assert not es_rechazo(crear_error(400, 'parsing_exception'))
+        assert not es_rechazo(ValueError('otro'))
+
+
+class TestLimitadorConcurrencia:
+    """Tests para la clase LimitadorConcurrencia"""
+    
+    def test_crece_con_latencia_estable(self):
+        """Test: El límite sube de forma aditiva hasta el máximo"""
+        limitador = LimitadorConcurrencia(maximo=4, inicial=1)
+        
+        for _ in range(20):
+            limitador.ejecutar(lambda: 'ok')
+        
+        assert limitador.resumen()['limite'] == 4
+    
+    def test_reduce_con_latencia_creciente(self):
+        """Test: Una petición mucho más lenta que la media reduce el límite"""
+        limitador = LimitadorConcurrencia(maximo=8, inicial=8)
+        
+        with patch('concurrencia.time.monotonic', side_effect=[0.0, 0.0, 1.0, 1.0, 1.0, 11.0]):
+            limitador.ejecutar(lambda: 'ok')
+            limitador.ejecutar(lambda: 'ok')
+        
+        assert limitador.resumen()['limite'] == 7
+    
+    @patch('concurrencia.time.sleep')
+    def test_reintenta_rechazos_con_backoff(self, mock_sleep):
+        """Test: Un 429 se reintenta tras esperar y reduce el límite a la mitad"""
+        limitador = LimitadorConcurrencia(maximo=8, inicial=8)
+        peticion = Mock(side_effect=[crear_error(429, 'es_rejected_execution_exception'), 'ok'])
+        
+        assert limitador.ejecutar(peticion) == 'ok'
+        
+        resumen = limitador.resumen()
+        assert (resumen['rechazos'], resumen['reintentos'], resumen['limite']) == (1, 1, 4)
+        mock_sleep.assert_called_once()
+    
+    def test_no_reintenta_otros_errores(self):
+        """Test: El circuit breaker de memoria se propaga (lo gestiona el tamaño de página)"""
+        limitador = LimitadorConcurrencia(maximo=4)
+        
+        with pytest.raises(ApiError):
+            limitador.ejecutar(Mock(side_effect=crear_error(429, 'circuit_breaking_exception')))
+        assert limitador.resumen()['reintentos'] == 0
+    
+    @patch('concurrencia.time.sleep')
+    def test_circuit_breaker_pausa_tras_rechazos_seguidos(self, mock_sleep):
+        """Test: N rechazos seguidos abren el breaker y el límite vuelve al mínimo"""
+        limitador = LimitadorConcurrencia(maximo=8, inicial=8, umbral_breaker=2,
+                                          pausa_breaker=30, reintentos=1)
+        rechazo = crear_error(503, 'unavailable')
+        
+        with pytest.raises(ApiError):
+            limitador.ejecutar(Mock(side_effect=rechazo))
+        
+        resumen = limitador.resumen()
+        assert resumen['pausas'] == 1
+        assert resumen['limite'] == 1
+        assert limitador.abierto_hasta > time.monotonic() + 25
+    
+    def test_respeta_el_limite_entre_hilos(self):
+        """Test: Nunca hay más peticiones en vuelo que el límite"""
+        limitador = LimitadorConcurrencia(maximo=2, inicial=2)
+        en_vuelo = []
+        maximo_visto = []
+        lock = threading.Lock()
+        
+        def peticion():
+            with lock:
+                en_vuelo.append(1)
+                maximo_visto.append(len(en_vuelo))
+            time.sleep(0.01)
+            with lock:
+                en_vuelo.pop()
+        
+        hilos = [threading.Thread(target=limitador.ejecutar, args=(peticion,)) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        
+        assert max(maximo_visto) <= 2
+    
+    def test_techo_externo_y_pausa(self):
+        """Test: El tope del monitor limita el hueco y la pausa retiene las peticiones"""
+        limitador = LimitadorConcurrencia(maximo=4, inicial=4)
+        limitador.aplicar_techo(1)
+        limitador._adquirir()
+        
+        hilo = threading.Thread(target=limitador.ejecutar, args=(lambda: 'ok',))
+        hilo.start()
+        hilo.join(timeout=0.1)
+        assert hilo.is_alive()
+        
+        limitador.aplicar_techo(None)
+        hilo.join(timeout=1)
+        assert not hilo.is_alive()
+        
+        limitador.pausar(10)
+        assert limitador.abierto_hasta > time.monotonic() + 5
+    
+    def test_inactivo_no_limita(self):
+        """Test: Desactivado, ejecuta la petición sin contabilizarla"""
+        limitador = LimitadorConcurrencia(maximo=1, activo=False)
+        
+        assert limitador.ejecutar(lambda: 'ok') == 'ok'
+        assert limitador.en_vuelo == 0
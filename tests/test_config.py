@@ -28,6 +28,18 @@ class TestConfig:
             assert config.es_user == 'testuser'
             assert config.es_password == 'testpass'
             assert config.es_index == 'test-logs-*'
+            assert config.es_hosts == ['https://test.example.com']
+    
+    def test_varios_hosts_separados_por_comas(self):
+        """Test: ELASTICSEARCH_HOST admite una lista de nodos"""
+        with patch.dict(os.environ, {
+            'ELASTICSEARCH_HOST': 'https://es1:9200, https://es2:9200,',
+            'ELASTICSEARCH_SNIFF': 'true'
+        }):
+            config = Config()
+            
+            assert config.es_hosts == ['https://es1:9200', 'https://es2:9200']
+            assert config.sniff is True
     
     def test_valores_por_defecto(self):
         """Test: Usa valores por defecto cuando no están definidos"""
@@ -42,6 +54,12 @@ class TestConfig:
             assert config.verify_ssl is True    # Default
             assert config.timeout == 300        # Default
             assert config.scroll_size == 1000   # Default
+            assert config.prune_indices is True # Default
+            assert config.metadata_cache_ttl == 300.0
+            assert config.metadata_cache_persist is True
+            assert config.fast_start is False
+            assert config.adaptive_page_size is True
+            assert (config.scroll_size_min, config.scroll_size_max) == (100, 10000)
     
     def test_convierte_tipos_correctamente(self):
         """Test: Convierte tipos de datos correctamente"""
@@ -61,6 +79,54 @@ class TestConfig:
             assert config.scroll_size == 2000
             assert config.verify_ssl is False
     
+    def test_ajustes_de_transporte(self):
+        """Test: Carga compresión, pool, node_class y serializador"""
+        with patch.dict(os.environ, {
+            'ELASTICSEARCH_HOST': 'https://test.example.com',
+            'ELASTICSEARCH_USER': 'testuser',
+            'ELASTICSEARCH_PASSWORD': 'testpass',
+            'ELASTICSEARCH_HTTP_COMPRESS': 'false',
+            'ELASTICSEARCH_CONNECTIONS_PER_NODE': '32',
+            'ELASTICSEARCH_NODE_CLASS': 'Requests',
+            'ELASTICSEARCH_MAX_RETRIES': '5'
+        }, clear=True):
+            config = Config()
+            
+            assert config.http_compress is False
+            assert config.connections_per_node == 32
+            assert config.node_class == 'requests'
+            assert config.serializer == 'orjson'  # Default
+            assert config.max_retries == 5
+    
+    def test_validate_falla_con_node_class_invalido(self):
+        """Test: Validación falla con un node_class desconocido"""
+        with patch.dict(os.environ, {
+            'ELASTICSEARCH_HOST': 'https://test.example.com',
+            'ELASTICSEARCH_USER': 'testuser',
+            'ELASTICSEARCH_PASSWORD': 'testpass',
+            'ELASTICSEARCH_NODE_CLASS': 'httpx'
+        }):
+            config = Config()
+            is_valid, error_msg = config.validate()
+            
+            assert is_valid is False
+            assert 'ELASTICSEARCH_NODE_CLASS' in error_msg
+    
+    def test_validate_falla_con_limites_de_pagina_invertidos(self):
+        """Test: Validación falla si el tamaño mínimo de página supera al máximo"""
+        with patch.dict(os.environ, {
+            'ELASTICSEARCH_HOST': 'https://test.example.com',
+            'ELASTICSEARCH_USER': 'testuser',
+            'ELASTICSEARCH_PASSWORD': 'testpass',
+            'ELASTICSEARCH_SCROLL_SIZE_MIN': '5000',
+            'ELASTICSEARCH_SCROLL_SIZE_MAX': '1000'
+        }):
+            config = Config()
+            is_valid, error_msg = config.validate()
+            
+            assert is_valid is False
+            assert 'ELASTICSEARCH_SCROLL_SIZE_MIN' in error_msg
+    
     def test_validate_con_variables_completas(self):
         """Test: Validación exitosa con todas las variables"""
         with patch.dict(os.environ, {
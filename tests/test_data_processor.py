@@ -12,6 +12,8 @@ from data_processor import (
     extraer_valores_no_nulos,
     procesar_mensaje,
     procesar_registros_iterable,
+    procesar_valores_agregados,
+    cargar_valores_unicos,
     contar_valores_por_campo
 )
 
@@ -225,6 +227,113 @@ class TestProcesarRegistrosIterable:
         assert len(resultado) == 2
         valores = {r["value"] for r in resultado}
         assert valores == {100, 200}
+    
+    def test_registros_colapsados_cuentan_sus_hits(self, tmp_path):
+        """Test: Un registro con 'count' cuenta como varios documentos"""
+        output_file = tmp_path / "output.json"
+        registros = [
+            {"message": 'Body: {"where":[{"field":"id","value":100}]}', "count": 40},
+            {"message": "Sin JSON", "count": 2},
+        ]
+        
+        stats = procesar_registros_iterable(iter(registros), str(output_file), show_progress=False)
+        
+        assert stats["registros_procesados"] == 42
+        assert stats["registros_con_valores"] == 40
+        assert stats["valores_unicos"] == 1
+    
+    def test_continua_desde_estado_previo(self, tmp_path):
+        """Test: Continúa desde un estado previo (reanudación de checkpoint)"""
+        output_file = tmp_path / "output.json"
+        estado = {
+            'valores_unicos': {("id", 100)},
+            'registros_procesados': 5,
+            'registros_con_valores': 3
+        }
+        
+        registros = [
+            {"message": 'Body: {"where":[{"field":"id","value":100}]}'},
+            {"message": 'Body: {"where":[{"field":"id","value":200}]}'},
+        ]
+        
+        stats = procesar_registros_iterable(
+            iter(registros),
+            str(output_file),
+            show_progress=False,
+            estado=estado
+        )
+        
+        assert stats["registros_procesados"] == 7
+        assert stats["registros_con_valores"] == 5
+        assert stats["valores_unicos"] == 2
+        # El estado se actualiza en sitio para que el checkpoint lo vea
+        assert estado['valores_unicos'] == {("id", 100), ("id", 200)}
+    
+    def test_fusiona_con_salida_anterior(self, tmp_path):
+        """Test: Una ejecución incremental conserva los valores del archivo previo"""
+        output_file = tmp_path / "output.json"
+        output_file.write_text(json.dumps([{"field": "id", "value": 100}]), encoding='utf-8')
+        
+        estado = {'valores_unicos': cargar_valores_unicos(str(output_file))}
+        registros = [{"message": 'Body: {"where":[{"field":"id","value":200}]}'}]
+        procesar_registros_iterable(iter(registros), str(output_file), show_progress=False, estado=estado)
+        
+        with open(output_file, 'r', encoding='utf-8') as f:
+            assert json.load(f) == [{"field": "id", "value": 100}, {"field": "id", "value": 200}]
+        assert cargar_valores_unicos(str(tmp_path / "no-existe.json")) == set()
+
+
+    def test_progreso_con_total_conocido(self, tmp_path, capsys):
+        """Test: Con un total disponible el progreso muestra porcentaje y ETA"""
+        registros = [{"message": "sin valores"}] * 2000
+        
+        procesar_registros_iterable(
+            iter(registros),
+            str(tmp_path / "output.json"),
+            show_progress=True,
+            obtener_total=lambda: 4000
+        )
+        
+        salida = capsys.readouterr().out
+        assert "Procesados 1,000 registros (25.0% de 4,000, ETA" in salida
+        assert "Procesados 2,000 registros (50.0% de 4,000, ETA" in salida
+    
+    def test_progreso_sin_total(self, tmp_path, capsys):
+        """Test: Mientras el total no se conoce el progreso no muestra porcentaje"""
+        procesar_registros_iterable(
+            iter([{"message": "sin valores"}] * 1000),
+            str(tmp_path / "output.json"),
+            show_progress=True,
+            obtener_total=lambda: None
+        )
+        
+        assert "Procesados 1,000 registros..." in capsys.readouterr().out
+
+
+class TestProcesarValoresAgregados:
+    """Tests para la función procesar_valores_agregados"""
+    
+    def test_mismo_formato_que_el_procesado_de_mensajes(self, tmp_path):
+        """Test: Los valores agregados producen la misma salida que los mensajes"""
+        salida_mensajes = tmp_path / "mensajes.json"
+        salida_agregada = tmp_path / "agregada.json"
+        
+        registros = [
+            {"message": 'Body: {"where":[{"field":"id","value":2},{"field":"plan","value":"A"}]}'},
+            {"message": 'Body: {"where":[{"field":"id","value":1},{"field":"plan","value":null}]}'},
+        ]
+        procesar_registros_iterable(iter(registros), str(salida_mensajes), show_progress=False)
+        
+        stats = procesar_valores_agregados(
+            [("plan", "A"), ("id", 1), ("id", 2), ("id", 2), ("plan", None)],
+            str(salida_agregada),
+            show_progress=False
+        )
+        
+        assert stats["valores_unicos"] == 3
+        with open(salida_mensajes, 'r', encoding='utf-8') as f1, \
+                open(salida_agregada, 'r', encoding='utf-8') as f2:
+            assert json.load(f1) == json.load(f2)
 
 
 class TestContarValoresPorCampo:
@@ -6,9 +6,11 @@ Tests para el módulo elasticsearch_client con mocks
 
 import pytest
 import json
+import threading
 from unittest.mock import Mock, MagicMock, patch
 from pathlib import Path
 from elasticsearch.exceptions import (
+    ApiError,
     ConnectionError,
     AuthenticationException,
     NotFoundError,
@@ -32,6 +34,48 @@ def mock_config():
     config.timeout = 300
     config.scroll_size = 1000
     config.scroll_timeout = '5m'
+    config.http_compress = True
+    config.connections_per_node = 16
+    config.node_class = 'urllib3'
+    config.serializer = 'json'
+    config.max_retries = 3
+    config.window_workers = 2
+    config.window_retries = 1
+    config.prune_indices = False
+    config.fast_start = False
+    config.adaptive_page_size = False
+    config.scroll_size_min = 1
+    config.scroll_size_max = 10000
+    config.page_target_seconds = 2.0
+    config.page_max_mb = 20.0
+    config.adaptive_concurrency = False
+    config.breaker_threshold = 5
+    config.breaker_pause = 30.0
+    config.load_monitor = False
+    config.load_monitor_interval = 15.0
+    config.load_queue_throttle = 20
+    config.load_queue_pause = 100
+    config.load_pause_on_red = True
+    config.es_hosts = [config.es_host]
+    config.sniff = False
+    config.dead_node_backoff = 1.0
+    config.max_dead_node_backoff = 30.0
+    config.hedge_requests = False
+    config.hedge_budget = 0.05
+    config.async_search = False
+    config.async_wait = 2.0
+    config.async_keep_alive = '1h'
+    config.page_cache = False
+    config.page_cache_dir = ''
+    config.page_cache_max_mb = 2048.0
+    config.page_cache_max_age_days = 30.0
+    config.replay = False
+    config.pipeline_name = 'extractor-body-where'
+    config.pipeline_field = 'body_where'
+    config.backfill_rate = 1000.0
+    config.memory_limit_mb = 0.0
+    config.metadata_cache_ttl = 300
+    config.metadata_cache_persist = False
     return config
 
 
@@ -65,6 +109,68 @@ class TestElasticsearchClientInit:
             assert call_kwargs['basic_auth'] == ('testuser', 'testpass')
             assert call_kwargs['verify_certs'] is True
             assert call_kwargs['timeout'] == 300
+    
+    def test_aplica_ajustes_de_transporte(self, mock_config):
+        """Test: Pasa compresión, pool, node_class y reintentos de la configuración"""
+        mock_config.http_compress = False
+        mock_config.connections_per_node = 32
+        mock_config.node_class = 'requests'
+        mock_config.max_retries = 7
+        
+        with patch('elasticsearch_client.Elasticsearch') as MockES:
+            ElasticsearchClient(mock_config)
+            call_kwargs = MockES.call_args[1]
+        
+        assert call_kwargs['http_compress'] is False
+        assert call_kwargs['connections_per_node'] == 32
+        assert call_kwargs['node_class'] == 'requests'
+        assert call_kwargs['max_retries'] == 7
+        assert 'serializers' not in call_kwargs
+        assert 'retry_on_status' not in call_kwargs
+        assert call_kwargs['node_selector_class'] == 'round_robin'
+        assert 'sniff_on_start' not in call_kwargs
+    
+    def test_varios_nodos_con_sniffing(self, mock_config):
+        """Test: Pasa todos los nodos y activa el sniffing si se configura"""
+        mock_config.es_hosts = ['https://es1:9200', 'https://es2:9200']
+        mock_config.sniff = True
+        mock_config.dead_node_backoff = 2.0
+        
+        with patch('elasticsearch_client.Elasticsearch') as MockES:
+            ElasticsearchClient(mock_config)
+            args, call_kwargs = MockES.call_args
+        
+        assert args[0] == ['https://es1:9200', 'https://es2:9200']
+        assert call_kwargs['sniff_on_start'] is True
+        assert call_kwargs['sniff_on_node_failure'] is True
+        assert call_kwargs['dead_node_backoff_factor'] == 2.0
+    
+    def test_concurrencia_adaptativa_reintenta_rechazos_fuera_del_transporte(self, mock_config):
+        """Test: Solo las páginas del limitador dejan de reintentar 429/503 en el transporte"""
+        mock_config.adaptive_concurrency = True
+        
+        with patch('elasticsearch_client.Elasticsearch') as MockES:
+            client = ElasticsearchClient(mock_config)
+            call_kwargs = MockES.call_args[1]
+            cliente_paginas = client._get_page_client()
+        
+        # El cliente general (scroll, PIT, _count, metadatos) conserva los reintentos
+        assert 'retry_on_status' not in call_kwargs
+        MockES.return_value.options.assert_called_once_with(retry_on_status=(502, 504))
+        assert cliente_paginas is MockES.return_value.options.return_value
+        assert client._get_page_client() is cliente_paginas
+        assert client.limitador.maximo == mock_config.window_workers
+    
+    def test_registra_serializador_orjson(self, mock_config):
+        """Test: Con serializer=orjson registra un serializador para application/json"""
+        mock_config.serializer = 'orjson'
+        
+        with patch('elasticsearch_client.Elasticsearch') as MockES:
+            ElasticsearchClient(mock_config)
+            call_kwargs = MockES.call_args[1]
+        
+        from serializers import FastJsonSerializer
+        assert isinstance(call_kwargs['serializers']['application/json'], FastJsonSerializer)
 
 
 class TestTestConnection:
@@ -151,6 +257,34 @@ class TestGetAvailableIndices:
         assert indices == []
 
 
+class TestCacheDeMetadatos:
+    """Tests para el uso de la caché de metadatos en el cliente"""
+    
+    def test_lista_de_indices_cacheada(self, mock_config, mock_elasticsearch):
+        """Test: Llamadas repetidas no repiten cat.indices"""
+        mock_elasticsearch.cat.indices.return_value = [{'index': 'logs-1'}]
+        
+        client = ElasticsearchClient(mock_config)
+        client.get_available_indices('logs-*')
+        client.get_available_indices('logs-*')
+        assert mock_elasticsearch.cat.indices.call_count == 1
+        
+        client.invalidate_metadata('indices:')
+        client.get_available_indices('logs-*')
+        assert mock_elasticsearch.cat.indices.call_count == 2
+    
+    def test_existencia_cacheada_entre_busquedas(self, mock_config, mock_elasticsearch):
+        """Test: search_logs comprueba la existencia del índice una sola vez"""
+        mock_elasticsearch.indices.exists.return_value = True
+        
+        with patch('elasticsearch_client.scan', return_value=iter([])):
+            client = ElasticsearchClient(mock_config)
+            list(client.search_logs({"query": {"match_all": {}}}, 'logs-*'))
+            list(client.search_logs({"query": {"match_all": {}}}, 'logs-*'))
+        
+        assert mock_elasticsearch.indices.exists.call_count == 1
+
+
 class TestGetTotalEstimate:
     """Tests para el método get_total_estimate"""
     
@@ -229,6 +363,36 @@ class TestSearchLogs:
                 list(client.search_logs(query, 'logs-*'))
             
             assert 'Query parsing error' in str(excinfo.value)
+    
+    def test_inicio_rapido_sin_comprobaciones_previas(self, mock_config, mock_elasticsearch):
+        """Test: En inicio rápido la primera búsqueda es la primera petición"""
+        mock_config.fast_start = True
+        mock_config.prune_indices = True
+        query = {"query": {"range": {"@timestamp": {"gte": "2024-01-01T00:00:00Z"}}}}
+        
+        with patch('elasticsearch_client.scan', return_value=iter([{'_id': '1'}])):
+            client = ElasticsearchClient(mock_config)
+            docs = list(client.get_documents_generator(query, 'logs-*'))
+        
+        assert len(docs) == 1
+        assert client.estadisticas['primer_documento'] is not None
+        mock_elasticsearch.indices.exists.assert_not_called()
+        mock_elasticsearch.cat.indices.assert_not_called()
+    
+    def test_inicio_rapido_indice_inexistente(self, mock_config, mock_elasticsearch):
+        """Test: Sin comprobación previa, el 404 de la búsqueda da el mismo error"""
+        mock_config.fast_start = True
+        mock_elasticsearch.cat.indices.return_value = [{'index': 'other-index'}]
+        
+        with patch('elasticsearch_client.scan') as mock_scan:
+            mock_scan.side_effect = NotFoundError('index_not_found_exception', Mock(), {})
+            client = ElasticsearchClient(mock_config)
+            
+            with pytest.raises(ValueError) as excinfo:
+                list(client.search_logs({"query": {"match_all": {}}}, 'nonexistent-*'))
+        
+        assert 'Índice no encontrado' in str(excinfo.value)
+        assert 'other-index' in str(excinfo.value)
 
 
 class TestDownloadToCsv:
@@ -295,6 +459,76 @@ class TestDownloadToCsv:
                 assert 'message' in rows[0]
                 assert 'level' in rows[0]
 
+    
+    def test_lotes_comprimidos_y_orden_de_columnas(self, mock_config, mock_elasticsearch, tmp_path):
+        """Test: Escribe por lotes en .csv.gz con el orden de fields, aunque falten o sobren campos"""
+        mock_elasticsearch.indices.exists.return_value = True
+        mock_config.scroll_size = 2
+        mock_docs = [
+            {'_source': {'message': f'log{i}', 'level': 'ERROR', 'extra': i}, '_id': str(i)}
+            for i in range(4)
+        ] + [{'_source': {'message': 'sin nivel'}, '_id': '4'}]
+        output_csv = tmp_path / "logs.csv.gz"
+        
+        with patch('elasticsearch_client.scan') as mock_scan:
+            mock_scan.return_value = iter(mock_docs)
+            
+            client = ElasticsearchClient(mock_config)
+            count = client.download_to_csv(
+                {"query": {"match_all": {}}}, str(output_csv), fields=['level', 'message']
+            )
+        
+        import csv
+        import gzip
+        with gzip.open(output_csv, 'rt', encoding='utf-8', newline='') as f:
+            filas = list(csv.reader(f))
+        assert count == 5
+        assert filas[0] == ['level', 'message']
+        assert filas[1] == ['ERROR', 'log0']
+        assert filas[-1] == ['', 'sin nivel']
+        assert len(filas) == 6
+
+
+class TestDownloadToCsvSql:
+    """Tests para la exportación con la API _sql"""
+    
+    def test_escribe_las_paginas_con_cursor(self, mock_config, mock_elasticsearch, tmp_path):
+        """Test: Pagina con el cursor y escribe una sola cabecera"""
+        paginas = [
+            Mock(body=b'@timestamp,message\n1,"a\nb"\n2,c\n', meta=Mock(headers={'Cursor': 'c1'})),
+            Mock(body=b'3,d\n', meta=Mock(headers={}))
+        ]
+        mock_elasticsearch.sql.query.side_effect = paginas
+        mock_elasticsearch.count.return_value = {'count': 3}
+        output_csv = tmp_path / "sql.csv"
+        
+        client = ElasticsearchClient(mock_config)
+        count = client.download_to_csv_sql(
+            {"query": {"term": {"level": "ERROR"}}}, str(output_csv), fields=['@timestamp', 'message']
+        )
+        
+        assert count == 3
+        assert output_csv.read_bytes() == b'@timestamp,message\n1,"a\nb"\n2,c\n3,d\n'
+        primera, segunda = mock_elasticsearch.sql.query.call_args_list
+        assert primera.kwargs['query'] == 'SELECT "@timestamp", "message" FROM "test-logs-*"'
+        assert primera.kwargs['filter'] == {"term": {"level": "ERROR"}}
+        assert segunda.kwargs == {'format': 'csv', 'cursor': 'c1'}
+        mock_elasticsearch.sql.clear_cursor.assert_not_called()
+    
+    def test_libera_el_cursor_si_se_interrumpe(self, mock_config, mock_elasticsearch, tmp_path):
+        """Test: Un error a mitad de la exportación cierra el cursor abierto"""
+        mock_elasticsearch.sql.query.side_effect = [
+            Mock(body=b'message\na\n', meta=Mock(headers={'Cursor': 'c1'})),
+            ConnectionError('VPN caída')
+        ]
+        mock_elasticsearch.count.return_value = {'count': 1}
+        
+        client = ElasticsearchClient(mock_config)
+        with pytest.raises(Exception, match='Error de conexión'):
+            client.download_to_csv_sql({"query": {"match_all": {}}}, str(tmp_path / "sql.csv"))
+        
+        mock_elasticsearch.sql.clear_cursor.assert_called_once_with(cursor='c1')
+
 
 class TestGetDocumentsGenerator:
     """Tests para el método get_documents_generator"""
@@ -348,6 +582,1095 @@ class TestGetDocumentsGenerator:
             assert docs[0]['@timestamp'] == ''
 
 
+def crear_busqueda_simulada(docs):
+    """
+    Simula search con PIT + search_after sobre una lista de documentos
+    
+    Cada documento es una tupla (timestamp_ms, _id, message). Aplica el
+    filtro de rango en epoch_millis que añade el cliente al reanudar.
+    """
+    ordenados = sorted(docs)
+    
+    def search(body=None, **kwargs):
+        desde, hasta = None, None
+        for clausula in body.get('query', {}).get('bool', {}).get('filter', []):
+            rango = clausula.get('range', {}).get('@timestamp', {})
+            if rango.get('format') == 'epoch_millis':
+                desde = max(desde or rango['gte'], rango['gte'])
+                hasta = rango.get('lt', hasta)
+        
+        candidatos = [
+            (ts, i, _id, msg) for i, (ts, _id, msg) in enumerate(ordenados)
+            if (desde is None or ts >= desde) and (hasta is None or ts < hasta)
+        ]
+        if 'search_after' in body:
+            candidatos = [c for c in candidatos if [c[0], c[1]] > body['search_after']]
+        
+        pagina = candidatos[:body['size']]
+        return {
+            'pit_id': body['pit']['id'],
+            'hits': {'hits': [
+                {
+                    '_id': _id,
+                    '_source': {'message': msg, '@timestamp': ts},
+                    'sort': [ts, i]
+                }
+                for ts, i, _id, msg in pagina
+            ]}
+        }
+    
+    return search
+
+
+def en_bytes(search):
+    """
+    Envuelve un search simulado para que responda como el cliente en bytes
+    
+    Las páginas de search_after se piden siempre en bytes (se decodifican en
+    el cliente para medir el JSON sin comprimir).
+    """
+    def search_en_bytes(*args, **kwargs):
+        return Mock(body=json.dumps(search(*args, **kwargs)).encode())
+    
+    return search_en_bytes
+
+
+class TestModoLean:
+    """Tests para el transporte reducido (filter_path, _source y docvalue_fields)"""
+    
+    def test_scan_con_filter_path_y_source_minimo(self, mock_config, mock_elasticsearch):
+        """Test: search_logs en modo lean reduce _source y filtra la respuesta"""
+        mock_elasticsearch.indices.exists.return_value = True
+        
+        with patch('elasticsearch_client.scan') as mock_scan:
+            mock_scan.return_value = iter([])
+            
+            client = ElasticsearchClient(mock_config)
+            list(client.search_logs({"query": {"match_all": {}}}, 'logs-*', lean=True))
+            
+            kwargs = mock_scan.call_args[1]
+            assert kwargs['query']['_source'] == ['message']
+            assert kwargs['query']['docvalue_fields'][0]['field'] == '@timestamp'
+            assert '-hits.hits._index' in kwargs['filter_path']
+            assert kwargs['scroll_kwargs']['filter_path'] == kwargs['filter_path']
+    
+    def test_timestamp_desde_docvalue_fields(self, mock_config, mock_elasticsearch):
+        """Test: Lee @timestamp de fields cuando no viene en _source"""
+        mock_elasticsearch.indices.exists.return_value = True
+        mock_docs = [{
+            '_id': '1',
+            '_source': {'message': 'Body: {...}'},
+            'fields': {'@timestamp': ['2026-02-16T10:00:00.000Z']}
+        }]
+        
+        with patch('elasticsearch_client.scan') as mock_scan:
+            mock_scan.return_value = iter(mock_docs)
+            
+            client = ElasticsearchClient(mock_config)
+            docs = list(client.get_documents_generator({"query": {"match_all": {}}}, lean=True))
+        
+        assert docs == [{
+            'message': 'Body: {...}',
+            '@timestamp': '2026-02-16T10:00:00.000Z',
+            '_id': '1'
+        }]
+    
+    def test_mide_bytes_por_documento(self, mock_config, mock_elasticsearch):
+        """Test: Compara bytes por documento entre modo normal y lean"""
+        hit_completo = {
+            '_index': '.ds-logs-aplicacion-2026.02.16-000123', '_id': 'abc', '_score': 1.0,
+            '_source': {'message': 'x' * 50, '@timestamp': '2026-02-16T10:00:00.000Z',
+                        'host': {'name': 'srv-01'}, 'level': 'ERROR'}
+        }
+        hit_lean = {
+            '_id': 'abc', '_source': {'message': 'x' * 50},
+            'fields': {'@timestamp': ['2026-02-16T10:00:00.000Z']}
+        }
+        mock_elasticsearch.search.side_effect = [
+            {'took': 5, 'hits': {'total': {'value': 2}, 'hits': [hit_completo] * 2}},
+            {'hits': {'hits': [hit_lean] * 2}}
+        ]
+        
+        client = ElasticsearchClient(mock_config)
+        medicion = client.measure_response_bytes({"query": {"match_all": {}}})
+        
+        assert medicion['bytes_por_doc_lean'] < medicion['bytes_por_doc_normal']
+        assert 0 < medicion['ahorro_pct'] < 100
+        assert 'filter_path' in mock_elasticsearch.search.call_args_list[1][1]
+
+
+class TestIterPages:
+    """Tests para la paginación reanudable con PIT + search_after"""
+    
+    def test_pagina_todos_los_documentos(self, mock_config, mock_elasticsearch):
+        """Test: Recorre todas las páginas y cierra el PIT"""
+        mock_config.scroll_size = 2
+        docs = [(1000, 'a', 'm1'), (2000, 'b', 'm2'), (3000, 'c', 'm3')]
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = en_bytes(crear_busqueda_simulada(docs))
+        
+        client = ElasticsearchClient(mock_config)
+        paginas = list(client.iter_pages({"query": {"match_all": {}}}, 'logs-*'))
+        
+        assert [len(hits) for hits, _ in paginas] == [2, 1]
+        assert paginas[-1][1] == {'ultimo_ts': 3000, 'ids': ['c']}
+        mock_elasticsearch.close_point_in_time.assert_called_once_with(id='pit-1')
+    
+    def test_reanuda_sin_repetir_documentos_del_limite(self, mock_config, mock_elasticsearch):
+        """Test: Al reanudar omite los _ids ya vistos con el mismo @timestamp"""
+        mock_config.scroll_size = 10
+        docs = [(1000, 'a', 'm1'), (2000, 'b', 'm2'), (2000, 'c', 'm3'), (3000, 'd', 'm4')]
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = en_bytes(crear_busqueda_simulada(docs))
+        
+        client = ElasticsearchClient(mock_config)
+        cursor = {'ultimo_ts': 2000, 'ids': ['b']}
+        paginas = list(client.iter_pages({"query": {"match_all": {}}}, 'logs-*', cursor))
+        
+        ids = [h['_id'] for hits, _ in paginas for h in hits]
+        assert ids == ['c', 'd']
+    
+    def test_limite_de_bytes_con_el_json_sin_comprimir(self, mock_config, mock_elasticsearch):
+        """Test: ELASTICSEARCH_PAGE_MAX_MB se compara con el JSON decodificado, no con el Content-Length"""
+        mock_config.adaptive_page_size = True
+        mock_config.scroll_size = 4
+        mock_config.scroll_size_min = 1
+        mock_config.page_max_mb = 0.001
+        docs = [(1000 + i, f'id{i}', 'x' * 500) for i in range(4)]
+        busqueda = crear_busqueda_simulada(docs)
+        
+        def search(body=None, **kwargs):
+            respuesta = Mock(body=json.dumps(busqueda(body=body)).encode())
+            # Con http_compress el transporte solo conoce el tamaño comprimido
+            respuesta.meta.headers = {'content-length': '100', 'content-encoding': 'gzip'}
+            return respuesta
+        
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = search
+        
+        client = ElasticsearchClient(mock_config)
+        paginas = client.iter_pages({"query": {"match_all": {}}}, 'logs-*')
+        next(paginas)
+        
+        assert client.tamano_pagina.tamano < 4
+        paginas.close()
+    
+    def test_indice_inexistente(self, mock_config, mock_elasticsearch):
+        """Test: Lanza ValueError si no se puede abrir el PIT"""
+        mock_elasticsearch.open_point_in_time.side_effect = NotFoundError(
+            'index_not_found_exception', Mock(), {}
+        )
+        mock_elasticsearch.cat.indices.return_value = []
+        
+        client = ElasticsearchClient(mock_config)
+        
+        with pytest.raises(ValueError) as excinfo:
+            list(client.iter_pages({"query": {"match_all": {}}}, 'nonexistent-*'))
+        
+        assert 'Índice no encontrado' in str(excinfo.value)
+    
+    def test_total_en_la_primera_pagina(self, mock_config, mock_elasticsearch):
+        """Test: Solo la primera página cuenta los hits y el total queda disponible"""
+        mock_config.scroll_size = 2
+        docs = [(1000, 'a', 'm1'), (2000, 'b', 'm2'), (3000, 'c', 'm3')]
+        busqueda = crear_busqueda_simulada(docs)
+        pedidos = []
+        
+        def search(body=None, **kwargs):
+            pedidos.append(body['track_total_hits'])
+            respuesta = busqueda(body=body)
+            if body['track_total_hits']:
+                respuesta['hits']['total'] = {'value': 3, 'relation': 'eq'}
+            return respuesta
+        
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = en_bytes(search)
+        
+        client = ElasticsearchClient(mock_config)
+        paginas = client.iter_pages({"query": {"match_all": {}}}, 'logs-*', contar_total=True)
+        next(paginas)
+        
+        assert client.get_known_total() == 3
+        list(paginas)
+        assert pedidos == [True, False, False]
+        mock_elasticsearch.count.assert_not_called()
+    
+    def test_reintenta_la_pagina_mas_pequena_tras_circuit_breaker(self, mock_config, mock_elasticsearch):
+        """Test: Un circuit breaker repite la misma página con la mitad de documentos"""
+        mock_config.adaptive_page_size = True
+        mock_config.scroll_size = 4
+        docs = [(1000, 'a', 'm1'), (2000, 'b', 'm2'), (3000, 'c', 'm3')]
+        busqueda = crear_busqueda_simulada(docs)
+        tamanos = []
+        
+        def search(body=None, **kwargs):
+            tamanos.append(body['size'])
+            if len(tamanos) == 1:
+                raise ApiError('circuit_breaking_exception', meta=Mock(status=429),
+                               body={'error': {'type': 'circuit_breaking_exception'}})
+            return busqueda(body=body)
+        
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = en_bytes(search)
+        
+        client = ElasticsearchClient(mock_config)
+        ids = [h['_id'] for hits, _ in client.iter_pages({"query": {"match_all": {}}}, 'logs-*')
+               for h in hits]
+        
+        assert ids == ['a', 'b', 'c']
+        assert tamanos[:2] == [4, 2]
+        assert client.estadisticas['tamano_pagina']['reducciones'] == 1
+    
+    def test_total_aproximado_se_ignora(self, mock_config, mock_elasticsearch):
+        """Test: Un total con relation 'gte' no se usa como total conocido"""
+        client = ElasticsearchClient(mock_config)
+        client._registrar_total({'value': 10000, 'relation': 'gte'})
+        
+        assert client.get_known_total() is None
+
+
+class TestMonitorDeCarga:
+    """Tests para el monitor de carga adjunto al cliente"""
+    
+    def test_registra_decisiones_en_estadisticas(self, mock_config, mock_elasticsearch):
+        """Test: Con load_monitor el generador arranca y detiene el monitor"""
+        mock_config.load_monitor = True
+        mock_elasticsearch.nodes.stats.return_value = {'nodes': {
+            'n1': {'thread_pool': {'search': {'queue': 30, 'rejected': 0}}}
+        }}
+        mock_elasticsearch.cluster.health.return_value = {'status': 'green'}
+        
+        with patch('elasticsearch_client.scan', return_value=iter([{'_id': '1'}])):
+            client = ElasticsearchClient(mock_config)
+            list(client.get_documents_generator({"query": {"match_all": {}}}, 'logs-*'))
+        
+        assert client.monitor is None
+        carga = client.estadisticas['monitor_carga']
+        assert carga['muestras']['frenar'] >= 1
+        assert client.limitador.techo is None
+    
+    def test_el_scroll_consulta_al_monitor_en_cada_pagina(self, mock_config, mock_elasticsearch, tmp_path):
+        """Test: download_to_csv arranca el monitor y el scroll lo consulta antes de cada página"""
+        mock_config.load_monitor = True
+        mock_config.scroll_size = 2
+        mock_elasticsearch.nodes.stats.return_value = {'nodes': {}}
+        mock_elasticsearch.cluster.health.return_value = {'status': 'green'}
+        docs = [{'_id': str(i), '_source': {'message': f'm{i}'}} for i in range(5)]
+        
+        with patch('elasticsearch_client.scan', return_value=iter(docs)), \
+                patch('elasticsearch_client.MonitorCarga.esperar_turno') as esperar_turno:
+            client = ElasticsearchClient(mock_config)
+            count = client.download_to_csv(
+                {"query": {"match_all": {}}}, str(tmp_path / 'salida.csv'), index_pattern='logs-*'
+            )
+        
+        assert count == 5
+        # Antes de la primera página y tras cada página completa (3 páginas de 2)
+        assert esperar_turno.call_count == 3
+        assert 'monitor_carga' in client.estadisticas
+
+
+class TestBusquedaAsincrona:
+    """Tests para _async_search en el cliente"""
+    
+    def test_async_search_espera_y_borra_el_resultado(self, mock_config, mock_elasticsearch):
+        """Test: Sondea hasta el final y borra el resultado guardado en el servidor"""
+        mock_elasticsearch.async_search.submit.return_value = {
+            'id': 'FmRl', 'is_running': True, 'response': {}
+        }
+        mock_elasticsearch.async_search.get.return_value = {
+            'id': 'FmRl', 'is_running': False,
+            'response': {'hits': {'total': {'value': 7}}, 'aggregations': {'a': {}}}
+        }
+        parciales = []
+        
+        client = ElasticsearchClient(mock_config)
+        estado = client.async_search({"size": 0}, 'logs-*', al_progreso=parciales.append)
+        
+        assert estado['total_hits'] == 7
+        assert len(parciales) == 1
+        mock_elasticsearch.async_search.delete.assert_called_once_with(id='FmRl')
+    
+    def test_error_final_se_propaga(self, mock_config, mock_elasticsearch):
+        """Test: Una búsqueda que termina con error lanza excepción"""
+        mock_elasticsearch.async_search.submit.return_value = {
+            'id': 'FmRl', 'is_running': False, 'error': {'type': 'search_phase_execution_exception'}
+        }
+        
+        client = ElasticsearchClient(mock_config)
+        with pytest.raises(Exception, match='search_phase_execution_exception'):
+            client.async_search({"size": 0}, 'logs-*')
+    
+    def test_agregaciones_y_conteo_asincronos(self, mock_config, mock_elasticsearch):
+        """Test: Con async_search el conteo y las agregaciones no usan _search ni _count"""
+        mock_config.async_search = True
+        mock_elasticsearch.async_search.submit.side_effect = [
+            {'id': 'c', 'is_running': False, 'response': {'hits': {'total': {'value': 42}}}},
+            {'id': 'a', 'is_running': False, 'response': {'aggregations': {'valores': {
+                'buckets': [{'key': {'valor': 'ERROR'}, 'doc_count': 3}]
+            }}}}
+        ]
+        
+        client = ElasticsearchClient(mock_config)
+        total = client.get_total_estimate({"query": {"match_all": {}}}, 'logs-*')
+        valores = list(client.iter_composite_values({"query": {"match_all": {}}}, {'nivel': 'level'}))
+        
+        assert total == 42
+        assert valores == [('nivel', 'ERROR')]
+        mock_elasticsearch.search.assert_not_called()
+        mock_elasticsearch.count.assert_not_called()
+
+
+class TestCobertura:
+    """Tests para las peticiones de cobertura en search_after"""
+    
+    def test_pagina_lenta_se_resuelve_con_el_duplicado(self, mock_config, mock_elasticsearch):
+        """Test: Con hedge_requests una página lenta se duplica con otro X-Opaque-Id"""
+        mock_config.hedge_requests = True
+        mock_config.es_hosts = ['https://es1:9200', 'https://es2:9200']
+        mock_config.hedge_budget = 1.0
+        mock_config.scroll_size = 2
+        docs = [(1000, 'a', 'm1'), (2000, 'b', 'm2'), (3000, 'c', 'm3')]
+        busqueda = crear_busqueda_simulada(docs)
+        liberar = threading.Event()
+        opaque_ids = []
+        
+        def options(opaque_id=None, **kwargs):
+            opaque_ids.append(opaque_id)
+            
+            def search(body=None, **kw):
+                if len(opaque_ids) == 1:
+                    # La primera petición se queda colgada hasta que gane el duplicado
+                    liberar.wait(5)
+                return busqueda(body=body)
+            return Mock(search=en_bytes(search))
+        
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.options.side_effect = options
+        mock_elasticsearch.tasks.list.side_effect = lambda **kw: liberar.set() or {'nodes': {}}
+        
+        client = ElasticsearchClient(mock_config)
+        client.cobertura.latencias.extend([0.001] * 10)
+        ids = [h['_id'] for hits, _ in client.iter_pages({"query": {"match_all": {}}}, 'logs-*')
+               for h in hits]
+        liberar.set()
+        client.cobertura.cerrar()
+        
+        assert ids == ['a', 'b', 'c']
+        assert opaque_ids[0].endswith('-0') and opaque_ids[1] == opaque_ids[0][:-1] + '1'
+        assert client.estadisticas['cobertura']['ganadas_por_duplicado'] >= 1
+    
+    def test_con_un_solo_host_se_desactiva(self, mock_config, mock_elasticsearch, capsys):
+        """Test: Con un único coordinador el duplicado no evitaría nada y se avisa"""
+        mock_config.hedge_requests = True
+        
+        client = ElasticsearchClient(mock_config)
+        
+        assert client.cobertura.activo is False
+        assert "--hedge" in capsys.readouterr().out
+    
+    def test_el_duplicado_espera_hueco_en_el_limitador(self, mock_config, mock_elasticsearch):
+        """Test: Sin hueco libre el duplicado espera y no sale si la original ya terminó"""
+        mock_config.hedge_requests = True
+        mock_config.hedge_budget = 1.0
+        mock_config.window_workers = 1
+        mock_config.es_hosts = ['https://es1:9200', 'https://es2:9200']
+        lenta = threading.Event()
+        opaque_ids = []
+        
+        def options(opaque_id=None, **kwargs):
+            opaque_ids.append(opaque_id)
+            
+            def search(body=None, **kw):
+                lenta.wait(0.2)
+                return {'hits': {'hits': []}}
+            return Mock(search=search)
+        
+        mock_elasticsearch.options.side_effect = options
+        client = ElasticsearchClient(mock_config)
+        client.cobertura.latencias.extend([0.001] * 10)
+        
+        # La original ocupa el único hueco, como en _pedir_pagina
+        respuesta = client.limitador.ejecutar(
+            lambda: client._buscar_pagina(mock_elasticsearch, {}, {})
+        )
+        client.cobertura.cerrar()
+        
+        assert respuesta == {'hits': {'hits': []}}
+        assert client.cobertura.resumen()['duplicadas'] == 1
+        assert [o[-2:] for o in opaque_ids] == ['-0']
+    
+    def test_cancela_la_tarea_por_opaque_id(self, mock_config, mock_elasticsearch):
+        """Test: La petición perdedora se busca en _tasks por su X-Opaque-Id"""
+        mock_elasticsearch.tasks.list.return_value = {'nodes': {'n1': {'tasks': {
+            'n1:1': {'headers': {'X-Opaque-Id': 'extractor-x-0'}},
+            'n1:2': {'headers': {'X-Opaque-Id': 'otra'}}
+        }}}}
+        
+        client = ElasticsearchClient(mock_config)
+        client._cancelar_busqueda('extractor-x-0')
+        
+        mock_elasticsearch.tasks.cancel.assert_called_once_with(task_id='n1:1')
+
+
+class TestEstimacion:
+    """Tests para --estimate"""
+    
+    def test_estima_con_conteo_y_muestra(self, mock_config, mock_elasticsearch):
+        """Test: Usa el _count y una página de muestra en bytes, sin descargar más"""
+        mock_config.memory_limit_mb = 512.0
+        mock_elasticsearch.count.return_value = {'count': 50000}
+        hits = [{'_id': str(i), '_source': {'message': 'm' * 300}} for i in range(200)]
+        mock_elasticsearch.search.return_value = Mock(body=json.dumps({'hits': {'hits': hits}}).encode())
+        
+        client = ElasticsearchClient(mock_config)
+        estimacion = client.estimate_extraction({"query": {"match_all": {}}}, 'logs-*', windows=8)
+        
+        assert estimacion['total'] == 50000
+        assert estimacion['muestra']['docs'] == 200
+        assert estimacion['limite_memoria'] == 512 * 1024 * 1024
+        assert [m['nombre'] for m in estimacion['modos']][3] == '--windows 8'
+        body = mock_elasticsearch.search.call_args.kwargs['body']
+        assert body['size'] == 200 and body['track_total_hits'] is False
+        assert mock_elasticsearch.search.call_count == 1
+
+
+class TestPipelineIngesta:
+    """Tests para el pipeline de ingesta y su relleno"""
+    
+    def test_instala_pipeline_mapping_y_default_pipeline(self, mock_config, mock_elasticsearch):
+        """Test: Instala el pipeline, añade el campo keyword y fija default_pipeline"""
+        client = ElasticsearchClient(mock_config)
+        resultado = client.install_ingest_pipeline('logs-*', default_pipeline=True)
+        
+        llamada = mock_elasticsearch.ingest.put_pipeline.call_args.kwargs
+        assert llamada['id'] == 'extractor-body-where'
+        assert [list(p)[0] for p in llamada['body']['processors']][:2] == ['grok', 'json']
+        mock_elasticsearch.indices.put_mapping.assert_called_once_with(
+            index='logs-*', properties={
+                'body_where': {'type': 'keyword', 'ignore_above': 8191},
+                'body_where_version': {'type': 'integer'}
+            }
+        )
+        mock_elasticsearch.indices.put_settings.assert_called_once_with(
+            index='logs-*', settings={'index': {'default_pipeline': 'extractor-body-where'}}
+        )
+        assert resultado['mapping'] is True and resultado['default_pipeline'] is True
+    
+    def test_verifica_con_simulate(self, mock_config, mock_elasticsearch):
+        """Test: Compara la salida de _simulate con el procesador en Python"""
+        mensajes = [
+            'Body: {"where":[{"field":"idEstudio","value":7},{"field":"x","value":null}]}',
+            'Body: {"where":[{"field":"idPlan","value":"A"}]}'
+        ]
+        mock_elasticsearch.search.return_value = {
+            'hits': {'hits': [{'_source': {'message': m}} for m in mensajes]}
+        }
+        mock_elasticsearch.ingest.simulate.return_value = {'docs': [
+            {'doc': {'_source': {'message': mensajes[0], 'body_where': ['idEstudio=7']}}},
+            {'doc': {'_source': {'message': mensajes[1], 'body_where': ['idPlan=B']}}}
+        ]}
+        
+        client = ElasticsearchClient(mock_config)
+        resultado = client.verify_ingest_pipeline({"query": {"match_all": {}}}, 'logs-*', muestras=2)
+        
+        assert resultado['documentos'] == 2
+        assert resultado['coinciden'] == 1
+        assert resultado['diferencias'][0]['obtenido'] == [('idPlan', 'B')]
+        assert mock_elasticsearch.ingest.simulate.call_args.kwargs['id'] == 'extractor-body-where'
+    
+    def test_relleno_en_sitio_con_throttling(self, mock_config, mock_elasticsearch):
+        """Test: _update_by_query en segundo plano, con slices y límite de docs/s"""
+        mock_elasticsearch.update_by_query.return_value = {'task': 'nodo:42'}
+        query = {"query": {"match_all": {}}}
+        
+        client = ElasticsearchClient(mock_config)
+        task_id = client.start_pipeline_backfill(query, 'logs-*', batch_size=500)
+        
+        assert task_id == 'nodo:42'
+        llamada = mock_elasticsearch.update_by_query.call_args.kwargs
+        assert llamada['pipeline'] == 'extractor-body-where'
+        assert llamada['slices'] == 'auto'
+        assert llamada['requests_per_second'] == 1000.0
+        assert llamada['scroll_size'] == 500
+        assert llamada['wait_for_completion'] is False
+        assert llamada['query']['bool']['must_not'] == [{'term': {'body_where_version': 2}}]
+    
+    def test_relleno_con_reindex(self, mock_config, mock_elasticsearch):
+        """Test: Con destino se copia con _reindex por el pipeline (op_type=create)"""
+        mock_elasticsearch.reindex.return_value = {'task': 'nodo:43'}
+        
+        client = ElasticsearchClient(mock_config)
+        client.start_pipeline_backfill({}, 'logs-*', destino='logs-v2', slices=4, requests_per_second=-1)
+        
+        llamada = mock_elasticsearch.reindex.call_args.kwargs
+        assert llamada['dest'] == {'index': 'logs-v2', 'pipeline': 'extractor-body-where', 'op_type': 'create'}
+        assert llamada['slices'] == 4
+        assert llamada['requests_per_second'] == -1
+        mock_elasticsearch.update_by_query.assert_not_called()
+    
+    def test_valores_desde_el_pipeline(self, mock_config, mock_elasticsearch):
+        """Test: La agregación sobre el campo de pares devuelve (campo, valor) con su tipo"""
+        mock_elasticsearch.search.return_value = {'aggregations': {'valores': {
+            'buckets': [{'key': {'valor': 'idEstudio=7'}}, {'key': {'valor': 'idPlan="A"'}}]
+        }}}
+        
+        client = ElasticsearchClient(mock_config)
+        valores = list(client.iter_pipeline_values({"query": {"match_all": {}}}, 'logs-*'))
+        
+        assert valores == [('idEstudio', 7), ('idPlan', 'A')]
+        body = mock_elasticsearch.search.call_args.kwargs['body']
+        assert body['aggs']['valores']['composite']['sources'] == [
+            {'valor': {'terms': {'field': 'body_where'}}}
+        ]
+
+    
+    def test_valores_no_escalares_igual_que_en_python(self, mock_config, mock_elasticsearch, tmp_path):
+        """Test: Listas y objetos del pipeline dan la misma salida que el procesador en Python"""
+        from data_processor import procesar_registros_iterable, procesar_valores_agregados
+        from pipeline_ingesta import codificar_par
+        message = 'Body: {"where":[{"value":[1,2],"field":"ids"},{"value":{"hasta":3,"desde":1},"field":"rango"}]}'
+        pares = [('ids', [1, 2]), ('rango', {'desde': 1, 'hasta': 3})]
+        mock_elasticsearch.search.return_value = {'aggregations': {'valores': {
+            'buckets': [{'key': {'valor': codificar_par(field, value)}} for field, value in pares]
+        }}}
+        
+        client = ElasticsearchClient(mock_config)
+        salida_pipeline = tmp_path / 'pipeline.json'
+        salida_python = tmp_path / 'python.json'
+        procesar_valores_agregados(
+            client.iter_pipeline_values({"query": {"match_all": {}}}, 'logs-*'),
+            str(salida_pipeline), show_progress=False
+        )
+        stats = procesar_registros_iterable(iter([{'message': message}]), str(salida_python), show_progress=False)
+        
+        assert stats['registros_con_valores'] == 1
+        assert json.loads(salida_pipeline.read_text()) == json.loads(salida_python.read_text())
+        assert json.loads(salida_python.read_text()) == [
+            {'field': 'ids', 'value': '[1,2]'},
+            {'field': 'rango', 'value': '{"desde":1,"hasta":3}'}
+        ]
+
+
+class TestCachePaginas:
+    """Tests para la caché de páginas y --replay"""
+    
+    def test_graba_y_repite_sin_cluster(self, mock_config, mock_elasticsearch, tmp_path):
+        """Test: Una extracción grabada se repite desde disco sin buscar ni abrir PIT"""
+        mock_config.page_cache = True
+        mock_config.page_cache_dir = str(tmp_path)
+        mock_config.fast_start = True
+        mock_config.scroll_size = 2
+        docs = [(1000, 'a', 'm1'), (2000, 'b', 'm2'), (3000, 'c', 'm3')]
+        busqueda = crear_busqueda_simulada(docs)
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = en_bytes(busqueda)
+        query = {"query": {"range": {"@timestamp": {"gte": "now-7d"}}}}
+        
+        client = ElasticsearchClient(mock_config)
+        grabados = [d['_id'] for d in client.get_documents_generator(query, 'logs-*')]
+        assert client.estadisticas['cache_paginas']['fallos'] == 3
+        
+        mock_elasticsearch.reset_mock()
+        mock_elasticsearch.search.side_effect = AssertionError('sin cluster')
+        mock_config.replay = True
+        client = ElasticsearchClient(mock_config)
+        repetidos = [d['_id'] for d in client.get_documents_generator(query, 'logs-*')]
+        
+        assert repetidos == grabados == ['a', 'b', 'c']
+        assert client.estadisticas['cache_paginas']['aciertos'] == 3
+        mock_elasticsearch.open_point_in_time.assert_not_called()
+    
+    def test_replay_sin_grabacion(self, mock_config, mock_elasticsearch, tmp_path):
+        """Test: --replay sin una extracción grabada da un error claro"""
+        mock_config.replay = True
+        mock_config.page_cache_dir = str(tmp_path)
+        
+        client = ElasticsearchClient(mock_config)
+        with pytest.raises(ValueError, match='No hay ninguna extracción grabada'):
+            list(client.get_documents_generator({"query": {"match_all": {}}}, 'logs-*'))
+
+
+class TestModoCrudo:
+    """Tests para la paginación con parser incremental de bytes"""
+    
+    def test_pagina_cruda_equivale_a_la_decodificada(self, mock_config, mock_elasticsearch):
+        """Test: El modo crudo entrega los mismos documentos y cursores"""
+        mock_config.scroll_size = 2
+        docs = [(1000, 'a', 'm1'), (2000, 'b', 'm2'), (2000, 'c', 'm3'), (3000, 'd', 'm4')]
+        busqueda = crear_busqueda_simulada(docs)
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = en_bytes(busqueda)
+        
+        client = ElasticsearchClient(mock_config)
+        cursores = []
+        ids = []
+        for hits, cursor in client.iter_pages({"query": {"match_all": {}}}, raw=True):
+            ids.extend(h['_id'] for h in hits)
+            cursores.append(dict(cursor))
+        
+        assert ids == ['a', 'b', 'c', 'd']
+        assert cursores[0] == {'ultimo_ts': 2000, 'ids': ['b']}
+        assert cursores[-1] == {'ultimo_ts': 3000, 'ids': ['d']}
+    
+    def test_reanuda_en_modo_crudo(self, mock_config, mock_elasticsearch):
+        """Test: Omite los documentos del límite también en modo crudo"""
+        docs = [(1000, 'a', 'm1'), (2000, 'b', 'm2'), (2000, 'c', 'm3')]
+        busqueda = crear_busqueda_simulada(docs)
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = en_bytes(busqueda)
+        
+        client = ElasticsearchClient(mock_config)
+        cursor = {'ultimo_ts': 2000, 'ids': ['b']}
+        hits = [
+            h for pagina, _ in client.iter_pages(
+                {"query": {"match_all": {}}}, cursor=cursor, raw=True
+            )
+            for h in pagina
+        ]
+        
+        assert [h['_id'] for h in hits] == ['c']
+        assert client._formatear_documento(hits[0])['message'] == 'm3'
+    
+    def test_generador_en_modo_crudo(self, mock_config, mock_elasticsearch):
+        """Test: get_documents_generator con raw usa PIT y el parser incremental"""
+        docs = [(1000, 'a', 'm1'), (2000, 'b', 'm2')]
+        busqueda = crear_busqueda_simulada(docs)
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = en_bytes(busqueda)
+        
+        client = ElasticsearchClient(mock_config)
+        docs_generados = list(client.get_documents_generator(
+            {"query": {"match_all": {}}}, raw=True
+        ))
+        
+        assert [d['message'] for d in docs_generados] == ['m1', 'm2']
+
+
+class TestGeneradorConMarcaAgua:
+    """Tests para las ejecuciones incrementales (--delta)"""
+    
+    def test_registra_el_mayor_timestamp_procesado(self, mock_config, mock_elasticsearch):
+        """Test: Con marca de agua se pagina con PIT y se anota el último cursor"""
+        from marca_agua import MarcaAgua
+        mock_config.scroll_size = 2
+        docs = [(1000, 'a', 'm'), (2000, 'b', 'm'), (3000, 'c', 'm'), (3000, 'd', 'm')]
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = en_bytes(crear_busqueda_simulada(docs))
+        
+        client = ElasticsearchClient(mock_config)
+        marca = MarcaAgua('no-se-escribe.delta', clave='abc')
+        ids = [d['_id'] for d in client.get_documents_generator(
+            {"query": {"match_all": {}}}, marca_agua=marca
+        )]
+        
+        assert ids == ['a', 'b', 'c', 'd']
+        assert marca.ultimo_ts == 3000
+        assert marca.ids == ['c', 'd']
+
+
+class TestGeneradorConCheckpoint:
+    """Tests para get_documents_generator con checkpoint y reanudación"""
+    
+    def test_reanudar_produce_el_mismo_resultado(self, mock_config, mock_elasticsearch, tmp_path):
+        """Test: Una ejecución interrumpida y reanudada equivale a una completa"""
+        from checkpoint import Checkpoint
+        from data_processor import procesar_registros_iterable
+        
+        mock_config.scroll_size = 2
+        docs = [
+            (1000 + i // 2, f'id{i}', f'Body: {{"where":[{{"field":"id","value":{i % 5}}}]}}')
+            for i in range(9)
+        ]
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = en_bytes(crear_busqueda_simulada(docs))
+        query = {"query": {"match_all": {}}}
+        
+        # Ejecución completa de referencia
+        client = ElasticsearchClient(mock_config)
+        completo = Checkpoint(str(tmp_path / "ref.checkpoint"), clave="k")
+        referencia = procesar_registros_iterable(
+            client.get_documents_generator(query, checkpoint=completo),
+            str(tmp_path / "ref.json"),
+            show_progress=False,
+            estado=completo.estado
+        )
+        
+        # Ejecución que muere tras la segunda página
+        ruta = tmp_path / "salida.json.checkpoint"
+        checkpoint = Checkpoint(str(ruta), clave="k", intervalo=0)
+        checkpoint.query = query
+        generador = client.get_documents_generator(query, checkpoint=checkpoint)
+        
+        def interrumpido():
+            for i, doc in enumerate(generador):
+                if i == 4:
+                    raise KeyboardInterrupt
+                yield doc
+        
+        with pytest.raises(KeyboardInterrupt):
+            procesar_registros_iterable(
+                interrumpido(), str(tmp_path / "salida.json"),
+                show_progress=False, estado=checkpoint.estado
+            )
+        
+        # Reanudación en un proceso nuevo
+        reanudado = Checkpoint(str(ruta), clave="k")
+        assert reanudado.cargar() is True
+        stats = procesar_registros_iterable(
+            client.get_documents_generator(reanudado.query, checkpoint=reanudado),
+            str(tmp_path / "salida.json"),
+            show_progress=False,
+            estado=reanudado.estado
+        )
+        
+        assert stats == referencia
+        assert (tmp_path / "salida.json").read_text() == (tmp_path / "ref.json").read_text()
+        assert reanudado.particion_terminada('total')
+
+
+class TestVentanasDeTiempo:
+    """Tests para la descarga paralela por ventanas de tiempo"""
+    
+    def test_calcula_ventanas_equilibradas(self, mock_config, mock_elasticsearch):
+        """Test: Reparte el rango según el date_histogram"""
+        def search(index=None, body=None):
+            intervalo = int(body['aggs']['por_tiempo']['date_histogram']['fixed_interval'][:-2])
+            # Muchos documentos al principio del rango y pocos al final
+            conteos = [100, 100, 10, 10, 10, 10, 10, 10]
+            return {'aggregations': {'por_tiempo': {'buckets': [
+                {'key': i * intervalo, 'doc_count': c} for i, c in enumerate(conteos)
+            ]}}}
+        mock_elasticsearch.search.side_effect = search
+        
+        client = ElasticsearchClient(mock_config)
+        query = {"query": {"range": {"@timestamp": {"gte": 0, "lt": 8_000_000}}}}
+        ventanas = client.calcular_ventanas(query, 'logs-*', num_ventanas=2)
+        
+        assert len(ventanas) == 2
+        assert ventanas[0][0] == 0 and ventanas[-1][1] == 8_000_000
+        assert ventanas[0][1] == ventanas[1][0]
+        # La primera ventana cubre solo el tramo denso
+        assert ventanas[0][1] < 4_000_000
+    
+    def test_ventanas_en_paralelo_entregan_todos_los_documentos(self, mock_config, mock_elasticsearch):
+        """Test: Cada documento se entrega una sola vez"""
+        mock_config.scroll_size = 2
+        docs = [(ts, f'id{ts}', f'm{ts}') for ts in range(0, 10_000, 500)]
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = en_bytes(crear_busqueda_simulada(docs))
+        
+        client = ElasticsearchClient(mock_config)
+        ventanas = [[0, 3000], [3000, 7000], [7000, 10_000]]
+        paginas = list(client.iter_window_pages({"query": {"match_all": {}}}, ventanas))
+        
+        ids = [h['_id'] for _, hits, _ in paginas for h in hits]
+        assert sorted(ids) == sorted(d[1] for d in docs)
+        terminadas = {p for p, _, cursor in paginas if cursor.get('terminado')}
+        assert terminadas == {'0', '1', '2'}
+    
+    def test_reintenta_solo_la_ventana_fallida(self, mock_config, mock_elasticsearch):
+        """Test: Un fallo transitorio reintenta la ventana sin duplicar documentos"""
+        mock_config.scroll_size = 2
+        docs = [(ts, f'id{ts}', f'm{ts}') for ts in range(0, 6000, 500)]
+        busqueda = crear_busqueda_simulada(docs)
+        fallos = {'pendientes': 1}
+        
+        def search(body=None, **kwargs):
+            if 'search_after' in body and fallos['pendientes']:
+                fallos['pendientes'] -= 1
+                raise Exception("Timeout simulado")
+            return busqueda(body=body)
+        
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = en_bytes(search)
+        
+        client = ElasticsearchClient(mock_config)
+        client.calcular_ventanas = Mock(return_value=[[0, 3000], [3000, 6000]])
+        with patch('elasticsearch_client.time.sleep'):
+            docs_generados = list(client.get_documents_generator(
+                {"query": {"match_all": {}}}, windows=2
+            ))
+        
+        ids = [d['_id'] for d in docs_generados]
+        assert sorted(ids) == sorted(d[1] for d in docs)
+    
+    def test_ventana_agota_reintentos(self, mock_config, mock_elasticsearch):
+        """Test: Lanza Exception si una ventana falla más veces de las permitidas"""
+        mock_elasticsearch.open_point_in_time.return_value = {'id': 'pit-1'}
+        mock_elasticsearch.search.side_effect = Exception("Cluster caído")
+        
+        client = ElasticsearchClient(mock_config)
+        with patch('elasticsearch_client.time.sleep'):
+            with pytest.raises(Exception) as excinfo:
+                list(client.iter_window_pages({"query": {"match_all": {}}}, [[0, 10]]))
+        
+        assert 'ventana 0' in str(excinfo.value)
+
+
+class TestAgregacionComposite:
+    """Tests para la enumeración de valores con agregación composite"""
+    
+    def test_pagina_cada_campo_con_after_key(self, mock_config, mock_elasticsearch):
+        """Test: Recorre todas las páginas de cada campo por separado"""
+        paginas = {
+            'labels.id': [
+                {'buckets': [{'key': {'valor': 1}}, {'key': {'valor': 2}}], 'after_key': {'valor': 2}},
+                {'buckets': [{'key': {'valor': 3}}], 'after_key': {'valor': 3}},
+                {'buckets': []}
+            ],
+            'plan': [
+                {'buckets': [{'key': {'valor': 'A'}}]}
+            ]
+        }
+        peticiones = []
+        
+        def buscar(index=None, body=None):
+            peticiones.append(json.loads(json.dumps(body)))
+            composite = body['aggs']['valores']['composite']
+            campo = composite['sources'][0]['valor']['terms']['field']
+            return {'aggregations': {'valores': paginas[campo].pop(0)}}
+        
+        mock_elasticsearch.search.side_effect = buscar
+        client = ElasticsearchClient(mock_config)
+        
+        valores = list(client.iter_composite_values(
+            {"query": {"match_all": {}}}, {'id': 'labels.id', 'plan': 'plan'}, page_size=2
+        ))
+        
+        assert valores == [('id', 1), ('id', 2), ('id', 3), ('plan', 'A')]
+        assert peticiones[0]['size'] == 0
+        assert peticiones[0]['aggs']['valores']['composite']['size'] == 2
+        assert 'after' not in peticiones[0]['aggs']['valores']['composite']
+        assert peticiones[1]['aggs']['valores']['composite']['after'] == {'valor': 2}
+    
+    def test_campo_no_agregable(self, mock_config, mock_elasticsearch):
+        """Test: Un campo text sin keyword se traduce en ValueError explicativo"""
+        mock_elasticsearch.search.side_effect = RequestError(
+            message="Text fields are not optimised", meta=Mock(status=400), body={}
+        )
+        
+        client = ElasticsearchClient(mock_config)
+        with pytest.raises(ValueError) as excinfo:
+            list(client.iter_composite_values({}, {'message': 'message'}))
+        
+        assert "'message'" in str(excinfo.value)
+
+
+class TestPodaDeIndices:
+    """Tests para la poda de índices por rango de @timestamp"""
+    
+    @staticmethod
+    def preparar(mock_elasticsearch, docs_recientes=10):
+        """Tres índices diarios; el cluster responde sus rangos de @timestamp"""
+        dia = 86_400_000
+        mock_elasticsearch.cat.indices.return_value = [
+            {'index': 'logs-2026.02.01', 'docs.count': '5', 'pri': '2'},
+            {'index': 'logs-2026.02.02', 'docs.count': '5', 'pri': '2'},
+            {'index': '.ds-logs-2026.02.03', 'docs.count': str(docs_recientes), 'pri': '1'},
+        ]
+        inicio = 1769904000000  # 2026-02-01T00:00:00Z
+        rangos = {
+            'logs-2026.02.01': inicio,
+            'logs-2026.02.02': inicio + dia,
+            '.ds-logs-2026.02.03': inicio + 2 * dia,
+        }
+        
+        def buscar(searches=None):
+            return {'responses': [
+                {'aggregations': {
+                    'min_ts': {'value': rangos[cabecera['index']]},
+                    'max_ts': {'value': rangos[cabecera['index']] + dia - 1}
+                }}
+                for cabecera in searches[::2]
+            ]}
+        
+        mock_elasticsearch.msearch.side_effect = buscar
+        return inicio + dia
+    
+    def test_descarta_indices_fuera_de_rango(self, mock_config, mock_elasticsearch, capsys):
+        """Test: Solo conserva los índices que cortan el rango y cuenta los shards omitidos"""
+        mock_config.prune_indices = True
+        desde = self.preparar(mock_elasticsearch)
+        query = {"query": {"range": {"@timestamp": {"gte": desde, "format": "epoch_millis"}}}}
+        
+        client = ElasticsearchClient(mock_config)
+        indices = client.prune_indices(query, 'logs-*')
+        
+        assert indices == '.ds-logs-2026.02.03,logs-2026.02.02'
+        assert '2 shards omitidos' in capsys.readouterr().out
+        # Una búsqueda por índice con min/max en la raíz (sin terms ni query)
+        busquedas = mock_elasticsearch.msearch.call_args[1]['searches']
+        assert len(busquedas) == 6
+        assert set(busquedas[1]['aggs']) == {'min_ts', 'max_ts'}
+        assert 'query' not in busquedas[1]
+    
+    def test_reutiliza_rangos_mientras_no_cambie_docs_count(self, mock_config, mock_elasticsearch):
+        """Test: Los rangos se cachean y solo se recalculan los índices modificados"""
+        mock_config.prune_indices = True
+        desde = self.preparar(mock_elasticsearch)
+        query = {"query": {"range": {"@timestamp": {"gte": desde, "format": "epoch_millis"}}}}
+        
+        client = ElasticsearchClient(mock_config)
+        client.prune_indices(query, 'logs-*')
+        client.prune_indices(query, 'logs-*')
+        assert mock_elasticsearch.msearch.call_count == 1
+        
+        self.preparar(mock_elasticsearch, docs_recientes=11)
+        client.prune_indices(query, 'logs-*')
+        busquedas = mock_elasticsearch.msearch.call_args[1]['searches']
+        assert [b['index'] for b in busquedas[::2]] == ['.ds-logs-2026.02.03']
+    
+    def test_rangos_persisten_entre_ejecuciones(self, mock_config, mock_elasticsearch, tmp_path):
+        """Test: Otra ejecución reutiliza los rangos guardados en disco"""
+        mock_config.prune_indices = True
+        mock_config.metadata_cache_persist = True
+        desde = self.preparar(mock_elasticsearch)
+        query = {"query": {"range": {"@timestamp": {"gte": desde, "format": "epoch_millis"}}}}
+        
+        with patch('elasticsearch_client.ruta_cache_cluster', return_value=tmp_path / 'm.json'):
+            ElasticsearchClient(mock_config).prune_indices(query, 'logs-*')
+            segunda = ElasticsearchClient(mock_config).prune_indices(query, 'logs-*')
+        
+        assert segunda == '.ds-logs-2026.02.03,logs-2026.02.02'
+        assert mock_elasticsearch.msearch.call_count == 1
+    
+    def test_sin_rango_no_poda(self, mock_config, mock_elasticsearch):
+        """Test: Sin filtro de @timestamp se usa el patrón tal cual"""
+        mock_config.prune_indices = True
+        
+        client = ElasticsearchClient(mock_config)
+        
+        assert client.prune_indices({"query": {"match_all": {}}}, 'logs-*') == 'logs-*'
+        mock_elasticsearch.cat.indices.assert_not_called()
+
+
+class TestOptimizacionYProfile:
+    """Tests para la optimización según mapping y la Profile API"""
+    
+    def test_optimiza_con_los_tipos_de_field_caps(self, mock_config, mock_elasticsearch):
+        """Test: Consulta field_caps y el mapping de los campos con wildcard y reescribe"""
+        mock_elasticsearch.field_caps.return_value = {'fields': {
+            'message': {'keyword': {'type': 'keyword'}},
+            'message.wc': {'wildcard': {'type': 'wildcard'}}
+        }}
+        mock_elasticsearch.indices.get_field_mapping.return_value = {
+            'logs-1': {'mappings': {
+                'message': {'full_name': 'message', 'mapping': {'message': {'type': 'keyword'}}},
+                'message.wc': {'full_name': 'message.wc', 'mapping': {'wc': {'type': 'wildcard'}}}
+            }}
+        }
+        query = {"query": {"bool": {"must": [{"wildcard": {"message": "*Body:*"}}]}}}
+        
+        client = ElasticsearchClient(mock_config)
+        optimizada, cambios = client.optimize_query(query, 'logs-*')
+        
+        assert mock_elasticsearch.field_caps.call_args[1]['fields'] == ['message', 'message.*']
+        assert optimizada["query"]["bool"]["filter"] == [
+            {"wildcard": {"message.wc": {"value": "*Body:*"}}}
+        ]
+        assert len(cambios) == 2
+    
+    def test_ignore_above_distinto_entre_indices_no_reescribe(self, mock_config, mock_elasticsearch):
+        """Test: Un campo con parámetros distintos en algún índice no se considera igual"""
+        mock_elasticsearch.field_caps.return_value = {'fields': {
+            'message': {'keyword': {'type': 'keyword'}},
+            'message.wc': {'wildcard': {'type': 'wildcard'}}
+        }}
+        subcampo = {'full_name': 'message.wc', 'mapping': {'wc': {'type': 'wildcard'}}}
+        mock_elasticsearch.indices.get_field_mapping.return_value = {
+            'logs-1': {'mappings': {
+                'message': {'full_name': 'message', 'mapping': {'message': {'type': 'keyword'}}},
+                'message.wc': subcampo
+            }},
+            'logs-2': {'mappings': {
+                'message': {'full_name': 'message', 'mapping': {
+                    'message': {'type': 'keyword', 'ignore_above': 256}
+                }},
+                'message.wc': subcampo
+            }}
+        }
+        query = {"query": {"wildcard": {"message": "*Body:*"}}}
+        
+        client = ElasticsearchClient(mock_config)
+        
+        assert client.get_field_mapping_params(['message', 'message.*'], 'logs-*') == {'message.wc': {}}
+        assert client.optimize_query(query, 'logs-*') == (query, [])
+    
+    def test_resume_tiempos_por_shard(self, mock_config, mock_elasticsearch):
+        """Test: Suma query, rewrite y collector de cada shard"""
+        mock_elasticsearch.search.return_value = {
+            'took': 12,
+            'hits': {'total': {'value': 7}},
+            'profile': {'shards': [{
+                'id': '[nodo][logs-1][0]',
+                'searches': [{
+                    'query': [{'time_in_nanos': 3_000_000}, {'time_in_nanos': 1_000_000}],
+                    'rewrite_time': 500_000,
+                    'collector': [{'time_in_nanos': 500_000}]
+                }]
+            }]}
+        }
+        
+        client = ElasticsearchClient(mock_config)
+        perfil = client.profile_query({"query": {"match_all": {}}})
+        
+        assert perfil['total'] == 7
+        assert perfil['shards'][0]['query_ms'] == 4.0
+        assert perfil['shards'][0]['total_ms'] == 5.0
+        assert mock_elasticsearch.search.call_args[1]['body']['profile'] is True
+
+
+class TestColapsoDeMensajes:
+    """Tests para la descarga de un representante por message distinto"""
+    
+    def test_un_documento_por_grupo_con_su_conteo(self, mock_config, mock_elasticsearch):
+        """Test: Pagina los grupos y adjunta doc_count a cada representante"""
+        def grupo(clave, mensaje, hits):
+            return {
+                'key': {'mensaje': clave},
+                'doc_count': hits,
+                'representante': {'hits': {'hits': [
+                    {'_id': clave, '_source': {'message': mensaje, '@timestamp': '2026-02-10'}}
+                ]}}
+            }
+        
+        paginas = [
+            {'buckets': [grupo('h1', 'Body: a', 40), grupo('h2', 'Body: b', 2)],
+             'after_key': {'mensaje': 'h2'}},
+            {'buckets': []}
+        ]
+        peticiones = []
+        
+        def buscar(index=None, body=None):
+            peticiones.append(json.loads(json.dumps(body)))
+            return {'aggregations': {'mensajes': paginas.pop(0)}}
+        
+        mock_elasticsearch.search.side_effect = buscar
+        client = ElasticsearchClient(mock_config)
+        resumen = {}
+        
+        docs = list(client.iter_collapsed_messages({"query": {"match_all": {}}}, resumen=resumen))
+        
+        assert [(d['message'], d['count']) for d in docs] == [('Body: a', 40), ('Body: b', 2)]
+        assert resumen == {'grupos': 2, 'documentos': 42}
+        assert 'message_sha1' in peticiones[0]['runtime_mappings']
+        assert peticiones[1]['aggs']['mensajes']['composite']['after'] == {'mensaje': 'h2'}
+    
+    def test_agrupa_por_campo_keyword(self, mock_config, mock_elasticsearch):
+        """Test: Con un campo keyword no se define runtime field"""
+        mock_elasticsearch.search.return_value = {'aggregations': {'mensajes': {'buckets': []}}}
+        
+        client = ElasticsearchClient(mock_config)
+        list(client.iter_collapsed_messages({}, campo='message.keyword'))
+        
+        body = mock_elasticsearch.search.call_args[1]['body']
+        assert 'runtime_mappings' not in body
+        assert body['aggs']['mensajes']['composite']['sources'][0]['mensaje']['terms'] == {
+            'field': 'message.keyword'
+        }
+
+
 # Tests de integración con todo el flujo
 class TestIntegracionElasticsearchClient:
     """Tests de integración del cliente completo"""
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo estimador
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+import estimador
+
+MB = 1024 * 1024
+
+
+def crear_config(**cambios):
+    """Configuración mínima con los ajustes que usa la estimación"""
+    valores = dict(
+        scroll_size=1000, scroll_size_min=100, scroll_size_max=10000, adaptive_page_size=True,
+        page_target_seconds=2.0, page_max_mb=20.0, scroll_timeout='5m', window_workers=4,
+        http_compress=True
+    )
+    valores.update(cambios)
+    return SimpleNamespace(**valores)
+
+
+def crear_muestra(**cambios):
+    """Medidas de una página de muestra de 200 docs de 1 KB"""
+    muestra = dict(
+        docs=200, bytes_doc=1024.0, bytes_doc_lean=512.0, ratio_gzip=0.2, expansion=3.0,
+        proceso_doc=0.00001, bytes_csv_doc=600.0, segundos=0.12, latencia_conteo=0.02
+    )
+    muestra.update(cambios)
+    return muestra
+
+
+class TestDuracion:
+    """Tests para el parseo de duraciones de Elasticsearch"""
+    
+    @pytest.mark.parametrize('texto,segundos', [('5m', 300), ('90s', 90), ('1h', 3600), ('500ms', 0.5)])
+    def test_unidades(self, texto, segundos):
+        """Test: Convierte las unidades de keep-alive a segundos"""
+        assert estimador.duracion_segundos(texto) == segundos
+    
+    def test_formato_invalido(self):
+        """Test: Un formato desconocido da error"""
+        with pytest.raises(ValueError):
+            estimador.duracion_segundos('5 minutos')
+
+
+class TestMedirMuestra:
+    """Tests para las medidas de la página de muestra"""
+    
+    def test_mide_bytes_lean_y_compresion(self):
+        """Test: Bytes por documento, tamaño lean y ratio gzip de la página"""
+        hits = [{
+            '_index': 'logs-2024.01.01', '_id': str(i), '_score': 1.0,
+            '_source': {'@timestamp': '2024-01-01T00:00:00Z', 'host': 'srv' * 50,
+                        'message': 'Body: {"where":[{"field":"idEstudio","value":7}]} ' * 5}
+        } for i in range(50)]
+        datos = json.dumps({'took': 3, 'hits': {'hits': hits}}).encode()
+        
+        muestra = estimador.medir_muestra(datos, 0.1)
+        
+        assert muestra['docs'] == 50
+        assert muestra['bytes_doc'] == pytest.approx(len(datos) / 50)
+        assert muestra['bytes_doc_lean'] < muestra['bytes_doc']
+        assert 0 < muestra['ratio_gzip'] < 0.5
+        assert muestra['expansion'] > 0
+        assert muestra['proceso_doc'] > 0
+    
+    def test_pagina_vacia(self):
+        """Test: Una muestra sin hits no divide por cero"""
+        muestra = estimador.medir_muestra(b'{"hits":{"hits":[]}}', 0.05)
+        
+        assert muestra['docs'] == 0
+        assert muestra['bytes_doc'] == 0.0
+
+
+class TestEstimar:
+    """Tests para la predicción por modo"""
+    
+    def test_tamano_adaptativo_limitado_por_latencia_y_bytes(self):
+        """Test: El tamaño converge al menor de los límites"""
+        config = crear_config()
+        
+        # 1 ms por documento y 20 ms fijos: caben 1980 docs en 2 s
+        assert estimador.tamano_pagina_estimado(config, 1024, 0.02, 0.001) == 1980
+        # 100 KB por documento: 20 MB son 204 docs
+        assert estimador.tamano_pagina_estimado(config, 100 * 1024, 0.02, 0.0) == 204
+        assert estimador.tamano_pagina_estimado(crear_config(adaptive_page_size=False), 1024, 0, 0) == 1000
+    
+    def test_predice_bytes_tiempo_y_memoria(self):
+        """Test: Los modos reflejan lean, paralelismo y parser incremental"""
+        estimacion = estimador.estimar(1_000_000, crear_muestra(), crear_config())
+        modos = {m['nombre']: m for m in estimacion['modos']}
+        
+        assert modos['scroll']['paginas'] == 1000
+        assert modos['scroll']['bytes'] == pytest.approx(1_000_000 * 1024)
+        assert modos['scroll']['bytes_red'] == pytest.approx(1_000_000 * 1024 * 0.2)
+        assert modos['scroll --lean']['bytes'] == pytest.approx(modos['scroll']['bytes'] / 2)
+        assert modos['--windows 4']['segundos'] < modos['search_after (PIT)']['segundos']
+        assert modos['--windows 4']['memoria'] > modos['search_after (PIT)']['memoria']
+        assert modos['--incremental-parse']['memoria'] < modos['search_after (PIT)']['memoria']
+        assert estimacion['bytes_csv'] == pytest.approx(600_000_000)
+        assert not estimacion['avisos']
+    
+    def test_avisa_de_memoria_y_keep_alive(self):
+        """Test: Avisa si la memoria pico o el tiempo entre páginas superan los límites"""
+        muestra = crear_muestra(bytes_doc=20 * 1024, proceso_doc=0.5)
+        
+        estimacion = estimador.estimar(
+            10_000, muestra, crear_config(scroll_timeout='1m'), windows=8, limite=200 * MB
+        )
+        modos = {m['nombre']: m for m in estimacion['modos']}
+        
+        assert any('memoria pico' in a for a in modos['--windows 8']['avisos'])
+        assert any('puede caducar' in a for a in modos['scroll']['avisos'])
+        assert 'divide el rango' in estimacion['avisos'][0]
+    
+    def test_ventanas_recomendadas(self):
+        """Test: Ventanas hasta que el procesamiento iguala a la red"""
+        muestra = crear_muestra(segundos=1.02, latencia_conteo=0.02, proceso_doc=0.001)
+        
+        estimacion = estimador.estimar(1_000, muestra, crear_config(adaptive_page_size=False))
+        
+        # Página de 1000: 5.02 s de red frente a 1 s de procesamiento
+        assert estimacion['ventanas_recomendadas'] == 6
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
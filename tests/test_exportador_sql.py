@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo exportador_sql
+"""
+
+import pytest
+from exportador_sql import (
+    construir_sql, contar_filas_csv, filtro_sql, primera_linea, separar_cabecera
+)
+
+
+class TestConstruirSql:
+    """Tests para la sentencia SQL de la exportación"""
+    
+    def test_todas_las_columnas(self):
+        """Test: Sin campos se exportan todas las columnas del patrón entrecomillado"""
+        assert construir_sql('logs-*') == 'SELECT * FROM "logs-*"'
+    
+    def test_campos_entrecomillados(self):
+        """Test: Los campos con @ o puntos se citan como identificadores"""
+        sql = construir_sql('logs-*', ['@timestamp', 'host.name', 'raro"campo'])
+        
+        assert sql == 'SELECT "@timestamp", "host.name", "raro""campo" FROM "logs-*"'
+    
+    def test_filtro_es_la_query_dsl(self):
+        """Test: La query del body se pasa como filtro DSL"""
+        query = {'query': {'term': {'level': 'ERROR'}}, 'size': 10}
+        
+        assert filtro_sql(query) == {'term': {'level': 'ERROR'}}
+        assert filtro_sql({}) is None
+
+
+class TestCabeceraYFilas:
+    """Tests para el manejo de las páginas CSV"""
+    
+    def test_separa_la_cabecera_solo_si_se_repite(self):
+        """Test: La cabecera se quita de la primera página y de las que la repitan"""
+        cabecera = primera_linea(b'@timestamp,message\n1,a\n')
+        
+        assert cabecera == b'@timestamp,message\n'
+        assert separar_cabecera(b'@timestamp,message\n1,a\n', cabecera) == b'1,a\n'
+        assert separar_cabecera(b'2,b\n', cabecera) == b'2,b\n'
+    
+    def test_cuenta_filas_sin_comillas(self):
+        """Test: Sin comillas se cuentan las líneas, con o sin salto final"""
+        assert contar_filas_csv(b'1,a\n2,b\n') == 2
+        assert contar_filas_csv(b'1,a\n2,b') == 2
+        assert contar_filas_csv(b'') == 0
+    
+    def test_cuenta_mensajes_multilinea(self):
+        """Test: Un message entre comillas con saltos de línea es un solo registro"""
+        filas = b'1,"Error:\nTraceback\n  linea"\n2,"{""a"":1}"\n'
+        
+        assert contar_filas_csv(filas) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo hit_parser
+"""
+
+import pytest
+import json
+from hit_parser import iterar_hits_crudos
+
+
+def pagina_cruda(hits, **extra):
+    """Serializa una respuesta de búsqueda como la envía Elasticsearch"""
+    respuesta = dict(extra)
+    respuesta['hits'] = {'total': {'value': len(hits)}, 'max_score': None, 'hits': hits}
+    return json.dumps(respuesta).encode('utf-8')
+
+
+class TestIterarHitsCrudos:
+    """Tests para la función iterar_hits_crudos"""
+    
+    def test_extrae_solo_campos_necesarios(self):
+        """Test: Materializa _id, sort, message y @timestamp y descarta el resto"""
+        raw = pagina_cruda([{
+            '_index': 'logs-2026.02',
+            '_id': 'abc',
+            '_score': None,
+            '_source': {
+                'message': 'Body: {"where":[{"field":"id","value":1}]}',
+                '@timestamp': '2026-02-16T10:00:00.000Z',
+                'host': {'name': 'srv', 'tags': ['a', '}']}
+            },
+            'sort': [1771236000000, 7]
+        }])
+        
+        hits = list(iterar_hits_crudos(raw))
+        
+        assert hits == [{
+            '_id': 'abc',
+            '_source': {
+                'message': 'Body: {"where":[{"field":"id","value":1}]}',
+                '@timestamp': '2026-02-16T10:00:00.000Z'
+            },
+            'sort': [1771236000000, 7]
+        }]
+    
+    def test_timestamp_desde_fields(self):
+        """Test: Conserva @timestamp de docvalue_fields"""
+        raw = pagina_cruda([{'_id': '1', 'fields': {'@timestamp': ['t1'], 'otro': [1]}}])
+        
+        assert list(iterar_hits_crudos(raw)) == [{'_id': '1', 'fields': {'@timestamp': ['t1']}}]
+    
+    def test_cadenas_con_escapes_y_llaves(self):
+        """Test: Los escapes y llaves dentro de cadenas no rompen el parser"""
+        mensaje = 'Error "grave" \\ con {llaves} y [corchetes] ñ ☃'
+        raw = pagina_cruda([{'_id': 'x"y', '_source': {'message': mensaje, 'extra': '"}]'}}])
+        
+        hit = next(iterar_hits_crudos(raw))
+        
+        assert hit['_id'] == 'x"y'
+        assert hit['_source']['message'] == mensaje
+    
+    def test_rellena_metadatos(self):
+        """Test: Guarda pit_id, _shards y hits.total y salta claves desconocidas"""
+        raw = pagina_cruda([{'_id': '1'}], pit_id='pit-2', _shards={'total': 3}, aggregations={'a': 1})
+        meta = {}
+        
+        assert [h['_id'] for h in iterar_hits_crudos(raw, meta)] == ['1']
+        assert meta['pit_id'] == 'pit-2'
+        assert meta == {'pit_id': 'pit-2', '_shards': {'total': 3}, 'total': {'value': 1}}
+    
+    def test_es_perezoso(self):
+        """Test: Entrega el primer hit antes de leer el resto de la página"""
+        raw = pagina_cruda([{'_id': '1'}, {'_id': '2'}])[:-3]  # Página truncada al final
+        hits = iterar_hits_crudos(raw)
+        
+        assert next(hits)['_id'] == '1'
+        with pytest.raises(ValueError):
+            list(hits)
+    
+    def test_pagina_vacia(self):
+        """Test: Una página sin hits no produce nada"""
+        assert list(iterar_hits_crudos(b'{"hits":{"hits":[]}}')) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
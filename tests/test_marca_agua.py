@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo marca_agua
+"""
+
+import json
+from marca_agua import MarcaAgua
+
+
+QUERY = {
+    "query": {
+        "bool": {
+            "must": [{"wildcard": {"message": "*Body:*"}}],
+            "filter": [{"range": {"@timestamp": {"gte": "2026-02-01T00:00:00Z"}}}]
+        }
+    }
+}
+
+
+class TestMarcaAgua:
+    """Tests para la clase MarcaAgua"""
+    
+    def test_sin_marca_no_altera_la_query(self, tmp_path):
+        """Test: La primera ejecución procesa el rango completo"""
+        marca = MarcaAgua(str(tmp_path / "salida.json.delta"), clave="abc")
+        
+        assert marca.cargar() is False
+        assert marca.aplicar(QUERY) == QUERY
+    
+    def test_observa_el_mayor_timestamp_y_sus_ids(self, tmp_path):
+        """Test: Conserva el cursor más alto y une los _id empatados"""
+        marca = MarcaAgua(str(tmp_path / "salida.json.delta"), clave="abc")
+        
+        marca.observar({'ultimo_ts': 2000, 'ids': ['b']})
+        marca.observar({'ultimo_ts': 1000, 'ids': ['a']})
+        marca.observar({'ultimo_ts': 2000, 'ids': ['c'], 'terminado': True})
+        marca.observar({})
+        
+        assert marca.ultimo_ts == 2000
+        assert marca.ids == ['b', 'c']
+    
+    def test_reescribe_rango_y_excluye_ids_del_limite(self, tmp_path):
+        """Test: La siguiente ejecución empieza en la marca sin repetir documentos"""
+        ruta = tmp_path / "salida.json.delta"
+        marca = MarcaAgua(str(ruta), clave="abc")
+        marca.observar({'ultimo_ts': 1770681600000, 'ids': ['x1', 'x2']})
+        marca.guardar()
+        
+        siguiente = MarcaAgua(str(ruta), clave="abc")
+        assert siguiente.cargar() is True
+        query = siguiente.aplicar(QUERY)
+        
+        filtros = query['query']['bool']['filter']
+        assert filtros[0]['range']['@timestamp'] == {'gte': '2026-02-10T00:00:00.000Z'}
+        assert filtros[1] == {'bool': {'must_not': [{'ids': {'values': ['x1', 'x2']}}]}}
+        # La query original no se modifica
+        assert QUERY['query']['bool']['filter'][0]['range']['@timestamp']['gte'] == \
+            "2026-02-01T00:00:00Z"
+    
+    def test_conserva_marcas_de_otras_queries(self, tmp_path):
+        """Test: Cada combinación query + índice tiene su propia marca"""
+        ruta = tmp_path / "estado.delta"
+        for clave, ts in (("q1", 1000), ("q2", 5000)):
+            marca = MarcaAgua(str(ruta), clave=clave)
+            marca.observar({'ultimo_ts': ts, 'ids': ['a']})
+            marca.guardar()
+        
+        datos = json.loads(ruta.read_text(encoding='utf-8'))
+        assert datos['q1']['ultimo_ts'] == 1000
+        assert datos['q2']['ultimo_ts'] == 5000
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo metadata_cache
+"""
+
+import time
+from unittest.mock import Mock, patch
+from metadata_cache import CacheMetadatos, ruta_cache_cluster
+
+
+class TestCacheMetadatos:
+    """Tests para la clase CacheMetadatos"""
+    
+    def test_reutiliza_dentro_del_ttl(self):
+        """Test: Dentro del TTL no se vuelve a consultar al cluster"""
+        cache = CacheMetadatos(ttl=60)
+        cargar = Mock(return_value=['logs-1'])
+        
+        assert cache.obtener('indices:*', cargar) == ['logs-1']
+        assert cache.obtener('indices:*', cargar) == ['logs-1']
+        assert cargar.call_count == 1
+        assert cache.estadisticas['aciertos'] == 1
+    
+    def test_revalida_con_la_version_del_cluster(self):
+        """Test: Caducada la entrada, la misma versión evita recargarla"""
+        version = Mock(return_value='uuid:7')
+        cache = CacheMetadatos(ttl=60, validador=version)
+        cargar = Mock(return_value=['logs-1'])
+        
+        with patch('metadata_cache.time.time', return_value=1000.0):
+            cache.obtener('indices:*', cargar)
+        with patch('metadata_cache.time.time', return_value=1100.0):
+            cache.obtener('indices:*', cargar)
+        assert cargar.call_count == 1
+        assert cache.estadisticas['revalidaciones'] == 1
+        
+        version.return_value = 'uuid:8'
+        with patch('metadata_cache.time.time', return_value=1200.0):
+            cache.obtener('indices:*', cargar)
+        assert cargar.call_count == 2
+    
+    def test_persiste_entre_instancias(self, tmp_path):
+        """Test: Una segunda ejecución reutiliza la caché guardada en disco"""
+        ruta = tmp_path / "metadatos.json"
+        CacheMetadatos(ttl=60, ruta=ruta).obtener('existe:logs-*', lambda: True)
+        
+        cargar = Mock(return_value=False)
+        assert CacheMetadatos(ttl=60, ruta=ruta).obtener('existe:logs-*', cargar) is True
+        cargar.assert_not_called()
+    
+    def test_invalida_por_prefijo(self):
+        """Test: La invalidación explícita fuerza la recarga"""
+        cache = CacheMetadatos(ttl=60)
+        cache.obtener('indices:*', lambda: ['a'])
+        cache.obtener('existe:a', lambda: True)
+        
+        assert cache.invalidar('indices:') == 1
+        assert cache.obtener('indices:*', lambda: ['a', 'b']) == ['a', 'b']
+        assert 'existe:a' in cache.entradas
+    
+    def test_invalida_clave_exacta(self):
+        """Test: Invalidar una clave no borra las que empiezan igual"""
+        cache = CacheMetadatos(ttl=60)
+        cache.obtener('indices:h|bob', lambda: ['a'])
+        cache.obtener('indices:h|bobby', lambda: ['b'])
+        
+        assert cache.invalidar_clave('indices:h|bob') is True
+        assert cache.invalidar_clave('indices:h|bob') is False
+        assert list(cache.entradas) == ['indices:h|bobby']
+    
+    def test_leer_y_guardar_sin_ttl(self, tmp_path):
+        """Test: leer ignora el TTL y guardar persiste varias entradas de una vez"""
+        cache = CacheMetadatos(ttl=0.01, ruta=tmp_path / "m.json")
+        cache.guardar({"rango_ts:a": {"docs": 1}, "rango_ts:b": {"docs": 2}})
+        time.sleep(0.02)
+        
+        otra = CacheMetadatos(ttl=0.01, ruta=tmp_path / "m.json")
+        assert otra.leer("rango_ts:b") == {"docs": 2}
+        assert otra.leer("rango_ts:c") is None
+    
+    def test_ttl_cero_desactiva_la_cache(self):
+        """Test: Con TTL 0 siempre se consulta al cluster"""
+        cache = CacheMetadatos(ttl=0)
+        cargar = Mock(return_value=1)
+        cache.obtener('x', cargar)
+        cache.obtener('x', cargar)
+        assert cargar.call_count == 2
+    
+    def test_ruta_distinta_por_cluster_y_usuario(self):
+        """Test: Cada cluster y usuario tiene su propio archivo"""
+        a = ruta_cache_cluster('https://elk', 'ana')
+        assert a == ruta_cache_cluster('https://elk', 'ana')
+        assert a != ruta_cache_cluster('https://elk', 'luis')
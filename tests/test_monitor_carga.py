@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo monitor_carga
+"""
+
+import time
+from unittest.mock import Mock, patch
+
+from concurrencia import LimitadorConcurrencia
+from monitor_carga import MonitorCarga, NORMAL, FRENAR, PAUSAR
+
+
+def crear_config(**extra):
+    """Política de carga por defecto"""
+    valores = dict(
+        load_monitor_interval=15.0, load_queue_throttle=20,
+        load_queue_pause=100, load_pause_on_red=True
+    )
+    valores.update(extra)
+    return Mock(**valores)
+
+
+def crear_es(colas, rechazados, estado='green'):
+    """Cliente simulado con un nodo por cola"""
+    es = Mock()
+    es.nodes.stats.return_value = {'nodes': {
+        f'n{i}': {'thread_pool': {'search': {'queue': cola, 'rejected': rechazados[i]}}}
+        for i, cola in enumerate(colas)
+    }}
+    es.cluster.health.return_value = {'status': estado}
+    return es
+
+
+class TestMonitorCarga:
+    """Tests para la clase MonitorCarga"""
+    
+    def test_muestra_cola_maxima_y_rechazos_nuevos(self):
+        """Test: Toma la cola del nodo más cargado y los rechazos desde la muestra anterior"""
+        es = crear_es([3, 40], [10, 5])
+        monitor = MonitorCarga(es, LimitadorConcurrencia(maximo=4), crear_config())
+        
+        assert monitor.muestrear() == {'cola': 40, 'rechazos': 0, 'estado': 'green'}
+        
+        es.nodes.stats.return_value['nodes']['n0']['thread_pool']['search']['rejected'] = 17
+        assert monitor.muestrear()['rechazos'] == 7
+    
+    def test_politica(self):
+        """Test: Umbrales de cola, rechazos y estado rojo"""
+        monitor = MonitorCarga(Mock(), LimitadorConcurrencia(maximo=4), crear_config())
+        
+        assert monitor.decidir({'cola': 0, 'rechazos': 0, 'estado': 'yellow'}) == NORMAL
+        assert monitor.decidir({'cola': 25, 'rechazos': 0, 'estado': 'green'}) == FRENAR
+        assert monitor.decidir({'cola': 0, 'rechazos': 3, 'estado': 'green'}) == FRENAR
+        assert monitor.decidir({'cola': 150, 'rechazos': 0, 'estado': 'green'}) == PAUSAR
+        assert monitor.decidir({'cola': 0, 'rechazos': 0, 'estado': 'red'}) == PAUSAR
+    
+    def test_aplica_al_limitador_y_registra_cambios(self):
+        """Test: Frenar deja una búsqueda simultánea, pausar detiene y normal lo retira"""
+        limitador = LimitadorConcurrencia(maximo=4)
+        monitor = MonitorCarga(Mock(), limitador, crear_config())
+        muestra = {'cola': 25, 'rechazos': 0, 'estado': 'green'}
+        
+        monitor.aplicar(FRENAR, muestra)
+        monitor.aplicar(FRENAR, muestra)
+        assert limitador.techo == 1
+        
+        monitor.aplicar(PAUSAR, muestra)
+        assert limitador.abierto_hasta > 0
+        
+        monitor.aplicar(NORMAL, muestra)
+        assert limitador.techo is None
+        
+        resumen = monitor.resumen()
+        assert resumen['muestras'] == {NORMAL: 1, FRENAR: 2, PAUSAR: 1}
+        assert [c['decision'] for c in resumen['cambios']] == [FRENAR, PAUSAR, NORMAL]
+    
+    def test_hilo_sin_permisos_no_frena(self):
+        """Test: Un error al muestrear no frena la descarga"""
+        es = Mock()
+        es.nodes.stats.side_effect = Exception('security_exception')
+        limitador = LimitadorConcurrencia(maximo=4)
+        monitor = MonitorCarga(es, limitador, crear_config())
+        
+        monitor.iniciar()
+        monitor.detener()
+        
+        assert limitador.techo is None
+        assert monitor.resumen()['muestras'] == {NORMAL: 0, FRENAR: 0, PAUSAR: 0}
+        assert monitor.resumen()['errores'] == 1
+    
+    def test_sigue_muestreando_tras_un_error(self):
+        """Test: Un fallo puntual no detiene el hilo: la muestra siguiente vuelve a decidir"""
+        es = crear_es([30], [0])
+        respuesta = es.nodes.stats.return_value
+        es.nodes.stats.side_effect = [Exception('timeout')] + [respuesta] * 1000
+        monitor = MonitorCarga(es, LimitadorConcurrencia(maximo=4), crear_config(
+            load_monitor_interval=0.01
+        ))
+        
+        monitor.iniciar()
+        limite = time.monotonic() + 5
+        while monitor.contadores[FRENAR] == 0 and time.monotonic() < limite:
+            time.sleep(0.01)
+        monitor.detener()
+        
+        assert monitor.errores == 1
+        assert monitor.contadores[FRENAR] >= 1
+    
+    def test_esperar_turno_del_scroll(self):
+        """Test: En pausa espera a que termine; al frenar deja un respiro entre páginas"""
+        limitador = LimitadorConcurrencia(maximo=4)
+        monitor = MonitorCarga(Mock(), limitador, crear_config(load_monitor_interval=0.05))
+        muestra = {'cola': 150, 'rechazos': 0, 'estado': 'green'}
+        
+        monitor.aplicar(PAUSAR, muestra)
+        inicio = time.monotonic()
+        monitor.esperar_turno()
+        assert time.monotonic() - inicio >= 0.04
+        
+        monitor.aplicar(FRENAR, muestra)
+        with patch('monitor_carga.PAUSA_FRENAR_SEGUNDOS', 0.05):
+            inicio = time.monotonic()
+            monitor.esperar_turno()
+        assert time.monotonic() - inicio >= 0.04
+        
+        monitor.aplicar(NORMAL, muestra)
+        inicio = time.monotonic()
+        monitor.esperar_turno()
+        assert time.monotonic() - inicio < 0.04
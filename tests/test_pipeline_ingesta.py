@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo pipeline_ingesta
+"""
+
+import json
+import re
+
+import pytest
+import pipeline_ingesta
+
+
+def ejecutar_pipeline(pipeline, source):
+    """
+    Ejecuta el pipeline como lo haría un nodo de ingesta (grok, json, script, remove)
+
+    El grok se traduce a una expresión regular de Python con las definiciones
+    del propio pipeline, así que comprueba el patrón instalado y no una copia.
+    """
+    doc = dict(source)
+    for procesador in pipeline['processors']:
+        (tipo, opciones), = procesador.items()
+        if tipo == 'grok':
+            if 'Body:' not in (doc.get(opciones['field']) or ''):
+                continue
+            patron = opciones['patterns'][0]
+            for nombre, definicion in opciones['pattern_definitions'].items():
+                patron = re.sub(r'%\{' + nombre + r':(\w+)\}', r'(?P<\1>' + definicion.replace('\\', '\\\\') + ')', patron)
+            match = re.search(patron, doc[opciones['field']])
+            if match:
+                doc.update(match.groupdict())
+        elif tipo == 'json' and opciones['field'] in doc:
+            try:
+                doc[opciones['target_field']] = json.loads(doc[opciones['field']])
+            except ValueError:
+                pass
+        elif tipo == 'script' and opciones['params']['origen'] in doc:
+            cuerpo = doc.pop(opciones['params']['origen'])
+            pares = [
+                pipeline_ingesta.codificar_par(item['field'], item['value'])
+                for item in (cuerpo.get('where') or []) if item.get('value') is not None
+            ]
+            if pares:
+                doc[opciones['params']['destino']] = pares
+        elif tipo == 'remove':
+            doc.pop(opciones['field'], None)
+        elif tipo == 'set':
+            doc[opciones['field']] = opciones['value']
+    return doc
+
+
+MENSAJES = [
+    'Body: {"where":[{"field":"idAsignaturaOfertada","value":294859},'
+    '{"field":"idEstudio","value":null},{"field":"idPlanEstudio","value":5109}]} , Mensaje del error',
+    'Body:{"where":[{"field":"nombre","value":"Grado \\"A\\" \\\\ B"},{"field":"activo","value":true}]}',
+    'Body: {"where":[{"field":"nota","value":7.5}]} Body: {"where":[{"field":"otro","value":1}]}',
+    'Body: {"where":[{"field":"roto","value":}]}',
+    'Body: {"where":[{"field":"ids","value":[1,"dos",null]},{"field":"rango","value":{"desde":1,"hasta":[2.5]}}]}',
+    'Mensaje sin cuerpo',
+    ''
+]
+
+
+class TestPipeline:
+    """Tests para la definición del pipeline"""
+    
+    @pytest.mark.parametrize('message', MENSAJES)
+    def test_coincide_con_el_procesador(self, message):
+        """Test: El pipeline extrae los mismos pares que procesar_mensaje"""
+        pipeline = pipeline_ingesta.construir_pipeline()
+        
+        doc = ejecutar_pipeline(pipeline, {'message': message})
+        
+        assert pipeline_ingesta.comparar_documento(message, doc) is None
+        assert pipeline_ingesta.CAMPO_BODY not in doc
+        assert pipeline_ingesta.CAMPO_JSON not in doc
+        assert doc['message'] == message
+    
+    def test_campo_destino_configurable(self):
+        """Test: Los pares se guardan en el campo indicado"""
+        pipeline = pipeline_ingesta.construir_pipeline('pares')
+        
+        doc = ejecutar_pipeline(pipeline, {'message': MENSAJES[0]})
+        
+        assert doc['pares'] == ['idAsignaturaOfertada=294859', 'idPlanEstudio=5109']
+        assert pipeline_ingesta.mapping_campo('pares')['pares']['type'] == 'keyword'
+    
+    def test_marca_los_documentos_sin_pares(self):
+        """Test: Un documento sin pares no nulos también queda marcado como procesado"""
+        pipeline = pipeline_ingesta.construir_pipeline()
+        
+        doc = ejecutar_pipeline(pipeline, {'message': 'Mensaje sin cuerpo'})
+        
+        assert 'body_where' not in doc
+        assert doc['body_where_version'] == pipeline_ingesta.VERSION_PIPELINE
+        assert pipeline_ingesta.mapping_campo()['body_where_version']['type'] == 'integer'
+
+
+class TestPares:
+    """Tests para la codificación de pares"""
+    
+    @pytest.mark.parametrize('valor', [
+        294859, 7.5, True, False, 'texto', 'con "comillas" y \\', 'a=b',
+        [1, 'dos', None], {'desde': 1, 'hasta': [2.5, {'x': 'y'}]}
+    ])
+    def test_ida_y_vuelta_conserva_el_tipo(self, valor):
+        """Test: Decodificar un par devuelve el valor con su tipo original"""
+        par = pipeline_ingesta.codificar_par('campo', valor)
+        
+        campo, decodificado = pipeline_ingesta.decodificar_par(par)
+        
+        assert campo == 'campo'
+        assert decodificado == valor
+        assert type(decodificado) is type(valor)
+    
+    def test_listas_y_objetos_en_json_compacto(self):
+        """Test: Listas y objetos se escriben en JSON, como la función aJson del script"""
+        assert pipeline_ingesta.codificar_par('c', [1, 'a']) == 'c=[1,"a"]'
+        assert pipeline_ingesta.codificar_par('c', {'k': None}) == 'c={"k":null}'
+        assert 'aJson' in pipeline_ingesta.SCRIPT_PARES
+    
+    def test_valor_no_json_se_devuelve_como_texto(self):
+        """Test: Un objeto escrito por la versión 1 del pipeline ({a=1}) se conserva como texto"""
+        assert pipeline_ingesta.decodificar_par('campo={a=1}') == ('campo', '{a=1}')
+    
+    def test_detecta_diferencias(self):
+        """Test: comparar_documento informa de lo esperado y lo obtenido"""
+        diferencia = pipeline_ingesta.comparar_documento(MENSAJES[0], {'body_where': ['idPlanEstudio=5109']})
+        
+        assert diferencia['esperado'] == [('idAsignaturaOfertada', 294859), ('idPlanEstudio', 5109)]
+        assert diferencia['obtenido'] == [('idPlanEstudio', 5109)]
+
+
+class TestRelleno:
+    """Tests para la query y el progreso del relleno"""
+    
+    def test_consulta_excluye_documentos_ya_procesados(self):
+        """Test: Se filtra por la query original y sin la marca de la versión actual"""
+        query = {'query': {'range': {'@timestamp': {'gte': 'now-7d'}}}}
+        
+        consulta = pipeline_ingesta.consulta_relleno(query, 'pares')
+        
+        assert consulta['bool']['filter'] == [query['query']]
+        assert consulta['bool']['must_not'] == [
+            {'term': {'pares_version': pipeline_ingesta.VERSION_PIPELINE}}
+        ]
+    
+    def test_resume_la_tarea(self):
+        """Test: Suma los documentos procesados y cuenta los fallos"""
+        progreso = pipeline_ingesta.resumir_tarea({
+            'completed': True,
+            'task': {'status': {'total': 10, 'updated': 6, 'noops': 2, 'version_conflicts': 1},
+                     'running_time_in_nanos': 3_000_000_000},
+            'response': {'failures': [{'id': 'x'}]}
+        })
+        
+        assert progreso == {
+            'completada': True, 'total': 10, 'procesados': 8, 'conflictos': 1,
+            'segundos': 3.0, 'fallos': 1, 'error': None
+        }
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo query_utils
+"""
+
+import pytest
+from datetime import datetime, timezone
+from query_utils import (
+    parsear_fecha,
+    a_epoch_millis,
+    resolver_fechas_relativas,
+    extraer_rango_timestamp,
+    agregar_filtro,
+    desplazar_inicio_rango,
+    campos_con_wildcard,
+    optimizar_query,
+    clave_query
+)
+
+
+AHORA = datetime(2026, 2, 17, 15, 30, 0, tzinfo=timezone.utc)
+
+
+def query_con_rango(gte, lte=None):
+    """Construye una query como las de queries/*.json"""
+    rango = {"gte": gte}
+    if lte is not None:
+        rango["lte"] = lte
+    return {
+        "query": {
+            "bool": {
+                "must": [{"wildcard": {"message": "*Body:*"}}],
+                "filter": [{"range": {"@timestamp": rango}}]
+            }
+        }
+    }
+
+
+class TestParsearFecha:
+    """Tests para la función parsear_fecha"""
+    
+    def test_date_math_relativo(self):
+        """Test: Resuelve now-7d respecto al instante de referencia"""
+        fecha = parsear_fecha("now-7d", AHORA)
+        assert fecha == datetime(2026, 2, 10, 15, 30, 0, tzinfo=timezone.utc)
+    
+    def test_redondeo_segun_direccion(self):
+        """Test: /d redondea hacia abajo o hacia arriba"""
+        assert parsear_fecha("now/d", AHORA) == datetime(2026, 2, 17, tzinfo=timezone.utc)
+        arriba = parsear_fecha("now/d", AHORA, hacia_arriba=True)
+        assert arriba == datetime(2026, 2, 17, 23, 59, 59, 999000, tzinfo=timezone.utc)
+    
+    def test_fecha_sin_hora_con_lte_cubre_el_dia(self):
+        """Test: Una fecha sin hora con lte incluye el día completo"""
+        fecha = parsear_fecha("2026-02-17", hacia_arriba=True)
+        assert fecha == datetime(2026, 2, 17, 23, 59, 59, 999000, tzinfo=timezone.utc)
+    
+    def test_epoch_millis(self):
+        """Test: Interpreta números como epoch_millis"""
+        assert a_epoch_millis(parsear_fecha(1771200000000)) == 1771200000000
+    
+    def test_expresion_invalida(self):
+        """Test: Lanza ValueError con expresiones no soportadas"""
+        with pytest.raises(ValueError):
+            parsear_fecha("now-7x", AHORA)
+
+
+class TestResolverFechasRelativas:
+    """Tests para la función resolver_fechas_relativas"""
+    
+    def test_congela_now(self):
+        """Test: Sustituye now-7d por una fecha absoluta"""
+        query = query_con_rango("now-7d", "now")
+        resuelta = resolver_fechas_relativas(query, AHORA)
+        
+        rango = resuelta["query"]["bool"]["filter"][0]["range"]["@timestamp"]
+        assert rango["gte"] == "2026-02-10T15:30:00.000Z"
+        assert rango["lte"] == "2026-02-17T15:30:00.000Z"
+        # La query original no se modifica
+        assert query["query"]["bool"]["filter"][0]["range"]["@timestamp"]["gte"] == "now-7d"
+    
+    def test_respeta_fechas_absolutas(self):
+        """Test: No toca fechas absolutas"""
+        query = query_con_rango("2026-02-10", "2026-02-17")
+        assert resolver_fechas_relativas(query, AHORA) == query
+
+
+class TestExtraerRangoTimestamp:
+    """Tests para la función extraer_rango_timestamp"""
+    
+    def test_rango_con_fin_exclusivo(self):
+        """Test: Devuelve [inicio, fin) en epoch_millis"""
+        inicio, fin = extraer_rango_timestamp(query_con_rango("2026-02-10", "2026-02-17"))
+        
+        assert inicio == a_epoch_millis(datetime(2026, 2, 10, tzinfo=timezone.utc))
+        assert fin == a_epoch_millis(datetime(2026, 2, 18, tzinfo=timezone.utc))
+    
+    def test_sin_rango(self):
+        """Test: Sin filtro de tiempo devuelve (None, None)"""
+        assert extraer_rango_timestamp({"query": {"match_all": {}}}) == (None, None)
+    
+    def test_ignora_rango_en_must_not(self):
+        """Test: Un rango excluido no acota la query (son los documentos de fuera)"""
+        query = query_con_rango("2026-02-10")
+        query["query"]["bool"]["must_not"] = [
+            {"range": {"@timestamp": {"gte": "2026-02-12", "lt": "2026-02-13"}}}
+        ]
+        
+        inicio, fin = extraer_rango_timestamp(query)
+        
+        assert inicio == a_epoch_millis(datetime(2026, 2, 10, tzinfo=timezone.utc))
+        assert fin is None
+    
+    def test_ignora_rango_en_should(self):
+        """Test: Un rango opcional no limita los documentos que devuelve la query"""
+        query = {"query": {"bool": {"should": [
+            {"range": {"@timestamp": {"gte": "2026-02-10", "lt": "2026-02-11"}}},
+            {"term": {"level": "ERROR"}}
+        ]}}}
+        
+        assert extraer_rango_timestamp(query) == (None, None)
+
+
+class TestAgregarFiltro:
+    """Tests para la función agregar_filtro"""
+    
+    def test_agrega_a_bool_existente(self):
+        """Test: Añade el filtro a la lista filter de un bool"""
+        query = query_con_rango("now-7d")
+        filtro = {"term": {"level": "ERROR"}}
+        
+        resultado = agregar_filtro(query, filtro)
+        
+        assert resultado["query"]["bool"]["filter"][-1] == filtro
+        assert len(query["query"]["bool"]["filter"]) == 1
+    
+    def test_envuelve_query_simple(self):
+        """Test: Envuelve una query no-bool en un bool"""
+        filtro = {"term": {"level": "ERROR"}}
+        resultado = agregar_filtro({"query": {"match_all": {}}}, filtro)
+        
+        assert resultado["query"] == {
+            "bool": {"must": [{"match_all": {}}], "filter": [filtro]}
+        }
+
+
+class TestDesplazarInicioRango:
+    """Tests para la función desplazar_inicio_rango"""
+    
+    def test_adelanta_inicio_y_respeta_fin(self):
+        """Test: Sustituye gt/gte por el nuevo inicio y conserva lte"""
+        query = query_con_rango("2026-02-01", lte="2026-02-20")
+        query["query"]["bool"]["filter"][0]["range"]["@timestamp"]["gt"] = "2026-01-01"
+        
+        resultado = desplazar_inicio_rango(query, 1770681600000)
+        
+        rango = resultado["query"]["bool"]["filter"][0]["range"]["@timestamp"]
+        assert rango == {"gte": "2026-02-10T00:00:00.000Z", "lte": "2026-02-20"}
+    
+    def test_no_retrasa_un_inicio_posterior(self):
+        """Test: Si la marca es anterior al rango de la query, no se toca"""
+        query = query_con_rango("2026-02-15T00:00:00Z")
+        assert desplazar_inicio_rango(query, 1770681600000) == query
+    
+    def test_no_toca_rangos_de_must_not(self):
+        """Test: Un rango excluido se conserva y el inicio se añade como filtro"""
+        excluido = {"range": {"@timestamp": {"gte": "2026-01-01", "lt": "2026-01-02"}}}
+        query = {"query": {"bool": {"must_not": [excluido]}}}
+        
+        resultado = desplazar_inicio_rango(query, 1770681600000)
+        
+        assert resultado["query"]["bool"]["must_not"] == [excluido]
+        assert resultado["query"]["bool"]["filter"] == [
+            {"range": {"@timestamp": {"gte": "2026-02-10T00:00:00.000Z"}}}
+        ]
+    
+    def test_anade_rango_si_no_hay(self):
+        """Test: Sin filtro de tiempo se añade uno en contexto filter"""
+        resultado = desplazar_inicio_rango({"query": {"match_all": {}}}, 1770681600000)
+        
+        assert resultado["query"]["bool"]["filter"] == [
+            {"range": {"@timestamp": {"gte": "2026-02-10T00:00:00.000Z"}}}
+        ]
+
+
+class TestOptimizarQuery:
+    """Tests para la función optimizar_query"""
+    
+    def test_must_pasa_a_filter_sin_conocer_el_mapping(self):
+        """Test: Sin tipos de campo solo se mueve must a contexto filter"""
+        query = query_con_rango("now-7d")
+        
+        resultado, cambios = optimizar_query(query)
+        
+        bool_query = resultado["query"]["bool"]
+        assert "must" not in bool_query
+        assert bool_query["filter"][0] == {"wildcard": {"message": "*Body:*"}}
+        assert len(bool_query["filter"]) == 2
+        assert len(cambios) == 1
+        assert "must" in query["query"]["bool"]
+    
+    def test_wildcard_en_text_sin_subcampo_no_se_reescribe(self):
+        """Test: '*literal*' sobre text no pasa a match_phrase (cambiaría los hits)"""
+        resultado, cambios = optimizar_query(
+            query_con_rango("now-7d"), {"message": "text", "message.keyword": "keyword"}
+        )
+        
+        assert resultado["query"]["bool"]["filter"][0] == {"wildcard": {"message": "*Body:*"}}
+        assert not any("match_phrase" in c for c in cambios)
+    
+    def test_prefiere_subcampo_de_tipo_wildcard(self):
+        """Test: Un subcampo wildcard de un keyword conserva exactamente el mismo patrón"""
+        resultado, _ = optimizar_query(
+            query_con_rango("now-7d"),
+            {"message": "keyword", "message.wc": "wildcard"},
+            {"message": {}, "message.wc": {}}
+        )
+        
+        assert resultado["query"]["bool"]["filter"][0] == {
+            "wildcard": {"message.wc": {"value": "*Body:*"}}
+        }
+    
+    def test_subcampo_wildcard_de_un_text_no_se_usa(self):
+        """Test: Sobre text el wildcard casa términos, no el valor completo del subcampo"""
+        resultado, cambios = optimizar_query(
+            query_con_rango("now-7d"),
+            {"message": "text", "message.wc": "wildcard"},
+            {"message": {}, "message.wc": {}}
+        )
+        
+        assert resultado["query"]["bool"]["filter"][0] == {"wildcard": {"message": "*Body:*"}}
+        assert not any("subcampo" in c for c in cambios)
+    
+    def test_subcampo_con_otro_ignore_above_o_normalizer_no_se_usa(self):
+        """Test: Parámetros de indexado distintos, o desconocidos, impiden la reescritura"""
+        tipos = {"message": "keyword", "message.wc": "wildcard"}
+        for parametros in (
+            {"message": {"ignore_above": 256}, "message.wc": {}},
+            {"message": {"normalizer": "minusculas"}, "message.wc": {}},
+            {"message": {}},
+            None
+        ):
+            resultado, _ = optimizar_query(query_con_rango("now-7d"), tipos, parametros)
+            
+            assert resultado["query"]["bool"]["filter"][0] == {"wildcard": {"message": "*Body:*"}}
+    
+    def test_no_toca_patrones_no_reconocidos(self):
+        """Test: Patrones con comodines intermedios o campos keyword no se reescriben"""
+        query = {"query": {"wildcard": {"message": {"value": "*Bo?y:*"}}}}
+        
+        resultado, cambios = optimizar_query(query, {"message": "text"})
+        
+        assert resultado == query
+        assert cambios == []
+        assert campos_con_wildcard(query) == ["message"]
+
+
+class TestClaveQuery:
+    """Tests para la función clave_query"""
+    
+    def test_clave_estable_e_independiente_del_orden(self):
+        """Test: El orden de las claves no cambia el hash"""
+        a = clave_query({"query": {"match_all": {}}, "_source": ["message"]}, "logs-*")
+        b = clave_query({"_source": ["message"], "query": {"match_all": {}}}, "logs-*")
+        assert a == b
+        assert a != clave_query({"query": {"match_all": {}}}, "otro-*")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo salida_csv
+"""
+
+import csv
+import gzip
+from unittest.mock import Mock
+
+import pytest
+import salida_csv
+from salida_csv import EscritorCsv, SalidaBinaria, abrir_csv_texto
+
+FILAS = [
+    ['2024-01-01T00:00:00Z', 'Body: {"where":[{"field":"a","value":1}]}'],
+    ['2024-01-01T00:00:01Z', 'mensaje con "comillas",\nsalto de línea y ñ'],
+    ['2024-01-01T00:00:02Z', None]
+]
+
+
+def escribir(ruta):
+    """Escribe cabecera y filas en dos lotes"""
+    with EscritorCsv(str(ruta)) as escritor:
+        escritor.escribir_cabecera(['@timestamp', 'message'])
+        escritor.escribir_filas(FILAS[:2])
+        escritor.escribir_filas(FILAS[2:])
+
+
+def leer(ruta):
+    """Filas del CSV (comprimido o no)"""
+    with abrir_csv_texto(str(ruta)) as f:
+        return list(csv.reader(f))
+
+
+class TestFormato:
+    """Tests para la detección del formato por extensión"""
+    
+    @pytest.mark.parametrize('ruta,formato', [
+        ('logs.csv', None), ('logs.csv.gz', 'gzip'), ('LOGS.CSV.ZST', 'zstd'), ('logs.zstd', 'zstd')
+    ])
+    def test_extension(self, ruta, formato):
+        """Test: La extensión decide la compresión"""
+        assert salida_csv.formato_compresion(ruta) == formato
+
+
+class TestEscritorCsv:
+    """Tests para la escritura por lotes"""
+    
+    def test_csv_sin_comprimir(self, tmp_path):
+        """Test: Los lotes se escriben en orden con el formato de csv.writer"""
+        ruta = tmp_path / 'logs.csv'
+        escribir(ruta)
+        
+        filas = leer(ruta)
+        
+        assert filas[0] == ['@timestamp', 'message']
+        assert filas[1:3] == FILAS[:2]
+        assert filas[3] == ['2024-01-01T00:00:02Z', '']
+    
+    def test_csv_gzip(self, tmp_path):
+        """Test: .gz produce un gzip estándar con el mismo contenido"""
+        escribir(tmp_path / 'logs.csv')
+        escribir(tmp_path / 'logs.csv.gz')
+        
+        with gzip.open(tmp_path / 'logs.csv.gz', 'rb') as f:
+            assert f.read() == (tmp_path / 'logs.csv').read_bytes()
+        assert leer(tmp_path / 'logs.csv.gz') == leer(tmp_path / 'logs.csv')
+    
+    def test_csv_zstd(self, tmp_path):
+        """Test: .zst se escribe y se lee con zstandard"""
+        pytest.importorskip('zstandard')
+        escribir(tmp_path / 'logs.csv')
+        escribir(tmp_path / 'logs.csv.zst')
+        
+        assert leer(tmp_path / 'logs.csv.zst') == leer(tmp_path / 'logs.csv')
+    
+    def test_zstd_sin_dependencia(self, tmp_path, monkeypatch):
+        """Test: Sin zstandard, .zst da un error claro antes de crear el archivo"""
+        monkeypatch.setattr(salida_csv, 'zstandard', None)
+        
+        with pytest.raises(ValueError, match='pip install zstandard'):
+            EscritorCsv(str(tmp_path / 'logs.csv.zst'))
+        assert not (tmp_path / 'logs.csv.zst').exists()
+
+
+class TestSalidaBinaria:
+    """Tests para la compresión en segundo plano"""
+    
+    def test_error_del_hilo_se_propaga_sin_bloquear(self, tmp_path):
+        """Test: Un fallo al comprimir llega al productor aunque la cola esté llena"""
+        with pytest.raises(OSError, match='disco lleno'):
+            with SalidaBinaria(str(tmp_path / 'logs.csv.gz')) as salida:
+                salida._compresor = Mock(compress=Mock(side_effect=OSError('disco lleno')))
+                for _ in range(4 * salida_csv.BLOQUES_EN_COLA):
+                    salida.write(b'fila\n')
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo serializers
+"""
+
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+from elastic_transport import SerializationError
+from elasticsearch import Elasticsearch
+from serializers import FastJsonSerializer, RawTextSerializer
+
+
+PAGINA = (
+    b'{"hits":{"hits":[{"_id":"1","_source":{"message":"Body: {\\"where\\":[]}",'
+    b'"@timestamp":"2026-02-16T10:00:00.000Z"}}]}}'
+)
+
+
+class TestFastJsonSerializer:
+    """Tests para la clase FastJsonSerializer"""
+    
+    def test_decodifica_pagina(self):
+        """Test: Decodifica una página de respuesta"""
+        datos = FastJsonSerializer().loads(PAGINA)
+        
+        assert datos['hits']['hits'][0]['_source']['message'] == 'Body: {"where":[]}'
+    
+    def test_respuesta_vacia(self):
+        """Test: Una respuesta vacía devuelve None"""
+        assert FastJsonSerializer().loads(b"") is None
+    
+    def test_json_invalido(self):
+        """Test: Lanza SerializationError con JSON inválido"""
+        with pytest.raises(SerializationError):
+            FastJsonSerializer().loads(b'{"hits":')
+    
+    def test_codifica_tipos_especiales(self):
+        """Test: Codifica fechas, Decimal y claves no-str como json estándar"""
+        serializer = FastJsonSerializer()
+        datos = {"fecha": datetime(2026, 2, 16), "valor": Decimal("1.5"), 1: "uno"}
+        
+        assert serializer.loads(serializer.dumps(datos)) == {
+            "fecha": "2026-02-16T00:00:00", "valor": 1.5, "1": "uno"
+        }
+    
+    def test_enteros_grandes_usan_json_estandar(self):
+        """Test: Enteros de más de 64 bits se codifican con el fallback"""
+        assert FastJsonSerializer().dumps({"id": 2 ** 70}) == b'{"id":1180591620717411303424}'
+    
+    def test_fallback_sin_orjson(self):
+        """Test: Sin orjson usa el json estándar con el mismo resultado"""
+        with patch('serializers.orjson', None):
+            serializer = FastJsonSerializer()
+            
+            assert serializer.usa_orjson is False
+            assert serializer.loads(PAGINA)['hits']['hits'][0]['_id'] == '1'
+            assert serializer.dumps({"a": 1}) == b'{"a":1}'
+    
+    def test_se_registra_en_el_transporte(self):
+        """Test: El cliente usa el serializador para application/json y modo compatibilidad"""
+        es = Elasticsearch(
+            'http://localhost:9200',
+            serializers={'application/json': FastJsonSerializer()}
+        )
+        serializers = es.transport.serializers
+        
+        assert isinstance(serializers.get_serializer('application/json'), FastJsonSerializer)
+        assert isinstance(
+            serializers.get_serializer('application/vnd.elasticsearch+json'), FastJsonSerializer
+        )
+
+
+
+class TestRawTextSerializer:
+    """Tests para el serializador de respuestas de texto sin decodificar"""
+    
+    def test_csv_llega_como_bytes(self):
+        """Test: Las respuestas text/csv se entregan como bytes sin tocar"""
+        es = Elasticsearch('http://localhost:9200', serializers={'text/*': RawTextSerializer()})
+        serializer = es.transport.serializers.get_serializer('text/csv')
+        
+        assert serializer.loads(b'message\r\n"a,b"\n') == b'message\r\n"a,b"\n'
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
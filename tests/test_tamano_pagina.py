@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests para el módulo tamano_pagina
+"""
+
+from unittest.mock import Mock
+
+from elasticsearch.exceptions import ApiError, ConnectionTimeout
+from tamano_pagina import TamanoPaginaAdaptativo, es_error_de_sobrecarga
+
+
+def crear_circuit_breaker():
+    """ApiError 429 como el que devuelve un circuit breaker del cluster"""
+    return ApiError(
+        'circuit_breaking_exception', meta=Mock(status=429),
+        body={'error': {'type': 'circuit_breaking_exception'}}
+    )
+
+
+class TestTamanoPaginaAdaptativo:
+    """Tests para el controlador AIMD"""
+    
+    def test_crece_con_paginas_llenas_y_rapidas(self):
+        """Test: Aumento aditivo hasta el máximo"""
+        control = TamanoPaginaAdaptativo(inicial=1000, minimo=100, maximo=1500)
+        
+        assert control.observar(1000, 1000, 0.3) == 1250
+        assert control.observar(1250, 1250, 0.3) == 1500
+        assert control.observar(1500, 1500, 0.3) == 1500
+    
+    def test_no_crece_con_la_ultima_pagina(self):
+        """Test: Una página incompleta no indica que quepan más documentos"""
+        control = TamanoPaginaAdaptativo(inicial=1000, minimo=100, maximo=5000)
+        
+        assert control.observar(1000, 10, 0.1) == 1000
+    
+    def test_reduce_a_la_mitad_con_paginas_lentas(self):
+        """Test: Reducción multiplicativa acotada al mínimo"""
+        control = TamanoPaginaAdaptativo(inicial=1000, minimo=300, maximo=5000,
+                                         objetivo_segundos=2.0)
+        
+        assert control.observar(1000, 1000, 5.0) == 500
+        assert control.observar(500, 500, 5.0) == 300
+    
+    def test_ajusta_a_los_bytes_por_documento(self):
+        """Test: Con mensajes enormes el tamaño baja según los bytes observados"""
+        control = TamanoPaginaAdaptativo(inicial=1000, minimo=10, maximo=5000,
+                                         max_bytes=10 * 1024 * 1024)
+        
+        # 1000 documentos de 100 KB = ~100 MB: caben ~100 por página
+        assert control.observar(1000, 1000, 0.5, 1000 * 100 * 1024) == 102
+    
+    def test_reduce_ante_timeout_y_circuit_breaker(self):
+        """Test: Timeouts y circuit breakers permiten reintentar más pequeño"""
+        control = TamanoPaginaAdaptativo(inicial=400, minimo=100, maximo=5000)
+        
+        assert control.reducir_por_error(ConnectionTimeout('timeout')) is True
+        assert control.reducir_por_error(crear_circuit_breaker()) is True
+        assert control.tamano == 100
+        assert control.reducir_por_error(crear_circuit_breaker()) is False
+        assert control.reducir_por_error(ValueError('otro')) is False
+    
+    def test_inactivo_mantiene_el_tamano(self):
+        """Test: Sin adaptación el tamaño configurado no cambia pero se registra"""
+        control = TamanoPaginaAdaptativo(inicial=2, minimo=100, maximo=5000, activo=False)
+        
+        assert control.observar(2, 2, 10.0) == 2
+        assert control.reducir_por_error(ConnectionTimeout('timeout')) is False
+        assert control.resumen()['paginas_por_tamano'] == {2: 1}
+    
+    def test_resumen_de_tamanos_usados(self):
+        """Test: El resumen refleja los tamaños elegidos"""
+        control = TamanoPaginaAdaptativo(inicial=1000, minimo=100, maximo=5000)
+        control.observar(1000, 1000, 0.1)
+        control.observar(1250, 1250, 9.0)
+        
+        resumen = control.resumen()
+        assert resumen['paginas_por_tamano'] == {1000: 1, 1250: 1}
+        assert resumen['final'] == 625
+        assert (resumen['aumentos'], resumen['reducciones']) == (1, 1)
+
+
+class TestEsErrorDeSobrecarga:
+    """Tests para la clasificación de errores"""
+    
+    def test_clasifica_errores(self):
+        """Test: Solo timeouts y circuit breakers cuentan como sobrecarga"""
+        assert es_error_de_sobrecarga(ConnectionTimeout('timeout'))
+        assert es_error_de_sobrecarga(crear_circuit_breaker())
+        assert not es_error_de_sobrecarga(Exception('Query parsing error'))